@@ -7,6 +7,8 @@ Calls create_pipeline() which redirects based on EXP_TYPE.
 import logging
 import numpy as np
 import copy
+import functools
+import os
 
 from astropy.modeling import models
 from astropy.modeling.models import Mapping, Identity, Const1D, Scale, Tabular1D
@@ -14,6 +16,7 @@ from astropy import units as u
 from astropy import coordinates as coord
 from astropy.io import fits
 from gwcs import coordinate_frames as cf
+from gwcs import WCS
 from gwcs.wcstools import grid_from_bounding_box
 
 from stdatamodels.jwst.datamodels import (CollimatorModel, CameraModel, DisperserModel, FOREModel,
@@ -40,7 +43,8 @@ FIXED_SLIT_NUMS = {'NONE': 0, 'S200A1': 1, 'S200A2': 2,
                    'S400A1': 3, 'S1600A1': 4, 'S200B1': 5}
 
 __all__ = ["create_pipeline", "imaging", "ifu", "slits_wcs", "get_open_slits", "nrs_wcs_set_input",
-           "nrs_ifu_wcs", "get_spectral_order_wrange"]
+           "nrs_wcs_set_input_list", "nrs_ifu_wcs", "get_spectral_order_wrange",
+           "read_msa_metadata"]
 
 
 def create_pipeline(input_model, reference_files, slit_y_range):
@@ -526,6 +530,168 @@ def get_msa_metadata(input_model, reference_files):
     return msa_config, msa_metadata_id, dither_position
 
 
+class MSAMetadata:
+    """
+    Shutter and source information for an MSA configuration.
+
+    The rows of the SHUTTER_INFO table of the MSA meta data file for one
+    MSA configuration and dither position are selected with vectorized masks
+    and grouped by slitlet, and the rows of the SOURCE_INFO table are indexed
+    by source_id, so that the information for each slitlet can be looked up
+    without scanning the tables.
+
+    Instances are shared by all the callers of `read_msa_metadata` and
+    should not be modified.
+
+    Parameters
+    ----------
+    msa_file : str
+        MSA meta data file name, FITS keyword ``MSAMETFL``.
+    msa_metadata_id : int
+        The MSA meta id for the science file, FITS keyword ``MSAMETID``.
+    dither_position : int
+        The index in the dither pattern, FITS keyword ``PATT_NUM``.
+
+    Attributes
+    ----------
+    shutters : dict
+        Columns of the SHUTTER_INFO rows for this MSA configuration and
+        dither position, keyed by column name.
+    is_fs : ndarray of bool
+        True for the rows of ``shutters`` that are fixed slits.
+    slitlets : dict
+        Indices into ``shutters`` of the rows of each slitlet, keyed by the
+        slitlet_id (or the fixed slit name), in order of first appearance.
+    sources : dict
+        Columns of the SOURCE_INFO table, keyed by column name.
+    source_index : dict
+        Row of ``sources`` of each source_id.
+    """
+
+    def __init__(self, msa_file, msa_metadata_id, dither_position):
+        try:
+            hdulist = fits.open(msa_file, memmap=False)
+        except FileNotFoundError:
+            message = "Missing MSA meta (MSAMETFL) file {}".format(msa_file)
+            log.error(message)
+            raise MSAFileError(message)
+        except OSError:
+            message = "Unable to read MSA FITS file (MSAMETFL) {0}".format(msa_file)
+            log.error(message)
+            raise MSAFileError(message)
+        except Exception:
+            message = "Problem reading MSA metafile (MSAMETFL) {0}".format(msa_file)
+            log.error(message)
+            raise MSAFileError(message)
+
+        with hdulist:
+            # Get the shutter and source info tables from the _msa.fits file.
+            msa_conf = hdulist[('SHUTTER_INFO', 1)].data  # EXTNAME = 'SHUTTER_INFO'
+            msa_source = hdulist[("SOURCE_INFO", 1)].data  # EXTNAME = 'SOURCE_INFO'
+
+            # Filter the shutters on the msa_metadata_id and dither_point_index.
+            select = ((msa_conf['msa_metadata_id'] == msa_metadata_id)
+                      & (msa_conf['dither_point_index'] == dither_position))
+            self.shutters = {name: msa_conf[name][select] for name in msa_conf.names}
+            self.sources = {name: msa_source[name] for name in msa_source.names}
+        nrows = np.count_nonzero(select)
+
+        # Index of the fixed slit name in FIXED_SLIT_NUMS for fixed slit rows,
+        # 0 for MSA rows (old-style MSA files have no fixed_slit column)
+        fs_index = np.zeros(nrows, dtype=int)
+        fs_names = [name for name in FIXED_SLIT_NUMS if name != 'NONE']
+        if 'fixed_slit' in self.shutters:
+            fixed_slit = self.shutters['fixed_slit']
+            for i, name in enumerate(fs_names):
+                fs_index[fixed_slit == name] = i + 1
+        self.is_fs = fs_index > 0
+
+        # Group the rows by slitlet_id for MSA rows and by name for fixed slits,
+        # keeping the order in which the slitlets first appear in the table
+        self.slitlets = {}
+        if nrows > 0:
+            group_id = np.stack([fs_index, np.where(self.is_fs, 0, self.shutters['slitlet_id'])],
+                                axis=1)
+            _, first, inverse, counts = np.unique(group_id, axis=0, return_index=True,
+                                                  return_inverse=True, return_counts=True)
+            rows = np.split(np.argsort(inverse.ravel(), kind='stable'), np.cumsum(counts)[:-1])
+            for group in np.argsort(first):
+                row = first[group]
+                if self.is_fs[row]:
+                    slitlet_id = fs_names[fs_index[row] - 1]
+                else:
+                    slitlet_id = self.shutters['slitlet_id'][row]
+                self.slitlets[slitlet_id] = rows[group]
+
+        # Index of the first row of each source_id in the source table
+        source_ids, source_rows = np.unique(self.sources['source_id'], return_index=True)
+        self.source_index = dict(zip(source_ids.tolist(), source_rows.tolist()))
+
+    def source_info(self, source_id):
+        """
+        Return the information of a source from the SOURCE_INFO table.
+
+        Parameters
+        ----------
+        source_id : int
+            The source ID.
+
+        Returns
+        -------
+        info : tuple or None
+            Source name, alias, stellarity, RA and Dec of the source,
+            or None if the source is not in the table.
+        """
+        row = self.source_index.get(source_id)
+        if row is None:
+            return None
+        return tuple(self.sources[name][row]
+                     for name in ('source_name', 'alias', 'stellarity', 'ra', 'dec'))
+
+
+@functools.lru_cache(maxsize=16)
+def _read_msa_metadata(msa_file, mtime, msa_metadata_id, dither_position):
+    return MSAMetadata(msa_file, msa_metadata_id, dither_position)
+
+
+def read_msa_metadata(msa_file, msa_metadata_id, dither_position):
+    """
+    Return the shutter and source information for an MSA configuration.
+
+    The information is read once per MSA meta data file, MSA metadata ID and
+    dither position and cached, so that all the exposures and steps using
+    the same MSA configuration share it. A file modified since it was
+    cached is read again. The information is cached only when ``msa_file``
+    is a file name.
+
+    Parameters
+    ----------
+    msa_file : str, os.PathLike or file-like
+        MSA meta data file name, FITS keyword ``MSAMETFL``, or any other
+        input accepted by `astropy.io.fits.open`.
+    msa_metadata_id : int
+        The MSA meta id for the science file, FITS keyword ``MSAMETID``.
+    dither_position : int
+        The index in the dither pattern, FITS keyword ``PATT_NUM``.
+
+    Returns
+    -------
+    msa_metadata : `MSAMetadata`
+        The shutter and source information of the MSA configuration.
+    """
+    if not isinstance(msa_file, (str, os.PathLike)):
+        # File objects may not be hashable, and their content may change
+        return MSAMetadata(msa_file, msa_metadata_id, dither_position)
+
+    msa_file = os.path.abspath(msa_file)
+    try:
+        mtime = os.stat(msa_file).st_mtime_ns
+    except OSError:
+        # Missing file: the error is reported by MSAMetadata
+        mtime = None
+    return _read_msa_metadata(msa_file, mtime, int(msa_metadata_id), int(dither_position))
+
+
 def get_open_msa_slits(prog_id, msa_file, msa_metadata_id, dither_position,
                        slit_y_range=[-.55, .55]):
     """
@@ -575,91 +741,37 @@ def get_open_msa_slits(prog_id, msa_file, msa_metadata_id, dither_position,
     """
     slitlets = []
     ylow, yhigh = slit_y_range
-    # If they passed in a string then we shall assume it is the filename
-    # of the configuration file.
-    try:
-        msa_file = fits.open(msa_file, memmap=False)
-    except FileNotFoundError:
-        message = "Missing MSA meta (MSAMETFL) file {}".format(msa_file)
-        log.error(message)
-        raise MSAFileError(message)
-    except OSError:
-        message = "Unable to read MSA FITS file (MSAMETFL) {0}".format(msa_file)
-        log.error(message)
-        raise MSAFileError(message)
-    except Exception:
-        message = "Problem reading MSA metafile (MSAMETFL) {0}".format(msa_file)
-        log.error(message)
-        raise MSAFileError(message)
-
-    # Get the shutter and source info tables from the _msa.fits file.
-    msa_conf = msa_file[('SHUTTER_INFO', 1)]  # EXTNAME = 'SHUTTER_INFO'
-    msa_source = msa_file[("SOURCE_INFO", 1)].data  # EXTNAME = 'SOURCE_INFO'
 
-    # First we are going to filter the msa_file data on the msa_metadata_id
-    # and dither_point_index.
-    msa_data = [x for x in msa_conf.data if x['msa_metadata_id'] == msa_metadata_id
-                and x['dither_point_index'] == dither_position]
-    log.debug(f'msa_data with msa_metadata_id = {msa_metadata_id}   {msa_data}')
+    msa_metadata = read_msa_metadata(msa_file, msa_metadata_id, dither_position)
+    shutters = msa_metadata.shutters
+    log.debug(f'msa_data with msa_metadata_id = {msa_metadata_id}: '
+              f'{len(msa_metadata.is_fs)} shutters')
     log.info(f'Retrieving open MSA slitlets for msa_metadata_id = {msa_metadata_id} '
              f'and dither_index = {dither_position}')
 
-    # Sort the MSA rows by slitlet_id
-    slitlet_sets = {}
-    for row in msa_data:
-        # Check for fixed slit: if set, then slitlet_id is null
-        is_fs = False
-        try:
-            fixed_slit = row['fixed_slit']
-            if (fixed_slit in FIXED_SLIT_NUMS.keys()
-                    and fixed_slit != 'NONE'):
-                is_fs = True
-        except (IndexError, ValueError, KeyError):
-            # May be old-style MSA file without a fixed_slit column
-            fixed_slit = None
-
-        if is_fs:
-            # Fixed slit - use the slit name as the ID
-            slitlet_id = fixed_slit
-        else:
-            # MSA - use the slitlet ID
-            slitlet_id = row['slitlet_id']
-
-        # Append the row for the slitlet
-        if slitlet_id in slitlet_sets:
-            slitlet_sets[slitlet_id].append(row)
-        else:
-            slitlet_sets[slitlet_id] = [row]
-
     # Add a margin to the slit y limits
     margin = 0.5
 
     # Now let's look at each unique slitlet id
-    for slitlet_id, slitlet_rows in slitlet_sets.items():
+    for slitlet_id, rows in msa_metadata.slitlets.items():
         # Get the open shutter information from the slitlet rows
-        open_shutters = [x['shutter_column'] for x in slitlet_rows]
+        shutter_column = shutters['shutter_column'][rows]
+        open_shutters = list(shutter_column)
 
         # How many shutters in the slitlet are labeled as "main" or "primary"?
-        n_main_shutter = len([s for s in slitlet_rows if s['primary_source'] == 'Y'])
+        is_main = shutters['primary_source'][rows] == 'Y'
+        n_main_shutter = np.count_nonzero(is_main)
 
         # Check for fixed slit sources defined in the MSA file
-        is_fs = [False] * len(slitlet_rows)
-        for i, slitlet in enumerate(slitlet_rows):
-            try:
-                if (slitlet['fixed_slit'] in FIXED_SLIT_NUMS.keys()
-                        and slitlet['fixed_slit'] != 'NONE'):
-                    is_fs[i] = True
-            except (IndexError, ValueError, KeyError):
-                # May be old-style MSA file without a fixed_slit column
-                pass
+        is_fs = msa_metadata.is_fs[rows]
 
         # In the next part we need to calculate, find, or determine 5 things for each slit:
         #    quadrant, xcen, ycen, ymin, ymax
 
         # First, check for a fixed slit
-        if all(is_fs) and len(slitlet_rows) == 1:
+        if all(is_fs) and len(rows) == 1:
             # One fixed slit open for the source
-            slitlet = slitlet_rows[0]
+            row = rows[0]
 
             # Use a standard number for fixed slit shutter id
             shutter_id = FIXED_SLIT_NUMS[slitlet_id] - 1
@@ -673,19 +785,18 @@ def get_open_msa_slits(prog_id, msa_file, msa_metadata_id, dither_position,
             # Source position and id
             if n_main_shutter == 1:
                 # Source is marked primary
-                source_id = slitlet['source_id']
-                source_xpos = slitlet['estimated_source_in_shutter_x']
-                source_ypos = slitlet['estimated_source_in_shutter_y']
+                source_id = shutters['source_id'][row]
+                source_xpos = shutters['estimated_source_in_shutter_x'][row]
+                source_ypos = shutters['estimated_source_in_shutter_y'][row]
                 log.info(f'Found fixed slit {slitlet_id} with source_id = {source_id}.')
 
                 # Get source info for this slitlet:
                 # note that slits with a real source assigned have source_id > 0,
                 # while slits with source_id < 0 contain "virtual" sources
-                try:
-                    source_name, source_alias, stellarity, source_ra, source_dec = [
-                        (s['source_name'], s['alias'], s['stellarity'], s['ra'], s['dec'])
-                        for s in msa_source if s['source_id'] == source_id][0]
-                except IndexError:
+                source_info = msa_metadata.source_info(source_id)
+                if source_info is not None:
+                    source_name, source_alias, stellarity, source_ra, source_dec = source_info
+                else:
                     # Missing source information: assign a virtual source name
                     log.warning("Could not retrieve source info from MSA file")
                     source_name = f"{prog_id}_VRT{slitlet_id}"
@@ -708,7 +819,6 @@ def get_open_msa_slits(prog_id, msa_file, msa_metadata_id, dither_position,
             message = ("MSA configuration file has an unsupported "
                        "fixed slit configuration.")
             log.warning(message)
-            msa_file.close()
             raise MSAFileError(message)
 
         # Now check for regular MSA slitlets
@@ -717,14 +827,14 @@ def get_open_msa_slits(prog_id, msa_file, msa_metadata_id, dither_position,
             if len(open_shutters) == 1:
                 jmin = jmax = j = open_shutters[0]
             else:
-                jmin = min([s['shutter_column'] for s in slitlet_rows])
-                jmax = max([s['shutter_column'] for s in slitlet_rows])
+                jmin = shutter_column.min()
+                jmax = shutter_column.max()
                 j = jmin + (jmax - jmin) // 2
             ymax = yhigh + margin + (jmax - j) * 1.15
             ymin = -(-ylow + margin) + (jmin - j) * 1.15
-            quadrant = slitlet_rows[0]['shutter_quadrant']
+            quadrant = shutters['shutter_quadrant'][rows[0]]
             ycen = j
-            xcen = slitlet_rows[0]['shutter_row']  # grab the first as they are all the same
+            xcen = shutters['shutter_row'][rows[0]]  # grab the first as they are all the same
             shutter_id = xcen + (ycen - 1) * 365  # shutter numbers in MSA file are 1-indexed
 
             # Background slits all have source_id=0 in the msa_file,
@@ -744,34 +854,31 @@ def get_open_msa_slits(prog_id, msa_file, msa_metadata_id, dither_position,
 
         # There is 1 main shutter: this is a slit containing either a real or virtual source
         elif n_main_shutter == 1:
-            xcen, ycen, quadrant, source_xpos, source_ypos = [
-                (s['shutter_row'], s['shutter_column'], s['shutter_quadrant'],
-                 s['estimated_source_in_shutter_x'],
-                 s['estimated_source_in_shutter_y'])
-                for s in slitlet_rows if s['background'] == 'N'][0]
+            row = rows[shutters['background'][rows] == 'N'][0]
+            xcen = shutters['shutter_row'][row]
+            ycen = shutters['shutter_column'][row]
+            quadrant = shutters['shutter_quadrant'][row]
+            source_xpos = shutters['estimated_source_in_shutter_x'][row]
+            source_ypos = shutters['estimated_source_in_shutter_y'][row]
             shutter_id = xcen + (ycen - 1) * 365  # shutter numbers in MSA file are 1-indexed
 
             # y-size
-            jmin = min([s['shutter_column'] for s in slitlet_rows])
-            jmax = max([s['shutter_column'] for s in slitlet_rows])
+            jmin = shutter_column.min()
+            jmax = shutter_column.max()
             j = ycen
             ymax = yhigh + margin + (jmax - j) * 1.15
             ymin = -(-ylow + margin) + (jmin - j) * 1.15
 
             # Get the source_id from the primary shutter entry
-            source_id = None
-            for i in range(len(slitlet_rows)):
-                if slitlet_rows[i]['primary_source'] == 'Y':
-                    source_id = slitlet_rows[i]['source_id']
+            source_id = shutters['source_id'][rows[is_main][0]]
 
             # Get source info for this slitlet;
             # note that slits with a real source assigned have source_id > 0,
             # while slits with source_id < 0 contain "virtual" sources
-            try:
-                source_name, source_alias, stellarity, source_ra, source_dec = [
-                    (s['source_name'], s['alias'], s['stellarity'], s['ra'], s['dec'])
-                    for s in msa_source if s['source_id'] == source_id][0]
-            except IndexError:
+            source_info = msa_metadata.source_info(source_id)
+            if source_info is not None:
+                source_name, source_alias, stellarity, source_ra, source_dec = source_info
+            else:
                 source_name = f"{prog_id}_VRT{slitlet_id}"
                 source_alias = "VRT{}".format(slitlet_id)
                 stellarity = 0.0
@@ -791,7 +898,6 @@ def get_open_msa_slits(prog_id, msa_file, msa_metadata_id, dither_position,
             log.warning(message)
             message = "MSA configuration file has more than 1 shutter with primary source"
             log.warning(message)
-            msa_file.close()
             raise MSAFileError(message)
 
         # Create the output list of tuples that contain the required
@@ -816,7 +922,6 @@ def get_open_msa_slits(prog_id, msa_file, msa_metadata_id, dither_position,
         log.debug(f'Appending slit: {slit_parameters}')
         slitlets.append(Slit(*slit_parameters))
 
-    msa_file.close()
     return slitlets
 
 
@@ -1760,14 +1865,19 @@ def _nrs_wcs_set_input_lite(input_model, input_wcs, slit_name, transforms,
 
     The lite version of the routine is distinguished from the legacy
     routine because it does not make a deep copy of the input WCS object.
+    The WCS objects of different slits built from the same ``input_wcs``
+    each have their own pipeline, but share the transform instances of
+    ``input_wcs`` and ``transforms[0]``.  Replacing a transform of one WCS
+    (e.g. with ``set_transform``) does not change the others, but modifying
+    the parameters of a shared transform in place changes all of them.
 
     Parameters
     ----------
     input_model : `~jwst.datamodels.JwstDataModel`
         A WCS object for the all open slitlets in an observation.
     input_wcs : `~gwcs.wcs.WCS`
-        A WCS object for the all open slitlets in an observation.  This
-        will be modified and returned.
+        A WCS object for the all open slitlets in an observation.  It is
+        not modified.
     slit_name : int or str
         Slit.name of an open slit.
     transforms : list of `~astropy.modeling.core.Model`
@@ -1796,7 +1906,10 @@ def _nrs_wcs_set_input_lite(input_model, input_wcs, slit_name, transforms,
     if wavelength_range is None:
         _, wavelength_range = spectral_order_wrange_from_model(input_model)
 
-    slit_wcs = copy.copy(input_wcs)
+    # New WCS with its own pipeline steps, so that setting the transforms
+    # of this slit does not change the WCS of other slits
+    slit_wcs = WCS([(step.frame, step.transform) for step in input_wcs.pipeline],
+                   name=input_wcs.name)
 
     slit_wcs.set_transform('sca', 'gwa', transforms[0])
     slit_wcs.set_transform('gwa', 'slit_frame', transforms[1])
@@ -1988,21 +2101,69 @@ def spectral_order_wrange_from_model(input_model):
     return spectral_order, wrange
 
 
+def nrs_wcs_set_input_list(input_model, slit_names, wavelength_range=None):
+    """
+    Return the WCS objects of several slits, slices or shutters.
+
+    This is the fast alternative to calling `nrs_wcs_set_input` for each
+    slit. The WCS of the exposure is copied once and the transforms of all
+    the slits are extracted from the copy at once, instead of deep copying
+    the WCS of the exposure for every slit.
+
+    The returned WCS objects do not share any transform with
+    ``input_model.meta.wcs``, but they share among themselves the transform
+    instances that are common to all the slits (the detector to ``gwa``
+    transforms and the transforms after the ``msa_frame`` or ``slicer``
+    frame).  Replacing a transform of one WCS, with ``set_transform`` or
+    ``insert_transform``, does not affect the other WCS objects, but the
+    parameters of the shared transforms must not be modified in place.  Use
+    `nrs_wcs_set_input` to get a fully independent WCS.
+
+    Parameters
+    ----------
+    input_model : `~jwst.datamodels.JwstDataModel`
+        The data model. Must have been through the assign_wcs step.
+    slit_names : list of int or str
+        Slit.name of the open slits (slice numbers for the IFU).
+    wavelength_range : list
+        Wavelength range for the combination of filter and grating. Optional.
+
+    Returns
+    -------
+    wcs_list : list of `~gwcs.wcs.WCS`
+        WCS object for each slit in ``slit_names``.
+    """
+    if wavelength_range is None:
+        _, wavelength_range = spectral_order_wrange_from_model(input_model)
+
+    wcsobj, sca2gwa, gwa2slit, slit2slicer, open_slits = _get_transforms(
+        input_model, slit_names, return_slits=True)
+    wcs_list = []
+    for i, slit_name in enumerate(slit_names):
+        wcs_list.append(_nrs_wcs_set_input_lite(input_model, wcsobj, slit_name,
+                                                [sca2gwa, gwa2slit[i], slit2slicer[i]],
+                                                wavelength_range=wavelength_range,
+                                                open_slits=open_slits))
+    return wcs_list
+
+
 def nrs_ifu_wcs(input_model):
     """
     Return a list of WCSs for all NIRSPEC IFU slits.
 
+    The slice WCSs are built with `nrs_wcs_set_input_list` and share the
+    transform instances common to all the slices, which must not be
+    modified in place.  Use `nrs_wcs_set_input` to get a fully independent
+    WCS for a slice.
+
     Parameters
     ----------
     input_model : jwst.datamodels.JwstDataModel
         The data model. Must have been through the assign_wcs step.
     """
     _, wrange = spectral_order_wrange_from_model(input_model)
-    wcs_list = []
     # loop over all IFU slits
-    for i in range(30):
-        wcs_list.append(nrs_wcs_set_input(input_model, i, wrange))
-    return wcs_list
+    return nrs_wcs_set_input_list(input_model, list(range(30)), wrange)
 
 
 def _create_ifupost_transform(ifupost_slice):
@@ -446,6 +446,47 @@ def test_msa_missing_source(tmp_path):
     _compare_slits(slitlet_info[1], ref_slit)
 
 
+def test_read_msa_metadata(tmp_path):
+    """
+    Test the MSA metadata is indexed and read once per file, metadata id and dither.
+    """
+    msaconfl = str(tmp_path / 'msa_fs_configuration.fits')
+    shutil.copy(get_file_path('msa_fs_configuration.fits'), msaconfl)
+
+    msa_metadata = nirspec.read_msa_metadata(msaconfl, 12, 1)
+    assert nirspec.read_msa_metadata(msaconfl, 12, 1) is msa_metadata
+    assert nirspec.read_msa_metadata(msaconfl, 13, 1) is not msa_metadata
+
+    # rows are grouped by slitlet id and by fixed slit name
+    assert list(msa_metadata.slitlets) == [55, 'S200A1', 'S200A2', 'S400A1', 'S1600A1', 'S200B1']
+    assert len(msa_metadata.slitlets[55]) == 5
+    assert np.all(msa_metadata.shutters['slitlet_id'][msa_metadata.slitlets[55]] == 55)
+    assert not np.any(msa_metadata.is_fs[msa_metadata.slitlets[55]])
+    assert msa_metadata.is_fs[msa_metadata.slitlets['S200A1']].all()
+
+    # sources are looked up by source_id
+    assert msa_metadata.source_info(1)[:2] == ('95065_1', '2122')
+    assert msa_metadata.source_info(9999) is None
+
+    # a modified file is read again
+    with fits.open(msaconfl) as msa_hdu_list:
+        msa_hdu_list.writeto(msaconfl, overwrite=True)
+    os.utime(msaconfl, ns=(0, 0))
+    assert nirspec.read_msa_metadata(msaconfl, 12, 1) is not msa_metadata
+
+
+def test_read_msa_metadata_file_object():
+    """
+    Test the MSA metadata of a file object is read without caching.
+    """
+    msaconfl = get_file_path('msa_fs_configuration.fits')
+    with open(msaconfl, 'rb') as msa_file:
+        msa_metadata = nirspec.read_msa_metadata(msa_file, 12, 1)
+    with open(msaconfl, 'rb') as msa_file:
+        assert nirspec.read_msa_metadata(msa_file, 12, 1) is not msa_metadata
+    assert list(msa_metadata.slitlets) == list(nirspec.read_msa_metadata(msaconfl, 12, 1).slitlets)
+
+
 open_shutters = [[24], [23, 24], [22, 23, 25, 27], [22, 23, 25, 27, 28]]
 main_shutter = [24, 23, 25, 28]
 result = ["x", "x1", "110x01", "110101x"]
@@ -1087,3 +1128,35 @@ def test_in_slice(slice, wcs_ifu_grating, ifu_world_coord):
 
     r, d, _ = slice_wcs(x, y)
     assert r[~np.isnan(r)].size == xinv.size
+
+
+def test_nrs_wcs_set_input_list(wcs_ifu_grating):
+    """ Test the slice WCSs built together match the WCSs built one at a time.
+
+    All the slice WCSs are built before any of them is evaluated, so this also
+    checks that building one slice WCS does not change the others.
+    """
+    im, refs = wcs_ifu_grating("G140H", "F100LP")
+    slices = [0, 9, 29]
+    wcs_list = nirspec.nrs_wcs_set_input_list(im, slices)
+    assert len(wcs_list) == len(slices)
+    for slice_wcs, sl in zip(wcs_list, slices):
+        full_wcs = nirspec.nrs_wcs_set_input(im, sl)
+        x, y = wcstools.grid_from_bounding_box(full_wcs.bounding_box)
+        assert_allclose(wcstools.grid_from_bounding_box(slice_wcs.bounding_box), (x, y))
+        for coord, full_coord in zip(slice_wcs(x, y), full_wcs(x, y)):
+            assert_allclose(coord, full_coord, equal_nan=True)
+    assert len(nirspec.nrs_ifu_wcs(im)) == 30
+
+
+def test_nrs_wcs_set_input_list_independent(wcs_ifu_grating):
+    """ Test replacing a transform of one slice WCS does not change the others."""
+    im, refs = wcs_ifu_grating("G140H", "F100LP")
+    wcs_list = nirspec.nrs_wcs_set_input_list(im, [0, 1])
+    gwa2slit = wcs_list[1].get_transform('gwa', 'slit_frame')
+    wcs_list[0].set_transform('slit_frame', 'slicer', astmodels.Identity(3))
+    wcs_list[0].set_transform('gwa', 'slit_frame', astmodels.Identity(3))
+    assert wcs_list[1].get_transform('gwa', 'slit_frame') is gwa2slit
+    assert wcs_list[1].get_transform('slit_frame', 'slicer') is not \
+        wcs_list[0].get_transform('slit_frame', 'slicer')
+    assert im.meta.wcs.get_transform('gwa', 'slit_frame') is not gwa2slit
@@ -3,17 +3,21 @@ Test the utility functions
 """
 
 import os
+import shutil
 
-from astropy.modeling.models import Shift, Identity
+from astropy.modeling.models import Shift, Identity, Polynomial1D, Polynomial2D
 from astropy.table import QTable
 
+from gwcs import wcs
 from stdatamodels.jwst import datamodels
+from stdatamodels.jwst.transforms.models import NIRCAMBackwardGrismDispersion
 
 from jwst.lib.catalog_utils import SkyObject
 
 from jwst.assign_wcs.util import (
     get_object_info, wcs_bbox_from_shape, subarray_transform,
-    bounding_box_from_subarray, transform_bbox_from_shape
+    bounding_box_from_subarray, transform_bbox_from_shape,
+    _grism_extents_key, is_elementwise
 )
 
 from jwst.assign_wcs.tests import data
@@ -105,3 +109,45 @@ def test_bounding_box_from_subarray():
     im.meta.subarray.xsize = 400
     im.meta.subarray.ysize = 600
     assert bounding_box_from_subarray(im) == ((-.5, 599.5), (-.5, 399.5))
+
+
+def test_is_elementwise():
+    xmodels = [Polynomial1D(1, c0=-1530.9, c1=2589.7)]
+    ymodels = [Polynomial1D(1, c0=0., c1=0.)]
+    lmodels = [Polynomial1D(1, c0=2.4, c1=2.6)]
+    inv_lmodels = [Polynomial1D(1, c0=-0.923, c1=0.385)]
+    dispersion = NIRCAMBackwardGrismDispersion([1], lmodels=lmodels, xmodels=xmodels,
+                                               ymodels=ymodels, inv_lmodels=inv_lmodels)
+    assert is_elementwise(Shift(1) & Shift(2) & Identity(2) | dispersion)
+
+    # Without inverse wavelength models the wavelengths are interpolated
+    lmodels = [[Polynomial2D(1, c0_0=2.4), Polynomial2D(1, c0_0=2.6)]]
+    dispersion = NIRCAMBackwardGrismDispersion([1], lmodels=lmodels, xmodels=xmodels,
+                                               ymodels=ymodels)
+    assert not is_elementwise(dispersion)
+    assert not is_elementwise(Shift(1) & Shift(2) & Identity(2) | dispersion)
+
+
+def test_grism_extents_key(tmp_path):
+    catalog = str(tmp_path / 'catalog.ecsv')
+    shutil.copy(get_file_path('step_SourceCatalogStep_cat.ecsv'), catalog)
+    model = datamodels.ImageModel()
+    model.meta.wcs = wcs.WCS(Shift(1) & Shift(2), input_frame='detector', output_frame='world')
+    model.meta.source_catalog = catalog
+    wavelength_range = {1: (2.4, 4.0)}
+
+    # The dispersion is only identified by the reference files
+    assert _grism_extents_key(model, wavelength_range) is None
+
+    model.meta.ref_file.specwcs.name = 'specwcs.asdf'
+    model.meta.ref_file.distortion.name = 'distortion.asdf'
+    key = _grism_extents_key(model, wavelength_range)
+    assert key is not None
+    assert _grism_extents_key(model, wavelength_range) == key
+    assert _grism_extents_key(model, {1: (2.5, 4.0)}) != key
+
+    model.meta.wcs = wcs.WCS(Shift(1) & Shift(3), input_frame='detector', output_frame='world')
+    assert _grism_extents_key(model, wavelength_range) != key
+
+    model.meta.source_catalog = str(tmp_path / 'missing.ecsv')
+    assert _grism_extents_key(model, wavelength_range) is None
@@ -4,10 +4,13 @@ Utility function for assign_wcs.
 """
 import logging
 import functools
+import os
+import warnings
 import numpy as np
 
 from astropy.coordinates import SkyCoord
 from astropy.io import fits
+from astropy.modeling import CompoundModel
 from astropy.modeling import models as astmodels
 from astropy.table import QTable
 from astropy.constants import c
@@ -20,9 +23,10 @@ from stpipe.exceptions import StpipeExitException
 from stcal.alignment.util import compute_s_region_keyword, compute_s_region_imaging
 
 from stdatamodels.jwst.datamodels import WavelengthrangeModel
-from stdatamodels.jwst.transforms.models import GrismObject
+from stdatamodels.jwst.transforms.models import GrismObject, NIRCAMBackwardGrismDispersion
 
 from ..lib.catalog_utils import SkyObject
+from ..lib.wcs_utils import wcs_fingerprint
 
 
 log = logging.getLogger(__name__)
@@ -34,7 +38,7 @@ _MAX_SIP_DEGREE = 6
 
 __all__ = ["reproject", "velocity_correction",
            "MSAFileError", "NoDataOnDetectorError", "compute_scale",
-           "calc_rotation_matrix", "wrap_ra", "update_fits_wcsinfo"]
+           "calc_rotation_matrix", "wrap_ra", "update_fits_wcsinfo", "is_elementwise"]
 
 
 class MSAFileError(Exception):
@@ -533,10 +537,119 @@ def create_grism_bbox(input_model,
                               nbright)
 
 
-def _create_grism_bbox(input_model, mmag_extract=None, wfss_extract_half_height=None,
-                       wavelength_range=None, nbright=None):
+# Catalog objects and their extents in the grism image computed by
+# _grism_object_extents, keyed by catalog file, WCS and wavelength range,
+# so that steps processing the same exposure (e.g. background and
+# extract_2d) do not evaluate the WCS again
+_grism_extents = {}
+_GRISM_EXTENTS_CACHE_SIZE = 4
 
-    log.debug(f'Extracting with wavelength_range {wavelength_range}')
+
+def _grism_extents_key(input_model, wavelength_range):
+    """Identify the catalog, WCS and wavelength range of a grism exposure.
+
+    Returns None if the catalog file, the WCS or the reference files
+    can not be identified.
+    """
+    catalog_name = input_model.meta.source_catalog
+    if not isinstance(catalog_name, str):
+        return None
+    try:
+        stat = os.stat(catalog_name)
+    except OSError:
+        return None
+    fingerprint = wcs_fingerprint(input_model.meta.wcs)
+    if fingerprint is None:
+        return None
+    # The dispersion polynomials are not parameters of the WCS transforms:
+    # identify them by the reference file names
+    ref_file = input_model.meta.ref_file
+    reference_names = tuple(getattr(ref_file, reftype).name
+                            for reftype in ('specwcs', 'distortion'))
+    if None in reference_names:
+        return None
+    ranges = tuple((order, tuple(wavelength_range[order])) for order in wavelength_range)
+    return (os.path.abspath(catalog_name), stat.st_mtime_ns, stat.st_size,
+            fingerprint, reference_names, ranges)
+
+
+def is_elementwise(transform):
+    """Check whether a transform evaluates each input point independently.
+
+    The NIRCam backward grism dispersion without inverse wavelength models
+    interpolates the wavelengths of all the input points together, so its
+    result depends on which points are evaluated in the same call.
+
+    Parameters
+    ----------
+    transform : `~astropy.modeling.Model`
+        The transform, e.g. the ``detector`` to ``grism_detector`` transform
+        of a grism WCS.
+
+    Returns
+    -------
+    elementwise : bool
+        True if the points can be evaluated together in a single call.
+    """
+    if isinstance(transform, CompoundModel):
+        models = transform.traverse_postorder()
+    else:
+        models = [transform]
+    return not any(isinstance(model, NIRCAMBackwardGrismDispersion) and not model.inv_lmodels
+                   for model in models)
+
+
+def _sky_to_grism_points(sky_to_grism, ra, dec, wavelength, order, elementwise):
+    """Evaluate the sky to grism transform of the points of all objects.
+
+    ``ra`` and ``dec`` have one row of points per object. If the transform
+    is not elementwise the points of each object are evaluated separately.
+    """
+    if elementwise:
+        npoints = ra.size
+        x, y, _, _, _ = sky_to_grism(ra.ravel(), dec.ravel(), np.full(npoints, wavelength),
+                                     np.full(npoints, order))
+        return np.reshape(x, ra.shape), np.reshape(y, ra.shape)
+
+    x = np.empty(ra.shape)
+    y = np.empty(ra.shape)
+    for i in range(ra.shape[0]):
+        if ra.ndim == 1:
+            x[i], y[i], _, _, _ = sky_to_grism(ra[i], dec[i], wavelength, order)
+        else:
+            npoints = ra.shape[1]
+            x[i], y[i], _, _, _ = sky_to_grism(ra[i], dec[i], [wavelength] * npoints, [order] * npoints)
+    return x, y
+
+
+def _grism_object_extents(input_model, wavelength_range):
+    """Compute the extents of all the catalog objects in the grism image.
+
+    The transforms are evaluated for all the objects at once, per spectral
+    order. The results are cached by catalog file, WCS and wavelength range.
+
+    Parameters
+    ----------
+    input_model : `jwst.datamodels.ImagingModel`
+        Data model which holds the grism image
+    wavelength_range : dict
+        Pairs of {spectral_order: (wave_min, wave_max)} for each order.
+
+    Returns
+    -------
+    skyobject_list : list[jwst.transforms.models.SkyObject]
+        The objects of the source catalog.
+    xcenter, ycenter : ndarray
+        Position of the objects in the direct image.
+    order_extents : dict
+        For each order, arrays of the minimum and maximum x and y of the
+        traces of the objects in the grism image, and the x and y
+        position of their centroids at the middle of the wavelength range.
+    """
+    key = _grism_extents_key(input_model, wavelength_range)
+    if key is not None and key in _grism_extents:
+        log.debug("Using the grism object extents computed before for this catalog and WCS")
+        return _grism_extents[key]
 
     # this contains the pure information from the catalog with no translations
     skyobject_list = get_object_info(input_model.meta.source_catalog)
@@ -546,65 +659,107 @@ def _create_grism_bbox(input_model, mmag_extract=None, wfss_extract_half_height=
 
     sky_to_detector = input_model.meta.wcs.get_transform('world', 'detector')
     sky_to_grism = input_model.meta.wcs.backward_transform
+    elementwise = is_elementwise(sky_to_grism)
+
+    if len(skyobject_list) == 0:
+        return skyobject_list, np.empty(0), np.empty(0), {}
+
+    corners = ['sky_bbox_ll', 'sky_bbox_lr', 'sky_bbox_ul', 'sky_bbox_ur']
+    ra = np.array([[getattr(obj, corner).ra.value for corner in corners] for obj in skyobject_list])
+    dec = np.array([[getattr(obj, corner).dec.value for corner in corners] for obj in skyobject_list])
+    ra_center = np.array([obj.sky_centroid.ra.value for obj in skyobject_list])
+    dec_center = np.array([obj.sky_centroid.dec.value for obj in skyobject_list])
+    ra_icrs = np.array([obj.sky_centroid.icrs.ra.value for obj in skyobject_list])
+    dec_icrs = np.array([obj.sky_centroid.icrs.dec.value for obj in skyobject_list])
+
+    # save the image frame center of the objects
+    # takes in ra, dec, wavelength, order but wave and order
+    # don't get used until the detector->grism_detector transform
+    xcenter, ycenter, _, _ = sky_to_detector(ra_icrs, dec_icrs, 1, 1)
+    xcenter = np.atleast_1d(xcenter)
+    ycenter = np.atleast_1d(ycenter)
+
+    order_extents = {}
+    for order in wavelength_range:
+        # The orders of the bounding box in the non-dispersed image
+        # drive the extraction extent. The location of the min and
+        # max wavelengths for each order are used to get the
+        # location of the +/- sides of the bounding box in the
+        # grism image
+        lmin, lmax = wavelength_range[order]
+        x1, y1 = _sky_to_grism_points(sky_to_grism, ra, dec, lmin, order, elementwise)
+        x2, y2 = _sky_to_grism_points(sky_to_grism, ra, dec, lmax, order, elementwise)
+
+        xstack = np.hstack([x1, x2])
+        ystack = np.hstack([y1, y2])
+
+        # Subarrays are only allowed in nircam tsgrism mode. The polynomial transforms
+        # only work with the full frame coordinates. The code here is called during extract_2d,
+        # and is creating bounding boxes which should be in the full frame coordinates, it just
+        # uses the input catalog and the magnitude to limit the objects that need bounding boxes.
+
+        # Tsgrism is always supposed to have the source object at the same pixel, and that is
+        # hardcoded into the transforms. At least a while ago, the 2d extraction for tsgrism mode
+        # didn't call this bounding box code. So I think it's safe to leave the subarray
+        # subtraction out, i.e. do not subtract x/ystart.
+        with warnings.catch_warnings():
+            # All-NaN objects are excluded later on
+            warnings.simplefilter('ignore', RuntimeWarning)
+            xmin = np.nanmin(xstack, axis=1)
+            xmax = np.nanmax(xstack, axis=1)
+            ymin = np.nanmin(ystack, axis=1)
+            ymax = np.nanmax(ystack, axis=1)
+
+        # Position of the center of the objects, used for the cross-dispersion
+        # extent of point sources when a fixed extraction height is given
+        xmid, ymid = _sky_to_grism_points(sky_to_grism, ra_center, dec_center,
+                                          (lmin + lmax) / 2, order, elementwise)
+        order_extents[order] = (xmin, xmax, ymin, ymax, xmid, ymid)
+
+    extents = (skyobject_list, xcenter, ycenter, order_extents)
+    if key is not None:
+        if len(_grism_extents) >= _GRISM_EXTENTS_CACHE_SIZE:
+            del _grism_extents[next(iter(_grism_extents))]
+        _grism_extents[key] = extents
+    return extents
+
+
+def _create_grism_bbox(input_model, mmag_extract=None, wfss_extract_half_height=None,
+                       wavelength_range=None, nbright=None):
+
+    log.debug(f'Extracting with wavelength_range {wavelength_range}')
+
+    skyobject_list, xcenters, ycenters, order_extents = _grism_object_extents(input_model,
+                                                                              wavelength_range)
 
     grism_objects = []  # the return list of GrismObjects
-    for obj in skyobject_list:
+    for iobj, obj in enumerate(skyobject_list):
         if obj.isophotal_abmag is not None:
             if obj.isophotal_abmag < mmag_extract:
                 # could add logic to ignore object if too far off image,
 
-                # save the image frame center of the object
-                # takes in ra, dec, wavelength, order but wave and order
-                # don't get used until the detector->grism_detector transform
-                xcenter, ycenter, _, _ = sky_to_detector(obj.sky_centroid.icrs.ra.value,
-                                                         obj.sky_centroid.icrs.dec.value,
-                                                         1, 1)
+                # the image frame center of the object
+                xcenter = xcenters[iobj]
+                ycenter = ycenters[iobj]
 
                 order_bounding = {}
                 waverange = {}
                 partial_order = {}
                 for order in wavelength_range:
-                    # range_select = [(x[2], x[3]) for x in wavelengthrange if (x[0] == order and x[1] == filter_name)]
-                    # The orders of the bounding box in the non-dispersed image
-                    # drive the extraction extent. The location of the min and
-                    # max wavelengths for each order are used to get the
-                    # location of the +/- sides of the bounding box in the
-                    # grism image
                     lmin, lmax = wavelength_range[order]
-                    ra = np.array([obj.sky_bbox_ll.ra.value, obj.sky_bbox_lr.ra.value,
-                                   obj.sky_bbox_ul.ra.value, obj.sky_bbox_ur.ra.value])
-                    dec = np.array([obj.sky_bbox_ll.dec.value, obj.sky_bbox_lr.dec.value,
-                                    obj.sky_bbox_ul.dec.value, obj.sky_bbox_ur.dec.value])
-                    x1, y1, _, _, _ = sky_to_grism(ra, dec, [lmin] * 4, [order] * 4)
-                    x2, y2, _, _, _ = sky_to_grism(ra, dec, [lmax] * 4, [order] * 4)
-
-                    xstack = np.hstack([x1, x2])
-                    ystack = np.hstack([y1, y2])
-
-                    # Subarrays are only allowed in nircam tsgrism mode. The polynomial transforms
-                    # only work with the full frame coordinates. The code here is called during extract_2d,
-                    # and is creating bounding boxes which should be in the full frame coordinates, it just
-                    # uses the input catalog and the magnitude to limit the objects that need bounding boxes.
-
-                    # Tsgrism is always supposed to have the source object at the same pixel, and that is
-                    # hardcoded into the transforms. At least a while ago, the 2d extraction for tsgrism mode
-                    # didn't call this bounding box code. So I think it's safe to leave the subarray
-                    # subtraction out, i.e. do not subtract x/ystart.
-
-                    xmin = np.nanmin(xstack)
-                    xmax = np.nanmax(xstack)
-                    ymin = np.nanmin(ystack)
-                    ymax = np.nanmax(ystack)
+                    xmins, xmaxs, ymins, ymaxs, xmids, ymids = order_extents[order]
+                    xmin = xmins[iobj]
+                    xmax = xmaxs[iobj]
+                    ymin = ymins[iobj]
+                    ymax = ymaxs[iobj]
 
                     if wfss_extract_half_height is not None and not obj.is_extended:
                         if input_model.meta.wcsinfo.dispersion_direction == 2:
-                            ra_center, dec_center = obj.sky_centroid.ra.value, obj.sky_centroid.dec.value
-                            center, _, _, _, _ = sky_to_grism(ra_center, dec_center, (lmin + lmax) / 2, order)
+                            center = xmids[iobj]
                             xmin = center - wfss_extract_half_height
                             xmax = center + wfss_extract_half_height
                         elif input_model.meta.wcsinfo.dispersion_direction == 1:
-                            ra_center, dec_center = obj.sky_centroid.ra.value, obj.sky_centroid.dec.value
-                            _, center, _, _, _ = sky_to_grism(ra_center, dec_center, (lmin + lmax) / 2, order)
+                            center = ymids[iobj]
                             ymin = center - wfss_extract_half_height
                             ymax = center + wfss_extract_half_height
                         else:
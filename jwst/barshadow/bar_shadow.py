@@ -4,10 +4,12 @@
 
 import numpy as np
 import logging
-from gwcs import wcstools
 
+from scipy import ndimage
 from stdatamodels.jwst import datamodels
 
+from ..lib.wcs_utils import get_slit_frame_coordinates
+
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
 
@@ -59,8 +61,10 @@ def do_correction(input_model, barshadow_model=None, inverse=False, source_type=
     # Create output as a copy of the input science data model
     output_model = input_model.copy()
 
-    # Loop over all the slits in the input model
+    # Loop over all the slits in the input model.  The bar shadow arrays
+    # only depend on the shutter pattern and are shared by the slits.
     corrections = datamodels.MultiSlitModel()
+    shadows = {}
     for slit_idx, slitlet in enumerate(output_model.slits):
         slitlet_number = slitlet.slitlet_id
         log.info('Working on slitlet %d' % slitlet_number)
@@ -68,7 +72,7 @@ def do_correction(input_model, barshadow_model=None, inverse=False, source_type=
         if correction_pars:
             correction = correction_pars.slits[slit_idx]
         else:
-            correction = _calc_correction(slitlet, barshadow_model, source_type)
+            correction = _calc_correction(slitlet, barshadow_model, source_type, shadows)
         corrections.slits.append(correction)
 
         # Apply the correction by dividing into the science and uncertainty arrays:
@@ -88,7 +92,7 @@ def do_correction(input_model, barshadow_model=None, inverse=False, source_type=
     return output_model, corrections
 
 
-def _calc_correction(slitlet, barshadow_model, source_type):
+def _calc_correction(slitlet, barshadow_model, source_type, shadows=None):
     """Calculate the barshadow correction for a slitlet
 
     Parameters
@@ -102,15 +106,20 @@ def _calc_correction(slitlet, barshadow_model, source_type):
     source_type : str or None
         Force processing using the specified source type.
 
+    shadows : dict or None
+        Bar shadow arrays created from `barshadow_model`, keyed by
+        shutter pattern.  The shadow array for the slitlet is added if
+        it is not found.
+
     Returns
     -------
     correction : jwst.datamodels.SlitModel
         The correction to be applied
     """
     slitlet_number = slitlet.slitlet_id
+    if shadows is None:
+        shadows = {}
 
-    # Create the pieces that are put together to make the barshadow model
-    shutter_elements = create_shutter_elements(barshadow_model)
     w0 = barshadow_model.crval1
     wave_increment = barshadow_model.cdelt1
     y_increment = barshadow_model.cdelt2
@@ -121,17 +130,12 @@ def _calc_correction(slitlet, barshadow_model, source_type):
     if has_uniform_source(slitlet, source_type):
         shutter_status = slitlet.shutter_state
         if len(shutter_status) > 0:
-            shadow = create_shadow(shutter_elements, shutter_status)
-
-            # For each pixel in the slit subarray,
-            # make a grid of indices for pixels in the subarray
-            x, y = wcstools.grid_from_bounding_box(slitlet.meta.wcs.bounding_box, step=(1, 1))
+            shadow = get_shadow(shadows, barshadow_model, shutter_status)
 
-            # Create the transformation from slit_frame to detector
-            det2slit = slitlet.meta.wcs.get_transform('detector', 'slit_frame')
-
-            # Use this transformation to calculate x, y, and wavelength
-            xslit, yslit, wavelength = det2slit(x, y)
+            # For each pixel in the slit subarray, use the transformation
+            # from detector to slit_frame to calculate x, y, and wavelength
+            # (the bounding box of an extracted slit covers the whole subarray)
+            xslit, yslit, wavelength = get_slit_frame_coordinates(slitlet)
 
             # If the source position is off-center in the slit, renormalize the yslit
             # values so that it appears as if the source is centered, which is the appropriate
@@ -172,6 +176,38 @@ def _calc_correction(slitlet, barshadow_model, source_type):
     return correction
 
 
+def get_shadow(shadows, barshadow_model, shutter_status):
+    """Get the bar shadow array for a shutter pattern, creating it if needed.
+
+    Parameters:
+
+    shadows: dict
+        Bar shadow arrays already created from `barshadow_model`, keyed
+        by shutter pattern.  The shutter elements are stored with the key
+        'elements'.
+
+    barshadow_model: BarshadowModel object
+        The barshadow model used to construct the shadow array
+
+    shutter_status: string
+        String describing the shutter status (see `create_shadow`)
+
+    Returns:
+
+    shadow_array: nddata array
+        The bar shadow array.  It is shared by the slitlets with the same
+        pattern of open and closed shutters and should not be modified.
+    """
+    # Shutters that contain the source are open shutters
+    pattern = ''.join('0' if status == '0' else '1' for status in shutter_status)
+    if pattern not in shadows:
+        if 'elements' not in shadows:
+            # Create the pieces that are put together to make the barshadow model
+            shadows['elements'] = create_shutter_elements(barshadow_model)
+        shadows[pattern] = create_shadow(shadows['elements'], pattern)
+    return shadows[pattern]
+
+
 def create_shutter_elements(barshadow_model):
     """Create the pieces that will be put together to make the barshadow
     array for the slitlets.  The pieces are:
@@ -484,42 +520,15 @@ def interpolate(rows, columns, array, default=np.nan):
     correction: nddata array
         array of correction factors, or default when not calculated
     """
-    nrows, ncolumns = rows.shape
-    correction = np.ones((nrows, ncolumns))
-    correction.fill(default)
+    correction = np.full(rows.shape, default, dtype=np.float64)
+    good = ~np.isnan(rows) & ~np.isnan(columns)
     nrows_out, ncols_out = array.shape
     #
-    # Extend the boundary of array by 1 row and column to handle end cases
-    augmented_array = np.ones((nrows_out + 1, ncols_out + 1))
-    augmented_array[:nrows_out, :ncols_out] = array
-    augmented_array[nrows_out, :ncols_out] = array[nrows_out - 1, :]
-    augmented_array[:nrows_out, ncols_out] = array[:, ncols_out - 1]
-    augmented_array[nrows_out, ncols_out] = array[nrows_out - 1, ncols_out - 1]
-    for row in range(nrows):
-        for column in range(ncolumns):
-            if ~np.isnan(rows[row, column]) and ~np.isnan(columns[row, column]):
-                array_row = rows[row, column]
-                array_column = columns[row, column]
-                #
-                # Deal with out-of-bounds pixels
-                if array_row >= nrows_out:
-                    array_row = nrows_out - 1
-                if array_column >= ncols_out:
-                    array_column = ncols_out - 1
-                if array_row < 0:
-                    array_row = 0
-                if array_column < 0:
-                    array_column = 0
-                ix = int(array_column)
-                iy = int(array_row)
-                a11 = augmented_array[iy, ix]
-                a12 = augmented_array[iy, ix + 1]
-                a21 = augmented_array[iy + 1, ix]
-                a22 = augmented_array[iy + 1, ix + 1]
-                dx = array_column - ix
-                dy = array_row - iy
-                correction[row, column] = a11 * (1.0 - dx) * (1.0 - dy) + a12 * dx * (1.0 - dy) + \
-                    a21 * (1.0 - dx) * dy + a22 * dx * dy
+    # Out-of-bounds pixels get the values at the edge of the array
+    array_rows = np.clip(rows[good], 0, nrows_out - 1)
+    array_columns = np.clip(columns[good], 0, ncols_out - 1)
+    correction[good] = ndimage.map_coordinates(array, [array_rows, array_columns],
+                                               order=1, mode='nearest')
     return correction
 
 
@@ -110,6 +110,26 @@ def test_create_shadow():
     assert np.allclose(shadow[4001:4500, :], d1x1[502:1001, :], atol=1.e-10)
 
 
+def test_get_shadow():
+
+    d1x1 = rn.random_sample((1001, 101))
+    d1x3 = rn.random_sample((1001, 101))
+    barshadow_model = datamodels.BarshadowModel(data1x1=d1x1, data1x3=d1x3)
+    shutter_elements = bar.create_shutter_elements(barshadow_model)
+    shadows = {}
+
+    shadow = bar.get_shadow(shadows, barshadow_model, "11x")
+    assert np.array_equal(shadow, bar.create_shadow(shutter_elements, "11x"))
+
+    # Shutters containing the source are open, so the array is shared
+    assert bar.get_shadow(shadows, barshadow_model, "x11") is shadow
+    assert bar.get_shadow(shadows, barshadow_model, "1x1") is shadow
+
+    shadow = bar.get_shadow(shadows, barshadow_model, "1x0")
+    assert np.array_equal(shadow, bar.create_shadow(shutter_elements, "1x0"))
+    assert sorted(shadows) == ['110', '111', 'elements']
+
+
 def test_create_empty_shadow_array():
 
     nshutters = 3
@@ -232,3 +252,15 @@ def test_has_uniform_source():
     # Since source_type is not 'POINT', the step will assume that the
     # source is extended.
     assert bar.has_uniform_source(slitlet)
+
+
+def test_interpolate_edges():
+
+    shadow = np.arange(12, dtype=np.float64).reshape(3, 4)
+    rows = np.array([[0.5, -2., 2.5, np.nan, 1.]])
+    columns = np.array([[0.5, 1., 5., 1., np.nan]])
+
+    correction = bar.interpolate(rows, columns, shadow, default=-1.)
+
+    # Out-of-bounds pixels get the value at the edge of the array
+    assert np.allclose(correction, [[2.5, 1., 11., -1., -1.]], atol=1.e-10)
@@ -167,14 +167,8 @@ def mask_ifu_slices(input_model, mask):
     # Initialize global DQ map to all zero (OK to use)
     dqmap = np.zeros_like(input_model.dq)
 
-    # Note: 30 in the line below is hardcoded in nirspec.nrs.ifu_wcs, which
-    # the line below replaces.
-    wcsobj, tr1, tr2, tr3 = nirspec._get_transforms(input_model, np.arange(30))
-
     # Loop over the IFU slices, finding the valid region for each
-    for k in range(len(tr2)):
-        ifu_wcs = nirspec._nrs_wcs_set_input_lite(input_model, wcsobj, k,
-                                                 [tr1, tr2[k], tr3[k]])
+    for ifu_wcs in nirspec.nrs_ifu_wcs(input_model):
 
         # Construct array indexes for pixels in this slice
         x, y = gwcs.wcstools.grid_from_bounding_box(
@@ -234,13 +228,7 @@ def mask_slits(input_model, mask):
     # Note that for 3D masks (TSO mode), all planes will be set to the same value.
 
     slits = [s.name for s in slit2msa.slits]
-    wcsobj, tr1, tr2, tr3, open_slits = nirspec._get_transforms(input_model, slits, return_slits=True)
-
-    for k in range(len(tr2)):
-        slit_wcs = nirspec._nrs_wcs_set_input_lite(input_model, wcsobj, slits[k],
-                                                  [tr1, tr2[k], tr3[k]],
-                                                  open_slits=open_slits)
-
+    for slit_wcs in nirspec.nrs_wcs_set_input_list(input_model, slits):
         xlo, xhi = _toindex(slit_wcs.bounding_box[0])
         ylo, yhi = _toindex(slit_wcs.bounding_box[1])
         mask[..., ylo:yhi, xlo:xhi] = False
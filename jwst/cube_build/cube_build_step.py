@@ -3,7 +3,7 @@
 
 import time
 from jwst.datamodels import ModelContainer
-from jwst.lib.pipe_utils import match_nans_and_flags
+from jwst.lib.pipe_utils import match_nans_and_flags, compute_num_cores
 from . import cube_build
 from . import ifu_cube
 from . import data_types
@@ -66,6 +66,9 @@ class CubeBuildStep (Step):
          suffix = string(default='s3d')
          offset_file = string(default=None) # Filename containing a list of Ra and Dec offsets to apply to files. 
          debug_spaxel = string(default='-1 -1 -1') # Default not used
+         maximum_cores = string(default='1') # cores for multiprocessing. Can be an integer, 'half', 'quarter', or 'all'
+         maximum_threads = string(default='1') # threads matching pixels to spaxels: an integer, 'half', 'quarter', or 'all'
+         pixel_sky_cache_dir = string(default=None) # Directory to cache the detector pixel to sky mapping of the input files
        """
 
     reference_file_types = ['cubepar']
@@ -291,7 +294,9 @@ class CubeBuildStep (Step):
             'offsets': self.offsets,
             'skip_dqflagging': self.skip_dqflagging,
             'suffix': self.suffix,
-            'debug_spaxel': self.debug_spaxel}
+            'debug_spaxel': self.debug_spaxel,
+            'num_threads': compute_num_cores(self.maximum_threads),
+            'pixel_sky_cache_dir': self.pixel_sky_cache_dir}
 
 # ________________________________________________________________________________
 # create an instance of class CubeData
@@ -343,6 +348,7 @@ class CubeBuildStep (Step):
 
         # for single type cubes num_cubes always = 1, Looping over
         # bands is done in outlier detection.
+        cubes = []
         for i in range(num_cubes):
             icube = str(i + 1)
             list_par1 = cube_pars[icube]['par1']
@@ -378,8 +384,6 @@ class CubeBuildStep (Step):
 # _______________________________________________________________________________
 # build the IFU Cube
 
-            status = 0
-
 # If single = True: map each file to output grid and return single mapped file
 # to output grid. # This option is used for background matching and outlier rejection
 
@@ -388,11 +392,16 @@ class CubeBuildStep (Step):
                 cube_container = thiscube.build_ifucube_single()
                 self.log.info("Number of Single IFUCube models returned %i ",
                               len(cube_container))
-
-# Else standard IFU cube building - the result returned from build_ifucube will be 1 IFU CUBR
+                del thiscube
             else:
-                result, status = thiscube.build_ifucube()
-
+                cubes.append(thiscube)
+
+# Else standard IFU cube building - the result returned from build_ifucube will be 1 IFU CUBE
+# The cubes are built one at a time and the input files of each cube are mapped
+# to its output grid using up to maximum_cores processes.
+        if cubes:
+            num_cores = compute_num_cores(self.maximum_cores)
+            for result, status in ifu_cube.build_ifucubes(cubes, num_cores):
                 # check if cube_build failed
                 # **************************
                 if status == 1:
@@ -400,7 +409,7 @@ class CubeBuildStep (Step):
 
                 cube_container.append(result)
                 del result
-            del thiscube
+            del cubes
 
         # irrelevant WCS keywords we will remove from final product
         rm_keys = ['v2_ref', 'v3_ref', 'ra_ref', 'dec_ref', 'roll_ref',
@@ -155,11 +155,7 @@ def find_corners_NIRSPEC(input, instrument_info, coord_system):
     # for NIRSPEC there are 30 regions
     log.info('Looping over slices to determine cube size')
 
-    wcsobj, tr1, tr2, tr3 = nirspec._get_transforms(input, np.arange(nslices))
-
-    for i in range(nslices):
-        slice_wcs = nirspec._nrs_wcs_set_input_lite(input, wcsobj, i,
-                                                   [tr1, tr2[i], tr3[i]])
+    for i, slice_wcs in enumerate(nirspec.nrs_wcs_set_input_list(input, list(range(nslices)))):
         x, y = wcstools.grid_from_bounding_box(slice_wcs.bounding_box,
                                                step=(1, 1), center=True)
         if coord_system == 'internal_cal':
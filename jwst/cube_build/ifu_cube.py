@@ -21,9 +21,11 @@ from ..assign_wcs import pointing
 from jwst.datamodels import ModelContainer
 from ..assign_wcs import nirspec
 from ..assign_wcs.util import wrap_ra
+from ..lib.pipe_utils import fork_map, fork_num_cores
 from . import cube_build_wcs_util
 from . import cube_internal_cal
 from . import coord
+from .pixel_sky_cache import PixelSkyCache
 from ..mrs_imatch.mrs_imatch_step import apply_background_2d
 from .cube_match_sky_pointcloud import cube_wrapper  # c extension
 from .cube_match_sky_driz import cube_wrapper_driz  # c extension
@@ -86,6 +88,10 @@ class IFUCubeData():
         self.weight_power = pars_cube.get('weight_power')
         self.skip_dqflagging = pars_cube.get('skip_dqflagging')
         self.suffix = pars_cube.get('suffix')
+        self.num_threads = pars_cube.get('num_threads', 1)
+        self.pixel_sky_cache = None
+        if pars_cube.get('pixel_sky_cache_dir') is not None:
+            self.pixel_sky_cache = PixelSkyCache(pars_cube.get('pixel_sky_cache_dir'))
         self.num_bands = 0
         self.output_name = ''
 
@@ -125,6 +131,7 @@ class IFUCubeData():
         self.xcoord = None
         self.ycoord = None
         self.zcoord = None
+        self.axes_sorted = (0, 0, 0)  # 1 if the x, y, z coordinates are sorted
 
         self.tolerance_dq_overlap = 0.05  # spaxel has to have 5% overlap to flag in FOV
         self.overlap_partial = 4  # intermediate flag
@@ -559,7 +566,27 @@ class IFUCubeData():
         Returns an ifu cube
 
         """
+        debug_cube_index = self.setup_spaxel_arrays()
 
+        # loop over every file that covers this channel/subchannel (MIRI) or
+        # Grating/filter(NIRSPEC)
+        # and map the detector pixels to the cube spaxel
+        for ib, ifile in self.input_file_indices():
+            result = self.match_input_to_cube(ib, ifile, debug_cube_index)
+            self.add_spaxel_contribution(result)
+        # _______________________________________________________________________
+        # done looping over files
+        return self.finish_ifucube()
+
+    # ********************************************************************************
+    def setup_spaxel_arrays(self):
+        """ Define the output name and initialize the spaxel arrays of the cube
+
+        Returns
+        -------
+        debug_cube_index : int
+           Index of the spaxel to print debug information for, -1 if none.
+        """
         self.output_name = self.define_cubename()
         total_num = self.naxis1 * self.naxis2 * self.naxis3
 
@@ -586,203 +613,285 @@ class IFUCubeData():
             debug_cube_index = spaxel_z * (nxyplane) + spaxel_y * self.naxis1 + spaxel_x
             log.info(f"Printing debug information for cube spaxel:  {spaxel_x} {spaxel_y} {spaxel_z}")
 
-        # ______________________________________________________________________________
-        subtract_background = True
+        # set up input_model to be first file used to copy in basic header info
+        # to ifucube meta data
+        self.input_models_this_cube = []
+        self.input_model_ref = None
+        for ib, ifile in self.input_file_indices():
+            input_model = self.get_input_model(ib, ifile)
+            if self.input_model_ref is None:
+                self.input_model_ref = input_model
+            self.input_models_this_cube.append(input_model.copy())
 
-        # loop over every file that covers this channel/subchannel (MIRI) or
-        # Grating/filter(NIRSPEC)
-        # and map the detector pixels to the cube spaxel
+        return debug_cube_index
 
-        number_bands = len(self.list_par1)
-        k = 0
-        for ib in range(number_bands):
+    # ********************************************************************************
+    def input_file_indices(self):
+        """ List the (band, file) index pairs of all the input files used by the cube
+
+        Returns
+        -------
+        indices : list of tuple
+           (band index, file index) pairs in the order the files are combined
+        """
+        indices = []
+        for ib in range(len(self.list_par1)):
             this_par1 = self.list_par1[ib]
             this_par2 = self.list_par2[ib]
-            for input_model in self.master_table.FileMap[self.instrument][this_par1][this_par2]:
-                # ________________________________________________________________________________
-                # loop over the files that cover the spectral range the cube is for
-
-                self.input_models_this_cube.append(input_model.copy())
-                # set up input_model to be first file used to copy in basic header info
-                # to ifucube meta data
-                if ib == 0 and k == 0:
-                    input_model_ref = input_model
-
-                log.debug(f"Working on Band defined by: {this_par1} {this_par2}")
-                # --------------------------------------------------------------------------------
-                # POINTCLOUD used for skyalign and IFUalign
-                # --------------------------------------------------------------------------------
-                if self.interpolation in ['pointcloud', 'drizzle']:
-                    pixelresult = self.map_detector_to_outputframe(this_par1,
-                                                                   subtract_background,
-                                                                   input_model)
-
-                    coord1, coord2, corner_coord, wave, dwave, flux, err, slice_no, rois_pixel, \
-                        roiw_pixel, weight_pixel, softrad_pixel, scalerad_pixel, \
-                        x_det, y_det = pixelresult
-
-                    # by default flag the dq plane based on the FOV of the detector projected to sky
-                    flag_dq_plane = 1
-                    if self.skip_dqflagging:
-                        flag_dq_plane = 0
-
-                    # check that there is valid data returned
-                    # If all the data is flagged as DO_NOT_USE - not common- then log warning
-                    build_cube = True
-                    if wave is None:
-                        log.warning(f'No valid data found on file {input_model.meta.filename}')
-                        flag_dq_plane = 0
-                        build_cube = False
-                    # ______________________________________________________________________
-                    # C extension setup
-                    # ______________________________________________________________________
-                    start_region = 0
-                    end_region = 0
+            nfiles = len(self.master_table.FileMap[self.instrument][this_par1][this_par2])
+            indices.extend([(ib, ifile) for ifile in range(nfiles)])
+        return indices
 
-                    if self.instrument == 'MIRI':
-                        instrument = 0
-                        start_region = self.instrument_info.GetStartSlice(this_par1)
-                        end_region = self.instrument_info.GetEndSlice(this_par1)
+    # ********************************************************************************
+    def get_input_model(self, ib, ifile):
+        """ Return input model number ifile of band number ib
+        """
+        this_par1 = self.list_par1[ib]
+        this_par2 = self.list_par2[ib]
+        return self.master_table.FileMap[self.instrument][this_par1][this_par2][ifile]
+
+    # ********************************************************************************
+    def subtract_input_background(self, ib, ifile):
+        """ Subtract the MIRI background of input file ifile of band ib
 
-                    else:  # NIRSPEC
-                        instrument = 1
+        This is the background subtraction done by `match_input_to_cube` when
+        mapping the input file to the cube.
 
-                    result = None
-                    weight_type = 0  # default to emsm instead of msm
-                    if self.weighting == 'msm':
-                        weight_type = 1
-
-                    if self.interpolation == 'pointcloud' and build_cube:
-                        roiw_ave = np.mean(roiw_pixel)
-                        result = cube_wrapper(instrument, flag_dq_plane, weight_type, start_region, end_region,
-                                              self.overlap_partial, self.overlap_full,
-                                              self.xcoord, self.ycoord, self.zcoord,
-                                              coord1, coord2, wave, flux, err, slice_no,
-                                              rois_pixel, roiw_pixel, scalerad_pixel,
-                                              weight_pixel, softrad_pixel,
-                                              self.cdelt3_normal,
-                                              roiw_ave, self.cdelt1, self.cdelt2)
-
-                        spaxel_flux, spaxel_weight, spaxel_var, spaxel_iflux, spaxel_dq = result
-                        self.spaxel_flux = self.spaxel_flux + np.asarray(spaxel_flux, np.float64)
-                        self.spaxel_weight = self.spaxel_weight + np.asarray(spaxel_weight, np.float64)
-                        self.spaxel_var = self.spaxel_var + np.asarray(spaxel_var, np.float64)
-                        self.spaxel_iflux = self.spaxel_iflux + np.asarray(spaxel_iflux, np.float64)
-                        spaxel_dq.astype(np.uint)
-                        self.spaxel_dq = np.bitwise_or(self.spaxel_dq, spaxel_dq)
-                        result = None
-                        del result
-                        del spaxel_flux, spaxel_weight, spaxel_var, spaxel_iflux, spaxel_dq
-                    if self.weighting == 'drizzle' and build_cube:
-                        cdelt3_mean = np.nanmean(self.cdelt3_normal)
-                        xi1, eta1, xi2, eta2, xi3, eta3, xi4, eta4 = corner_coord
-                        linear = 0
-                        if self.linear_wavelength:
-                            linear = 1
-                        result = cube_wrapper_driz(instrument, flag_dq_plane,
-                                                   start_region, end_region,
-                                                   self.overlap_partial, self.overlap_full,
-                                                   self.xcoord, self.ycoord, self.zcoord,
-                                                   coord1, coord2, wave, flux, err, slice_no,
-                                                   xi1, eta1, xi2, eta2, xi3, eta3, xi4, eta4,
-                                                   dwave,
-                                                   self.cdelt3_normal,
-                                                   self.cdelt1, self.cdelt2, cdelt3_mean, linear,
-                                                   x_det, y_det, debug_cube_index)
-
-                        spaxel_flux, spaxel_weight, spaxel_var, spaxel_iflux, spaxel_dq = result
-                        self.spaxel_flux = self.spaxel_flux + np.asarray(spaxel_flux, np.float64)
-                        self.spaxel_weight = self.spaxel_weight + np.asarray(spaxel_weight, np.float64)
-                        self.spaxel_var = self.spaxel_var + np.asarray(spaxel_var, np.float64)
-                        self.spaxel_iflux = self.spaxel_iflux + np.asarray(spaxel_iflux, np.float64)
-                        spaxel_dq.astype(np.uint)
-                        self.spaxel_dq = np.bitwise_or(self.spaxel_dq, spaxel_dq)
-                        result = None
-                        del result
-                        del spaxel_flux, spaxel_weight, spaxel_var, spaxel_iflux, spaxel_dq
-                # --------------------------------------------------------------------------------
-                #                     # AREA - 2d method only works for single files local slicer plane (internal_cal)
-                # --------------------------------------------------------------------------------
-                elif self.interpolation == 'area':
-                    # --------------------------------------------------------------------------------
-                    # MIRI
-                    # --------------------------------------------------------------------------------
-                    if self.instrument == 'MIRI':
-                        det2ab_transform = input_model.meta.wcs.get_transform('detector',
-                                                                              'alpha_beta')
-                        start_region = self.instrument_info.GetStartSlice(this_par1)
-                        end_region = self.instrument_info.GetEndSlice(this_par1)
-                        regions = list(range(start_region, end_region + 1))
-
-                        for i in regions:
-                            log.info('Working on Slice # %d', i)
-                            y, x = (det2ab_transform.label_mapper.mapper == i).nonzero()
-
-                            # getting pixel corner - ytop = y + 1 (routine fails for y = 1024)
-                            index = np.where(y < 1023)
-                            y = y[index]
-                            x = x[index]
-                            slice = i - start_region
-                            result = cube_internal_cal.match_det2cube(self.instrument,
-                                                                      x, y, slice,
-                                                                      input_model,
-                                                                      det2ab_transform,
-                                                                      self.xcoord, self.zcoord,
-                                                                      self.crval1, self.crval3,
-                                                                      self.cdelt1, self.cdelt3,
-                                                                      self.naxis1, self.naxis2)
-                            spaxel_flux, spaxel_weight, spaxel_var, spaxel_iflux = result
-                            self.spaxel_flux = self.spaxel_flux + np.asarray(spaxel_flux, np.float64)
-                            self.spaxel_weight = self.spaxel_weight + np.asarray(spaxel_weight, np.float64)
-                            self.spaxel_var = self.spaxel_var + np.asarray(spaxel_var, np.float64)
-                            self.spaxel_iflux = self.spaxel_iflux + np.asarray(spaxel_iflux, np.float64)
-                            result = None
-                            del spaxel_flux, spaxel_weight, spaxel_var, spaxel_iflux, result
-                    # --------------------------------------------------------------------------------
-                    # NIRSPEC
-                    # --------------------------------------------------------------------------------
-                    if self.instrument == 'NIRSPEC':
-                        nslices = 30
-
-                        slicemap = [15, 14, 16, 13, 17, 12, 18, 11, 19, 10,
-                                    20, 9, 21, 8, 22, 7, 23, 6, 24, 5, 25,
-                                    4, 26, 3, 27, 2, 28, 1, 29, 0]
-
-                        wcsobj, tr1, tr2, tr3 = nirspec._get_transforms(input_model, np.arange(nslices))
-
-                        for i in range(nslices):
-
-                            slice_wcs = nirspec._nrs_wcs_set_input_lite(input_model, wcsobj, i,
-                                                                       [tr1, tr2[i], tr3[i]])
-                            x, y = wcstools.grid_from_bounding_box(slice_wcs.bounding_box, step=(1, 1), center=True)
-                            detector2slicer = slice_wcs.get_transform('detector', 'slicer')
-
-                            result = cube_internal_cal.match_det2cube(self.instrument,
-                                                                      x, y, slicemap[i],
-                                                                      input_model,
-                                                                      detector2slicer,
-                                                                      self.ycoord, self.zcoord,
-                                                                      self.crval2, self.crval3,
-                                                                      self.cdelt2, self.cdelt3,
-                                                                      self.naxis1, self.naxis2)
-                            spaxel_flux, spaxel_weight, spaxel_var, spaxel_iflux = result
-                            self.spaxel_flux = self.spaxel_flux + np.asarray(spaxel_flux, np.float64)
-                            self.spaxel_weight = self.spaxel_weight + np.asarray(spaxel_weight, np.float64)
-                            self.spaxel_var = self.spaxel_var + np.asarray(spaxel_var, np.float64)
-                            self.spaxel_iflux = self.spaxel_iflux + np.asarray(spaxel_iflux, np.float64)
-                            result = None
-                            del spaxel_flux, spaxel_weight, spaxel_var, spaxel_iflux, result
-                k = k + 1
-            # _______________________________________________________________________
-            # done looping over files
+        Parameters
+        ----------
+        ib : int
+           index of the band (channel/subchannel or grating/filter) in the cube
+        ifile : int
+           index of the input file in the list of files covering the band
+        """
+        if self.instrument == 'MIRI' and self.interpolation in ['pointcloud', 'drizzle']:
+            self.subtract_miri_background(self.get_input_model(ib, ifile), self.list_par1[ib])
+
+    # ********************************************************************************
+    def match_input_to_cube(self, ib, ifile, debug_cube_index, subtract_background=True):
+        """ Map a single input file to the cube and find its spaxel contribution
+
+        Parameters
+        ----------
+        ib : int
+           index of the band (channel/subchannel or grating/filter) in the cube
+        ifile : int
+           index of the input file in the list of files covering the band
+        debug_cube_index : int
+           index of the spaxel to print debug information for, -1 if none
+        subtract_background : boolean
+           if TRUE then subtract the MIRI background found in the mrs_imatch
+           step, if it has not been subtracted already (see
+           `subtract_input_background`)
+
+        Returns
+        -------
+        result : tuple or None
+           spaxel_flux, spaxel_weight, spaxel_var, spaxel_iflux, spaxel_dq of the
+           input file, or None if the file contributes no data
+        """
+        this_par1 = self.list_par1[ib]
+        this_par2 = self.list_par2[ib]
+        input_model = self.get_input_model(ib, ifile)
+        result = None
+
+        log.debug(f"Working on Band defined by: {this_par1} {this_par2}")
+        # --------------------------------------------------------------------------------
+        # POINTCLOUD used for skyalign and IFUalign
+        # --------------------------------------------------------------------------------
+        if self.interpolation in ['pointcloud', 'drizzle']:
+            pixelresult = self.map_detector_to_outputframe(this_par1,
+                                                           subtract_background,
+                                                           input_model)
+
+            coord1, coord2, corner_coord, wave, dwave, flux, err, slice_no, rois_pixel, \
+                roiw_pixel, weight_pixel, softrad_pixel, scalerad_pixel, \
+                x_det, y_det = pixelresult
+
+            # by default flag the dq plane based on the FOV of the detector projected to sky
+            flag_dq_plane = 1
+            if self.skip_dqflagging:
+                flag_dq_plane = 0
+
+            # check that there is valid data returned
+            # If all the data is flagged as DO_NOT_USE - not common- then log warning
+            if wave is None:
+                log.warning(f'No valid data found on file {input_model.meta.filename}')
+                return None
+            # ______________________________________________________________________
+            # C extension setup
+            # ______________________________________________________________________
+            start_region = 0
+            end_region = 0
+
+            if self.instrument == 'MIRI':
+                instrument = 0
+                start_region = self.instrument_info.GetStartSlice(this_par1)
+                end_region = self.instrument_info.GetEndSlice(this_par1)
+
+            else:  # NIRSPEC
+                instrument = 1
+
+            weight_type = 0  # default to emsm instead of msm
+            if self.weighting == 'msm':
+                weight_type = 1
 
+            if self.interpolation == 'pointcloud':
+                roiw_ave = np.mean(roiw_pixel)
+                result = cube_wrapper(instrument, flag_dq_plane, weight_type, start_region, end_region,
+                                      self.overlap_partial, self.overlap_full,
+                                      self.xcoord, self.ycoord, self.zcoord,
+                                      coord1, coord2, wave, flux, err, slice_no,
+                                      rois_pixel, roiw_pixel, scalerad_pixel,
+                                      weight_pixel, softrad_pixel,
+                                      self.cdelt3_normal,
+                                      roiw_ave, self.cdelt1, self.cdelt2, self.num_threads,
+                                      *self.axes_sorted)
+
+            if self.weighting == 'drizzle':
+                cdelt3_mean = np.nanmean(self.cdelt3_normal)
+                xi1, eta1, xi2, eta2, xi3, eta3, xi4, eta4 = corner_coord
+                linear = 0
+                if self.linear_wavelength:
+                    linear = 1
+                result = cube_wrapper_driz(instrument, flag_dq_plane,
+                                           start_region, end_region,
+                                           self.overlap_partial, self.overlap_full,
+                                           self.xcoord, self.ycoord, self.zcoord,
+                                           coord1, coord2, wave, flux, err, slice_no,
+                                           xi1, eta1, xi2, eta2, xi3, eta3, xi4, eta4,
+                                           dwave,
+                                           self.cdelt3_normal,
+                                           self.cdelt1, self.cdelt2, cdelt3_mean, linear,
+                                           x_det, y_det, debug_cube_index, self.num_threads)
+        # --------------------------------------------------------------------------------
+        #                     # AREA - 2d method only works for single files local slicer plane (internal_cal)
+        # --------------------------------------------------------------------------------
+        elif self.interpolation == 'area':
+            total_num = self.naxis1 * self.naxis2 * self.naxis3
+            file_flux = np.zeros(total_num, dtype=np.float64)
+            file_weight = np.zeros(total_num, dtype=np.float64)
+            file_var = np.zeros(total_num, dtype=np.float64)
+            file_iflux = np.zeros(total_num, dtype=np.float64)
+            # --------------------------------------------------------------------------------
+            # MIRI
+            # --------------------------------------------------------------------------------
+            if self.instrument == 'MIRI':
+                det2ab_transform = input_model.meta.wcs.get_transform('detector',
+                                                                      'alpha_beta')
+                start_region = self.instrument_info.GetStartSlice(this_par1)
+                end_region = self.instrument_info.GetEndSlice(this_par1)
+                regions = list(range(start_region, end_region + 1))
+
+                for i in regions:
+                    log.info('Working on Slice # %d', i)
+                    y, x = (det2ab_transform.label_mapper.mapper == i).nonzero()
+
+                    # getting pixel corner - ytop = y + 1 (routine fails for y = 1024)
+                    index = np.where(y < 1023)
+                    y = y[index]
+                    x = x[index]
+                    slice = i - start_region
+                    slice_result = cube_internal_cal.match_det2cube(self.instrument,
+                                                                    x, y, slice,
+                                                                    input_model,
+                                                                    det2ab_transform,
+                                                                    self.xcoord, self.zcoord,
+                                                                    self.crval1, self.crval3,
+                                                                    self.cdelt1, self.cdelt3,
+                                                                    self.naxis1, self.naxis2)
+                    spaxel_flux, spaxel_weight, spaxel_var, spaxel_iflux = slice_result
+                    file_flux = file_flux + np.asarray(spaxel_flux, np.float64)
+                    file_weight = file_weight + np.asarray(spaxel_weight, np.float64)
+                    file_var = file_var + np.asarray(spaxel_var, np.float64)
+                    file_iflux = file_iflux + np.asarray(spaxel_iflux, np.float64)
+                    slice_result = None
+                    del spaxel_flux, spaxel_weight, spaxel_var, spaxel_iflux, slice_result
+            # --------------------------------------------------------------------------------
+            # NIRSPEC
+            # --------------------------------------------------------------------------------
+            if self.instrument == 'NIRSPEC':
+                nslices = 30
+
+                slicemap = [15, 14, 16, 13, 17, 12, 18, 11, 19, 10,
+                            20, 9, 21, 8, 22, 7, 23, 6, 24, 5, 25,
+                            4, 26, 3, 27, 2, 28, 1, 29, 0]
+
+                slice_wcs_list = nirspec.nrs_wcs_set_input_list(input_model, list(range(nslices)))
+
+                for i, slice_wcs in enumerate(slice_wcs_list):
+                    x, y = wcstools.grid_from_bounding_box(slice_wcs.bounding_box, step=(1, 1), center=True)
+                    detector2slicer = slice_wcs.get_transform('detector', 'slicer')
+
+                    slice_result = cube_internal_cal.match_det2cube(self.instrument,
+                                                                    x, y, slicemap[i],
+                                                                    input_model,
+                                                                    detector2slicer,
+                                                                    self.ycoord, self.zcoord,
+                                                                    self.crval2, self.crval3,
+                                                                    self.cdelt2, self.cdelt3,
+                                                                    self.naxis1, self.naxis2)
+                    spaxel_flux, spaxel_weight, spaxel_var, spaxel_iflux = slice_result
+                    file_flux = file_flux + np.asarray(spaxel_flux, np.float64)
+                    file_weight = file_weight + np.asarray(spaxel_weight, np.float64)
+                    file_var = file_var + np.asarray(spaxel_var, np.float64)
+                    file_iflux = file_iflux + np.asarray(spaxel_iflux, np.float64)
+                    slice_result = None
+                    del spaxel_flux, spaxel_weight, spaxel_var, spaxel_iflux, slice_result
+
+            # the area method does not set the DQ plane
+            file_dq = np.zeros(total_num, dtype=np.uint32)
+            result = (file_flux, file_weight, file_var, file_iflux, file_dq)
+
+        return result
+
+    # ********************************************************************************
+    def add_spaxel_contribution(self, result):
+        """ Add the spaxel values found for a single input file to the cube totals
+
+        Parameters
+        ----------
+        result : tuple or None
+           spaxel_flux, spaxel_weight, spaxel_var, spaxel_iflux, spaxel_dq of an
+           input file as returned by `match_input_to_cube`
+        """
+        if result is None:
+            return
+
+        spaxel_flux, spaxel_weight, spaxel_var, spaxel_iflux, spaxel_dq = result
+        self.spaxel_flux = self.spaxel_flux + np.asarray(spaxel_flux, np.float64)
+        self.spaxel_weight = self.spaxel_weight + np.asarray(spaxel_weight, np.float64)
+        self.spaxel_var = self.spaxel_var + np.asarray(spaxel_var, np.float64)
+        self.spaxel_iflux = self.spaxel_iflux + np.asarray(spaxel_iflux, np.float64)
+        self.spaxel_dq = np.bitwise_or(self.spaxel_dq, spaxel_dq)
+
+    # ********************************************************************************
+    def finish_ifucube(self):
+        """ Find the final spaxel values and set up the IFU cube model
+
+        Returns
+        -------
+        Returns an ifu cube and the status of cube building
+        """
         self.find_spaxel_flux()
         self.set_final_dq_flags()
 
         # shove Flux and iflux in the  final IFU cube
-        result = self.setup_final_ifucube_model(input_model_ref)
+        result = self.setup_final_ifucube_model(self.input_model_ref)
         return result
 
+    # ********************************************************************************
+    def release_spaxel_arrays(self):
+        """ Free the working arrays once the IFU cube model has been created
+        """
+        self.spaxel_flux = None
+        self.spaxel_weight = None
+        self.spaxel_var = None
+        self.spaxel_iflux = None
+        self.spaxel_dq = None
+        self.input_models_this_cube = []
+        self.input_model_ref = None
+
     # ********************************************************************************
     def build_ifucube_single(self):
         """ Build a set of single mode IFU cubes used for outlier detection
@@ -856,7 +965,8 @@ class IFUCubeData():
                                           rois_pixel, roiw_pixel, scalerad_pixel,
                                           weight_pixel, softrad_pixel,
                                           self.cdelt3_normal,
-                                          roiw_ave, self.cdelt1, self.cdelt2)
+                                          roiw_ave, self.cdelt1, self.cdelt2, self.num_threads,
+                                          *self.axes_sorted)
                     spaxel_flux, spaxel_weight, spaxel_var, spaxel_iflux, _ = result
 
                     self.spaxel_flux = self.spaxel_flux + np.asarray(spaxel_flux, np.float64)
@@ -884,7 +994,7 @@ class IFUCubeData():
                                                dwave,
                                                self.cdelt3_normal,
                                                self.cdelt1, self.cdelt2, cdelt3_mean, linear,
-                                               x_det, y_det, debug_cube)
+                                               x_det, y_det, debug_cube, self.num_threads)
 
                     spaxel_flux, spaxel_weight, spaxel_var, spaxel_iflux, _ = result
                     self.spaxel_flux = self.spaxel_flux + np.asarray(spaxel_flux, np.float64)
@@ -1268,7 +1378,7 @@ class IFUCubeData():
                 temp_ra2, temp_dec2, lam_temp = alpha_beta2world(2, 0, lam_med)
 
             elif self.instrument == 'NIRSPEC':
-                slice_wcs = nirspec.nrs_wcs_set_input(input_model, 0)
+                slice_wcs = nirspec.nrs_wcs_set_input_list(input_model, [0])[0]
                 x, y = wcstools.grid_from_bounding_box(slice_wcs.bounding_box, step=(1, 1), center=True)
                 detector2slicer = slice_wcs.get_transform('detector', 'slicer')
                 across, along, lam = detector2slicer(x, y)  # lam ~0 for this transform
@@ -1452,6 +1562,11 @@ class IFUCubeData():
         else:
             self.set_geometryAB(corner_a, corner_b, final_lambda_min, final_lambda_max)
 
+        # The point cloud is matched to the spaxels with a binary search along the
+        # sorted cube axes: check which axes are sorted once for all the input files
+        self.axes_sorted = tuple(int(_is_sorted_axis(coord))
+                                 for coord in (self.xcoord, self.ycoord, self.zcoord))
+
         self.print_cube_geometry()
 
     # **************************************************************************
@@ -1711,6 +1826,8 @@ class IFUCubeData():
         The output frame is on the SKY (ra-dec)
 
         Return the coordinates of all the detector pixel in the output frame.
+        If a pixel to sky cache is used, the mapping is read from the cache
+        when it is available.
 
         Parameters
         ----------
@@ -1730,30 +1847,64 @@ class IFUCubeData():
         x, y, ra, dec, lambda, slice_no  of valid slice pixels
 
         """
-        wave = None
-        slice_no = None  # Slice number
-        dwave = None
-        corner_coord = None
+        if subtract_background:
+            self.subtract_miri_background(input_model, this_par1)
+
+        if self.pixel_sky_cache is not None:
+            sky_result = self.pixel_sky_cache.get_or_compute(
+                input_model, ('MIRI', this_par1, self.interpolation),
+                self.compute_miri_pixel_to_sky, input_model, this_par1)
+        else:
+            sky_result = self.compute_miri_pixel_to_sky(input_model, this_par1)
 
-        raoffset = 0.0
-        decoffset = 0.0 
-        # pull out ra dec offset if it exists
         if offsets is not None:
-            raoffset, decoffset = self.find_ra_dec_offset(input_model.meta.filename)
-            log.info("Ra and Dec offset (arc seconds) applied to file :%8.6f, %8.6f,  %s",
-                     raoffset.value, decoffset.value, input_model.meta.filename)
+            sky_result = self.offset_sky_result(input_model, sky_result)
+        return sky_result
 
+    # ______________________________________________________________________
+    def subtract_miri_background(self, input_model, this_par1):
+        """Subtract the background found in the mrs_imatch step from a MIRI channel
+
+        Parameters
+        ----------
+        input_model: datamodel
+           input data model, modified in place
+        this_par1 : str
+           the channel number
+        """
         # check if background sky matching as been done in mrs_imatch step
         # If it has not been subtracted and the background has not been
         # subtracted - subtract it.
         num_ch_bgk = len(input_model.meta.background.polynomial_info)
-        if num_ch_bgk > 0 and subtract_background and input_model.meta.background.subtracted is False:
+        if num_ch_bgk > 0 and input_model.meta.background.subtracted is False:
             for ich_num in range(num_ch_bgk):
                 poly = input_model.meta.background.polynomial_info[ich_num]
                 poly_ch = poly.channel
                 if poly_ch == this_par1:
                     apply_background_2d(input_model, poly_ch, subtract=True)
 
+    # ______________________________________________________________________
+    def compute_miri_pixel_to_sky(self, input_model, this_par1):
+        """Map the detector pixels of a MIRI channel to the sky
+
+        Parameters
+        ----------
+        input_model: datamodel
+           input data model
+        this_par1 : str
+           channel number
+
+        Returns
+        -------
+        x, y, ra, dec, lambda, slice_no, dwave, corner_coord of valid slice pixels
+        without any ra and dec offsets applied
+
+        """
+        wave = None
+        slice_no = None  # Slice number
+        dwave = None
+        corner_coord = None
+
         # find the slice number of each pixel and fill in slice_det
         ysize, xsize = input_model.data.shape
         slice_det = np.zeros((ysize, xsize), dtype=int)
@@ -1779,10 +1930,6 @@ class IFUCubeData():
         # if self.coord_system == 'skyalign' or self.coord_system == 'ifualign':
         ra, dec, wave = input_model.meta.wcs(x, y)
 
-        # offset the central pixel
-        if offsets is not None:
-            ra, dec = self.offset_coord(ra, dec, raoffset, decoffset)
-        
         valid1 = ~np.isnan(ra)
         ra = ra[valid1]
         dec = dec[valid1]
@@ -1822,13 +1969,6 @@ class IFUCubeData():
                                                           input_model.meta.wcs.output_frame, alpha2,
                                                           beta - dbeta * pixfrac / 2., wave)
 
-            # now offset the pixel corners
-            if offsets is not None:
-                ra1, dec1 = self.offset_coord(ra1, dec1, raoffset, decoffset)
-                ra2, dec2 = self.offset_coord(ra2, dec2, raoffset, decoffset)
-                ra3, dec3 = self.offset_coord(ra3, dec3, raoffset, decoffset)                
-                ra4, dec4 = self.offset_coord(ra4, dec4, raoffset, decoffset)
-                
             corner_coord = [ra1, dec1, ra2, dec2, ra3, dec3, ra4, dec4]
 
         sky_result = (x, y, ra, dec, wave, slice_no, dwave, corner_coord)
@@ -1841,6 +1981,8 @@ class IFUCubeData():
 
         The output frame is on the SKY (ra-dec)
         Return the coordinates of all the detector pixel in the output frame.
+        If a pixel to sky cache is used, the mapping is read from the cache
+        when it is available.
 
         Parameters
         ----------
@@ -1852,16 +1994,32 @@ class IFUCubeData():
         x, y, ra, dec, lambda, slice_no
 
         """
+        if self.pixel_sky_cache is not None:
+            sky_result = self.pixel_sky_cache.get_or_compute(
+                input_model, ('NIRSPEC', self.interpolation),
+                self.compute_nirspec_pixel_to_sky, input_model)
+        else:
+            sky_result = self.compute_nirspec_pixel_to_sky(input_model)
 
-        # check if we have an ra and dec offset file
-        raoffset = 0.0
-        decoffset = 0.0 
-        # pull out ra dec offset if it exists
         if offsets is not None:
-            raoffset, decoffset = self.find_ra_dec_offset(input_model.meta.filename)
-            log.info("Ra and Dec offset (arc seconds) applied to file :%8.6f, %8.6f,  %s",
-                     raoffset.value, decoffset.value, input_model.meta.filename)
-    
+            sky_result = self.offset_sky_result(input_model, sky_result)
+        return sky_result
+
+    # ______________________________________________________________________
+    def compute_nirspec_pixel_to_sky(self, input_model):
+        """Map the detector pixels of the NIRSpec slices to the sky
+
+        Parameters
+        ----------
+        input_model: datamodel
+           input data model
+
+        Returns
+        -------
+        x, y, ra, dec, lambda, slice_no, dwave, corner_coord of valid slice pixels
+        without any ra and dec offsets applied
+
+        """
         # initialize the ra,dec, and wavelength arrays
         # we will loop over slice_nos and fill in values
         # the flag_det will be set when a slice_no pixel is filled in
@@ -1885,15 +2043,20 @@ class IFUCubeData():
 
         pixfrac = 1.0
 
+        # for NIRSPEC each file has 30 slices
+        # wcs information access separately for each slice
+        nslices = 30
+        slice_wcs_list = nirspec.nrs_wcs_set_input_list(input_model, list(range(nslices)))
+
         # determine the slice width using slice 1 and 3
-        slice_wcs1 = nirspec.nrs_wcs_set_input(input_model, 0)
+        slice_wcs1 = slice_wcs_list[0]
         detector2slicer = slice_wcs1.get_transform('detector', 'slicer')
         x, y = wcstools.grid_from_bounding_box(slice_wcs1.bounding_box)
         across1, along1, _ = detector2slicer(x, y - 0.4999 * pixfrac)
         across1 = across1[~np.isnan(across1)]
         slice_loc1 = np.unique(across1)
 
-        slice_wcs3 = nirspec.nrs_wcs_set_input(input_model, 2)
+        slice_wcs3 = slice_wcs_list[2]
         detector2slicer = slice_wcs3.get_transform('detector', 'slicer')
         x, y = wcstools.grid_from_bounding_box(slice_wcs3.bounding_box)
         across3, along3, _ = detector2slicer(x, y - 0.4999 * pixfrac)
@@ -1901,17 +2064,9 @@ class IFUCubeData():
         slice_loc3 = np.unique(across3)
 
         across_width = abs(slice_loc1 - slice_loc3)
-        # for NIRSPEC each file has 30 slices
-        # wcs information access separately for each slice
-        nslices = 30
         log.info("Mapping each NIRSpec slice to sky for input file: %s", input_model.meta.filename)
 
-        wcsobj, tr1, tr2, tr3 = nirspec._get_transforms(input_model, np.arange(nslices))
-
-        for ii in range(nslices):
-            slice_wcs = nirspec._nrs_wcs_set_input_lite(input_model, wcsobj, ii,
-                                                       [tr1, tr2[ii], tr3[ii]])
-
+        for ii, slice_wcs in enumerate(slice_wcs_list):
             x, y = wcstools.grid_from_bounding_box(slice_wcs.bounding_box)
             ra, dec, lam = slice_wcs(x, y)
 
@@ -2025,20 +2180,44 @@ class IFUCubeData():
         dec3 = dec3_det[valid_data]
         dec4 = dec4_det[valid_data]
 
-        if offsets is not None:
-            # central pixel
-            ra, dec = self.offset_coord(ra, dec, raoffset, decoffset)
-
-            # pixel corners
-            ra1, dec1 = self.offset_coord(ra1, dec1, raoffset, decoffset)
-            ra2, dec2 = self.offset_coord(ra2, dec2, raoffset, decoffset)
-            ra3, dec3 = self.offset_coord(ra3, dec3, raoffset, decoffset)
-            ra4, dec4 = self.offset_coord(ra4, dec4, raoffset, decoffset)
-            
         corner_coord = [ra1, dec1, ra2, dec2, ra3, dec3, ra4, dec4]
         sky_result = (x, y, ra, dec, wave, slice_no, dwave, corner_coord)
         return sky_result
 
+    # ______________________________________________________________________
+    def offset_sky_result(self, input_model, sky_result):
+        """ Apply the ra and dec offsets of an input file to its pixel to sky mapping
+
+        Parameters
+        ----------
+        input_model: datamodel
+           input data model
+        sky_result : tuple
+           x, y, ra, dec, lambda, slice_no, dwave, corner_coord without offsets
+
+        Returns
+        -------
+        x, y, ra, dec, lambda, slice_no, dwave, corner_coord with the offsets
+        applied to the ra and dec of the pixel centers and corners
+        """
+        x, y, ra, dec, wave, slice_no, dwave, corner_coord = sky_result
+
+        raoffset, decoffset = self.find_ra_dec_offset(input_model.meta.filename)
+        log.info("Ra and Dec offset (arc seconds) applied to file :%8.6f, %8.6f,  %s",
+                 raoffset.value, decoffset.value, input_model.meta.filename)
+
+        # central pixel
+        ra, dec = self.offset_coord(ra, dec, raoffset, decoffset)
+
+        # pixel corners
+        if corner_coord is not None:
+            offset_corners = []
+            for ra_corner, dec_corner in zip(corner_coord[::2], corner_coord[1::2]):
+                offset_corners.extend(self.offset_coord(ra_corner, dec_corner,
+                                                        raoffset, decoffset))
+            corner_coord = offset_corners
+        return x, y, ra, dec, wave, slice_no, dwave, corner_coord
+
     # ********************************************************************************
     def find_closest_wave(self, iw, w,
                           wavelength_table,
@@ -2459,7 +2638,111 @@ class IFUCubeData():
         dec_new = coord_new.dec.value
 
         return ra_new, dec_new
-    
+
+
+def _is_sorted_axis(coord):
+    """ Return True if the cube centers along an axis are sorted in increasing order
+
+    Parameters
+    ----------
+    coord : numpy.ndarray
+        The centers of the cube spaxels along one axis (xcoord, ycoord or zcoord).
+
+    Returns
+    -------
+    sorted : bool
+        True if the centers are sorted and none of them is NaN.
+    """
+    return not np.any(np.isnan(coord)) and bool(np.all(np.diff(coord) >= 0))
+
+
+def build_ifucubes(cubes, num_cores=1):
+    """ Build a set of IFU cubes, optionally using multiple processes
+
+    The cubes are built one at a time, as in the serial code. Each input file
+    of a cube is mapped to the cube and matched to the cube spaxels
+    independently. When more than one core is requested the input files of
+    the cube are distributed over a pool of worker processes. The
+    contributions of the input files are always added to the cube in the same
+    order as the serial code, so the results do not depend on the number of
+    cores used. The spaxel arrays and the input model copies of a cube are
+    released before the next cube is built, so only one cube is held in
+    memory at a time.
+
+    Parameters
+    ----------
+    cubes : list of `IFUCubeData`
+        IFU cubes with their output geometry already defined (see
+        `IFUCubeData.setup_ifucube_wcs`).
+    num_cores : int
+        Number of processes to use. If 1 the cubes are built serially.
+
+    Returns
+    -------
+    results : list of tuple
+        (ifucube_model, status) for each of the input cubes.
+    """
+    max_files = max([len(thiscube.input_file_indices()) for thiscube in cubes], default=0)
+    num_cores = fork_num_cores(min(num_cores, max_files), 'IFU cubes')
+
+    results = []
+    for thiscube in cubes:
+        cube_cores = min(num_cores, len(thiscube.input_file_indices()))
+        if cube_cores <= 1:
+            results.append(thiscube.build_ifucube())
+        else:
+            results.append(_build_ifucube_parallel(thiscube, cube_cores))
+        thiscube.release_spaxel_arrays()
+    return results
+
+
+def _build_ifucube_parallel(thiscube, num_cores):
+    """ Build an IFU cube, matching its input files in worker processes
+
+    Parameters
+    ----------
+    thiscube : `IFUCubeData`
+        IFU cube with its output geometry already defined.
+    num_cores : int
+        Number of processes to use.
+
+    Returns
+    -------
+    result : tuple
+        (ifucube_model, status) of the cube.
+    """
+    tasks = thiscube.input_file_indices()
+    debug_cube_index = thiscube.setup_spaxel_arrays()
+    log.info(f'Building IFU cube {thiscube.output_name} from {len(tasks)} input file(s) '
+             f'using {num_cores} processes')
+
+    # The input models are modified by the MIRI background subtraction:
+    # subtract it in this process, in the same order as the serial code,
+    # so that the input models are left in the same state.
+    for ib, ifile in tasks:
+        thiscube.subtract_input_background(ib, ifile)
+
+    # The worker processes inherit the cube, including its input models,
+    # so only the task indices and the spaxel arrays are sent between
+    # processes. Each worker matches its input files on a single thread.
+    num_threads = thiscube.num_threads
+    thiscube.num_threads = 1
+
+    def match_input_to_cube(task):
+        ib, ifile = task
+        return thiscube.match_input_to_cube(ib, ifile, debug_cube_index,
+                                            subtract_background=False)
+
+    # the results are returned in task order, so the reduction is
+    # identical to the serial one
+    try:
+        for result in fork_map(match_input_to_cube, tasks, num_cores):
+            thiscube.add_spaxel_contribution(result)
+    finally:
+        thiscube.num_threads = num_threads
+    return thiscube.finish_ifucube()
+
+
 class IncorrectInput(Exception):
     """ Raises an exception if input parameter, Interpolation, is set to area
     when more than one file is used to build the cube.
@@ -0,0 +1,215 @@
+""" Cache of the detector pixel to sky mapping of IFU exposures
+
+Mapping every detector pixel of an IFU exposure to the sky (ra, dec, wavelength,
+slice number and, for drizzle weighting, the pixel corners) requires the full IFU
+WCS to be evaluated and is one of the most expensive parts of building IFU cubes.
+The mapping only depends on the WCS of the exposure, so it is stored on disk in a
+sidecar directory keyed by a hash of the WCS. Later consumers of the mapping
+(other cubes built in the same run, single cubes built for background matching)
+memory-map the stored arrays instead of evaluating the WCS again.
+
+RA and Dec offsets provided by the user are not part of the cached mapping;
+they are applied to the values returned from the cache.
+"""
+import hashlib
+import io
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import asdf
+from asdf.exceptions import AsdfSerializationError, ValidationError
+import numpy as np
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+__all__ = ['PixelSkyCache', 'wcs_hash']
+
+# names of the arrays returned by map_miri_pixel_to_sky and map_nirspec_pixel_to_sky
+_ARRAY_NAMES = ['x', 'y', 'ra', 'dec', 'wave', 'slice_no']
+_DRIZZLE_NAMES = ['dwave']
+_CORNER_NAMES = ['ra1', 'dec1', 'ra2', 'dec2', 'ra3', 'dec3', 'ra4', 'dec4']
+
+
+def wcs_hash(wcs):
+    """ Compute a hash identifying a WCS object
+
+    The hash is computed from the ASDF serialization of the WCS (the form in
+    which it is stored in the datamodels), so two WCS objects with the same
+    hash have identical transforms, whether they were created in the same
+    run or read from the same file in different runs.
+
+    Parameters
+    ----------
+    wcs : `~gwcs.wcs.WCS`
+        WCS object of the exposure
+
+    Returns
+    -------
+    hash : str or None
+        Hexadecimal digest of the WCS, or None if the WCS can not be serialized.
+    """
+    buffer = io.BytesIO()
+    try:
+        asdf.AsdfFile({'wcs': wcs}).write_to(buffer)
+    except (AsdfSerializationError, ValidationError, TypeError, ValueError) as err:
+        log.warning(f'Unable to serialize the WCS, the pixel to sky mapping is not cached: {err}')
+        return None
+    return hashlib.sha256(buffer.getvalue()).hexdigest()
+
+
+class PixelSkyCache:
+    """ Disk backed cache of the detector pixel to sky mapping of IFU exposures
+
+    Each mapping is stored in a subdirectory of ``cache_dir`` holding one
+    ``.npy`` file per array. Stored arrays are memory-mapped read-only when
+    they are retrieved.
+
+    Parameters
+    ----------
+    cache_dir : str or `~pathlib.Path`
+        Directory holding the cached mappings. It is created if it does not exist.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # WCS hashes of the models already seen, keyed by the id of the WCS object
+        self._hashes = {}
+
+    def key(self, input_model, *params):
+        """ Return the cache key of the mapping of an input model
+
+        Parameters
+        ----------
+        input_model : `~jwst.datamodels.IFUImageModel`
+            Input model with an assigned WCS
+        params : tuple
+            Additional parameters the mapping depends on (for example the MIRI
+            channel or the weighting type)
+
+        Returns
+        -------
+        key : str or None
+            Cache key, None if the mapping of this model can not be cached.
+        """
+        wcs = input_model.meta.wcs
+        if wcs is None:
+            return None
+        hash_id = self._hashes.get(id(wcs))
+        if hash_id is None or hash_id[0] is not wcs:
+            hash_id = (wcs, wcs_hash(wcs))
+            self._hashes[id(wcs)] = hash_id
+        if hash_id[1] is None:
+            return None
+        items = [hash_id[1], str(input_model.data.shape)] + [str(par) for par in params]
+        return hashlib.sha256('_'.join(items).encode()).hexdigest()
+
+    def get(self, key):
+        """ Retrieve a cached mapping
+
+        Parameters
+        ----------
+        key : str
+            Cache key returned by `key`
+
+        Returns
+        -------
+        sky_result : tuple or None
+            x, y, ra, dec, wave, slice_no, dwave, corner_coord as returned by the
+            IFUCubeData mapping methods, or None if the mapping is not in the cache.
+        """
+        if key is None:
+            return None
+        path = self.cache_dir / key
+        if not path.is_dir():
+            return None
+
+        try:
+            arrays = {}
+            for name in _ARRAY_NAMES + _DRIZZLE_NAMES + _CORNER_NAMES:
+                filename = path / f'{name}.npy'
+                if filename.exists():
+                    arrays[name] = np.load(filename, mmap_mode='r')
+        except (OSError, ValueError) as err:
+            log.warning(f'Unable to read cached pixel to sky mapping {path}: {err}')
+            return None
+
+        if any(name not in arrays for name in _ARRAY_NAMES):
+            return None
+
+        dwave = arrays.get('dwave')
+        corner_coord = None
+        if all(name in arrays for name in _CORNER_NAMES):
+            corner_coord = [arrays[name] for name in _CORNER_NAMES]
+
+        log.debug(f'Using cached pixel to sky mapping {path}')
+        return tuple(arrays[name] for name in _ARRAY_NAMES) + (dwave, corner_coord)
+
+    def put(self, key, sky_result):
+        """ Store a mapping in the cache
+
+        The mapping is written to a temporary directory first and then moved into
+        place, so that a partially written mapping is never read back and
+        concurrent writers of the same mapping do not interfere.
+
+        Parameters
+        ----------
+        key : str
+            Cache key returned by `key`
+        sky_result : tuple
+            x, y, ra, dec, wave, slice_no, dwave, corner_coord as returned by the
+            IFUCubeData mapping methods
+        """
+        if key is None:
+            return
+
+        path = self.cache_dir / key
+        if path.is_dir():
+            return
+
+        x, y, ra, dec, wave, slice_no, dwave, corner_coord = sky_result
+        arrays = dict(zip(_ARRAY_NAMES, [x, y, ra, dec, wave, slice_no]))
+        if dwave is not None:
+            arrays['dwave'] = dwave
+        if corner_coord is not None:
+            arrays.update(zip(_CORNER_NAMES, corner_coord))
+
+        tmpdir = tempfile.mkdtemp(prefix=f'.{key}_', dir=self.cache_dir)
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(tmpdir, f'{name}.npy'), np.asarray(array))
+            os.rename(tmpdir, path)
+        except OSError as err:
+            # another process stored the same mapping first or the disk is full
+            log.debug(f'Pixel to sky mapping not cached: {err}')
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    def get_or_compute(self, input_model, params, compute, *args):
+        """ Return the cached mapping of a model, computing and storing it if needed
+
+        Parameters
+        ----------
+        input_model : `~jwst.datamodels.IFUImageModel`
+            Input model with an assigned WCS
+        params : tuple
+            Additional parameters the mapping depends on
+        compute : callable
+            Function computing the mapping if it is not in the cache
+        args : tuple
+            Arguments for ``compute``
+
+        Returns
+        -------
+        sky_result : tuple
+            x, y, ra, dec, wave, slice_no, dwave, corner_coord
+        """
+        key = self.key(input_model, *params)
+        sky_result = self.get(key)
+        if sky_result is None:
+            sky_result = compute(*args)
+            self.put(key, sky_result)
+        return sky_result
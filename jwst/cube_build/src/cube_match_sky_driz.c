@@ -13,7 +13,8 @@ Python signature: result = cube_wrapper_driz(instrument, flag_dq_plane,  start_r
                                         coord1, coord2, wave, flux, err, slice_no,
                                         rois_pixel, roiw_pixel, scalerad_pixel
 					weight_pixel, softrad_pixel,cdelt3_normal,
-                                        roiw_ave, cdelt1, cdelt2, x_det, y_det, debug_cube_index)
+                                        roiw_ave, cdelt1, cdelt2, x_det, y_det, debug_cube_index,
+                                        [nthreads])
 provide more details
 
 The output of this function is a tuple of 5 arrays:(spaxel_flux, spaxel_weight, spaxel_var, spaxel_iflux, spaxel_dq)
@@ -65,6 +66,10 @@ y_det : double array
    size: point cloud elements. Y detector value of each point cloud member
 debug_cube_index : int
    if > 0, value of cube index to print information on 
+nthreads : int
+   optional number of threads used to match the detector pixels to the spaxels (default 1).
+   The cube is split between the threads by wavelength plane, the results do not
+   depend on the number of threads. Only used if the module is built with OpenMP.
 
 Returns
 -------
@@ -116,6 +121,8 @@ extern int dq_nirspec(int overlap_partial,
 
 extern int set_dqplane_to_zero(int ncube, int **spaxel_dq);
 
+extern void thread_wave_range(int nwave, int *iw_lo, int *iw_hi);
+
 extern double sh_find_overlap(double xcenter, double ycenter,
                               double xlength, double ylength,
                               double xPixelCorner[],double yPixelCorner[]);
@@ -123,6 +130,11 @@ extern double sh_find_overlap(double xcenter, double ycenter,
 // extern double find_area_quad(double MinX, double MinY, double Xcorner[], double Ycorner[]);
 
 
+// The cube is split between nthreads threads by wavelength plane. Each thread loops over
+// all the detector pixels in order and only accumulates into its own planes, so every
+// spaxel receives its contributions in the same order as with a single thread and the
+// results do not depend on the number of threads.
+
 // return values: spaxel_flux, spaxel_weight, spaxel_var, spaxel_iflux
 
 int match_driz(double *xc, double *yc, double *zc,
@@ -135,32 +147,22 @@ int match_driz(double *xc, double *yc, double *zc,
 	       double *x_det, double *y_det,
 	       double cdelt1, double cdelt2,
 	       int nx, int ny, int nwave, long ncube, long npt, int linear, long debug_cube_index,
+	       int nthreads,
 	       double **spaxel_flux, double **spaxel_weight, double **spaxel_var,
 	       double **spaxel_iflux) {
 
 
   double *fluxv=NULL, *weightv=NULL, *varv=NULL, *ifluxv=NULL;  // vector for spaxel
 
-  int k,j,ix1,ix2,iy1,iy2, iw1, iw2;
-  int nxy, ix, iy, iw, index_xy, index_cube;
-  double wdiff, zreg;
-  double w1;
-  double weighted_flux, weighted_var;
-  double max_dwave;
-  double xpixel[5], ypixel[5];
-  double xmax, ymax, xmin, ymin, max_cdelt3, area, area_weight;
+  int iw;
+  double max_dwave, max_cdelt3;
 
-  double ptmin, ptmax, spxmin, spxmax, zoverlap, z1, z2, z3;
-  double cdelt1_half, cdelt2_half;
-  double xleft, xright, ybot, ytop;
-  // double area_quad;
   // allocate memory to hold output
   if (alloc_flux_arrays(ncube, &fluxv, &weightv, &varv, &ifluxv)) return 1;
 
 
   // find max of cdelt3, dwave to be used to estimate which wavelength plane the
   // pixel falls on
-  zreg =0;
   max_cdelt3 = cdelt3[0];
   max_dwave = dwave[0];
   for (iw =1; iw < nwave;  iw++){
@@ -168,6 +170,28 @@ int match_driz(double *xc, double *yc, double *zc,
     if(dwave[iw] > max_dwave){ max_dwave = dwave[iw];}
   }
 
+  Py_BEGIN_ALLOW_THREADS
+#ifdef _OPENMP
+#pragma omp parallel num_threads(nthreads) if(nthreads > 1)
+#endif
+  {
+  int k,j,ix1,ix2,iy1,iy2, iw1, iw2, iw_lo, iw_hi;
+  int nxy, ix, iy, iw, index_xy, index_cube;
+  double wdiff, zreg;
+  double w1;
+  double weighted_flux, weighted_var;
+  double xpixel[5], ypixel[5];
+  double xmax, ymax, xmin, ymin, area, area_weight;
+
+  double ptmin, ptmax, spxmin, spxmax, zoverlap, z1, z2, z3;
+  double cdelt1_half, cdelt2_half;
+  double xleft, xright, ybot, ytop;
+  // double area_quad;
+
+  // wavelength planes this thread accumulates into
+  thread_wave_range(nwave, &iw_lo, &iw_hi);
+  zreg =0;
+
   // printf("debug_spaxel  %i  \n ", debug_cube_index);
   // loop over each detector pixel and find which spaxels it overlaps with
   nxy = nx * ny;
@@ -230,6 +254,8 @@ int match_driz(double *xc, double *yc, double *zc,
 
       iw1 = 0;
       iw2 = nwave;
+      if (iw1 < iw_lo) iw1 = iw_lo;
+      if (iw2 > iw_hi) iw2 = iw_hi;
       for (iw =iw1; iw < iw2;  iw++){
 	zreg = fabs(dwave[k] + cdelt3[iw]);
 	// zreg = 0.0025; (roiw size for testing- usually larger than zreg)
@@ -299,6 +325,8 @@ int match_driz(double *xc, double *yc, double *zc,
 	} // check of wave
       } // end loop over wave
   } // end loop over detector elements
+  } // end parallel region
+  Py_END_ALLOW_THREADS
 
     // assign output values:
   *spaxel_flux = fluxv;
@@ -338,6 +366,7 @@ static PyObject *cube_wrapper_driz(PyObject *module, PyObject *args) {
   long npt, ncube, debug_cube_index;
   int linear;
   int instrument, flag_dq_plane, start_region, end_region, overlap_partial, overlap_full;
+  int nthreads = 1;
   double *spaxel_flux=NULL, *spaxel_weight=NULL, *spaxel_var=NULL;
   double *spaxel_iflux=NULL;
   int *spaxel_dq=NULL;
@@ -357,13 +386,13 @@ static PyObject *cube_wrapper_driz(PyObject *module, PyObject *args) {
 
   int  ny,nz;
 
-  if (!PyArg_ParseTuple(args, "iiiiiiOOOOOOOOOOOOOOOOOOOdddiOOl:cube_wrapper_driz",
+  if (!PyArg_ParseTuple(args, "iiiiiiOOOOOOOOOOOOOOOOOOOdddiOOl|i:cube_wrapper_driz",
 			&instrument, &flag_dq_plane, &start_region, &end_region, &overlap_partial, &overlap_full,
 			&xco, &yco, &zco, &coord1o, &coord2o, &waveo,  &fluxo, &erro, &slicenoo,
 			&xi1o, &eta1o, &xi2o, &eta2o, &xi3o, &eta3o, &xi4o, &eta4o,
 			&dwaveo,
 			&cdelt3o, &cdelt1, &cdelt2, &cdelt3_mean, &linear,
-			&x_deto, &y_deto, &debug_cube_index)) {
+			&x_deto, &y_deto, &debug_cube_index, &nthreads)) {
     return NULL;
   }
 
@@ -375,6 +404,7 @@ static PyObject *cube_wrapper_driz(PyObject *module, PyObject *args) {
 		    "'cdelt1' and 'cdelt2' must be a strictly positive number.");
     return NULL;
   }
+  if (nthreads < 1) nthreads = 1;
 
     // ensure we are working with numpy arrays and avoid creating new ones
     // if possible:
@@ -505,7 +535,7 @@ static PyObject *cube_wrapper_driz(PyObject *module, PyObject *args) {
 			(double *) PyArray_DATA(x_det),
 			(double *) PyArray_DATA(y_det),
 			cdelt1, cdelt2,
-			nxx, nyy, nwave, ncube, npt,linear, debug_cube_index,
+			nxx, nyy, nwave, ncube, npt,linear, debug_cube_index, nthreads,
 			&spaxel_flux, &spaxel_weight, &spaxel_var, &spaxel_iflux);
 
 
@@ -14,7 +14,7 @@ Python signature: result = cube_wrapper(instrument, flag_dq_plane, weight_type,
                                         coord1, coord2, wave, flux, err, slice_no,
                                         rois_pixel, roiw_pixel, scalerad_pixel
 					weight_pixel, softrad_pixel,cdelt3_normal,
-                                        roiw_ave, cdelt1, cdelt2)
+                                        roiw_ave, cdelt1, cdelt2, [nthreads, xsorted, ysorted, wsorted])
 provide more details
 
 The output of this function is a tuple of 5 arrays:(spaxel_flux, spaxel_weight, spaxel_var, spaxel_iflux, spaxel_dq)
@@ -70,6 +70,14 @@ cdelt1 : double
    Naxis 1 scale for cube
 cdelt2 : double
    Naxis 2 scale for cube
+nthreads : int
+   optional number of threads used to match the point cloud to the spaxels (default 1).
+   The cube is split between the threads by wavelength plane, the results do not
+   depend on the number of threads. Only used if the module is built with OpenMP.
+xsorted, ysorted, wsorted : int
+   optional flags set to 1 if xcoord, ycoord and zcoord are sorted in increasing order
+   (default 0). The point cloud members within the roi along a sorted axis are found with
+   a binary search, along the other axes by scanning all the centers.
 
 
 Returns
@@ -86,6 +94,7 @@ spaxel_dq : numpy.ndarray
   IFU spaxel dq
 */
 
+#include <assert.h>
 #include <stdlib.h>
 #include <math.h>
 #include <stdio.h>
@@ -122,8 +131,161 @@ extern int dq_nirspec(int overlap_partial,
 
 extern int set_dqplane_to_zero(int ncube, int **spaxel_dq);
 
+extern void thread_wave_range(int nwave, int *iw_lo, int *iw_hi);
+
+// Find the range [istart, iend) of the cube centers (along one axis) that are within
+// the roi of a point cloud member by scanning the centers.
+// return 1 if a match is found, 0 otherwise
+
+int find_roi_range(double *centers, int ncenters, double value, double roi,
+		   int *istart, int *iend) {
+
+  int ii, done_search;
+  double diff;
+
+  *istart = -1;
+  *iend = -1;
+  ii = 0;
+  done_search = 0;
+
+  while (ii < ncenters && done_search == 0) {
+    diff = fabs(centers[ii] - value);
+    if(diff <= roi){
+      if (*istart == -1){
+	*istart = ii;
+      }
+    } else{
+      if(*istart != -1 && *iend ==-1){
+	*iend = ii;
+	done_search = 1;
+      }
+    }
+    ii = ii + 1;
+  }
+  // catch the case of istart near ncenters and becomes = ncenters before iend can be set.
+  if(*istart !=-1 && *iend == -1){
+    *iend = ncenters;
+    done_search = 1;
+  }
+  return done_search;
+}
+
+
+// Find the range [istart, iend) of the cube centers (along one axis) that are within
+// the roi of a point cloud member using a binary search. The centers must be sorted
+// in increasing order. Then centers[i] - value is also increasing, the centers within the
+// roi are contiguous and the result is the same as find_roi_range.
+// return 1 if a match is found, 0 otherwise
+
+int find_roi_range_sorted(double *centers, int ncenters, double value, double roi,
+			  int *istart, int *iend) {
+
+  int lo, hi, mid;
+
+  *istart = -1;
+  *iend = -1;
+
+  // first center not below the roi
+  lo = 0;
+  hi = ncenters;
+  while (lo < hi) {
+    mid = lo + (hi - lo) / 2;
+    if (centers[mid] - value < -roi) {
+      lo = mid + 1;
+    } else {
+      hi = mid;
+    }
+  }
+  // no center in the roi (this also catches NaN values)
+  if (lo == ncenters || !(fabs(centers[lo] - value) <= roi)) return 0;
+  *istart = lo;
+
+  // first center above the roi
+  hi = ncenters;
+  while (lo < hi) {
+    mid = lo + (hi - lo) / 2;
+    if (centers[mid] - value <= roi) {
+      lo = mid + 1;
+    } else {
+      hi = mid;
+    }
+  }
+  *iend = lo;
+  return 1;
+}
+
+
+// return 1 if the cube centers are sorted in increasing order (and contain no NaN values)
+// The caller determines it once per cube, this is only used to check the flags passed in.
+
+int is_sorted_axis(double *centers, int ncenters) {
+
+  int ii;
+
+  for (ii = 0; ii < ncenters; ii++) {
+    if (isnan(centers[ii])) return 0;
+    if (ii > 0 && centers[ii] < centers[ii - 1]) return 0;
+  }
+  return 1;
+}
+
+
+// Find the roi range of a point cloud member along one axis, with a binary search
+// if the cube centers along the axis are sorted.
+
+int find_axis_range(double *centers, int ncenters, int sorted, double value, double roi,
+		    int *istart, int *iend) {
+
+  if (sorted) {
+    return find_roi_range_sorted(centers, ncenters, value, roi, istart, iend);
+  }
+  return find_roi_range(centers, ncenters, value, roi, istart, iend);
+}
+
+
+// For each point cloud member find the range of wavelength planes and spatial spaxels
+// within its roi. The ranges are stored in roi_range as
+// iwstart, iwend, ixstart, ixend, iystart, iyend. Point cloud members not matching
+// any spaxel have an empty wavelength range.
+// The cube centers along each axis are the index used to find the ranges: they are
+// sorted when the cube is set up, so the ranges are found with a binary search instead of
+// scanning all the centers of the axis for every point cloud member. Whether each axis
+// is sorted is determined once per cube by the caller (xsorted, ysorted, wsorted).
+// Called from within an OpenMP parallel region the point cloud members are split
+// between the threads.
+
+void find_roi_ranges(double *xc, double *yc, double *zc,
+		     double *coord1, double *coord2, double *wave,
+		     double *rois_pixel, double *roiw_pixel,
+		     int nx, int ny, int nwave, int npt,
+		     int xsorted, int ysorted, int wsorted, int *roi_range) {
+
+  int k, found;
+  int *range;
+
+#ifdef _OPENMP
+#pragma omp for schedule(static)
+#endif
+  for (k = 0; k < npt; k++) {
+    range = roi_range + 6 * (long) k;
+    found = find_axis_range(zc, nwave, wsorted, wave[k], roiw_pixel[k], &range[0], &range[1]);
+    found = find_axis_range(xc, nx, xsorted, coord1[k], rois_pixel[k], &range[2], &range[3]) && found;
+    found = find_axis_range(yc, ny, ysorted, coord2[k], rois_pixel[k], &range[4], &range[5]) && found;
+    if (!found) {
+      range[0] = 0;
+      range[1] = 0;
+    }
+  }
+}
+
+
 // Match point cloud to sky and determine the weighting to assign to each point cloud  member
 // to matched spaxel based on ROI - weighting type - emsm
+//
+// The cube is split between nthreads threads by wavelength plane. Each thread loops over
+// all the point cloud members in order and only accumulates into its own planes, so every
+// spaxel receives its contributions in the same order as with a single thread and the
+// results do not depend on the number of threads.
 
 // return values: spaxel_flux, spaxel_weight, spaxel_var, spaxel_iflux
 
@@ -133,106 +295,57 @@ int match_point_emsm(double *xc, double *yc, double *zc,
 		     double *rois_pixel, double *roiw_pixel, double *scalerad_pixel,
 		     double *zcdelt3,
 		     int nx, int ny, int nwave, int ncube, int npt,
-		     double cdelt1, double cdelt2,
+		     double cdelt1, double cdelt2, int nthreads,
+		     int xsorted, int ysorted, int wsorted,
 		     double **spaxel_flux, double **spaxel_weight, double **spaxel_var,
 		     double **spaxel_iflux) {
 
 
   double *fluxv=NULL, *weightv=NULL, *varv=NULL, *ifluxv=NULL;  // vector for spaxel
-
-  int k, iwstart, iwend, ixstart,  ixend, iystart, iyend;
-  int ii, nxy, ix, iy, iw, index_xy, index_cube;
-  int done_search_w, done_search_y, done_search_x;
-  double wdiff, ydiff, xdiff, ydist, xdist, radius;
-  double d1, d2, dxy, d3, d32, w, wn, ww, weighted_flux, weighted_var;
+  int *roi_range=NULL;
 
   // allocate memory to hold output
   if (alloc_flux_arrays(ncube, &fluxv, &weightv, &varv, &ifluxv)) return 1;
 
+  if (!(roi_range = (int*)malloc(6 * (size_t) npt * sizeof(int)))) {
+    PyErr_SetString(PyExc_MemoryError, "Couldn't allocate memory for the roi ranges.");
+    free(fluxv);
+    free(weightv);
+    free(varv);
+    free(ifluxv);
+    return 1;
+  }
 
-    // loop over each point cloud member and find which roi spaxels it is found
+  Py_BEGIN_ALLOW_THREADS
+#ifdef _OPENMP
+#pragma omp parallel num_threads(nthreads) if(nthreads > 1)
+#endif
+  {
+    int k, iwstart, iwend, ixstart,  ixend, iystart, iyend, iw_lo, iw_hi;
+    int nxy, ix, iy, iw, index_xy, index_cube;
+    int *range;
+    double ydist, xdist, radius;
+    double d1, d2, dxy, d3, d32, w, wn, ww, weighted_flux, weighted_var;
 
-  for (k = 0; k < npt; k++) {
-    // Search wave and find match
-    iwstart = -1;
-    iwend = -1;
-    ii = 0;
-    done_search_w = 0;
-
-    while (ii < nwave && done_search_w == 0) {
-      wdiff = fabs(zc[ii] - wave[k]);
-      if(wdiff <= roiw_pixel[k]){
-	if (iwstart == -1){
-	  iwstart = ii;
-	}
-      } else{
-	if(iwstart != -1 && iwend ==-1){
-	  iwend = ii;
-	  done_search_w = 1;
-	}
-      }
-      ii = ii + 1;
-    }
-    // catch the case of iwstart near nwave and becomes = nwave before iwend can be set.
-    if(iwstart !=-1 && iwend == -1){
-      iwend = nwave;
-      done_search_w = 1;
-    }
-    // Search xcenters and find match
-    ixstart = -1;
-    ixend = -1;
-    ii = 0;
-    done_search_x = 0;
-
-    while (ii < nx && done_search_x == 0) {
-      xdiff = fabs(xc[ii] - coord1[k]);
-      if(xdiff <= rois_pixel[k]){
-	if (ixstart == -1){
-	  ixstart = ii;
-	}
-      } else{
-	if(ixstart != -1 && ixend ==-1){
-	  ixend = ii;
-	  done_search_x = 1;
-	}
-      }
-      ii = ii + 1;
-    }
+    // find the roi of each point cloud member
+    find_roi_ranges(xc, yc, zc, coord1, coord2, wave, rois_pixel, roiw_pixel,
+		    nx, ny, nwave, npt, xsorted, ysorted, wsorted, roi_range);
 
-    // catch the case of ixstart near nx and becomes = nx before ixend can be set.
-    if(ixstart !=-1 && ixend == -1){
-      ixend = nx;
-      done_search_x = 1;
-    }
+    // wavelength planes this thread accumulates into
+    thread_wave_range(nwave, &iw_lo, &iw_hi);
 
-    // Search ycenters and find match
-    iystart = -1;
-    iyend = -1;
-    ii = 0;
-    done_search_y = 0;
-    while (ii < ny && done_search_y == 0) {
-      ydiff = fabs(yc[ii] - coord2[k]);
-      if(ydiff <= rois_pixel[k]){
-	if (iystart == -1){
-	  iystart = ii;
-	}
-      } else{
-	if(iystart != -1 && iyend ==-1){
-	  iyend = ii;
-	  done_search_y = 1;
-	}
-      }
-      ii = ii + 1;
-    }
-    // catch the case of iystart near ny and becomes = ny before iyend can be set.
-    if(iystart !=-1 && iyend == -1){
-      iyend = ny;
-      done_search_y = 1;
-    }
-
-    // set up the values for fluxv, weightv, ifluxv, varv
+    // loop over each point cloud member and find which roi spaxels it is found
     nxy = nx * ny;
-    if(done_search_x == 1 && done_search_y ==1 && done_search_w ==1){
+    for (k = 0; k < npt; k++) {
+      range = roi_range + 6 * (long) k;
+      iwstart = range[0] > iw_lo ? range[0] : iw_lo;
+      iwend = range[1] < iw_hi ? range[1] : iw_hi;
+      if (iwstart >= iwend) continue;
+      ixstart = range[2];
+      ixend = range[3];
+      iystart = range[4];
+      iyend = range[5];
+
       // The search above for x,y  was a crude search - now narrow the search using the distance between
       // the spaxel center and point cloud
 
@@ -268,8 +381,11 @@ int match_point_emsm(double *xc, double *yc, double *zc,
 	  }
 	} // end loop over iy
       } // end loop over ix
-    } // end done_search_x, done_search_y, done_search_w
-  } // end loop over point cloud
+    } // end loop over point cloud
+  } // end parallel region
+  Py_END_ALLOW_THREADS
+
+  free(roi_range);
 
   // assign output values:
   *spaxel_flux = fluxv;
@@ -284,6 +400,7 @@ int match_point_emsm(double *xc, double *yc, double *zc,
 
 // Match point cloud to sky and determine the weighting to assign to each point cloud  member
 // to matched spaxel based on ROI - weighting type - msm
+// The cube is split between the threads by wavelength plane as in match_point_emsm.
 //return values: spaxel_flux, spaxel_weight, spaxel_var, spaxel_iflux
 
 int match_point_msm(double *xc, double *yc, double *zc,
@@ -293,157 +410,111 @@ int match_point_msm(double *xc, double *yc, double *zc,
 		    double *weight_pixel, double *softrad_pixel,
 		    double *zcdelt3,
 		    int nx, int ny, int nwave, int ncube, int npt,
-		    double cdelt1, double cdelt2,
+		    double cdelt1, double cdelt2, int nthreads,
+		    int xsorted, int ysorted, int wsorted,
 		    double **spaxel_flux, double **spaxel_weight, double **spaxel_var,
 		    double **spaxel_iflux) {
 
 
   double *fluxv=NULL, *weightv=NULL, *varv=NULL, *ifluxv=NULL;  // vector for spaxel
-
-  int k;
-  int iwstart, iwend, ixstart, ixend, iystart, iyend;
-  int ii, nxy, iw, ix, iy, index_xy, index_cube;
-  int done_search_w, done_search_x, done_search_y;
-  double wdiff, xdiff, ydiff, radius, ydist, xdist;
-  double d1, d2, dxy, d3, d32, w, wn, ww;
-  double weighted_flux, weighted_var;
+  int *roi_range=NULL;
 
   // allocate memory to hold output
   if (alloc_flux_arrays(ncube, &fluxv, &weightv, &varv, &ifluxv)) return 1;
 
-  // loop over each point cloud member and find which roi spaxels it is found
+  if (!(roi_range = (int*)malloc(6 * (size_t) npt * sizeof(int)))) {
+    PyErr_SetString(PyExc_MemoryError, "Couldn't allocate memory for the roi ranges.");
+    free(fluxv);
+    free(weightv);
+    free(varv);
+    free(ifluxv);
+    return 1;
+  }
 
-  for ( k = 0; k < npt; k++) {
-    // Search wave and find match
-    iwstart = -1;
-    iwend = -1;
-    ii = 0;
-    done_search_w = 0;
+  Py_BEGIN_ALLOW_THREADS
+#ifdef _OPENMP
+#pragma omp parallel num_threads(nthreads) if(nthreads > 1)
+#endif
+  {
+    int k;
+    int iwstart, iwend, ixstart, ixend, iystart, iyend, iw_lo, iw_hi;
+    int nxy, iw, ix, iy, index_xy, index_cube;
+    int *range;
+    double radius, ydist, xdist;
+    double d1, d2, dxy, d3, d32, w, wn, ww;
+    double weighted_flux, weighted_var;
+
+    // find the roi of each point cloud member
+    find_roi_ranges(xc, yc, zc, coord1, coord2, wave, rois_pixel, roiw_pixel,
+		    nx, ny, nwave, npt, xsorted, ysorted, wsorted, roi_range);
+
+    // wavelength planes this thread accumulates into
+    thread_wave_range(nwave, &iw_lo, &iw_hi);
 
-    while (ii < nwave && done_search_w == 0) {
-	wdiff = fabs(zc[ii] - wave[k]);
-	if(wdiff <= roiw_pixel[k]){
-	  if (iwstart == -1){
-	    iwstart = ii;
-	  }
-	} else{
-	  if(iwstart != -1 && iwend ==-1){
-	    iwend = ii;
-	    done_search_w = 1;
-	  }
-	}
-	ii = ii + 1;
-      }
-      // catch the case of iwstart near nwave and becomes = nwave before iwend can be set.
-      if(iwstart !=-1 && iwend == -1){
-      	iwend = nwave;
-      	done_search_w = 1;
-      }
+    // loop over each point cloud member and find which roi spaxels it is found
+    nxy = nx * ny;
+    for ( k = 0; k < npt; k++) {
+      range = roi_range + 6 * (long) k;
+      iwstart = range[0] > iw_lo ? range[0] : iw_lo;
+      iwend = range[1] < iw_hi ? range[1] : iw_hi;
+      if (iwstart >= iwend) continue;
+      ixstart = range[2];
+      ixend = range[3];
+      iystart = range[4];
+      iyend = range[5];
 
-      // Search xcenters and find match
-      ixstart = -1;
-      ixend = -1;
-      ii = 0;
-      done_search_x = 0;
-      while (ii < nx && done_search_x == 0) {
-	xdiff = fabs(xc[ii] - coord1[k]);
-	if(xdiff <= rois_pixel[k]){
-	  if (ixstart == -1){
-	    ixstart = ii;
-	  }
-	} else{
-	  if(ixstart != -1 && ixend ==-1){
-	    ixend = ii;
-	    done_search_x = 1;
-	  }
-	}
-	ii = ii + 1;
-      }
-      // catch the case of ixstart near nx and becomes = nx before ixend can be set.
-      if(ixstart !=-1 && ixend == -1){
-	ixend = nx;
-	done_search_x = 1;
-      }
+      // The search above for x,y  was a crude search - now narrow the search using the distance between
+      // the spaxel center and point cloud
+      for (ix = ixstart; ix< ixend; ix ++){
+	for ( iy = iystart; iy < iyend; iy ++){
+	  ydist = fabs(yc[iy] - coord2[k]);
+	  xdist = fabs(xc[ix] - coord1[k]);
+	  radius = sqrt( xdist*xdist + ydist*ydist);
 
-       // Search ycenters and find match
-      iystart = -1;
-      iyend = -1;
-      ii = 0;
-      done_search_y = 0;
-      while (ii < ny && done_search_y == 0) {
-	ydiff = fabs(yc[ii] - coord2[k]);
-	if(ydiff <= rois_pixel[k]){
-	  if (iystart == -1){
-	    iystart = ii;
-	  }
-	} else{
-	  if(iystart != -1 && iyend ==-1){
-	    iyend = ii;
-	    done_search_y = 1;
-	  }
-	}
-	ii = ii + 1;
-      }
-      // catch the case of iystart near ny and becomes = ny before iyend can be set.
-      if(iystart !=-1 && iyend == -1){
-	iyend = ny;
-	done_search_y = 1;
-      }
+	  if (radius <= rois_pixel[k]){
+	    // Find the index for this in spatial plane
+	    index_xy = iy* nx + ix;
+	    for (iw = iwstart; iw< iwend; iw++){
+	      index_cube = iw*nxy + index_xy;
 
-      // set up the values for fluxv, weightv, ifluxv, varv
-      nxy = nx * ny;
-      if(done_search_x == 1 && done_search_y ==1 && done_search_w ==1){
-	// The search above for x,y  was a crude search - now narrow the search using the distance between
-	// the spaxel center and point cloud
-	for (ix = ixstart; ix< ixend; ix ++){
-	  for ( iy = iystart; iy < iyend; iy ++){
-	    ydist = fabs(yc[iy] - coord2[k]);
-	    xdist = fabs(xc[ix] - coord1[k]);
-	    radius = sqrt( xdist*xdist + ydist*ydist);
-
-	    if (radius <= rois_pixel[k]){
-	      // Find the index for this in spatial plane
- 	      index_xy = iy* nx + ix;
-	      for (iw = iwstart; iw< iwend; iw++){
-		index_cube = iw*nxy + index_xy;
-
-		d1 = xdist/cdelt1;
-		d2 = ydist/cdelt2;
-		dxy = (d1 * d1) + (d2 * d2);
-		d3 = (wave[k] - zc[iw])/ zcdelt3[iw];
-
-		d32 = d3 * d3;
-		w = d32  +  dxy;
-		wn = pow(sqrt(w), weight_pixel[k]);
-		if( wn < softrad_pixel[k]){
-		  wn = softrad_pixel[k];
-		}
-
-		ww = 1.0/wn;
-		weighted_flux =  flux[k]* ww;
-		weighted_var = (err[k]* ww) * (err[k]*ww);
-		fluxv[index_cube] = fluxv[index_cube] + weighted_flux;
-		weightv[index_cube] = weightv[index_cube] + ww;
-		varv[index_cube] = varv[index_cube] + weighted_var;
-		ifluxv[index_cube] = ifluxv[index_cube] +1.0;
+	      d1 = xdist/cdelt1;
+	      d2 = ydist/cdelt2;
+	      dxy = (d1 * d1) + (d2 * d2);
+	      d3 = (wave[k] - zc[iw])/ zcdelt3[iw];
 
+	      d32 = d3 * d3;
+	      w = d32  +  dxy;
+	      wn = pow(sqrt(w), weight_pixel[k]);
+	      if( wn < softrad_pixel[k]){
+		wn = softrad_pixel[k];
 	      }
-	    }
-	  } // end loop over iy
-	} // end loop over ix
 
-      } // end done_search_x, done_search_y, done_search_w
+	      ww = 1.0/wn;
+	      weighted_flux =  flux[k]* ww;
+	      weighted_var = (err[k]* ww) * (err[k]*ww);
+	      fluxv[index_cube] = fluxv[index_cube] + weighted_flux;
+	      weightv[index_cube] = weightv[index_cube] + ww;
+	      varv[index_cube] = varv[index_cube] + weighted_var;
+	      ifluxv[index_cube] = ifluxv[index_cube] +1.0;
+
+	    }
+	  }
+	} // end loop over iy
+      } // end loop over ix
     } // end loop over point cloud
+  } // end parallel region
+  Py_END_ALLOW_THREADS
 
+  free(roi_range);
 
-    // assign output values:
+  // assign output values:
 
-    *spaxel_flux = fluxv;
-    *spaxel_weight = weightv;
-    *spaxel_var = varv;
-    *spaxel_iflux = ifluxv;
+  *spaxel_flux = fluxv;
+  *spaxel_weight = weightv;
+  *spaxel_var = varv;
+  *spaxel_iflux = ifluxv;
 
-    return 0;
+  return 0;
 }
 
 
@@ -471,6 +542,7 @@ static PyObject *cube_wrapper(PyObject *module, PyObject *args) {
   int  nwave, npt, nxx, nyy, ncube;
 
   int instrument, flag_dq_plane,start_region, end_region, overlap_partial, overlap_full, weight_type;
+  int nthreads = 1, xsorted = 0, ysorted = 0, wsorted = 0;
   double *spaxel_flux=NULL, *spaxel_weight=NULL, *spaxel_var=NULL;
   double *spaxel_iflux=NULL;
   int *spaxel_dq=NULL;
@@ -487,11 +559,11 @@ static PyObject *cube_wrapper(PyObject *module, PyObject *args) {
 
   int  ny,nz;
 
-  if (!PyArg_ParseTuple(args, "iiiiiiiOOOOOOOOOOOOOOOddd:cube_wrapper",
+  if (!PyArg_ParseTuple(args, "iiiiiiiOOOOOOOOOOOOOOOddd|iiii:cube_wrapper",
 			&instrument, &flag_dq_plane, &weight_type,  &start_region, &end_region, &overlap_partial, &overlap_full,
 			&xco, &yco, &zco, &coord1o, &coord2o, &waveo,  &fluxo, &erro, &slicenoo,
 			&rois_pixelo, &roiw_pixelo, &scalerad_pixelo, &weight_pixelo, &softrad_pixelo, &zcdelt3o, &roiw_ave,
-			&cdelt1, &cdelt2)) {
+			&cdelt1, &cdelt2, &nthreads, &xsorted, &ysorted, &wsorted)) {
     return NULL;
   }
 
@@ -503,6 +575,7 @@ static PyObject *cube_wrapper(PyObject *module, PyObject *args) {
 		    "'cdelt1' and 'cdelt2' must be a strictly positive number.");
     return NULL;
   }
+  if (nthreads < 1) nthreads = 1;
 
     // ensure we are working with numpy arrays and avoid creating new ones
     // if possible:
@@ -542,6 +615,11 @@ static PyObject *cube_wrapper(PyObject *module, PyObject *args) {
 
   ncube = nxx * nyy * nwave;
 
+  // the axes flagged as sorted must be sorted for the binary search
+  assert(!xsorted || is_sorted_axis((double *) PyArray_DATA(xc), nxx));
+  assert(!ysorted || is_sorted_axis((double *) PyArray_DATA(yc), nyy));
+  assert(!wsorted || is_sorted_axis((double *) PyArray_DATA(zc), nwave));
+
   if (ncube ==0) {
     // 0-length input arrays. Nothing to clip. Return 0-length arrays
     spaxel_flux_arr = (PyArrayObject*) PyArray_EMPTY(1, &npy_ncube, NPY_DOUBLE, 0);
@@ -620,7 +698,8 @@ static PyObject *cube_wrapper(PyObject *module, PyObject *args) {
 			      (double *) PyArray_DATA(roiw_pixel),
 			      (double *) PyArray_DATA(scalerad_pixel),
 			      (double *) PyArray_DATA(zcdelt3),
-			      nxx, nyy, nwave, ncube, npt, cdelt1, cdelt2,
+			      nxx, nyy, nwave, ncube, npt, cdelt1, cdelt2, nthreads,
+			      xsorted, ysorted, wsorted,
 			      &spaxel_flux, &spaxel_weight, &spaxel_var, &spaxel_iflux);
   } else{
     status = match_point_msm((double *) PyArray_DATA(xc),
@@ -636,7 +715,8 @@ static PyObject *cube_wrapper(PyObject *module, PyObject *args) {
 			     (double *) PyArray_DATA(weight_pixel),
 			     (double *) PyArray_DATA(softrad_pixel),
 			     (double *) PyArray_DATA(zcdelt3),
-			     nxx, nyy, nwave, ncube, npt, cdelt1, cdelt2,
+			     nxx, nyy, nwave, ncube, npt, cdelt1, cdelt2, nthreads,
+			     xsorted, ysorted, wsorted,
 			     &spaxel_flux, &spaxel_weight, &spaxel_var, &spaxel_iflux);
   }
 
@@ -6,6 +6,10 @@
 #include <Python.h>
 #include <stdbool.h>
 
+#ifdef _OPENMP
+#include <omp.h>
+#endif
+
 #define CP_LEFT 0
 #define CP_RIGHT 1
 #define CP_BOTTOM 2
@@ -57,6 +61,24 @@ int alloc_flux_arrays(int nelem, double **fluxv, double **weightv, double **varv
     return 1;
 }
 
+//_______________________________________________________________________
+// Find the range of wavelength planes [iw_lo, iw_hi) of the cube the calling
+// thread accumulates into. The planes are split in contiguous blocks between the
+// threads of the current OpenMP team. Outside of a parallel region (or if the
+// module is built without OpenMP) all the planes are returned.
+//_______________________________________________________________________
+
+void thread_wave_range(int nwave, int *iw_lo, int *iw_hi) {
+  int ithread = 0;
+  int nthreads = 1;
+#ifdef _OPENMP
+  ithread = omp_get_thread_num();
+  nthreads = omp_get_num_threads();
+#endif
+  *iw_lo = (int) (((long) nwave * ithread) / nthreads);
+  *iw_hi = (int) (((long) nwave * (ithread + 1)) / nthreads);
+}
+
 // support function for sh_find_overlap
 void addpoint (double x, double y, double xnew[], double ynew[], int *nVertices2){
   xnew[*nVertices2] = x;
@@ -0,0 +1,97 @@
+"""
+Unit test for building IFU cubes with multiprocessing
+"""
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from jwst.cube_build import ifu_cube
+
+
+class SimpleCube(ifu_cube.IFUCubeData):
+    """ IFU cube with a fake mapping of the input files to the spaxels """
+
+    # cubes with allocated spaxel arrays
+    allocated = set()
+
+    def __init__(self, nfiles, nspaxel, seed):
+        self.nfiles = nfiles
+        self.nspaxel = nspaxel
+        self.seed = seed
+        self.subtracted = []
+        self.num_threads = 4
+        self.output_name = f'cube_{seed}'
+
+    def input_file_indices(self):
+        return [(0, ifile) for ifile in range(self.nfiles)]
+
+    def setup_spaxel_arrays(self):
+        # the cubes are built one at a time
+        assert not SimpleCube.allocated
+        SimpleCube.allocated.add(self.seed)
+        self.spaxel_flux = np.zeros(self.nspaxel, dtype=np.float64)
+        self.spaxel_weight = np.zeros(self.nspaxel, dtype=np.float64)
+        self.spaxel_var = np.zeros(self.nspaxel, dtype=np.float64)
+        self.spaxel_iflux = np.zeros(self.nspaxel, dtype=np.float64)
+        self.spaxel_dq = np.zeros(self.nspaxel, dtype=np.uint32)
+        return -1
+
+    def subtract_input_background(self, ib, ifile):
+        self.subtracted.append(ifile)
+
+    def match_input_to_cube(self, ib, ifile, debug_cube_index, subtract_background=True):
+        if subtract_background:
+            self.subtract_input_background(ib, ifile)
+        # an input file without any valid data
+        if ifile == 1:
+            return None
+        rng = np.random.default_rng(self.seed + ifile)
+        flux = rng.normal(size=self.nspaxel) * 1e3
+        weight = rng.random(self.nspaxel)
+        var = rng.random(self.nspaxel)
+        iflux = rng.integers(0, 5, self.nspaxel).astype(np.float64)
+        dq = rng.choice([0, 2, 4], self.nspaxel).astype(np.uint32)
+        return flux, weight, var, iflux, dq
+
+    def finish_ifucube(self):
+        result = (self.spaxel_flux.copy(), self.spaxel_weight.copy(),
+                  self.spaxel_var.copy(), self.spaxel_iflux.copy(),
+                  self.spaxel_dq.copy())
+        return result, 0
+
+    def release_spaxel_arrays(self):
+        super().release_spaxel_arrays()
+        SimpleCube.allocated.discard(self.seed)
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(),
+                    reason='requires the fork start method')
+def test_build_ifucubes_multiprocessing():
+    """ Test the cubes are identical when built serially or in parallel """
+
+    serial_cubes = [SimpleCube(5, 1000, 10), SimpleCube(3, 500, 20)]
+    serial = ifu_cube.build_ifucubes(serial_cubes, num_cores=1)
+    parallel_cubes = [SimpleCube(5, 1000, 10), SimpleCube(3, 500, 20)]
+    parallel = ifu_cube.build_ifucubes(parallel_cubes, num_cores=3)
+
+    # the background of the input files is subtracted in the parent process,
+    # so the input models are left in the same state
+    for serial_cube, parallel_cube in zip(serial_cubes, parallel_cubes):
+        assert serial_cube.subtracted == parallel_cube.subtracted
+        assert parallel_cube.subtracted == list(range(parallel_cube.nfiles))
+        assert parallel_cube.spaxel_flux is None
+        assert parallel_cube.num_threads == 4
+    assert not SimpleCube.allocated
+
+    assert len(serial) == len(parallel) == 2
+    for (serial_cube, serial_status), (parallel_cube, parallel_status) in zip(serial, parallel):
+        assert serial_status == parallel_status == 0
+        for serial_array, parallel_array in zip(serial_cube, parallel_cube):
+            # bit for bit identical
+            assert serial_array.dtype == parallel_array.dtype
+            np.testing.assert_array_equal(serial_array, parallel_array)
+
+    # the spaxels of the first cube have contributions from 4 of its 5 files
+    assert np.any(serial[0][0][3] > 0)
+    assert np.all(serial[0][0][4] <= 6)
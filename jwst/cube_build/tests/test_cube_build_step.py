@@ -2,6 +2,8 @@
 Unit test for Cube Build testing reading in MIRI cubepars ref file and using it
 """
 
+import multiprocessing
+
 import numpy as np
 import pytest
 from astropy.io import fits
@@ -10,6 +12,7 @@ from gwcs import WCS
 from stdatamodels.jwst.datamodels import IFUImageModel
 
 from jwst import assign_wcs
+from jwst.datamodels import ModelContainer
 from jwst.cube_build import CubeBuildStep
 from jwst.cube_build.file_table import ErrorNoAssignWCS
 from jwst.cube_build.cube_build import ErrorNoChannels
@@ -191,3 +194,26 @@ def test_call_cube_build_nirspec(tmp_cwd, nirspec_data, tmp_path, as_filename):
     step.channel = '1'
     step.coord_system = 'internal_cal'
     step.run(step_input)
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(),
+                    reason='requires the fork start method')
+def test_call_cube_build_nirspec_multiprocessing(tmp_cwd, nirspec_data):
+    """ Test the cubes built serially or with 2 processes are identical """
+    second = nirspec_data.copy()
+    second.data = np.random.random((2048, 2048))
+    second.meta.filename = 'test_nirspec2.fits'
+
+    cubes = {}
+    for maximum_cores in ('1', '2'):
+        step = CubeBuildStep()
+        step.coord_system = 'internal_cal'
+        step.maximum_cores = maximum_cores
+        result = step.run(ModelContainer([nirspec_data.copy(), second.copy()]))
+        assert len(result) == 1
+        cubes[maximum_cores] = result[0]
+
+    for extension in ('data', 'err', 'dq', 'wmap'):
+        np.testing.assert_array_equal(getattr(cubes['1'], extension),
+                                      getattr(cubes['2'], extension))
+    assert np.any(np.isfinite(cubes['2'].data) & (cubes['2'].data != 0))
@@ -0,0 +1,115 @@
+"""
+Unit test for matching the point cloud to the spaxels using several threads
+"""
+import numpy as np
+import pytest
+
+from jwst.cube_build.cube_match_sky_pointcloud import cube_wrapper
+from jwst.cube_build.cube_match_sky_driz import cube_wrapper_driz
+from jwst.cube_build.ifu_cube import _is_sorted_axis
+
+
+@pytest.fixture(scope='module')
+def point_cloud():
+    """ Random point cloud covering a small cube """
+    rng = np.random.default_rng(42)
+    nx, ny, nwave, npt = 15, 13, 40, 5000
+    xcoord = np.arange(nx) * 0.1 - 0.7
+    ycoord = np.arange(ny) * 0.1 - 0.6
+    zcoord = 5.0 + np.arange(nwave) * 0.01
+    coord1 = rng.uniform(-0.8, 0.8, npt)
+    coord2 = rng.uniform(-0.7, 0.7, npt)
+    wave = rng.uniform(4.98, 5.42, npt)
+    flux = rng.normal(size=npt)
+    err = rng.random(npt)
+    slice_no = rng.integers(1, 10, npt).astype(np.float64)
+    return xcoord, ycoord, zcoord, coord1, coord2, wave, flux, err, slice_no
+
+
+@pytest.mark.parametrize('weight_type', [0, 1])
+def test_pointcloud_threads(point_cloud, weight_type):
+    """ Test the emsm and msm cubes do not depend on the number of threads """
+    xcoord, ycoord, zcoord, coord1, coord2, wave, flux, err, slice_no = point_cloud
+    npt = len(wave)
+    rois = np.full(npt, 0.15)
+    roiw = np.full(npt, 0.02)
+    scalerad = np.full(npt, 0.1)
+    weight_power = np.full(npt, 2.0)
+    softrad = np.full(npt, 0.01)
+    cdelt3 = np.full(len(zcoord), 0.01)
+
+    results = [cube_wrapper(0, 0, weight_type, 0, 0, 1, 2,
+                            xcoord, ycoord, zcoord, coord1, coord2, wave, flux, err, slice_no,
+                            rois, roiw, scalerad, weight_power, softrad, cdelt3,
+                            0.02, 0.1, 0.1, nthreads)
+               for nthreads in (1, 3)]
+
+    assert np.any(results[0][3] > 0)
+    for single, threaded in zip(*results):
+        np.testing.assert_array_equal(single, threaded)
+
+
+def test_driz_threads(point_cloud):
+    """ Test the drizzled cubes do not depend on the number of threads """
+    xcoord, ycoord, zcoord, coord1, coord2, wave, flux, err, slice_no = point_cloud
+    npt = len(wave)
+    half = 0.04
+    corners = [coord1 - half, coord2 - half, coord1 + half, coord2 - half,
+               coord1 + half, coord2 + half, coord1 - half, coord2 + half]
+    dwave = np.full(npt, 0.01)
+    cdelt3 = np.full(len(zcoord), 0.01)
+
+    results = [cube_wrapper_driz(0, 0, 0, 0, 1, 2,
+                                 xcoord, ycoord, zcoord, coord1, coord2, wave, flux, err, slice_no,
+                                 *corners, dwave, cdelt3, 0.1, 0.1, 0.01, 0,
+                                 np.zeros(npt), np.zeros(npt), -1, nthreads)
+               for nthreads in (1, 3)]
+
+    assert np.any(results[0][3] > 0)
+    for single, threaded in zip(*results):
+        np.testing.assert_array_equal(single, threaded)
+
+
+@pytest.mark.parametrize('reverse, axes_sorted', [(False, (1, 1, 1)), (False, (0, 0, 0)),
+                                                 (True, (0, 1, 1))])
+def test_pointcloud_roi_search(point_cloud, reverse, axes_sorted):
+    """ Test the spaxels matched to the point cloud against a brute force search
+
+    The wavelength planes are not evenly spaced. The centers along the axes
+    not flagged as sorted are searched without the index; with reverse=True
+    the x centers are not sorted.
+    """
+    xcoord, ycoord, _, coord1, coord2, wave, flux, err, slice_no = point_cloud
+    npt = len(wave)
+    zcoord = 5.0 + np.cumsum(np.linspace(0.005, 0.015, 30))
+    if reverse:
+        xcoord = xcoord[::-1].copy()
+    rois = np.full(npt, 0.15)
+    roiw = np.full(npt, 0.02)
+    ones = np.ones(npt)
+    cdelt3 = np.full(len(zcoord), 0.01)
+
+    result = cube_wrapper(0, 0, 0, 0, 0, 1, 2,
+                          xcoord, ycoord, zcoord, coord1, coord2, wave, flux, err, slice_no,
+                          rois, roiw, 0.1 * ones, 2 * ones, 0.01 * ones, cdelt3,
+                          0.02, 0.1, 0.1, 1, *axes_sorted)
+    iflux = result[3].reshape(len(zcoord), len(ycoord), len(xcoord))
+
+    xdist = xcoord[np.newaxis, :] - coord1[:, np.newaxis]
+    ydist = ycoord[np.newaxis, :] - coord2[:, np.newaxis]
+    radius = np.sqrt(xdist[:, np.newaxis, :] ** 2 + ydist[:, :, np.newaxis] ** 2)
+    in_roi = radius <= rois[0]
+    in_roiw = np.abs(zcoord[np.newaxis, :] - wave[:, np.newaxis]) <= roiw[0]
+    expected = np.einsum('kw,kyx->wyx', in_roiw.astype(float), in_roi.astype(float))
+
+    assert np.any(expected > 0)
+    np.testing.assert_array_equal(iflux, expected)
+
+
+def test_is_sorted_axis():
+    """ Test the check of the cube axes done once per cube """
+    assert _is_sorted_axis(np.array([1.0, 2.0, 2.0, 3.5]))
+    assert _is_sorted_axis(np.array([1.0]))
+    assert not _is_sorted_axis(np.array([1.0, 3.0, 2.0]))
+    assert not _is_sorted_axis(np.array([1.0, np.nan, 2.0]))
+    assert not _is_sorted_axis(np.array([np.nan]))
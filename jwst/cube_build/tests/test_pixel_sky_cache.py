@@ -0,0 +1,102 @@
+"""
+Unit test for the cache of the detector pixel to sky mapping
+"""
+import numpy as np
+from astropy import coordinates as coord
+from astropy import units as u
+from astropy.modeling import custom_model, models
+from gwcs import WCS
+from gwcs import coordinate_frames as cf
+from stdatamodels.jwst import datamodels
+
+from jwst.cube_build.pixel_sky_cache import PixelSkyCache, wcs_hash
+
+
+def make_model(shift):
+    """ IFU image with a simple detector to sky WCS """
+    model = datamodels.IFUImageModel((20, 30))
+    detector = cf.Frame2D(name='detector', axes_order=(0, 1), unit=(u.pix, u.pix))
+    sky = cf.CelestialFrame(reference_frame=coord.ICRS(), name='world')
+    transform = (models.Shift(shift) & models.Shift(shift)) | models.Scale(1e-4) & models.Scale(1e-4)
+    model.meta.wcs = WCS([(detector, transform), (sky, None)])
+    return model
+
+
+def make_sky_result(nwave, corners):
+    rng = np.random.default_rng(5)
+    x = np.arange(nwave)
+    y = np.arange(nwave)[::-1]
+    ra, dec, wave = rng.random((3, nwave))
+    slice_no = rng.integers(1, 30, nwave)
+    dwave = None
+    corner_coord = None
+    if corners:
+        dwave = rng.random(nwave)
+        corner_coord = list(rng.random((8, nwave)))
+    return x, y, ra, dec, wave, slice_no, dwave, corner_coord
+
+
+def test_pixel_sky_cache(tmp_path):
+    """ Test storing, retrieving and the keys of cached mappings """
+    cache = PixelSkyCache(tmp_path / 'cache')
+    model = make_model(1.0)
+
+    key = cache.key(model, 'NIRSPEC', 'drizzle')
+    assert cache.get(key) is None
+
+    sky_result = make_sky_result(100, corners=True)
+    cache.put(key, sky_result)
+    cached = cache.get(key)
+    assert len(cached) == 8
+    for array, cached_array in zip(sky_result[:7], cached[:7]):
+        np.testing.assert_array_equal(array, cached_array)
+        assert isinstance(cached_array, np.memmap)
+    for array, cached_array in zip(sky_result[7], cached[7]):
+        np.testing.assert_array_equal(array, cached_array)
+
+    # the key depends on the parameters and on the WCS
+    assert cache.key(model, 'NIRSPEC', 'drizzle') == key
+    assert cache.key(model, 'NIRSPEC', 'pointcloud') != key
+    assert cache.key(make_model(1.0), 'NIRSPEC', 'drizzle') == key
+    assert cache.key(make_model(2.0), 'NIRSPEC', 'drizzle') != key
+
+    # a new cache on the same directory sees the stored mapping
+    assert PixelSkyCache(tmp_path / 'cache').get(key) is not None
+
+
+def test_pixel_sky_cache_get_or_compute(tmp_path):
+    """ Test the mapping is only computed when it is not cached """
+    cache = PixelSkyCache(tmp_path)
+    model = make_model(1.0)
+    ncalls = []
+
+    def compute(nwave):
+        ncalls.append(nwave)
+        return make_sky_result(nwave, corners=False)
+
+    first = cache.get_or_compute(model, ('MIRI', '1', 'pointcloud'), compute, 50)
+    second = cache.get_or_compute(model, ('MIRI', '1', 'pointcloud'), compute, 50)
+    assert ncalls == [50]
+    assert second[6] is None and second[7] is None
+    for array, cached_array in zip(first[:6], second[:6]):
+        np.testing.assert_array_equal(array, cached_array)
+
+    cache.get_or_compute(model, ('MIRI', '2', 'pointcloud'), compute, 40)
+    assert ncalls == [50, 40]
+
+
+@custom_model
+def _unserializable_model(x, scale=1.):
+    return scale * x
+
+
+def test_wcs_hash_unserializable(tmp_path, caplog):
+    """ Test WCSs that can not be serialized are not cached """
+    model = make_model(1.0)
+    assert wcs_hash(model.meta.wcs) == wcs_hash(make_model(1.0).meta.wcs)
+
+    transform = _unserializable_model() & _unserializable_model()
+    model.meta.wcs.set_transform('detector', 'world', transform)
+    assert wcs_hash(model.meta.wcs) is None
+    assert 'pixel to sky mapping is not cached' in caplog.text
+    assert PixelSkyCache(tmp_path / 'cache').key(model, 'NIRSPEC', 'drizzle') is None
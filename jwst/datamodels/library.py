@@ -1,4 +1,5 @@
 import io
+import os
 
 import asdf
 from astropy.io import fits
@@ -48,6 +49,32 @@ class ModelLibrary(AbstractModelLibrary):
         """
         return [i for i, member in enumerate(self._members) if member["exptype"].lower() == exptype.lower()]
 
+    def on_disk_filename(self, index):
+        """
+        Name of the file holding the model at ``index`` of an "on_disk" library.
+
+        Parameters
+        ----------
+        index : int
+            Index of the model within the library.
+
+        Returns
+        -------
+        filename : str or None
+            The temporary file the model was last shelved to or, if the
+            model was never modified, the file of the association member.
+            `None` if the library is not "on_disk".
+
+        Notes
+        -----
+        Library does NOT need to be open (i.e., this can be called outside the `with` context)
+        """
+        if not self._on_disk:
+            return None
+        if index in self._temp_filenames:
+            return str(self._temp_filenames[index])
+        return os.path.join(self._asn_dir, self._members[index]["expname"])
+
     def _model_to_filename(self, model):
         model_filename = model.meta.filename
         if model_filename is None:
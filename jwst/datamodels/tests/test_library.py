@@ -146,4 +146,25 @@ def test_asn_attributes_assignment(example_library):
             model = example_library.borrow(i)
             assert model.meta.asn.table_name.startswith(expected_table_name)
             assert model.meta.asn.pool_name == _POOL_NAME
-            example_library.shelve(model, i, modify=False)
\ No newline at end of file
+            example_library.shelve(model, i, modify=False)
+
+def test_on_disk_filename(example_asn_path, example_library):
+    """
+    Test that the file of a model in an "on_disk" library is the
+    association member until the model is modified
+    """
+    assert example_library.on_disk_filename(0) is None
+
+    library = ModelLibrary(example_asn_path, on_disk=True)
+    assert library.on_disk_filename(0) == str(example_asn_path.parent / "0.fits")
+    with library:
+        model = library.borrow(0)
+        library.shelve(model, 0, modify=False)
+        assert library.on_disk_filename(0) == str(example_asn_path.parent / "0.fits")
+
+        model = library.borrow(0)
+        library.shelve(model, 0)
+    filename = library.on_disk_filename(0)
+    assert filename != str(example_asn_path.parent / "0.fits")
+    with dm.open(filename) as model:
+        assert model.meta.filename == "0.fits"
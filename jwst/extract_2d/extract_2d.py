@@ -19,7 +19,8 @@ def extract2d(input_model,
               wfss_extract_half_height=None,
               extract_orders=None,
               mmag_extract=None,
-              nbright=None):
+              nbright=None,
+              num_cores=1):
     """
     The main extract_2d function
 
@@ -46,6 +47,8 @@ def extract2d(input_model,
         Minimum (faintest) abmag to extract for WFSS mode.
     nbright : float
         Number of brightest objects to extract, WFSS mode.
+    num_cores : int
+        Number of processes used to extract the objects, WFSS mode.
 
     Returns
     -------
@@ -82,7 +85,8 @@ def extract2d(input_model,
                                                  extract_orders=extract_orders,
                                                  mmag_extract=mmag_extract,
                                                  wfss_extract_half_height=wfss_extract_half_height,
-                                                 nbright=nbright)
+                                                 nbright=nbright,
+                                                 num_cores=num_cores)
 
     else:
         log.info(f'EXP_TYPE {exp_type} not supported for extract 2D')
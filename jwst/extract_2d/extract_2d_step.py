@@ -2,6 +2,7 @@
 from stdatamodels.jwst import datamodels
 
 from ..stpipe import Step
+from ..lib.pipe_utils import compute_num_cores
 from . import extract_2d
 
 
@@ -23,6 +24,7 @@ class Extract2dStep(Step):
         wfss_extract_half_height =  integer(default=5)  # extraction half height in pixels, WFSS mode
         wfss_mmag_extract = float(default=None)  # minimum abmag to extract, WFSS mode
         wfss_nbright = integer(default=1000)  # number of brightest objects to extract, WFSS mode
+        maximum_cores = string(default='1')  # cores for multiprocessing, WFSS mode: an integer, 'half', 'quarter', or 'all'
     """
 
     reference_file_types = ['wavelengthrange']
@@ -41,6 +43,7 @@ class Extract2dStep(Step):
                                                 wfss_extract_half_height=self.wfss_extract_half_height,
                                                 extract_orders=self.extract_orders,
                                                 mmag_extract=self.wfss_mmag_extract,
-                                                nbright=self.wfss_nbright)
+                                                nbright=self.wfss_nbright,
+                                                num_cores=compute_num_cores(self.maximum_cores))
 
         return output_model
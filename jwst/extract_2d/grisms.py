@@ -4,6 +4,7 @@
 
 import copy
 import logging
+from functools import partial
 
 import numpy as np
 
@@ -17,6 +18,7 @@ from stdatamodels.jwst.transforms.models import IdealToV2V3
 from astropy.modeling import CompoundModel
 
 from ..assign_wcs import util
+from ..lib.pipe_utils import fork_map, fork_num_cores, model_from_bytes, model_to_bytes
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
@@ -279,7 +281,8 @@ def extract_grism_objects(input_model,
                           mmag_extract=None,
                           compute_wavelength=True,
                           wfss_extract_half_height=None,
-                          nbright=None):
+                          nbright=None,
+                          num_cores=1):
     """
     Extract 2d boxes around each objects spectra for each order.
 
@@ -311,6 +314,10 @@ def extract_grism_objects(input_model,
     nbright : int
         Number of brightest objects to extract for WFSS mode.
 
+    num_cores : int
+        Number of processes used to extract the objects. If 1 the objects
+        are extracted serially.
+
     Returns
     -------
     output_model : `~jwst.datamodels.MultiSlitModel`
@@ -382,18 +389,6 @@ def extract_grism_objects(input_model,
         raise ValueError("No grism objects created from source catalog")
 
     log.info("Extracting %d grism objects", len(grism_objects))
-    output_model = datamodels.MultiSlitModel()
-    output_model.update(input_model)
-
-    # One WCS model can be used to govern all the extractions
-    # and in fact the model transforms rely on the full frame
-    # coordinates of the input pixel location. So the WCS
-    # attached to the extraction is just a copy of the
-    # input_model WCS with a shift transform to the corner
-    # of the subarray. They also depend on the source object
-    # center, this information will be saved to the meta of
-    # the output model as source_[x/y]pos
-    inwcs = input_model.meta.wcs
 
     # For easy reference here, GrismObjects has:
     #
@@ -402,18 +397,11 @@ def extract_grism_objects(input_model,
     # sky_centroid: SkyCoord of object center
     # sky_bbox_ :lower and upper bounding box in SkyCoord
     # sid: catalog ID of the object
-
-    slits = []
+    cutouts = []
     for obj in grism_objects:
         for order in obj.order_bounding.keys():
 
-            # Add the shift to the lower corner to each subarray WCS object
-            # The shift should just be the lower bounding box corner
-            # also replace the object center location inputs to the GrismDispersion
-            # model with the known object center and order information (in pixels of direct image)
-            # This is changes the user input to the model from (x,y,x0,y0,order) -> (x,y)
-            #
-            # The bounding boxes here are also limited to the size of the detector
+            # The bounding boxes here are limited to the size of the detector
             # The check for boxes entirely off the detector is done in create_grism_bbox right now
             y, x = obj.order_bounding[order]
             log.debug(f'YYY, {y}, {clamp(y[0], 0, input_model.meta.subarray.ysize)}')
@@ -428,102 +416,164 @@ def extract_grism_objects(input_model,
             # this means that it was identified as a partial order but only on one
             # row or column of the detector
             if ymax - ymin > 0 and xmax - xmin > 0:
-                subwcs = copy.deepcopy(inwcs)
-                log.info("Subarray extracted for obj: {} order: {}:".format(obj.sid, order))
-                log.info("Subarray extents are: "
-                         "(xmin:{}, xmax:{}), (ymin:{}, ymax:{})".format(xmin, xmax, ymin, ymax))
-
-                # only the first two numbers in the Mapping are used
-                # the order and source position are put directly into
-                # the new wcs for the subarray for the forward transform
-                xcenter_model = Const1D(obj.xcentroid)
-                xcenter_model.inverse = Const1D(obj.xcentroid)
-
-                ycenter_model = Const1D(obj.ycentroid)
-                ycenter_model.inverse = Const1D(obj.ycentroid)
-
-                order_model = Const1D(order)
-                order_model.inverse = Const1D(order)
-
-                tr = inwcs.get_transform('grism_detector', 'detector')
-                tr = Mapping((0, 1, 0, 0, 0)) | (Shift(xmin) & Shift(ymin) &
-                                                 xcenter_model &
-                                                 ycenter_model &
-                                                 order_model) | tr
-
-                y_slice = slice(_toindex(ymin), _toindex(ymax) + 1)
-                x_slice = slice(_toindex(xmin), _toindex(xmax) + 1)
-
-                ext_data = input_model.data[y_slice, x_slice].copy()
-                ext_err = input_model.err[y_slice, x_slice].copy()
-                ext_dq = input_model.dq[y_slice, x_slice].copy()
-                if input_model.var_poisson is not None and np.size(input_model.var_poisson) > 0:
-                    var_poisson = input_model.var_poisson[y_slice, x_slice].copy()
-                else:
-                    var_poisson = None
-                if input_model.var_rnoise is not None and np.size(input_model.var_rnoise) > 0:
-                    var_rnoise = input_model.var_rnoise[y_slice, x_slice].copy()
-                else:
-                    var_rnoise = None
-                if input_model.var_flat is not None and np.size(input_model.var_flat) > 0:
-                    var_flat = input_model.var_flat[y_slice, x_slice].copy()
-                else:
-                    var_flat = None
-
-                tr.bounding_box = util.transform_bbox_from_shape(ext_data.shape)
-                subwcs.set_transform('grism_detector', 'detector', tr)
-
-                new_slit = datamodels.SlitModel(data=ext_data,
-                                                err=ext_err,
-                                                dq=ext_dq,
-                                                var_poisson=var_poisson,
-                                                var_rnoise=var_rnoise,
-                                                var_flat=var_flat)
-                new_slit.meta.wcsinfo.spectral_order = order
-                new_slit.meta.wcsinfo.dispersion_direction = \
-                    input_model.meta.wcsinfo.dispersion_direction
-                new_slit.meta.wcsinfo.specsys = input_model.meta.wcsinfo.specsys
-                new_slit.meta.coordinates = input_model.meta.coordinates
-                new_slit.meta.wcs = subwcs
-
-                if compute_wavelength:
-                    log.debug("Computing wavelengths")
-                    new_slit.wavelength = compute_wfss_wavelength(new_slit)
-
-                # set x/ystart values relative to the image (screen) frame.
-                # The overall subarray offset is recorded in model.meta.subarray.
-                # nslit = obj.sid - 1  # catalog id starts at zero
-                new_slit.name = "{0}".format(obj.sid)
-                new_slit.is_extended = obj.is_extended
-                new_slit.xstart = _toindex(xmin) + 1  # fits pixels
-                new_slit.xsize = ext_data.shape[1]
-                new_slit.ystart = _toindex(ymin) + 1  # fits pixels
-                new_slit.ysize = ext_data.shape[0]
-                new_slit.source_xpos = float(obj.xcentroid)
-                new_slit.source_ypos = float(obj.ycentroid)
-                new_slit.source_id = obj.sid
-                new_slit.source_dec = obj.sky_centroid.dec.value
-                new_slit.source_ra = obj.sky_centroid.ra.value
-                new_slit.bunit_data = input_model.meta.bunit_data
-                new_slit.bunit_err = input_model.meta.bunit_err
-                slits.append(new_slit)
-    output_model.slits.extend(slits)
-    # In the case that there are no spectra to extract deleting the variables
-    # will fail so add the try block.
-    try:
-        del subwcs
-    except UnboundLocalError:
-        pass
-    try:
-        del new_slit
-    except UnboundLocalError:
-        pass
-    # del subwcs
-    # del new_slit
+                cutouts.append((obj, order, xmin, xmax, ymin, ymax))
+
+    num_cores = fork_num_cores(min(num_cores, len(cutouts)), 'grism objects')
+
+    if num_cores <= 1:
+        output_model = datamodels.MultiSlitModel()
+        output_model.update(input_model)
+        output_model.slits.extend(_extract_grism_cutouts(input_model, cutouts, compute_wavelength))
+    else:
+        log.info(f'Extracting {len(cutouts)} grism cutouts using {num_cores} processes')
+        batches = np.array_split(np.arange(len(cutouts)), num_cores)
+
+        # The worker processes inherit the input model and the cutouts, and
+        # return the slits of their batch serialized
+        batch_function = partial(_extract_grism_cutout_batch, input_model, cutouts,
+                                 compute_wavelength)
+        results = fork_map(batch_function, batches, num_cores)
+
+        output_model = datamodels.MultiSlitModel()
+        output_model.update(input_model)
+        for result in results:
+            output_model.slits.extend(model_from_bytes(result, datamodels.MultiSlitModel).slits)
+
     log.info("Finished extractions")
     return output_model
 
 
+def _extract_grism_cutouts(input_model, cutouts, compute_wavelength):
+    """
+    Extract the 2d cutouts of grism objects.
+
+    Parameters
+    ----------
+    input_model : `~jwst.datamodels.ImageModel`
+        The grism image.
+    cutouts : list of tuple
+        (grism object, spectral order, xmin, xmax, ymin, ymax) of each
+        cutout, limited to the detector.
+    compute_wavelength : bool
+        Compute a wavelength array for the cutouts.
+
+    Returns
+    -------
+    slits : list of `~jwst.datamodels.SlitModel`
+        The extracted slits.
+    """
+    # One WCS model can be used to govern all the extractions
+    # and in fact the model transforms rely on the full frame
+    # coordinates of the input pixel location. So the WCS
+    # attached to the extraction is just a copy of the
+    # input_model WCS with a shift transform to the corner
+    # of the subarray. They also depend on the source object
+    # center, this information will be saved to the meta of
+    # the output model as source_[x/y]pos
+    inwcs = input_model.meta.wcs
+
+    slits = []
+    for obj, order, xmin, xmax, ymin, ymax in cutouts:
+
+        # Add the shift to the lower corner to each subarray WCS object
+        # The shift should just be the lower bounding box corner
+        # also replace the object center location inputs to the GrismDispersion
+        # model with the known object center and order information (in pixels of direct image)
+        # This is changes the user input to the model from (x,y,x0,y0,order) -> (x,y)
+        subwcs = copy.deepcopy(inwcs)
+        log.info("Subarray extracted for obj: {} order: {}:".format(obj.sid, order))
+        log.info("Subarray extents are: "
+                 "(xmin:{}, xmax:{}), (ymin:{}, ymax:{})".format(xmin, xmax, ymin, ymax))
+
+        # only the first two numbers in the Mapping are used
+        # the order and source position are put directly into
+        # the new wcs for the subarray for the forward transform
+        xcenter_model = Const1D(obj.xcentroid)
+        xcenter_model.inverse = Const1D(obj.xcentroid)
+
+        ycenter_model = Const1D(obj.ycentroid)
+        ycenter_model.inverse = Const1D(obj.ycentroid)
+
+        order_model = Const1D(order)
+        order_model.inverse = Const1D(order)
+
+        tr = inwcs.get_transform('grism_detector', 'detector')
+        tr = Mapping((0, 1, 0, 0, 0)) | (Shift(xmin) & Shift(ymin) &
+                                         xcenter_model &
+                                         ycenter_model &
+                                         order_model) | tr
+
+        y_slice = slice(_toindex(ymin), _toindex(ymax) + 1)
+        x_slice = slice(_toindex(xmin), _toindex(xmax) + 1)
+
+        ext_data = input_model.data[y_slice, x_slice].copy()
+        ext_err = input_model.err[y_slice, x_slice].copy()
+        ext_dq = input_model.dq[y_slice, x_slice].copy()
+        if input_model.var_poisson is not None and np.size(input_model.var_poisson) > 0:
+            var_poisson = input_model.var_poisson[y_slice, x_slice].copy()
+        else:
+            var_poisson = None
+        if input_model.var_rnoise is not None and np.size(input_model.var_rnoise) > 0:
+            var_rnoise = input_model.var_rnoise[y_slice, x_slice].copy()
+        else:
+            var_rnoise = None
+        if input_model.var_flat is not None and np.size(input_model.var_flat) > 0:
+            var_flat = input_model.var_flat[y_slice, x_slice].copy()
+        else:
+            var_flat = None
+
+        tr.bounding_box = util.transform_bbox_from_shape(ext_data.shape)
+        subwcs.set_transform('grism_detector', 'detector', tr)
+
+        new_slit = datamodels.SlitModel(data=ext_data,
+                                        err=ext_err,
+                                        dq=ext_dq,
+                                        var_poisson=var_poisson,
+                                        var_rnoise=var_rnoise,
+                                        var_flat=var_flat)
+        new_slit.meta.wcsinfo.spectral_order = order
+        new_slit.meta.wcsinfo.dispersion_direction = \
+            input_model.meta.wcsinfo.dispersion_direction
+        new_slit.meta.wcsinfo.specsys = input_model.meta.wcsinfo.specsys
+        new_slit.meta.coordinates = input_model.meta.coordinates
+        new_slit.meta.wcs = subwcs
+
+        if compute_wavelength:
+            log.debug("Computing wavelengths")
+            new_slit.wavelength = compute_grism_detector_wavelength(tr, ext_data.shape)
+
+        # set x/ystart values relative to the image (screen) frame.
+        # The overall subarray offset is recorded in model.meta.subarray.
+        # nslit = obj.sid - 1  # catalog id starts at zero
+        new_slit.name = "{0}".format(obj.sid)
+        new_slit.is_extended = obj.is_extended
+        new_slit.xstart = _toindex(xmin) + 1  # fits pixels
+        new_slit.xsize = ext_data.shape[1]
+        new_slit.ystart = _toindex(ymin) + 1  # fits pixels
+        new_slit.ysize = ext_data.shape[0]
+        new_slit.source_xpos = float(obj.xcentroid)
+        new_slit.source_ypos = float(obj.ycentroid)
+        new_slit.source_id = obj.sid
+        new_slit.source_dec = obj.sky_centroid.dec.value
+        new_slit.source_ra = obj.sky_centroid.ra.value
+        new_slit.bunit_data = input_model.meta.bunit_data
+        new_slit.bunit_err = input_model.meta.bunit_err
+        slits.append(new_slit)
+    return slits
+
+
+def _extract_grism_cutout_batch(input_model, cutouts, compute_wavelength, cutout_indices):
+    """Worker process function: extract a batch of grism cutouts.
+
+    Returns a MultiSlitModel of the extracted slits, serialized so that
+    it can be sent back to the parent process.
+    """
+    batch_model = datamodels.MultiSlitModel()
+    batch_model.slits.extend(_extract_grism_cutouts(
+        input_model, [cutouts[i] for i in cutout_indices], compute_wavelength))
+    return model_to_bytes(batch_model)
+
+
 def clamp(value, minval, maxval):
     """
     Return the value clipped between minval and maxval.
@@ -623,6 +673,32 @@ def compute_tso_offset_center(input_model: ImageModel, distortion: CompoundModel
     return xc, yc
 
 
+def compute_grism_detector_wavelength(transform, shape):
+    """
+    Compute the wavelength array of a WFSS cutout from its dispersion transform.
+
+    The wavelength is an output of the grism_detector to detector transform
+    and is passed unchanged through the rest of the WCS pipeline, so the
+    spatial transforms to the sky do not need to be evaluated.
+
+    Parameters
+    ----------
+    transform : `~astropy.modeling.Model`
+        The grism_detector to detector transform of the cutout WCS,
+        with its bounding box.
+    shape : tuple
+        Shape of the cutout.
+
+    Returns
+    -------
+    wavelength : numpy.array
+        The wavelength array
+    """
+    x, y = grid_from_bounding_box(util.wcs_bbox_from_shape(shape))
+    wavelength = transform(x, y, with_bounding_box=True)[2]
+    return wavelength
+
+
 def compute_wfss_wavelength(slit):
     """
     Compute the wavelength array for a slit with gwcs object
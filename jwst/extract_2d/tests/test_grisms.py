@@ -27,7 +27,8 @@ from jwst.assign_wcs.util import create_grism_bbox
 from jwst.assign_wcs import AssignWcsStep, nircam
 
 from jwst.extract_2d.extract_2d_step import Extract2dStep
-from jwst.extract_2d.grisms import extract_tso_object, extract_grism_objects, compute_tso_offset_center
+from jwst.extract_2d.grisms import (extract_tso_object, extract_grism_objects, compute_tso_offset_center,
+                                    compute_wfss_wavelength)
 from jwst.extract_2d.tests import data
 
 
@@ -385,6 +386,26 @@ def test_compute_tso_offset_center():
     assert np.isclose(xc, 961.355, atol=1e-3)
 
 
+@pytest.mark.filterwarnings("ignore: Card is too long")
+def test_extract_wfss_object_parallel():
+    """Test the WFSS objects extracted by several processes are identical to the serial ones."""
+    source_catalog = get_file_path('step_SourceCatalogStep_cat.ecsv')
+    wcsimage = create_wfss_image(pupil='GRISMR')
+    wcsimage.meta.source_catalog = source_catalog
+    refs = get_reference_files(wcsimage)
+    serial = extract_grism_objects(wcsimage, reference_files=refs)
+    parallel = extract_grism_objects(wcsimage, reference_files=refs, num_cores=2)
+
+    assert len(serial.slits) == len(parallel.slits) == 3
+    for slit, pslit in zip(serial.slits, parallel.slits):
+        assert slit.name == pslit.name
+        assert (slit.xstart, slit.ystart) == (pslit.xstart, pslit.ystart)
+        np.testing.assert_array_equal(slit.data, pslit.data)
+        np.testing.assert_array_equal(slit.wavelength, pslit.wavelength)
+        # the wavelengths are computed from the dispersion transform only
+        np.testing.assert_allclose(slit.wavelength, compute_wfss_wavelength(pslit))
+
+
 @pytest.mark.filterwarnings("ignore: Card is too long")
 def test_extract_wfss_object():
     """Test extraction of a WFSS object.
@@ -4,6 +4,7 @@
 
 import logging
 import math
+import weakref
 
 import numpy as np
 
@@ -27,6 +28,11 @@ NIRSPEC_SPECTRAL_EXPOSURES = ['NRS_AUTOWAVE', 'NRS_BRIGHTOBJ', 'NRS_FIXEDSLIT',
 HORIZONTAL = 1
 VERTICAL = 2
 
+# Wavelengths of the image planes and fast-variation tables read from the
+# NIRSpec flat field reference models, keyed by the id of the model.  The
+# entries of a model are removed when the model is deleted.
+_flat_table_cache = {}
+
 
 def do_correction(input_model,
                   flat=None, fflat=None, sflat=None, dflat=None, user_supplied_flat=None,
@@ -1077,6 +1083,40 @@ def combine_dq(f_flat_dq, s_flat_dq, d_flat_dq, default_shape):
     return flat_dq
 
 
+def _cached_read(flat_model, key, read):
+    """Return copies of the arrays read from a flat field reference model.
+
+    Parameters
+    ----------
+    flat_model : NIRSpec flat-field object
+        The reference model the arrays are read from.
+
+    key : tuple
+        Identifies what is read from `flat_model`.
+
+    read : callable
+        Reads an array, or a tuple of arrays, from `flat_model`.  It is
+        only called the first time `key` is requested for `flat_model`.
+
+    Returns
+    -------
+    ndarray or tuple of ndarray
+        Copies of the arrays returned by `read`, so the caller may modify
+        them.
+    """
+    model_id = id(flat_model)
+    if model_id not in _flat_table_cache:
+        ref = weakref.ref(flat_model, lambda ref: _flat_table_cache.pop(model_id, None))
+        _flat_table_cache[model_id] = (ref, {})
+    entries = _flat_table_cache[model_id][1]
+    if key not in entries:
+        entries[key] = read()
+    value = entries[key]
+    if isinstance(value, tuple):
+        return tuple(array.copy() for array in value)
+    return value.copy()
+
+
 def read_image_wl(flat_model, quadrant=None):
     """Read wavelengths for the image planes.
 
@@ -1101,6 +1141,13 @@ def read_image_wl(flat_model, quadrant=None):
         An array of wavelengths, one for each plane of the SCI array.
     """
 
+    return _cached_read(flat_model, ('image_wl', quadrant),
+                        lambda: _read_image_wl(flat_model, quadrant))
+
+
+def _read_image_wl(flat_model, quadrant):
+    """Read wavelengths for the image planes, see `read_image_wl`."""
+
     if quadrant is not None:  # NRS_MSASPEC
         wavelength = flat_model.quadrants[quadrant].wavelength["wavelength"]
     else:
@@ -1166,6 +1213,17 @@ def read_flat_table(flat_model, exposure_type, slit_name=None, quadrant=None):
         table.
     """
 
+    # The row of the table only depends on the slit name for fixed-slit data.
+    if exposure_type not in FIXED_SLIT_TYPES:
+        slit_name = None
+    return _cached_read(flat_model, ('flat_table', quadrant, slit_name),
+                        lambda: _read_flat_table(flat_model, exposure_type,
+                                                 slit_name, quadrant))
+
+
+def _read_flat_table(flat_model, exposure_type, slit_name, quadrant):
+    """Read the table (the "fast" variation), see `read_flat_table`."""
+
     if quadrant is not None:  # NRS_MSASPEC
         data = flat_model.quadrants[quadrant].flat_table
     else:
@@ -1364,12 +1422,13 @@ def combine_fast_slow(wl, flat_2d, flat_dq, flat_err, tab_wl, tab_flat, tab_flat
     dx = np.array([-d, 0., d])
     wgt = np.array([5., 8., 5.]) / 18.
 
-    # Interpolate tabular data over the range of wavelengths,
-    # weight, and sum at each of 3 specified points
-    for offset, weight in zip(dx, wgt):
-        wavelengths = wl_c + dwl * offset
-        values += weight * np.interp(wavelengths, tab_wl, tab_flat,
-                                     left=np.nan, right=np.nan)
+    # Interpolate tabular data over the range of wavelengths at each of
+    # 3 specified points, all pixels at once, then weight and sum.
+    wavelengths = np.stack([wl_c + dwl * offset for offset in dx])
+    tab_values = np.interp(wavelengths, tab_wl, tab_flat,
+                           left=np.nan, right=np.nan)
+    for tab_value, weight in zip(tab_values, wgt):
+        values += weight * tab_value
 
     # Interpolate error values from reference file using a simple
     # linear interpolation as these don't have the required precision
@@ -1418,45 +1477,32 @@ def clean_wl(wl, dispaxis):
     """
 
     wl_c = wl.copy()  # so we can replace zeros
-    wl_c[wl_c <= 0.] = np.nan
-    shape = wl_c.shape
-
     if dispaxis == HORIZONTAL:
-        i0 = None
-        i1 = None
-        for i in range(shape[1]):
-            temp = wl_c[:, i]
-            if np.any(np.isfinite(temp)):
-                if i0 is None:
-                    i0 = i  # first i with some non-zero wl
-                i1 = i  # last i (so far) with some non-zero wl
-                replacement_value = np.nanmean(temp)
-                temp[np.isnan(temp)] = replacement_value
-        if i0 is not None and i0 > 0:
-            temp = wl_c[:, i0].reshape(shape[0], 1)
-            wl_c[:, 0:i0] = temp.copy()
-        if i1 is not None and i1 < shape[1] - 1:
-            temp = wl_c[:, i1].reshape(shape[0], 1)
-            wl_c[:, i1:] = temp.copy()
+        # Work on columns, i.e. along the cross-dispersion direction.
+        wl_t = wl_c
     elif dispaxis == VERTICAL:
-        j0 = None
-        j1 = None
-        for j in range(shape[0]):
-            temp = wl_c[j, :]
-            if np.any(np.isfinite(temp)):
-                if j0 is None:
-                    j0 = j  # first j with some non-zero wl
-                j1 = j  # last j (so far) with some non-zero wl
-                replacement_value = np.nanmean(temp)
-                temp[np.isnan(temp)] = replacement_value
-        if j0 is not None and j0 > 0:
-            temp = wl_c[j0, :].reshape(1, shape[1])
-            wl_c[0:j0, :] = temp.copy()
-        if j1 is not None and j1 < shape[0] - 1:
-            temp = wl_c[j1, :].reshape(1, shape[1])
-            wl_c[j1:, :] = temp.copy()
+        wl_t = wl_c.T
     else:
-        wl_c = wl.copy()
+        return wl_c
+
+    wl_t[wl_t <= 0.] = np.nan
+    good = np.flatnonzero(np.any(np.isfinite(wl_t), axis=0))
+    if len(good) == 0:
+        return wl_c
+
+    # Replace the NaNs in each column (row) that has some non-zero
+    # wavelengths with the average along the cross-dispersion direction.
+    # The average is taken over a contiguous copy to match the (pairwise)
+    # summation of a single column.
+    averages = np.nanmean(np.ascontiguousarray(wl_t[:, good].T), axis=1)
+    nans = np.isnan(wl_t[:, good])
+    wl_t[:, good] = np.where(nans, averages, wl_t[:, good])
+
+    # Copy the first and last such columns (rows) to the edges.
+    i0 = good[0]  # first i with some non-zero wl
+    i1 = good[-1]  # last i with some non-zero wl
+    wl_t[:, 0:i0] = wl_t[:, i0:i0 + 1]
+    wl_t[:, i1:] = wl_t[:, i1:i1 + 1]
 
     return wl_c
 
@@ -1513,38 +1559,17 @@ def interpolate_flat(image_flat, image_dq, image_err, image_wl, wl):
                     image_dq.reshape((ysize, xsize)),
                     image_err.reshape((ysize, xsize)))
 
-    grid = np.indices((ysize, xsize), dtype=np.intp)
-    ixpixel = grid[1]
-    iypixel = grid[0]
-
-    # The initial value of -1 is a flag to indicate that elements have not
-    # been assigned valid values yet.
-    k = np.zeros(wl.shape, dtype=np.intp) - 1
-
-    # Truncate the index for wavelengths that are outside the range of
-    # image_wl.  The indices need to be assigned harmless values to avoid
-    # indexing out of bounds.
+    # Find the interval of image_wl for linear interpolation, so that
+    # image_wl[k] <= wl < image_wl[k + 1].  Wavelengths that are outside the
+    # range of image_wl are assigned the first or last interval.
     #   Why do we set the upper limit of k to nz - 2?
     #   Because we interpolate using elements k and k + 1.
+    k = np.searchsorted(image_wl, wl, side='right') - 1
+    np.clip(k, 0, nz - 2, out=k)
+    # NaN wavelengths are not in any interval; the initial value of -1 of
+    # the interval search is kept for them.
+    k[np.isnan(wl)] = -1
 
-    # for wavelengths < lower limit (image_wl[0]) set k to 0
-    k[:, :] = np.where(wl <= image_wl[0], 0, k)
-
-    # for wavelengths > upper limit (image_wl[nz-1]) set k to nz-2
-    k[:, :] = np.where(wl >= image_wl[nz - 1], nz - 2, k)
-
-    # Look for the correct interval for linear interpolation.
-    for k_test in range(nz - 1):
-        test1 = np.logical_and(wl >= image_wl[k_test],
-                               wl < image_wl[k_test + 1])
-
-        # If an element of k is not -1, it has already been assigned, and
-        # I don't want to clobber it.
-        test2 = np.logical_and(k == -1, test1)
-        k[:, :] = np.where(test2, k_test, k)
-
-        if np.all(k >= 0):
-            break
     # Use linear interpolation within the 3-D flat field to get a 2-D
     # flat field.
     denom = image_wl[k + 1] - image_wl[k]
@@ -1559,21 +1584,24 @@ def interpolate_flat(image_flat, image_dq, image_err, image_wl, wl):
 
     p = np.where(zero_denom, 0., (wl - image_wl[k]) / denom)
     q = 1. - p
-    flat_2d = q * image_flat[k, iypixel, ixpixel] + \
-        p * image_flat[k + 1, iypixel, ixpixel]
+    # Gather the planes k and k + 1 at each pixel.
+    k = k[np.newaxis]
+    flat_2d = q * np.take_along_axis(image_flat, k, axis=0)[0] + \
+        p * np.take_along_axis(image_flat, k + 1, axis=0)[0]
     if len(image_err.shape) == 2:
         flat_err = image_err.copy()
     else:
-        flat_err = q * image_err[k, iypixel, ixpixel] + \
-            p * image_err[k + 1, iypixel, ixpixel]
+        flat_err = q * np.take_along_axis(image_err, k, axis=0)[0] + \
+            p * np.take_along_axis(image_err, k + 1, axis=0)[0]
 
     if len(image_dq.shape) == 2:
         flat_dq = image_dq.copy()
     else:
+        dq_k = np.take_along_axis(image_dq, k, axis=0)[0]
         flat_dq = np.where(p == 0.,
-                           image_dq[k, iypixel, ixpixel],
-                           np.bitwise_or(image_dq[k, iypixel, ixpixel],
-                                         image_dq[k + 1, iypixel, ixpixel]))
+                           dq_k,
+                           np.bitwise_or(dq_k,
+                                         np.take_along_axis(image_dq, k + 1, axis=0)[0]))
 
         flat_bad = np.bitwise_and(flat_dq, dqflags.pixel['DO_NOT_USE'])
         # Reset the flat value of all bad pixels to 1.0, so that no
@@ -1630,9 +1658,7 @@ def flat_for_nirspec_ifu(output_model, f_flat_model, s_flat_model, d_flat_model,
     flat_err = np.zeros_like(output_model.data) * np.nan
 
     try:
-        # Note: the 30 is hardcoded in nirspec.nrs_ifu_wcs, which the line
-        # below replaced.
-        wcsobj, tr1, tr2, tr3 = nirspec._get_transforms(output_model, np.arange(30))
+        ifu_wcs_list = nirspec.nrs_ifu_wcs(output_model)
     except (KeyError, AttributeError):
         if output_model.meta.cal_step.assign_wcs == 'COMPLETE':
             log.error("The input file does not appear to have WCS info.")
@@ -1640,9 +1666,7 @@ def flat_for_nirspec_ifu(output_model, f_flat_model, s_flat_model, d_flat_model,
         else:
             log.error("This mode %s requires WCS information.", exposure_type)
             raise RuntimeError("The assign_wcs step has not been run.")
-    for k in range(len(tr2)):
-        ifu_wcs = nirspec._nrs_wcs_set_input_lite(output_model, wcsobj, k,
-                                                 [tr1, tr2[k], tr3[k]])
+    for k, ifu_wcs in enumerate(ifu_wcs_list):
         # example:  bounding_box = ((1600.5, 2048.5),   # X
         #                           (1886.5, 1925.5))   # Y
         truncated = False
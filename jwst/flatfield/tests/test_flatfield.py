@@ -1,3 +1,5 @@
+import gc
+
 import pytest
 import numpy as np
 from astropy.io import fits
@@ -7,7 +9,7 @@ from stdatamodels.jwst import datamodels
 
 from jwst.assign_wcs import AssignWcsStep
 from jwst.assign_wcs.tests.test_nirspec import create_nirspec_ifu_file
-from jwst.flatfield import FlatFieldStep
+from jwst.flatfield import FlatFieldStep, flat_field
 from jwst.flatfield.flat_field_step import NRS_IMAGING_MODES, NRS_SPEC_MODES
 
 
@@ -389,3 +391,30 @@ def test_nirspec_ifu_flat():
     result.close()
     for flat in flats:
         flat.close()
+
+
+def test_read_flat_table_cache():
+    """Test the tables read from a flat reference model are cached"""
+    d_flat = create_nirspec_flats((10, 20, 20))[2]
+    model_id = id(d_flat)
+
+    tab_wl, tab_flat, tab_flat_err = flat_field.read_flat_table(d_flat, 'NRS_MSASPEC', 'S1')
+    image_wl = flat_field.read_image_wl(d_flat)
+    np.testing.assert_array_equal(tab_wl, np.arange(1, 11))
+    np.testing.assert_array_equal(image_wl, np.arange(1, 11))
+
+    # The slit name does not select the row for MOS data, so the table is
+    # only read once; the returned arrays are copies of the cached ones.
+    tab_flat *= 2.
+    image_wl[:] = 0.
+    _, tab_flat2, _ = flat_field.read_flat_table(d_flat, 'NRS_MSASPEC', 'S2')
+    np.testing.assert_array_equal(tab_flat2, np.ones(10))
+    np.testing.assert_array_equal(flat_field.read_image_wl(d_flat), np.arange(1, 11))
+    entries = flat_field._flat_table_cache[model_id][1]
+    assert sorted(entries, key=str) == [('flat_table', None, None), ('image_wl', None)]
+
+    # The entries are removed with the model
+    d_flat.close()
+    del d_flat
+    gc.collect()
+    assert model_id not in flat_field._flat_table_cache
@@ -1,7 +1,10 @@
 """Pipeline utilities objects"""
 
+import io
 import logging
+import multiprocessing
 
+import asdf
 import numpy as np
 from stdatamodels.properties import ObjectNode
 from stdatamodels.jwst.datamodels import dqflags, JwstDataModel
@@ -151,3 +154,164 @@ def match_nans_and_flags(input_model):
     # Update the DQ extension
     if input_model.dq.shape == data_shape:
         input_model.dq[is_invalid] |= dqflags.pixel['DO_NOT_USE']
+
+
+def compute_num_cores(max_cores, max_tasks=None):
+    """Determine how many processes to use for a multiprocessing step option.
+
+    Parameters
+    ----------
+    max_cores : str or int
+        Number of cores to use for multiprocessing. This may be an integer
+        (or string integer), 'none' or 'one' (no multiprocessing), or one of
+        'quarter', 'half', and 'all', which indicate the fraction of the
+        available cores to use. The total number of cores includes the SMT
+        cores (Hyper Threading for Intel).
+    max_tasks : int, optional
+        Number of independent tasks to be processed. The number of processes
+        is never larger than this value.
+
+    Returns
+    -------
+    num_cores : int
+        Number of processes to use; 1 means no multiprocessing.
+    """
+    num_available = multiprocessing.cpu_count()
+
+    max_cores = str(max_cores).strip().lower()
+    if max_cores.isnumeric():
+        num_cores = int(max_cores)
+    elif max_cores == 'quarter':
+        num_cores = num_available // 4
+    elif max_cores == 'half':
+        num_cores = num_available // 2
+    elif max_cores == 'all':
+        num_cores = num_available
+    else:
+        # 'none', 'one' or unrecognized values
+        num_cores = 1
+
+    num_cores = min(num_cores, num_available)
+    if max_tasks is not None:
+        num_cores = min(num_cores, max_tasks)
+    return max(num_cores, 1)
+
+
+def fork_num_cores(num_cores, description):
+    """Limit the number of processes to those usable by `fork_map`.
+
+    The worker processes of `fork_map` are forked from the parent process.
+    If the fork start method is not available on this platform, a warning
+    is logged and a single process is used.
+
+    Parameters
+    ----------
+    num_cores : int
+        Requested number of processes.
+    description : str
+        What is being processed in parallel, used in the warning message,
+        e.g. "IFU cubes".
+
+    Returns
+    -------
+    num_cores : int
+        Number of processes to use; 1 means no multiprocessing.
+    """
+    if num_cores > 1 and 'fork' not in multiprocessing.get_all_start_methods():
+        log.warning(f'Multiprocessing of {description} requires the fork start '
+                    'method, which is not available on this platform. '
+                    'Processing serially.')
+        return 1
+    return max(num_cores, 1)
+
+
+def fork_map(function, tasks, num_cores, chunksize=1):
+    """Apply a function to tasks in a pool of forked worker processes.
+
+    Data models can not be pickled: the worker processes are forked and
+    inherit ``function``, which is typically a bound method or a closure
+    that refers to the models being processed. Only the tasks and the
+    results of the function are sent between the processes, so they must
+    be picklable; models can be returned as `model_to_bytes`.
+
+    Parameters
+    ----------
+    function : callable
+        The function to apply to each task. It does not need to be
+        picklable.
+    tasks : iterable
+        The arguments of each call of ``function``.
+    num_cores : int
+        Number of worker processes (see `fork_num_cores`).
+    chunksize : int, optional
+        Number of tasks sent to a worker process at once.
+
+    Yields
+    ------
+    result
+        The results of ``function`` for each task, in the order of the
+        tasks.
+    """
+    ctx = multiprocessing.get_context('fork')
+    with ctx.Pool(num_cores, initializer=_fork_initializer,
+                  initargs=(function,)) as pool:
+        yield from pool.imap(_fork_worker, tasks, chunksize=chunksize)
+
+
+def model_to_bytes(model):
+    """Serialize a data model, e.g. to return it from a `fork_map` worker.
+
+    The model is written to an in-memory ASDF file, which stamps its
+    ``meta.date`` as any saved model.
+
+    Parameters
+    ----------
+    model : `~jwst.datamodels.JwstDataModel`
+        The model to serialize.
+
+    Returns
+    -------
+    data : bytes
+        The ASDF serialization of the model (see `model_from_bytes`).
+    """
+    buffer = io.BytesIO()
+    model.to_asdf(buffer)
+    return buffer.getvalue()
+
+
+def model_from_bytes(data, model_class):
+    """Open a data model serialized by `model_to_bytes`.
+
+    Parameters
+    ----------
+    data : bytes
+        The ASDF serialization of the model.
+    model_class : type
+        The class of the model, e.g. `~jwst.datamodels.MultiSlitModel`.
+
+    Returns
+    -------
+    model : `~jwst.datamodels.JwstDataModel`
+        The model, with its arrays in memory.
+    """
+    return model_class(asdf.open(io.BytesIO(data), lazy_load=False))
+
+
+# Function applied by the worker processes of fork_map, set in each worker
+# process by _fork_initializer
+_fork_function = None
+
+
+def _fork_initializer(function):
+    """Initialize a worker process of `fork_map`.
+
+    The initialization arguments of forked worker processes are inherited,
+    not pickled.
+    """
+    global _fork_function
+    _fork_function = function
+
+
+def _fork_worker(task):
+    """Worker process function of `fork_map`."""
+    return _fork_function(task)
@@ -216,3 +216,90 @@ def test_match_nans_and_flags_shape_mismatch():
 
     model.close()
     model_copy.close()
+
+
+@pytest.mark.parametrize(
+    'max_cores, max_tasks, expected',
+    [
+        ('none', None, 1),
+        ('1', None, 1),
+        ('2', 1, 1),
+        ('all', None, 8),
+        ('half', None, 4),
+        ('quarter', None, 2),
+        ('all', 3, 3),
+        ('100', None, 8),
+        ('bogus', None, 1),
+    ]
+)
+def test_compute_num_cores(monkeypatch, max_cores, max_tasks, expected):
+    """Test conversion of the maximum_cores option to a number of processes"""
+    monkeypatch.setattr(pipe_utils.multiprocessing, 'cpu_count', lambda: 8)
+    assert pipe_utils.compute_num_cores(max_cores, max_tasks) == expected
+
+
+def test_fork_num_cores(monkeypatch, caplog):
+    """Test falling back to a single process without the fork start method"""
+    monkeypatch.setattr(pipe_utils.multiprocessing, 'get_all_start_methods',
+                        lambda: ['fork', 'spawn'])
+    assert pipe_utils.fork_num_cores(3, 'things') == 3
+    assert pipe_utils.fork_num_cores(0, 'things') == 1
+
+    monkeypatch.setattr(pipe_utils.multiprocessing, 'get_all_start_methods',
+                        lambda: ['spawn'])
+    assert pipe_utils.fork_num_cores(3, 'things') == 1
+    assert 'Multiprocessing of things requires the fork start method' in caplog.text
+
+
+@pytest.mark.skipif('fork' not in pipe_utils.multiprocessing.get_all_start_methods(),
+                    reason='requires the fork start method')
+def test_fork_map():
+    """Test the worker processes inherit an unpicklable function"""
+    offset = np.arange(5)
+
+    def add_offset(i):
+        return i + offset
+
+    results = list(pipe_utils.fork_map(add_offset, range(10), 3))
+    assert len(results) == 10
+    for i, result in enumerate(results):
+        np.testing.assert_array_equal(result, i + offset)
+    assert pipe_utils._fork_function is None
+
+
+@pytest.mark.skipif('fork' not in pipe_utils.multiprocessing.get_all_start_methods(),
+                    reason='requires the fork start method')
+def test_fork_map_nested():
+    """Test interleaved pools apply their own function"""
+    first = pipe_utils.fork_map(lambda i: i, range(4), 2)
+    assert next(first) == 0
+    second = list(pipe_utils.fork_map(lambda i: -i, range(4), 2))
+    assert list(first) == [1, 2, 3]
+    assert second == [0, -1, -2, -3]
+
+
+@pytest.mark.skipif('fork' not in pipe_utils.multiprocessing.get_all_start_methods(),
+                    reason='requires the fork start method')
+def test_model_to_bytes():
+    """Test models returned by the worker processes as bytes"""
+    model = datamodels.MultiSlitModel()
+    model.meta.exposure.type = 'NRS_MSASPEC'
+    for i in range(3):
+        slit = datamodels.SlitModel(np.full((5, 20), float(i), dtype=np.float32))
+        slit.name = str(i)
+        model.slits.append(slit)
+
+    def serialize_slit(i):
+        result = datamodels.MultiSlitModel()
+        result.update(model)
+        result.slits.append(model.slits[i])
+        return pipe_utils.model_to_bytes(result)
+
+    results = [pipe_utils.model_from_bytes(data, datamodels.MultiSlitModel)
+               for data in pipe_utils.fork_map(serialize_slit, range(3), 2)]
+    for i, result in enumerate(results):
+        assert isinstance(result, datamodels.MultiSlitModel)
+        assert result.meta.exposure.type == 'NRS_MSASPEC'
+        assert len(result.slits) == 1
+        assert result.slits[0].name == str(i)
+        np.testing.assert_array_equal(result.slits[0].data, model.slits[i].data)
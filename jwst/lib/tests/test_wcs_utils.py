@@ -3,13 +3,14 @@ from numpy.testing import assert_allclose
 
 from astropy import units as u
 from astropy import coordinates as coord
-from astropy.modeling.models import Mapping, Identity, Shift, Scale
+from astropy.modeling.models import Mapping, Identity, Shift, Scale, Tabular1D
 from gwcs import wcstools, wcs
 from gwcs import coordinate_frames as cf
 
 from stdatamodels.jwst import datamodels
 from stdatamodels.jwst.transforms.models import NirissSOSSModel
-from jwst.lib.wcs_utils import get_wavelengths
+from jwst.lib import wcs_utils
+from jwst.lib.wcs_utils import get_slit_frame_coordinates, get_wavelengths, slit_coordinate_cache
 from jwst.assign_wcs import util
 
 
@@ -155,3 +156,67 @@ def test_get_wavelength_wavecorr():
 
     wl_uncorr = get_wavelengths(model, use_wavecorr=False)
     assert_allclose(wl_uncorr, wl_og)
+
+
+def test_slit_coordinate_cache():
+    """Test slit coordinates are computed once per WCS inside the cache context"""
+    model = create_model()
+    del model.wavelength
+    model.name = 'S200A1'
+    key = ('S200A1', model.data.shape)
+
+    with slit_coordinate_cache():
+        xslit, yslit, lam = get_slit_frame_coordinates(model)
+        assert_allclose(lam, create_mock_wl())
+        assert_allclose(get_wavelengths(model), create_mock_wl())
+        _, entry = wcs_utils._slit_cache[key]
+        assert set(entry) == {'slit_frame', 'wavelength'}
+
+        # later calls use the cached values, returning copies of them
+        entry['wavelength'] = np.full(model.data.shape, 3.0)
+        wl = get_wavelengths(model)
+        assert_allclose(wl, 3.0)
+        wl[:] = 0
+        assert_allclose(get_wavelengths(model), 3.0)
+
+        # changing the WCS invalidates the cached values
+        slit_spatial = cf.Frame2D(name="slit_spatial", axes_order=(0, 1), unit=("", ""),
+                                  axes_names=("x_slit", "y_slit"))
+        spec = cf.SpectralFrame(name="spectral", axes_order=(2,), unit=(u.micron,),
+                                axes_names=("wavelength",))
+        wcorr_frame = cf.CompositeFrame([slit_spatial, spec], name="wavecorr_frame")
+        model.meta.wcs.insert_frame("slit_frame", Identity(2) & Shift(0.1), wcorr_frame)
+        assert_allclose(get_wavelengths(model), create_mock_wl() + 0.1)
+        wl_uncorr = get_wavelengths(model, use_wavecorr=False)
+        _, entry = wcs_utils._slit_cache[key]
+        assert set(entry) == {'slit_frame', 'wavelength', 'uncorrected_wavelength'}
+
+    # nothing is cached outside of the context, and the results are the same
+    assert wcs_utils._slit_cache is None
+    np.testing.assert_array_equal(get_wavelengths(model, use_wavecorr=False), wl_uncorr)
+    np.testing.assert_array_equal(get_slit_frame_coordinates(model)[1], yslit)
+
+
+def test_wcs_fingerprint():
+    """Test the WCS fingerprint changes with any state of the transforms"""
+    lookup = Tabular1D(points=np.arange(5.), lookup_table=np.arange(5.) * 2)
+    wcsobj = wcs.WCS([('detector', Mapping((0, 1)) | (Shift(1) & lookup)), ('world', None)])
+    fingerprint = wcs_utils.wcs_fingerprint(wcsobj)
+    assert wcs_utils.wcs_fingerprint(wcsobj) == fingerprint
+
+    lookup.lookup_table[1] = 7.
+    changed = wcs_utils.wcs_fingerprint(wcsobj)
+    assert changed != fingerprint
+
+    wcsobj.forward_transform.offset_1 = 2.
+    assert wcs_utils.wcs_fingerprint(wcsobj) != changed
+    changed = wcs_utils.wcs_fingerprint(wcsobj)
+
+    lookup.bounding_box = (0, 4)
+    assert wcs_utils.wcs_fingerprint(wcsobj) != changed
+    changed = wcs_utils.wcs_fingerprint(wcsobj)
+
+    wcsobj.set_transform('detector', 'world', Mapping((1, 0)) | (Shift(2) & lookup))
+    assert wcs_utils.wcs_fingerprint(wcsobj) != changed
+
+    assert wcs_utils.wcs_fingerprint(None) is None
@@ -1,8 +1,163 @@
+import hashlib
+from contextlib import contextmanager
+
 import numpy as np
+from astropy.modeling import CompoundModel, Model
 
 
 WFSS_EXPTYPES = ['NIS_WFSS', 'NRC_WFSS', 'NRC_GRISM', 'NRC_TSGRISM']
 
+# Coordinates computed from the WCS of each slit, kept while a
+# slit_coordinate_cache context is active (None otherwise)
+_slit_cache = None
+
+
+@contextmanager
+def slit_coordinate_cache():
+    """Keep coordinates computed from slit WCSs in memory.
+
+    Inside this context, the slit frame coordinates returned by
+    `get_slit_frame_coordinates` and the wavelengths computed from the WCS
+    by `get_wavelengths` are computed once per slit and reused by later
+    calls, for example by the steps of a pipeline run on the same
+    exposure. A cached value is discarded when the WCS of its slit changes,
+    for instance when the wavecorr step inserts the wavelength correction
+    into the slit WCS. Outside of the context nothing is cached.
+    """
+    global _slit_cache
+    previous = _slit_cache
+    _slit_cache = {}
+    try:
+        yield
+    finally:
+        _slit_cache = previous
+
+
+# Model attributes left out of the WCS fingerprint: the parameter values
+# are taken from the ``parameters`` property instead of the ``_parameters``
+# array, which is not kept up to date when a compound model is modified
+_FINGERPRINT_EXCLUDED_ATTRIBUTES = ('_parameters', '_name', '_param_metrics', '_constraints_cache')
+
+
+def wcs_fingerprint(wcs):
+    """Identify the state of a WCS object.
+
+    Two WCS objects with the same frames, bounding box and transforms are
+    considered identical. The transforms are compared by class, parameters,
+    bounding box and the arrays, models and values they hold as attributes,
+    such as the inputs and outputs, the inverse, the lookup table of a
+    tabular model or the slit models of a NIRSpec ``gwa`` to ``slit_frame``
+    transform.
+
+    Parameters
+    ----------
+    wcs : `~gwcs.wcs.WCS`
+        The WCS object.
+
+    Returns
+    -------
+    fingerprint : tuple or None
+        The fingerprint of the WCS, or None if the WCS can not be identified.
+    """
+    digest = hashlib.sha1()
+    try:
+        for step in wcs.pipeline:
+            _update_fingerprint(digest, step.transform, set())
+        bounding_box = str(wcs.bounding_box)
+        frames = tuple(wcs.available_frames)
+    except (AttributeError, NotImplementedError, TypeError, ValueError):
+        return None
+    return frames, bounding_box, digest.hexdigest()
+
+
+def _update_fingerprint(digest, value, seen):
+    """Add a transform, or a value held by a transform, to a WCS fingerprint."""
+    if isinstance(value, Model):
+        if id(value) in seen:
+            return
+        seen.add(id(value))
+        digest.update(f'{type(value).__module__}.{type(value).__name__}'.encode())
+        if isinstance(value, CompoundModel):
+            # The parameters of a compound model are those of its leaves
+            attributes = {'op': value.op, 'left': value.left, 'right': value.right,
+                          'inputs': value.inputs, 'outputs': value.outputs,
+                          'inverse': getattr(value, '_user_inverse', None)}
+        else:
+            digest.update(np.asarray(value.parameters, dtype=np.float64).tobytes())
+            attributes = {name: attribute for name, attribute in vars(value).items()
+                          if name not in _FINGERPRINT_EXCLUDED_ATTRIBUTES}
+        for name, attribute in attributes.items():
+            digest.update(name.encode())
+            _update_fingerprint(digest, attribute, seen)
+        try:
+            bounding_box = value.bounding_box
+        except NotImplementedError:
+            bounding_box = None
+        digest.update(str(bounding_box).encode())
+    elif isinstance(value, np.ndarray):
+        digest.update(f'{value.dtype}{value.shape}{getattr(value, "unit", "")}'.encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)):
+        digest.update(f'{type(value).__name__}{len(value)}'.encode())
+        for item in value:
+            _update_fingerprint(digest, item, seen)
+    elif isinstance(value, dict):
+        digest.update(f'dict{len(value)}'.encode())
+        for key, item in value.items():
+            digest.update(repr(key).encode())
+            _update_fingerprint(digest, item, seen)
+    elif value is None or isinstance(value, (str, int, float, complex, np.generic)):
+        digest.update(repr(value).encode())
+
+
+def _cached(model, name, compute):
+    """Return a value computed from the WCS of a model, using the slit cache if active.
+
+    Cached arrays are copied on return, so callers may modify them.
+    """
+    if _slit_cache is None:
+        return compute()
+    fingerprint = wcs_fingerprint(model.meta.wcs)
+    if fingerprint is None:
+        return compute()
+
+    key = (getattr(model, 'name', None), model.data.shape)
+    cached_fingerprint, entry = _slit_cache.get(key, (None, None))
+    if cached_fingerprint != fingerprint:
+        # New slit or the WCS has changed: drop the values computed before
+        entry = {}
+        _slit_cache[key] = (fingerprint, entry)
+    if name not in entry:
+        entry[name] = compute()
+
+    value = entry[name]
+    if isinstance(value, tuple):
+        return tuple(array.copy() for array in value)
+    return value.copy()
+
+
+def get_slit_frame_coordinates(model):
+    """Compute the slit frame coordinates of each pixel of a slit.
+
+    Parameters
+    ----------
+    model : `~jwst.datamodels.SlitModel`
+        A slit with a WCS that includes the ``slit_frame``, e.g. a slit
+        from a NIRSpec `~jwst.datamodels.MultiSlitModel`.
+
+    Returns
+    -------
+    x_slit, y_slit, wavelength : tuple of 2-D ndarray
+        Position in the slit and wavelength (without wavelength
+        correction) of each pixel in the slit data.
+    """
+    def compute():
+        grid = np.indices(model.data.shape[-2:], dtype=np.float64)
+        det2slit = model.meta.wcs.get_transform('detector', 'slit_frame')
+        return tuple(det2slit(grid[1], grid[0]))
+
+    return _cached(model, 'slit_frame', compute)
+
 
 def get_wavelengths(model, exp_type="", order=None, use_wavecorr=None):
     """Read or compute wavelengths.
@@ -53,10 +208,11 @@ def get_wavelengths(model, exp_type="", order=None, use_wavecorr=None):
     if use_wavecorr is not None:
         if (not use_wavecorr and hasattr(model.meta, "wcs")
                 and 'wavecorr_frame' in model.meta.wcs.available_frames):
-            wcs = model.meta.wcs
-            detector2slit = wcs.get_transform('detector', 'slit_frame')
-            wavecorr2world = wcs.get_transform("wavecorr_frame", "world")
-            wl_array = (detector2slit | wavecorr2world)(grid[1], grid[0])[2]
+            def compute():
+                wavecorr2world = model.meta.wcs.get_transform("wavecorr_frame", "world")
+                return wavecorr2world(*get_slit_frame_coordinates(model))[2]
+
+            wl_array = _cached(model, 'uncorrected_wavelength', compute)
             return wl_array
 
     # If no existing wavelength array, compute one
@@ -76,6 +232,6 @@ def get_wavelengths(model, exp_type="", order=None, use_wavecorr=None):
                     # Keep wavelength; ignore RA and Dec
                     wl_array[..., j, i] = wcs(i, j)[2]
         else:
-            wl_array = wcs(grid[1], grid[0])[2]
+            wl_array = _cached(model, 'wavelength', lambda: wcs(grid[1], grid[0])[2])
 
     return wl_array
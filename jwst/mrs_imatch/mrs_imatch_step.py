@@ -29,6 +29,7 @@ class MRSIMatchStep(Step):
         bkg_degree = integer(min=0, default=1) # Degree of the polynomial for background fitting
         subtract = boolean(default=False) # subtract computed sky from 'images' cube data?
         skip = boolean(default=True) # Step must be turned on by parameter reference or user
+        pixel_sky_cache_dir = string(default=None) # Directory to cache the detector pixel to sky mapping of the input files
     """
 
     reference_file_types = []
@@ -83,7 +84,8 @@ class MRSIMatchStep(Step):
 
         # match background for images from a single channel
         for c in sorted(single_ch.keys()):
-            _match_models(single_ch[c], channel=str(c), degree=degree)
+            _match_models(single_ch[c], channel=str(c), degree=degree,
+                          pixel_sky_cache_dir=self.pixel_sky_cache_dir)
 
         # subtract the background, if requested
         if self.subtract:
@@ -255,7 +257,8 @@ def _get_2d_pixgrid(model2d, channel):
         return x + 516, y
 
 
-def _match_models(models, channel, degree, center=None, center_cs='image'):
+def _match_models(models, channel, degree, center=None, center_cs='image',
+                  pixel_sky_cache_dir=None):
     from .. cube_build import CubeBuildStep
 
     # create a list of cubes:
@@ -264,6 +267,7 @@ def _match_models(models, channel, degree, center=None, center_cs='image'):
     cbs.band = 'ALL'
     cbs.single = True
     cbs.weighting = 'drizzle'
+    cbs.pixel_sky_cache_dir = pixel_sky_cache_dir
     cube_models = cbs.process(models)
     if len(cube_models) != len(models):
         raise RuntimeError("The number of generated cube models does not "
@@ -2,16 +2,19 @@
 #  Module for flagging the DQ array of pixels affected by failed
 #  open MSA shutters in nirspec science data sets
 #
+import hashlib
 import json
 import numpy as np
 import logging
+import os
+import tempfile
 
 from gwcs.wcs import WCS
 
 from stdatamodels.jwst import datamodels
 from stdatamodels.jwst.transforms.models import Slit
 
-from ..assign_wcs.nirspec import slitlets_wcs, _nrs_wcs_set_input_lite, _get_transforms
+from ..assign_wcs.nirspec import slitlets_wcs, nrs_wcs_set_input_list
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
@@ -22,9 +25,13 @@ SHUTTERS_PER_ROW = 365
 #
 # States in the msaoper file that are to flagged when set to 'open'
 FLAGGABLE_STATES = ['Internal state', 'TA state', 'state']
+#
+# Failed open footprints already computed, keyed by mask_key
+_footprints = {}
+MAX_CACHED_FOOTPRINTS = 4
 
 
-def do_correction(input_model, shutter_refname, wcs_refnames):
+def do_correction(input_model, shutter_refname, wcs_refnames, cache_dir=None):
     """
     Short Summary
     -------------
@@ -41,6 +48,10 @@ def do_correction(input_model, shutter_refname, wcs_refnames):
     wcs_refnames: dict
         Dictionary of wcs reference file names
 
+    cache_dir: string or None
+        Directory in which the DQ footprints of the failed open shutters
+        are cached.  If None, the footprints are only kept in memory.
+
     Returns
     -------
     output_model: data model object
@@ -48,15 +59,139 @@ def do_correction(input_model, shutter_refname, wcs_refnames):
 
     """
     #
-    # Create a list of failed open slitlets from the msaoper reference file
-    failed_slitlets = create_slitlets(input_model, shutter_refname)
+    # Get the DQ footprint of the failed open shutters from the msaoper
+    # reference file and the instrument configuration
+    footprint = get_failed_open_footprint(input_model, shutter_refname,
+                                          wcs_refnames, cache_dir)
+
+    # Flag the stuck open shutters
+    input_model.dq |= footprint
+
+    input_model.meta.cal_step.msa_flagging = 'COMPLETE'
+
+    return input_model
+
+
+def mask_key(input_model, shutter_refname, wcs_refnames):
+    """
+    Compute the key identifying the DQ footprint of the failed open shutters.
+
+    The footprint depends on the failed open shutters listed in the MSAOPER
+    reference file, the WCS reference files and the instrument configuration
+    (grating, filter, detector, grating wheel tilt and subarray).
+
+    Parameters
+    ----------
+    input_model: data model object
+        the input science data
+
+    shutter_refname: string
+        Name of MSAOPER reference file
+
+    wcs_refnames: dict
+        dictionary of reference file names used to calculate the WCS
 
-    # Flag the stuck open hutters
-    output_model = flag(input_model, failed_slitlets, wcs_refnames)
+    Returns
+    -------
+    key: string
+        Hexadecimal digest of the parameters of the footprint
+    """
+    with open(shutter_refname, 'rb') as f1:
+        items = [hashlib.sha256(f1.read()).hexdigest()]
+    items += [f'{name}={os.path.basename(str(refname))}'
+              for name, refname in sorted(wcs_refnames.items())]
+    instrument = input_model.meta.instrument
+    subarray = input_model.meta.subarray
+    items += [str(value) for value in (instrument.grating, instrument.filter, instrument.detector,
+                                       instrument.gwa_tilt, instrument.gwa_xtilt, instrument.gwa_ytilt,
+                                       subarray.xstart, subarray.ystart,
+                                       input_model.dq.shape[-2:])]
+    return hashlib.sha256('_'.join(items).encode()).hexdigest()
+
+
+def get_failed_open_footprint(input_model, shutter_refname, wcs_refnames, cache_dir=None):
+    """
+    Get the DQ footprint of the failed open shutters.
 
-    output_model.meta.cal_step.msa_flagging = 'COMPLETE'
+    The footprint is only computed from the WCS the first time it is needed
+    for a given MSAOPER reference file and instrument configuration (see
+    `mask_key`).  It is then kept in memory and, if `cache_dir` is given,
+    stored on disk, including when it was already in memory.
 
-    return output_model
+    Parameters
+    ----------
+    input_model: data model object
+        the input science data
+
+    shutter_refname: string
+        Name of MSAOPER reference file
+
+    wcs_refnames: dict
+        dictionary of reference file names used to calculate the WCS
+
+    cache_dir: string or None
+        Directory in which the footprints are cached
+
+    Returns
+    -------
+    footprint: 2-D ndarray, uint32
+        FAILEDOPENFLAG where the pixels are affected by failed open
+        shutters, 0 elsewhere.  The array is shared and should not be
+        modified.
+    """
+    key = mask_key(input_model, shutter_refname, wcs_refnames)
+    filename = None
+    if cache_dir is not None:
+        filename = os.path.join(cache_dir, f'msaflagopen_{key}.npz')
+
+    if key in _footprints:
+        footprint = _footprints[key]
+        if filename is not None and not os.path.exists(filename):
+            save_footprint(filename, footprint)
+        return footprint
+
+    footprint = None
+    if filename is not None:
+        if os.path.exists(filename):
+            try:
+                with np.load(filename) as cached:
+                    footprint = np.where(cached['mask'], FAILEDOPENFLAG, 0).astype(np.uint32)
+                log.info('Using cached failed open shutter footprint %s', filename)
+            except (OSError, ValueError, KeyError) as err:
+                log.warning('Unable to read cached footprint %s: %s', filename, err)
+
+    if footprint is None:
+        #
+        # Create a list of failed open slitlets from the msaoper reference file
+        failed_slitlets = create_slitlets(input_model, shutter_refname)
+        dq_array = np.zeros(input_model.dq.shape[-2:], dtype=np.uint32)
+        footprint = flag_array(input_model, dq_array, failed_slitlets, wcs_refnames)
+        if filename is not None:
+            save_footprint(filename, footprint)
+
+    footprint.flags.writeable = False
+    if len(_footprints) >= MAX_CACHED_FOOTPRINTS:
+        del _footprints[next(iter(_footprints))]
+    _footprints[key] = footprint
+    return footprint
+
+
+def save_footprint(filename, footprint):
+    """
+    Store a footprint on disk.
+
+    The file is written to a temporary file first and then moved into
+    place, so that a partially written file is never read back.
+    """
+    cache_dir = os.path.dirname(filename)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmpname = tempfile.mkstemp(suffix='.npz', dir=cache_dir)
+        with os.fdopen(fd, 'wb') as tmpfile:
+            np.savez_compressed(tmpfile, mask=(footprint != 0))
+        os.replace(tmpname, filename)
+    except OSError as err:
+        log.warning('Unable to cache failed open shutter footprint: %s', err)
 
 
 def flag(input_datamodel, failed_slitlets, wcs_refnames):
@@ -83,6 +218,36 @@ def flag(input_datamodel, failed_slitlets, wcs_refnames):
     input_datamodel: data model object
         science data with DQ flags of affected modified
 
+    """
+    input_datamodel.dq = flag_array(input_datamodel, input_datamodel.dq,
+                                    failed_slitlets, wcs_refnames)
+    return input_datamodel
+
+
+def flag_array(input_datamodel, dq_array, failed_slitlets, wcs_refnames):
+    """
+    Combine the MSA_FAILED_OPEN flag with the DQ values of the pixels
+    affected by failed open shutters.
+
+    Parameters
+    ----------
+    input_datamodel: data model object
+        the input science data, used to create the WCS of the shutters
+
+    dq_array: ndarray
+        the DQ array to flag, with the shape of the science data
+
+    failed_slitlets: list
+        List of failed open slitlets
+
+    wcs_refnames: dict
+        dictionary of reference file names used to calculate the WCS
+
+    Returns
+    -------
+    dq_array: ndarray
+        the flagged DQ array
+
     """
     # Use the machinery in assign_wcs to create a WCS object for the bad shutters
     pipeline = slitlets_wcs(input_datamodel, wcs_refnames, failed_slitlets)
@@ -98,15 +263,9 @@ def flag(input_datamodel, failed_slitlets, wcs_refnames):
     temporary_copy.meta.exposure.type = 'NRS_MSASPEC'
 
     s = [slitlet.name for slitlet in failed_slitlets]
-    wcsobj, tr1, tr2, tr3, open_slits = _get_transforms(temporary_copy, s, return_slits=True)
 
-    dq_array = input_datamodel.dq
-    for k in range(len(s)):
-        #
-        # Pick the WCS for this slitlet from the WCS of the exposure
-        thiswcs = _nrs_wcs_set_input_lite(temporary_copy, wcsobj, s[k],
-                                         [tr1, tr2[k], tr3[k]],
-                                         open_slits=open_slits)
+    # Pick the WCS for each slitlet from the WCS of the exposure
+    for thiswcs in nrs_wcs_set_input_list(temporary_copy, s):
         #
         # Convert the bounding box for this slitlet to a set of indices to use as a slice
         xmin, xmax, ymin, ymax = boundingbox_to_indices(temporary_copy,
@@ -129,9 +288,7 @@ def flag(input_datamodel, failed_slitlets, wcs_refnames):
         # bitwise-or this subarray with the slice in the original exposure's DQ array
         dq_array = or_subarray_with_array(dq_array, dq_subarray, xmin, xmax, ymin, ymax)
 
-    # Set the dq array of the input datamodel to the corrected dq array
-    input_datamodel.dq = dq_array
-    return input_datamodel
+    return dq_array
 
 
 def boundingbox_to_indices(data_model, bounding_box):
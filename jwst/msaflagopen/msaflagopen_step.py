@@ -16,7 +16,7 @@ class MSAFlagOpenStep(Step):
     class_alias = "msa_flagging"
 
     spec = """
-
+        footprint_cache_dir = string(default=None) # Directory to cache the DQ footprints of the failed open shutters
     """
 
     reference_file_types = ['msaoper']
@@ -43,7 +43,8 @@ class MSAFlagOpenStep(Step):
             # Do the DQ flagging
             result = msaflag_open.do_correction(input_model,
                                                 self.reference_name,
-                                                wcs_reffile_names)
+                                                wcs_reffile_names,
+                                                cache_dir=self.footprint_cache_dir)
 
             # set the step status to complete
             result.meta.cal_step.msa_flagging = 'COMPLETE'
@@ -1,16 +1,21 @@
+import json
 import numpy as np
 from numpy.testing import assert_array_equal
 import os
+import pytest
 
 from stdatamodels.jwst.datamodels import ImageModel, dqflags
 from stdatamodels.jwst.transforms.models import Slit
 
 from jwst.assign_wcs import AssignWcsStep
+from jwst.msaflagopen import msaflag_open
 from jwst.msaflagopen.msaflag_open import (
     boundingbox_to_indices,
     create_slitlets,
+    get_failed_open_footprint,
     get_failed_open_shutters,
     id_from_xy,
+    mask_key,
     or_subarray_with_array,
     wcs_to_dq
 )
@@ -22,6 +27,14 @@ from jwst.stpipe import Step
 MSA_FAILED_OPEN = dqflags.pixel["MSA_FAILED_OPEN"]
 
 
+@pytest.fixture(autouse=True)
+def clear_footprints():
+    """Start and end each test with no failed open footprint in memory"""
+    msaflag_open._footprints.clear()
+    yield
+    msaflag_open._footprints.clear()
+
+
 def get_file_path(filename):
     """Construct an absolute path."""
     data_path = os.path.abspath(os.path.dirname(data.__file__))
@@ -192,3 +205,50 @@ def test_msaflagopen_step():
 
     nonzero = np.nonzero(result.dq)
     assert_array_equal(result.dq[nonzero], MSA_FAILED_OPEN)
+
+
+def test_msaflagopen_step_footprint_cache(tmp_path):
+    im = make_nirspec_mos_model()
+    im = AssignWcsStep.call(im)
+    result = MSAFlagOpenStep.call(im.copy(), footprint_cache_dir=str(tmp_path / 'first'))
+    assert len(list((tmp_path / 'first').glob('msaflagopen_*.npz'))) == 1
+
+    # A footprint already in memory is also stored in a new cache directory
+    cached = MSAFlagOpenStep.call(im.copy(), footprint_cache_dir=str(tmp_path / 'second'))
+    assert_array_equal(cached.dq, result.dq)
+    assert len(list((tmp_path / 'second').glob('msaflagopen_*.npz'))) == 1
+
+
+def test_failed_open_footprint_cache(tmp_path):
+    shutter_refname = tmp_path / 'msaoper.json'
+    with open(shutter_refname, 'w') as f1:
+        json.dump({'msaoper': [{'Q': 1, 'x': 10, 'y': 20, 'state': 'open',
+                                'TA state': 'open', 'Internal state': 'open'}]}, f1)
+    wcs_refnames = {'disperser': 'jwst_nirspec_disperser_0001.asdf'}
+    im = make_nirspec_mos_model()
+    im.dq = np.zeros((20, 30), dtype=np.uint32)
+
+    # The footprint depends on the instrument configuration
+    key = mask_key(im, shutter_refname, wcs_refnames)
+    other = im.copy()
+    other.meta.instrument.grating = 'G235M'
+    assert mask_key(other, shutter_refname, wcs_refnames) != key
+    other = im.copy()
+    other.meta.instrument.gwa_xtilt = 0.0002
+    assert mask_key(other, shutter_refname, wcs_refnames) != key
+
+    # A footprint stored on disk is used instead of evaluating the WCS
+    mask = np.zeros((20, 30), dtype=bool)
+    mask[5:8, 10:25] = True
+    msaflag_open.save_footprint(str(tmp_path / f'msaflagopen_{key}.npz'), mask)
+    footprint = get_failed_open_footprint(im, shutter_refname, wcs_refnames, str(tmp_path))
+    assert_array_equal(footprint, np.where(mask, MSA_FAILED_OPEN, 0))
+    assert footprint.dtype == np.uint32
+
+    # and it is kept in memory
+    assert get_failed_open_footprint(im, shutter_refname, wcs_refnames) is footprint
+
+    # and stored in a new cache directory from memory
+    other_dir = tmp_path / 'other'
+    assert get_failed_open_footprint(im, shutter_refname, wcs_refnames, str(other_dir)) is footprint
+    assert (other_dir / f'msaflagopen_{key}.npz').exists()
@@ -196,71 +196,108 @@ def calculate_pathloss_vector(pathloss_refdata,
         Returns True if the object source position is inside the slitlet,
         otherwise returns False
     """
-    is_inside_slitlet = True
-    if len(pathloss_refdata.shape) == 3:
-        wavesize, nrows, ncols = pathloss_refdata.shape
-    else:
-        wavesize = pathloss_refdata.shape[0]
-    wavelength = np.zeros(wavesize, dtype=np.float32)
-    pathloss_vector = np.zeros(wavesize, dtype=np.float32)
-
     # uniformsource.data is 1-d. We just return it, along with
     # a vector of wavelengths calculated using the WCS.
     # Uniform source is always inside the slitlet
     if len(pathloss_refdata.shape) == 1:
-        crpix1 = pathloss_wcs.crpix1
-        crval1 = pathloss_wcs.crval1
-        cdelt1 = pathloss_wcs.cdelt1
-        for i in np.arange(wavesize):
-            wavelength[i] = crval1 + (float(i + 1) - crpix1) * cdelt1
+        wavelength = _wavelength_vector(pathloss_wcs.crval1, pathloss_wcs.crpix1,
+                                        pathloss_wcs.cdelt1, pathloss_refdata.shape[0])
         return wavelength, pathloss_refdata, True
 
     # pointsource.data is 3-d, so we have to extract a wavelength vector
-    # at the specified location.  We do this using bilinear interpolation
+    # at the specified location.
     else:
+        wavelength, pathloss_vectors, is_inside_slitlet = calculate_pathloss_vectors(
+            pathloss_refdata, pathloss_wcs, [xcenter], [ycenter], calc_wave=calc_wave)
+        return wavelength, pathloss_vectors[0], bool(is_inside_slitlet[0])
 
-        # If requested, calculate a wavelength vector from the ref file
-        # WCS info
-        if calc_wave:
-            crpix3 = pathloss_wcs.crpix3
-            crval3 = pathloss_wcs.crval3
-            cdelt3 = pathloss_wcs.cdelt3
-            for i in np.arange(wavesize):
-                wavelength[i] = crval3 + (float(i + 1) - crpix3) * cdelt3
-
-        # Calculate python index of object center
-        crpix1 = pathloss_wcs.crpix1
-        crval1 = pathloss_wcs.crval1
-        cdelt1 = pathloss_wcs.cdelt1
-        crpix2 = pathloss_wcs.crpix2
-        crval2 = pathloss_wcs.crval2
-        cdelt2 = pathloss_wcs.cdelt2
-        object_colindex = crpix1 + (xcenter - crval1) / cdelt1 - 1
-        object_rowindex = crpix2 + (ycenter - crval2) / cdelt2 - 1
-
-        # check whether target is inside slit boundaries
-        if (object_colindex < 0 or object_colindex >= (ncols - 1) or
-                object_rowindex < 0 or object_rowindex >= (nrows - 1)):
-            is_inside_slitlet = False
 
-        else:
-            # Do bilinear interpolation to get the array of
-            # path loss vs wavelength
-            dx1 = object_colindex - int(object_colindex)
-            dx2 = 1.0 - dx1
-            dy1 = object_rowindex - int(object_rowindex)
-            dy2 = 1.0 - dy1
-            a11 = dx1 * dy1
-            a12 = dx1 * dy2
-            a21 = dx2 * dy1
-            a22 = dx2 * dy2
-            j, i = int(object_colindex), int(object_rowindex)
-            pathloss_vector = (a22 * pathloss_refdata[:, i, j]
-                               + a21 * pathloss_refdata[:, i + 1, j]
-                               + a12 * pathloss_refdata[:, i, j + 1]
-                               + a11 * pathloss_refdata[:, i + 1, j + 1])
-
-        return wavelength, pathloss_vector, is_inside_slitlet
+def calculate_pathloss_vectors(pathloss_refdata,
+                               pathloss_wcs,
+                               xcenters,
+                               ycenters,
+                               calc_wave=True):
+    """Calculate the pathloss vectors of several source positions from
+    a 3-d pathloss array, using bilinear interpolation of all the positions
+    at once
+
+    Parameters
+    -----------
+    pathloss_refdata : numpy ndarray
+        The input 3-d pathloss data array
+
+    pathloss_wcs : wcs attribute from model
+
+    xcenters : numpy ndarray
+        The x-centers of the targets (-0.5 to 0.5)
+
+    ycenters : numpy ndarray
+        The y-centers of the targets (-0.5 to 0.5)
+
+    calc_wave : bool
+        Calculate a wavelength vector from the ref file
+
+    Returns
+    --------
+    wavelength : numpy ndarray
+        The 1-d wavelength array
+
+    pathloss : numpy ndarray
+        The corresponding 2-d array of pathloss vectors, one row for each
+        source position.  Rows for positions outside the slitlet are zero.
+
+    is_inside_slitlet : numpy ndarray
+        Boolean array, True where the source position is inside the slitlet
+    """
+    wavesize, nrows, ncols = pathloss_refdata.shape
+
+    # If requested, calculate a wavelength vector from the ref file
+    # WCS info
+    if calc_wave:
+        wavelength = _wavelength_vector(pathloss_wcs.crval3, pathloss_wcs.crpix3,
+                                        pathloss_wcs.cdelt3, wavesize)
+    else:
+        wavelength = np.zeros(wavesize, dtype=np.float32)
+
+    # Calculate python index of object center
+    xcenters = np.asarray(xcenters, dtype=np.float64)
+    ycenters = np.asarray(ycenters, dtype=np.float64)
+    object_colindex = pathloss_wcs.crpix1 + (xcenters - pathloss_wcs.crval1) / pathloss_wcs.cdelt1 - 1
+    object_rowindex = pathloss_wcs.crpix2 + (ycenters - pathloss_wcs.crval2) / pathloss_wcs.cdelt2 - 1
+
+    # check whether targets are inside slit boundaries
+    is_inside_slitlet = ((object_colindex >= 0) & (object_colindex < (ncols - 1))
+                         & (object_rowindex >= 0) & (object_rowindex < (nrows - 1)))
+
+    pathloss_vectors = np.zeros((len(xcenters), wavesize),
+                                dtype=np.promote_types(pathloss_refdata.dtype, np.float32))
+    if np.any(is_inside_slitlet):
+        # Do bilinear interpolation to get the arrays of
+        # path loss vs wavelength
+        colindex = object_colindex[is_inside_slitlet]
+        rowindex = object_rowindex[is_inside_slitlet]
+        j = colindex.astype(int)
+        i = rowindex.astype(int)
+        dx1 = colindex - j
+        dx2 = 1.0 - dx1
+        dy1 = rowindex - i
+        dy2 = 1.0 - dy1
+        # The weights have the type of the reference data, as when the
+        # weights of a single position are applied to the data
+        weights = [(a[:, np.newaxis]).astype(pathloss_refdata.dtype)
+                   for a in (dx2 * dy2, dx2 * dy1, dx1 * dy2, dx1 * dy1)]
+        pathloss_vectors[is_inside_slitlet] = (weights[0] * pathloss_refdata[:, i, j].T
+                                               + weights[1] * pathloss_refdata[:, i + 1, j].T
+                                               + weights[2] * pathloss_refdata[:, i, j + 1].T
+                                               + weights[3] * pathloss_refdata[:, i + 1, j + 1].T)
+
+    return wavelength, pathloss_vectors, is_inside_slitlet
+
+
+def _wavelength_vector(crval, crpix, cdelt, wavesize, dtype=np.float32):
+    """Wavelengths of a pathloss reference array from its WCS"""
+    pixels = np.arange(1, wavesize + 1, dtype=np.float64)
+    return (crval + (pixels - crpix) * cdelt).astype(dtype)
 
 
 def calculate_two_shutter_uniform_pathloss(pathloss_model):
@@ -306,13 +343,9 @@ def calculate_two_shutter_uniform_pathloss(pathloss_model):
     if aperture1x1.uniform_wcs.cdelt1 != aperture1x3.uniform_wcs.cdelt1:
         log.warning("1x1 and 1x3 apertures have different WCS CDELT1")
         return (None, None)
-    wavesize = len(pathloss1x1)
-    wavelength = np.zeros(wavesize)
-    crpix1 = aperture1x1.uniform_wcs.crpix1
-    crval1 = aperture1x1.uniform_wcs.crval1
-    cdelt1 = aperture1x1.uniform_wcs.cdelt1
-    for i in np.arange(wavesize):
-        wavelength[i] = crval1 + (float(i + 1) - crpix1) * cdelt1
+    wavelength = _wavelength_vector(aperture1x1.uniform_wcs.crval1, aperture1x1.uniform_wcs.crpix1,
+                                    aperture1x1.uniform_wcs.cdelt1, len(pathloss1x1),
+                                    dtype=np.float64)
     average_pathloss = 0.5 * (pathloss1x1 + pathloss1x3)
     log.info("2 shutter slit: Uniform correction averages corrections for 1x1 and 1x3 apertures")
     return (wavelength, average_pathloss)
@@ -519,6 +552,13 @@ def do_correction_mos(data, pathloss, inverse=False, source_type=None, correctio
     """
     exp_type = data.meta.exposure.type
 
+    if not correction_pars:
+        # Find the apertures and source positions of all the slitlets first,
+        # so their pathloss vectors are interpolated together.
+        positions = [_mos_source_position(slit, pathloss, exp_type) if slit.data.size > 0 else None
+                     for slit in data.slits]
+        pathloss_vectors = calculate_mos_pathloss_vectors(pathloss, positions)
+
     # Loop over all MOS slitlets
     corrections = datamodels.MultiSlitModel()
     for slit_number, slit in enumerate(data.slits):
@@ -527,7 +567,9 @@ def do_correction_mos(data, pathloss, inverse=False, source_type=None, correctio
         if correction_pars:
             correction = correction_pars.slits[slit_number]
         else:
-            correction = _corrections_for_mos(slit, pathloss, exp_type, source_type)
+            correction = _corrections_for_mos(slit, pathloss, exp_type, source_type,
+                                              position=positions[slit_number],
+                                              pathloss_vectors=pathloss_vectors)
         corrections.slits.append(correction)
 
         # Apply the correction
@@ -815,7 +857,126 @@ def do_correction_soss(data, pathloss):
     data.meta.cal_step.pathloss = 'COMPLETE'
 
 
-def _corrections_for_mos(slit, pathloss, exp_type, source_type=None):
+def _mos_source_position(slit, pathloss, exp_type):
+    """Find the pathloss aperture and the source position in it for a MOS slit
+
+    Parameters
+    ----------
+    slit : jwst.datamodels.SlitModel
+        The slit being operated on.
+
+    pathloss : jwst.datamodels.JwstDataModel
+        The pathloss reference data
+
+    exp_type : str
+        Exposure type
+
+    Returns
+    -------
+    aperture : aperture from the pathloss reference data or None
+        The aperture matching the shutter state of the slit
+
+    xcenter, ycenter : float
+        The source position in the aperture
+    """
+    # Get centering
+    xcenter, ycenter = get_center(exp_type, slit)
+    # Get the aperture from the reference file that matches the slit
+    aperture = get_aperture_from_model(pathloss, slit.shutter_state)
+    log.info(f"Shutter state = {slit.shutter_state}, using {aperture.name} entry in ref file")
+    if shutter_below_is_closed(slit.shutter_state) and not shutter_above_is_closed(slit.shutter_state):
+        ycenter = ycenter - 1.0
+        log.info('Shutter below fiducial is closed, using lower region of pathloss array')
+    if not shutter_below_is_closed(slit.shutter_state) and shutter_above_is_closed(slit.shutter_state):
+        ycenter = ycenter + 1.0
+        log.info('Shutter above fiducial is closed, using upper region of pathloss array')
+    return aperture, xcenter, ycenter
+
+
+def calculate_mos_pathloss_vectors(pathloss, positions):
+    """Calculate the point source pathloss vectors of MOS slits
+
+    The source positions in each aperture are interpolated together.
+
+    Parameters
+    ----------
+    pathloss : jwst.datamodels.JwstDataModel
+        The pathloss reference data
+
+    positions : list
+        The aperture and source position (xcenter, ycenter) of each slit,
+        see `_mos_source_position`.  Slits with no position are None.
+
+    Returns
+    -------
+    pathloss_vectors : dict
+        The (wavelength, pathloss vector, is_inside_slitlet) tuples
+        returned by `calculate_pathloss_vector`, keyed by
+        (aperture name, 'pointsource', xcenter, ycenter).  It is meant to be
+        passed to `_corrections_for_mos`, which adds the other vectors it needs.
+    """
+    pathloss_vectors = {}
+    apertures = {}
+    centers = {}
+    for position in positions:
+        if position is None or position[0] is None:
+            continue
+        aperture, xcenter, ycenter = position
+        apertures[aperture.name] = aperture
+        centers.setdefault(aperture.name, {})[(xcenter, ycenter)] = None
+
+    for name, aperture in apertures.items():
+        refdata = aperture.pointsource_data
+        if len(refdata.shape) != 3:
+            continue
+        xcenters, ycenters = zip(*centers[name])
+        (wavelength,
+         pathloss_pointsource_vectors,
+         is_inside_slitlet) = calculate_pathloss_vectors(refdata, aperture.pointsource_wcs,
+                                                         xcenters, ycenters)
+        for k, center in enumerate(centers[name]):
+            pathloss_vectors[(name, 'pointsource') + center] = (
+                wavelength, pathloss_pointsource_vectors[k], bool(is_inside_slitlet[k]))
+    return pathloss_vectors
+
+
+def _get_pathloss_vector(pathloss_vectors, aperture, kind, xcenter, ycenter):
+    """Get the pathloss vector of an aperture at a source position
+
+    Parameters
+    ----------
+    pathloss_vectors : dict
+        Pathloss vectors already calculated, see `calculate_mos_pathloss_vectors`.
+        The vector is added if it is not found.
+
+    aperture : aperture from the pathloss reference data
+
+    kind : str
+        'pointsource' or 'uniform'
+
+    xcenter, ycenter : float
+        The source position in the aperture
+
+    Returns
+    -------
+    wavelength, pathloss, is_inside_slitlet : tuple
+        See `calculate_pathloss_vector`.  The arrays are shared and
+        should not be modified.
+    """
+    refdata = getattr(aperture, f'{kind}_data')
+    # 1-d reference data do not depend on the source position
+    if len(refdata.shape) == 1:
+        key = (aperture.name, kind)
+    else:
+        key = (aperture.name, kind, xcenter, ycenter)
+    if key not in pathloss_vectors:
+        pathloss_vectors[key] = calculate_pathloss_vector(refdata, getattr(aperture, f'{kind}_wcs'),
+                                                          xcenter, ycenter)
+    return pathloss_vectors[key]
+
+
+def _corrections_for_mos(slit, pathloss, exp_type, source_type=None,
+                         position=None, pathloss_vectors=None):
     """Calculate the correction arrays for MOS slit
 
     Parameters
@@ -832,6 +993,14 @@ def _corrections_for_mos(slit, pathloss, exp_type, source_type=None):
     source_type : str or None
         Force processing using the specified source type.
 
+    position : tuple or None
+        The aperture and source position of the slit, as returned by
+        `_mos_source_position`.  Found from the slit if None.
+
+    pathloss_vectors : dict or None
+        Pathloss vectors shared by the slits, see
+        `calculate_mos_pathloss_vectors`.
+
     Returns
     -------
     correction : jwst.datamodels.SlitModel
@@ -839,56 +1008,49 @@ def _corrections_for_mos(slit, pathloss, exp_type, source_type=None):
     """
     correction = None
     size = slit.data.size
+    if pathloss_vectors is None:
+        pathloss_vectors = {}
 
     # Only work on slits with data.size > 0
     if size > 0:
 
-        # Get centering
-        xcenter, ycenter = get_center(exp_type, slit)
         # Calculate the 1-d wavelength and pathloss vectors
         # for the source position
-        # Get the aperture from the reference file that matches the slit
+        if position is None:
+            position = _mos_source_position(slit, pathloss, exp_type)
+        aperture, xcenter, ycenter = position
         slitlength = len(slit.shutter_state)
-        aperture = get_aperture_from_model(pathloss, slit.shutter_state)
-        log.info(f"Shutter state = {slit.shutter_state}, using {aperture.name} entry in ref file")
         two_shutters = False
         if slitlength == 2:
             two_shutters = True
-        if shutter_below_is_closed(slit.shutter_state) and not shutter_above_is_closed(slit.shutter_state):
-            ycenter = ycenter - 1.0
-            log.info('Shutter below fiducial is closed, using lower region of pathloss array')
-        if not shutter_below_is_closed(slit.shutter_state) and shutter_above_is_closed(slit.shutter_state):
-            ycenter = ycenter + 1.0
-            log.info('Shutter above fiducial is closed, using upper region of pathloss array')
         if aperture is not None:
             (wavelength_pointsource,
              pathloss_pointsource_vector,
-             is_inside_slitlet) = calculate_pathloss_vector(aperture.pointsource_data,
-                                                            aperture.pointsource_wcs,
-                                                            xcenter, ycenter)
+             is_inside_slitlet) = _get_pathloss_vector(pathloss_vectors, aperture, 'pointsource',
+                                                       xcenter, ycenter)
             if two_shutters:
+                if 'two_shutters' not in pathloss_vectors:
+                    pathloss_vectors['two_shutters'] = calculate_two_shutter_uniform_pathloss(pathloss)
                 (wavelength_uniformsource,
-                 pathloss_uniform_vector) = calculate_two_shutter_uniform_pathloss(pathloss)
+                 pathloss_uniform_vector) = pathloss_vectors['two_shutters']
             else:
                 (wavelength_uniformsource,
                  pathloss_uniform_vector,
-                 dummy) = calculate_pathloss_vector(aperture.uniform_data,
-                                                    aperture.uniform_wcs,
-                                                    xcenter, ycenter)
+                 dummy) = _get_pathloss_vector(pathloss_vectors, aperture, 'uniform',
+                                               xcenter, ycenter)
             # This should only happen if the 2 shutter uniform pathloss calculation has an error
             if wavelength_uniformsource is None or pathloss_uniform_vector is None:
                 log.warning("Unable to calculate 2 shutter uniform pathloss, using 3 shutter aperture")
                 (wavelength_uniformsource,
                  pathloss_uniform_vector,
-                 dummy) = calculate_pathloss_vector(aperture.uniform_data,
-                                                    aperture.uniform_wcs,
-                                                    xcenter, ycenter)
+                 dummy) = _get_pathloss_vector(pathloss_vectors, aperture, 'uniform',
+                                               xcenter, ycenter)
             if is_inside_slitlet:
 
                 # Wavelengths in the reference file are in meters,
                 # need them to be in microns
-                wavelength_pointsource *= 1.0e6
-                wavelength_uniformsource *= 1.0e6
+                wavelength_pointsource = wavelength_pointsource * 1.0e6
+                wavelength_uniformsource = wavelength_uniformsource * 1.0e6
 
                 wavelength_array = slit.wavelength
 
@@ -1074,12 +1236,7 @@ def _corrections_for_ifu(data, pathloss, source_type):
     wavelength_array = np.zeros(data.shape, dtype=np.float32)
     wavelength_array.fill(np.nan)
 
-    wcsobj, tr1, tr2, tr3 = nirspec._get_transforms(data, NIRSPEC_IFU_SLICES)
-
-    for slice in NIRSPEC_IFU_SLICES:
-        slice_wcs = nirspec._nrs_wcs_set_input_lite(data, wcsobj, slice,
-                                                   [tr1, tr2[slice], tr3[slice]])
-
+    for slice_wcs in nirspec.nrs_wcs_set_input_list(data, NIRSPEC_IFU_SLICES):
         x, y = wcstools.grid_from_bounding_box(slice_wcs.bounding_box)
         ra, dec, wavelength = slice_wcs(x, y)
         valid = ~np.isnan(wavelength)
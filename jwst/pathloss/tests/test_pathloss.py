@@ -4,7 +4,9 @@ Unit tests for pathloss correction
 
 from stdatamodels.jwst.datamodels import MultiSlitModel, PathlossModel
 
-from jwst.pathloss.pathloss import (calculate_pathloss_vector,
+from jwst.pathloss.pathloss import (calculate_mos_pathloss_vectors,
+                                    calculate_pathloss_vector,
+                                    calculate_pathloss_vectors,
                                     get_aperture_from_model,
                                     get_center,
                                     interpolate_onto_grid,
@@ -227,6 +229,55 @@ def test_calculate_pathloss_vector_interpolation_nontrivial():
     assert is_inside_slitlet is True
 
 
+def test_calculate_pathloss_vectors():
+    """Calculate the pathloss vectors of several positions at once."""
+
+    rng = np.random.default_rng(42)
+    datmod = PathlossModel()
+    datmod.meta.exposure.type = 'NRS_MSASPEC'
+    ref_data = {'name': 'MOS1x3', 'shutters': 3,
+                'pointsource_data': rng.random((10, 10, 10), dtype=np.float32),
+                'pointsource_wcs': {'crpix1': 5.0, 'crval1': 0.0, 'cdelt1': 0.2,
+                                    'crpix2': 5.0, 'crval2': 0.0, 'cdelt2': 0.2,
+                                    'crpix3': 1.0, 'crval3': 1.0, 'cdelt3': 1.0}}
+    datmod.apertures.append(ref_data)
+    aperture = datmod.apertures[0]
+
+    # The last two positions are outside of the slitlet
+    xcenters = [0.0, 0.13, -0.71, 0.3, 1.2]
+    ycenters = [0.0, -0.27, 0.55, -0.9, 0.1]
+    wavelength, pathloss, is_inside_slitlet = calculate_pathloss_vectors(
+        aperture.pointsource_data, aperture.pointsource_wcs, xcenters, ycenters)
+
+    assert np.all(wavelength == 1.0 + np.arange(10))
+    assert pathloss.shape == (5, 10)
+    assert list(is_inside_slitlet) == [True, True, True, False, False]
+
+    # Bilinear interpolation of the reference data at the pixel position
+    # (x - crval1) / cdelt1 + crpix1 - 1 of each source, and the same for y
+    ps_data = aperture.pointsource_data.astype(np.float64)
+    for k, (xcenter, ycenter) in enumerate(zip(xcenters, ycenters)):
+        if not is_inside_slitlet[k]:
+            assert np.all(pathloss[k] == 0)
+            continue
+        col = xcenter / 0.2 + 4.0
+        row = ycenter / 0.2 + 4.0
+        j, i = int(np.floor(col)), int(np.floor(row))
+        dx, dy = col - j, row - i
+        expected = ((1 - dx) * (1 - dy) * ps_data[:, i, j]
+                    + (1 - dx) * dy * ps_data[:, i + 1, j]
+                    + dx * (1 - dy) * ps_data[:, i, j + 1]
+                    + dx * dy * ps_data[:, i + 1, j + 1])
+        np.testing.assert_allclose(pathloss[k], expected, rtol=1e-5, atol=1e-6)
+
+    # The vectors of MOS slits are keyed by aperture and position
+    positions = [(aperture, 0.0, 0.0), None, (aperture, 0.13, -0.27), (aperture, 0.0, 0.0)]
+    vectors = calculate_mos_pathloss_vectors(datmod, positions)
+    assert sorted(vectors) == [('MOS1x3', 'pointsource', 0.0, 0.0),
+                               ('MOS1x3', 'pointsource', 0.13, -0.27)]
+    assert np.all(vectors[('MOS1x3', 'pointsource', 0.13, -0.27)][1] == pathloss[1])
+
+
 def test_is_pointsource():
     """Check to see if object it point source"""
 
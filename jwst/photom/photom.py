@@ -41,6 +41,12 @@ class DataModelTypeError(Exception):
         super().__init__(message)
 
 
+def _normalize_strings(field):
+    if isinstance(field[0], str):
+        return np.array([s.upper() for s in field])
+    return field
+
+
 def find_row(fits_table, match_fields):
     """
     Find a row in a FITS table matching fields.
@@ -64,14 +70,13 @@ def find_row(fits_table, match_fields):
     row : int, or None
         FITS table row index, None if no match.
     """
-    def _normalize_strings(field):
-        if isinstance(field[0], str):
-            return np.array([s.upper() for s in field])
-        return field
-
     # item[1] is always converted to upper case in the `DataSet` initializer.
     results = [_normalize_strings(fits_table.field(item[0])) == item[1] for item in match_fields.items()]
     row = functools.reduce(np.logical_and, results).nonzero()[0]
+    return _single_row(row)
+
+
+def _single_row(row):
     if len(row) > 1:
         raise MatchFitsTableRowError(f"Expected to find one matching row in table, found {len(row)}.")
     if len(row) == 0:
@@ -80,6 +85,121 @@ def find_row(fits_table, match_fields):
     return row[0]
 
 
+def get_relresponse(tabdata):
+    """
+    Get the relative response from a row of a spectroscopic photom table.
+
+    Parameters
+    ----------
+    tabdata : FITS record
+        Single row of data from reference table
+
+    Returns
+    -------
+    relresponse : tuple of 1D arrays, or None
+        The wavelengths, in microns and in increasing order, and the
+        relative response at these wavelengths. None if the table is
+        not spectroscopic (it has no 'wavelength' column).
+    """
+    try:
+        waves = tabdata['wavelength']
+    except KeyError:
+        return None
+    relresps = tabdata['relresponse']
+
+    # Get the length of the relative response arrays in this row.  If the
+    # nelem column is not present, we'll use the entire wavelength and
+    # relresponse arrays.
+    try:
+        nelem = tabdata['nelem']
+    except KeyError:
+        nelem = None
+    if nelem is not None:
+        waves = waves[:nelem]
+        relresps = relresps[:nelem]
+
+    # Make sure waves and relresps are in increasing wavelength order
+    if not np.all(np.diff(waves) > 0):
+        index = np.argsort(waves)
+        waves = waves[index].copy()
+        relresps = relresps[index].copy()
+
+    # Convert wavelengths from meters to microns, if necessary.
+    # The reference table itself is left unchanged.
+    microns_100 = 1.e-4         # 100 microns, in meters
+    if waves.max() > 0. and waves.max() < microns_100:
+        waves = waves * 1.e+6
+
+    return waves, relresps
+
+
+class PhotomTable():
+    """
+    Rows of a photom reference table, indexed by the values of some fields.
+
+    The index is built once, so that the rows of many slits can be looked
+    up without scanning the table for each slit. The relative response of
+    each row is also only prepared once, for all the slits using this row.
+
+    Parameters
+    ----------
+    phot_table : `~astropy.io.fits.fitsrec.FITS_rec`
+        FITS table
+    field_names : list of str
+        Names of the fields used to match the rows.
+    """
+
+    def __init__(self, phot_table, field_names):
+        self.phot_table = phot_table
+        self.field_names = tuple(field_names)
+        columns = [_normalize_strings(phot_table.field(name)) for name in self.field_names]
+        self._rows = {}
+        for row, values in enumerate(zip(*columns)):
+            self._rows.setdefault(values, []).append(row)
+        self._relresponses = {}
+
+    def find_row(self, match_fields):
+        """
+        Find the row matching fields, as `find_row` does.
+
+        Parameters
+        ----------
+        match_fields : dict
+            {field_name: value} pair to use as a matching criteria, for
+            all the fields of the index.
+
+        Raises
+        ------
+        MatchFitsTableRowError
+            When more than one rows match.
+
+        Returns
+        -------
+        row : int, or None
+            FITS table row index, None if no match.
+        """
+        values = tuple(match_fields[name] for name in self.field_names)
+        return _single_row(self._rows.get(values, []))
+
+    def relresponse(self, row):
+        """
+        Get the relative response of a row, see `get_relresponse`.
+
+        Parameters
+        ----------
+        row : int
+            FITS table row index
+
+        Returns
+        -------
+        relresponse : tuple of 1D arrays, or None
+            The wavelengths, in microns, and the relative response.
+        """
+        if row not in self._relresponses:
+            self._relresponses[row] = get_relresponse(self.phot_table[row])
+        return self._relresponses[row]
+
+
 class DataSet():
     """
     Input dataset to which the photom information will be applied
@@ -245,16 +365,17 @@ class DataSet():
 
             # We have to find and apply a separate set of flux cal
             # data for each of the fixed slits in the input
+            table = PhotomTable(ftab.phot_table, ['filter', 'grating', 'slit'])
             for slit in self.input.slits:
 
                 log.info('Working on slit %s' % slit.name)
                 self.slitnum += 1
 
                 fields_to_match = {'filter': self.filter, 'grating': self.grating, 'slit': slit.name}
-                row = find_row(ftab.phot_table, fields_to_match)
+                row = table.find_row(fields_to_match)
                 if row is None:
                     continue
-                self.photom_io(ftab.phot_table[row])
+                self.photom_io(ftab.phot_table[row], relresponse=table.relresponse(row))
 
         # Bright object fixed-slit exposures use a SlitModel
         elif self.exptype == 'NRS_BRIGHTOBJ':
@@ -281,10 +402,12 @@ class DataSet():
 
                 # Loop over the MSA slits, applying the same photom
                 # ref data to all slits
+                tabdata = ftab.phot_table[row]
+                relresponse = get_relresponse(tabdata)
                 for slit in self.input.slits:
                     log.info('Working on slit %s' % slit.name)
                     self.slitnum += 1
-                    self.photom_io(ftab.phot_table[row])
+                    self.photom_io(tabdata, relresponse=relresponse)
 
             # IFU data
             else:
@@ -407,6 +530,7 @@ class DataSet():
 
             # We have to find and apply a separate set of flux cal
             # data for each of the slits/orders in the input
+            table = PhotomTable(ftab.phot_table, ['filter', 'pupil', 'order'])
             for slit in self.input.slits:
 
                 # Increment slit number
@@ -417,10 +541,10 @@ class DataSet():
                 log.info(f"Working on slit {slit.name}, order {order}")
 
                 fields_to_match = {'filter': self.filter, 'pupil': self.pupil, 'order': order}
-                row = find_row(ftab.phot_table, fields_to_match)
+                row = table.find_row(fields_to_match)
                 if row is None:
                     continue
-                self.photom_io(ftab.phot_table[row])
+                self.photom_io(ftab.phot_table[row], relresponse=table.relresponse(row))
 
         elif isinstance(self.input, datamodels.CubeModel):
             raise DataModelTypeError(f"Unexpected input data model type for NIRISS: {self.input.__class__.__name__}")
@@ -598,17 +722,16 @@ class DataSet():
         # Handle WFSS data separately from regular imaging
         if isinstance(self.input, datamodels.MultiSlitModel) and self.exptype == 'NRC_WFSS':
             # Loop over the WFSS slits, applying the correct photom ref data
+            table = PhotomTable(ftab.phot_table, ['filter', 'pupil', 'order'])
             for slit in self.input.slits:
                 log.info('Working on slit %s' % slit.name)
                 self.slitnum += 1
                 order = slit.meta.wcsinfo.spectral_order
-                # TODO: If it's reasonable to hardcode the list of orders for Nircam WFSS,
-                # the code matching the two rows can be taken outside the loop.
                 fields_to_match = {'filter': self.filter, 'pupil': self.pupil, 'order': order}
-                row = find_row(ftab.phot_table, fields_to_match)
+                row = table.find_row(fields_to_match)
                 if row is None:
                     continue
-                self.photom_io(ftab.phot_table[row])
+                self.photom_io(ftab.phot_table[row], relresponse=table.relresponse(row))
         elif self.exptype == 'NRC_TSGRISM':
             fields_to_match = {'filter': self.filter, 'pupil': self.pupil, 'order': self.order}
             row = find_row(ftab.phot_table, fields_to_match)
@@ -682,15 +805,10 @@ class DataSet():
         dqmap = np.zeros_like(self.input.dq) + dqflags.pixel['NON_SCIENCE']
 
         # Get the list of wcs's for the IFU slices
-        # Note: 30 in the line below is hardcoded in nirspec.nrs.ifu_wcs, which
-        # the line below replaces.
-        wcsobj, tr1, tr2, tr3 = nirspec._get_transforms(self.input, np.arange(30))
+        ifu_wcs_list = nirspec.nrs_ifu_wcs(self.input)
 
         # Loop over the slices
-        for k in range(len(tr2)):
-
-            ifu_wcs = nirspec._nrs_wcs_set_input_lite(self.input, wcsobj, k,
-                                                     [tr1, tr2[k], tr3[k]])
+        for k, ifu_wcs in enumerate(ifu_wcs_list):
 
             # Construct array indexes for pixels in this slice
             x, y = gwcs.wcstools.grid_from_bounding_box(ifu_wcs.bounding_box,
@@ -728,7 +846,7 @@ class DataSet():
 
         return wave2d, area2d, dqmap
 
-    def photom_io(self, tabdata, order=None):
+    def photom_io(self, tabdata, order=None, relresponse=None):
         """
         Short Summary
         -------------
@@ -743,6 +861,10 @@ class DataSet():
         order : int
             Spectral order number
 
+        relresponse : tuple or None
+            The relative response of `tabdata`, as returned by
+            `get_relresponse`, when already computed for another slit.
+
         Returns
         -------
 
@@ -813,44 +935,14 @@ class DataSet():
         # If the photom reference file is for spectroscopic data, the table
         # in the reference file should contain a 'wavelength' column (among
         # other columns).
-        try:
-            wl_test = tabdata['wavelength']
-            is_spectroscopic = True
-            del wl_test
-        except KeyError:
-            is_spectroscopic = False
-
-        # Get the length of the relative response arrays in this row.  If the
-        # nelem column is not present, we'll use the entire wavelength and
-        # relresponse arrays.
-        if is_spectroscopic:
-            try:
-                nelem = tabdata['nelem']
-            except KeyError:
-                nelem = None
-        else:
-            nelem = None
+        if relresponse is None:
+            relresponse = get_relresponse(tabdata)
 
         # For spectroscopic data, include the relative response array in
         # the flux conversion.
         no_cal = None
-        if is_spectroscopic:
-            waves = tabdata['wavelength']
-            relresps = tabdata['relresponse']
-            if nelem is not None:
-                waves = waves[:nelem]
-                relresps = relresps[:nelem]
-
-            # Make sure waves and relresps are in increasing wavelength order
-            if not np.all(np.diff(waves) > 0):
-                index = np.argsort(waves)
-                waves = waves[index].copy()
-                relresps = relresps[index].copy()
-
-            # Convert wavelengths from meters to microns, if necessary
-            microns_100 = 1.e-4         # 100 microns, in meters
-            if waves.max() > 0. and waves.max() < microns_100:
-                waves *= 1.e+6
+        if relresponse is not None:
+            waves, relresps = relresponse
 
             # Compute a 2-D grid of conversion factors, as a function of wavelength
             if isinstance(self.input, datamodels.MultiSlitModel):
@@ -1085,14 +1177,11 @@ class DataSet():
             2-d array of dispersion values, in microns/pixel
 
         """
-        nrows, ncols = wavelength_array.shape
         dispersion_array = np.zeros(wavelength_array.shape)
         if dispaxis == 1:
-            for row in range(nrows):
-                dispersion_array[row] = np.gradient(wavelength_array[row])
+            dispersion_array[:] = np.gradient(wavelength_array, axis=1)
         elif dispaxis == 2:
-            for column in range(ncols):
-                dispersion_array[:, column] = np.gradient(wavelength_array[:, column])
+            dispersion_array[:] = np.gradient(wavelength_array, axis=0)
         else:
             log.warning(f"Can't process data with DISPAXIS={dispaxis}")
         return dispersion_array
@@ -1687,3 +1687,30 @@ def test_find_row():
 
     ind = photom.find_row(ftab.phot_table, {'filter': 'F444W', 'pupil': 'GRISMR', 'order': 2})
     assert ind is None
+
+
+def test_photom_table():
+    ftab = create_photom_nircam_wfss(min_wl=2.4, max_wl=5.0,
+                                     min_r=8.0, max_r=9.0)
+    ftab.phot_table[-1][1] = 'grismr'
+    table = photom.PhotomTable(ftab.phot_table, ['filter', 'pupil', 'order'])
+    for order in (1, 2):
+        fields_to_match = {'filter': 'F444W', 'pupil': 'GRISMR', 'order': order}
+        assert table.find_row(fields_to_match) == photom.find_row(ftab.phot_table, fields_to_match)
+
+    # The relative response is prepared once per row, in microns,
+    # without modifying the reference table
+    row = table.find_row({'filter': 'F444W', 'pupil': 'GRISMR', 'order': 1})
+    waves, relresps = table.relresponse(row)
+    assert table.relresponse(row)[0] is waves
+    nelem = ftab.phot_table['nelem'][row]
+    np.testing.assert_allclose(waves, ftab.phot_table['wavelength'][row][:nelem])
+    np.testing.assert_array_equal(relresps, ftab.phot_table['relresponse'][row][:nelem])
+
+    # Duplicated rows
+    ftab.phot_table['order'][:] = 1
+    ftab.phot_table['pupil'][:] = 'GRISMR'
+    ftab.phot_table['filter'][:] = 'F444W'
+    table = photom.PhotomTable(ftab.phot_table, ['filter', 'pupil', 'order'])
+    with pytest.raises(photom.MatchFitsTableRowError):
+        table.find_row({'filter': 'F444W', 'pupil': 'GRISMR', 'order': 1})
@@ -1,5 +1,6 @@
 import os
-from collections import defaultdict
+from collections import defaultdict, namedtuple
+from functools import partial
 import os.path as op
 import traceback
 import numpy as np
@@ -9,6 +10,9 @@ from jwst.stpipe import query_step_status
 
 from ..assign_wcs.util import NoDataOnDetectorError
 from ..lib.exposure_types import is_nrs_ifu_flatlamp, is_nrs_ifu_linelamp, is_nrs_slit_linelamp
+from ..lib.pipe_utils import (compute_num_cores, fork_map, fork_num_cores,
+                              model_from_bytes, model_to_bytes)
+from ..lib.wcs_utils import slit_coordinate_cache
 from ..stpipe import Pipeline
 
 # step imports
@@ -43,6 +47,10 @@ NRS_SLIT_TYPES = ['NRS_FIXEDSLIT', 'NRS_BRIGHTOBJ', 'NRS_MSASPEC',
 WFSS_TYPES = ["NIS_WFSS", "NRC_GRISM", "NRC_WFSS"]
 GRISM_TYPES = ['NRC_TSGRISM'] + WFSS_TYPES
 
+# Steps applied to the NIRSpec MOS slits one slit at a time, which can be run
+# on batches of slits in parallel
+MSA_SLIT_STEPS = ['wavecorr', 'flat_field', 'pathloss', 'barshadow', 'photom']
+
 
 class Spec2Pipeline(Pipeline):
     """
@@ -62,6 +70,7 @@ class Spec2Pipeline(Pipeline):
         save_bsub = boolean(default=False)        # Save background-subtracted science
         fail_on_exception = boolean(default=True) # Fail if any product fails.
         save_wfss_esec = boolean(default=False)   # Save WFSS e-/sec image
+        maximum_cores = string(default='1')       # Cores for the NIRSpec MOS slits: an integer, 'quarter', 'half' or 'all'
     """
 
     # Define aliases to steps
@@ -128,11 +137,14 @@ class Spec2Pipeline(Pipeline):
             except AttributeError:
                 asn.filename = "singleton"
             try:
-                result = self.process_exposure_product(
-                    product,
-                    asn['asn_pool'],
-                    asn.filename,
-                )
+                # Slit coordinates computed from the WCS are shared
+                # by the steps run on the exposure
+                with slit_coordinate_cache():
+                    result = self.process_exposure_product(
+                        product,
+                        asn['asn_pool'],
+                        asn.filename,
+                    )
             except NoDataOnDetectorError as exception:
                 # This error merits a special return
                 # status if run from the command line.
@@ -610,11 +622,8 @@ class Spec2Pipeline(Pipeline):
         calib_mos.update(calibrated)
         if len(calib_mos.slits) > 0:
             calib_mos = self.master_background_mos(calib_mos)
-            calib_mos = self.wavecorr(calib_mos)
-            calib_mos = self.flat_field(calib_mos)
-            calib_mos = self.pathloss(calib_mos)
-            calib_mos = self.barshadow(calib_mos)
-            calib_mos = self.photom(calib_mos)
+            num_cores = compute_num_cores(self.maximum_cores, len(calib_mos.slits))
+            calib_mos = self._calibrate_msa_slits(calib_mos, num_cores)
 
         # Now repeat for FS slits
         if len(calib_fss.slits) > 0:
@@ -649,6 +658,70 @@ class Spec2Pipeline(Pipeline):
 
         return calib_mos
 
+    def _calibrate_msa_slits(self, data, num_cores=1):
+        """Run the slit by slit calibration steps on NIRSpec MOS slits.
+
+        The steps in MSA_SLIT_STEPS calibrate each slit independently of
+        the others. When more than one core is requested, the slits are
+        split into contiguous batches and each batch is run through all
+        of these steps in a separate process. The calibrated slits are
+        put back together in their original order, so the result does not
+        depend on the number of cores used. The step status of the batches
+        is merged, and the correction parameters of the steps hold the
+        corrections of all the slits.
+
+        Parameters
+        ----------
+        data : `~jwst.datamodels.MultiSlitModel`
+            The MOS slits, after master background subtraction.
+        num_cores : int
+            Number of processes to use. If 1 the slits are calibrated serially.
+
+        Returns
+        -------
+        calibrated : `~jwst.datamodels.MultiSlitModel`
+            The calibrated MOS slits.
+        """
+        num_cores = fork_num_cores(min(num_cores, len(data.slits)), 'MOS slits')
+        if num_cores > 1 and (any(getattr(self, step_name).save_results
+                                  for step_name in MSA_SLIT_STEPS)
+                              or self.flat_field.save_interpolated_flat):
+            self.log.info('Intermediate products of the MOS slit calibration steps are saved: '
+                          'calibrating slits serially.')
+            num_cores = 1
+
+        if num_cores <= 1:
+            return _calibrate_slits(self, data)
+
+        self.log.info(f'Calibrating {len(data.slits)} MOS slits using {num_cores} processes')
+        batches = np.array_split(np.arange(len(data.slits)), num_cores)
+
+        # The worker processes inherit the pipeline and the slits, and return
+        # the calibrated slits and the correction parameters serialized.
+        results = [_unpack_slit_batch(result) for result in
+                   fork_map(partial(_calibrate_slit_batch, self, data), batches, num_cores)]
+
+        calibrated = results[0].model
+        for result in results[1:]:
+            calibrated.slits.extend(result.model.slits)
+        # the serialization stamps the date of the batches
+        calibrated.meta.date = data.meta.date
+
+        # Each batch sets the step status for its own slits: a step is
+        # complete if it was completed for any of the batches
+        for step_name in MSA_SLIT_STEPS:
+            status = [getattr(result.model.meta.cal_step, step_name) for result in results]
+            if 'COMPLETE' in status:
+                setattr(calibrated.meta.cal_step, step_name, 'COMPLETE')
+            elif status[0] is not None:
+                setattr(calibrated.meta.cal_step, step_name, status[0])
+
+        # Put the correction parameters of the batches back together
+        for step_name in MSA_SLIT_STEPS:
+            getattr(self, step_name).correction_pars = _merge_correction_pars(
+                [result.correction_pars[step_name] for result in results])
+        return calibrated
+
     def _process_niriss_soss(self, data):
         """Process SOSS
 
@@ -729,3 +802,80 @@ class Spec2Pipeline(Pipeline):
         resamp_fss.close()
 
         return x1d
+
+
+def _calibrate_slits(pipeline, data):
+    """Run the slit by slit calibration steps of a pipeline on a MultiSlitModel."""
+    for step_name in MSA_SLIT_STEPS:
+        data = getattr(pipeline, step_name)(data)
+    return data
+
+
+def _calibrate_slit_batch(pipeline, data, slit_indices):
+    """Worker process function: calibrate a batch of MOS slits.
+
+    Returns the calibrated batch and the correction parameters of the steps,
+    with the models serialized so that they can be sent back to the parent
+    process.
+    """
+    # The model is a copy inherited from the parent process: keep only the
+    # slits of this batch
+    keep = set(slit_indices.tolist())
+    for i in reversed(range(len(data.slits))):
+        if i not in keep:
+            del data.slits[i]
+
+    calibrated = _calibrate_slits(pipeline, data)
+    correction_pars = {step_name: _pack_correction_pars(getattr(pipeline, step_name).correction_pars)
+                       for step_name in MSA_SLIT_STEPS}
+    return _SlitBatch(model_to_bytes(calibrated), correction_pars)
+
+
+# Result of the calibration of a batch of slits in a worker process, with
+# the calibrated slits and the MultiSlitModels of the correction parameters
+# serialized by `model_to_bytes`
+_SlitBatch = namedtuple('_SlitBatch', ['model', 'correction_pars'])
+
+# A MultiSlitModel of the correction parameters, serialized by `model_to_bytes`
+_PackedSlits = namedtuple('_PackedSlits', ['data'])
+
+
+def _unpack_slit_batch(result):
+    """Open the calibrated slits and the correction parameters of a `_SlitBatch`."""
+    return _SlitBatch(model_from_bytes(result.model, datamodels.MultiSlitModel),
+                      _unpack_correction_pars(result.correction_pars))
+
+
+def _pack_correction_pars(correction_pars):
+    """Serialize the MultiSlitModels in step correction parameters."""
+    if isinstance(correction_pars, datamodels.MultiSlitModel):
+        return _PackedSlits(model_to_bytes(correction_pars))
+    if isinstance(correction_pars, dict):
+        return {key: _pack_correction_pars(value) for key, value in correction_pars.items()}
+    return correction_pars
+
+
+def _unpack_correction_pars(correction_pars):
+    """Open the MultiSlitModels serialized by `_pack_correction_pars`."""
+    if isinstance(correction_pars, _PackedSlits):
+        return model_from_bytes(correction_pars.data, datamodels.MultiSlitModel)
+    if isinstance(correction_pars, dict):
+        return {key: _unpack_correction_pars(value) for key, value in correction_pars.items()}
+    return correction_pars
+
+
+def _merge_correction_pars(batch_pars):
+    """Merge the correction parameters of a step for all the slit batches.
+
+    The per slit corrections are concatenated in the order of the batches;
+    for any other parameter the value of the first batch is used.
+    """
+    first = batch_pars[0]
+    if isinstance(first, datamodels.MultiSlitModel):
+        for pars in batch_pars[1:]:
+            first.slits.extend(pars.slits)
+        return first
+    if isinstance(first, dict):
+        return {key: _merge_correction_pars([pars[key] for pars in batch_pars])
+                for key in first}
+    return first
@@ -54,6 +54,7 @@ class Spec3Pipeline(Pipeline):
     class_alias = "calwebb_spec3"
 
     spec = """
+        pixel_sky_cache_dir = string(default=None) # Directory to share the IFU detector pixel to sky mapping between steps
     """
 
     # Define aliases to steps
@@ -100,6 +101,13 @@ class Spec3Pipeline(Pipeline):
         self.spectral_leak.save_results = self.save_results
         self.pixel_replace.suffix = 'pixel_replace'
         self.pixel_replace.output_use_model = True
+
+        # Share the cached IFU detector pixel to sky mapping between the steps
+        # that map the detector pixels of the input exposures
+        if self.pixel_sky_cache_dir is not None:
+            for step in (self.mrs_imatch, self.cube_build):
+                if step.pixel_sky_cache_dir is None:
+                    step.pixel_sky_cache_dir = self.pixel_sky_cache_dir
         
         # Overriding the Step.save_model method for the following steps.
         # These steps save intermediate files, resulting in meta.filename
@@ -1,7 +1,15 @@
 import pytest
 import os
 import shutil
-from jwst.pipeline.calwebb_spec2 import Spec2Pipeline
+import numpy as np
+from gwcs import wcstools
+from numpy.testing import assert_allclose, assert_array_equal
+from stdatamodels.jwst import datamodels
+from jwst.assign_wcs import AssignWcsStep
+from jwst.assign_wcs.tests.test_nirspec import create_nirspec_mos_file, get_file_path
+from jwst.extract_2d import Extract2dStep
+from jwst.pipeline.calwebb_spec2 import Spec2Pipeline, MSA_SLIT_STEPS
+from jwst.srctype import SourceTypeStep
 from jwst.stpipe import Step
 from jwst.datamodels import IFUImageModel
 
@@ -156,3 +164,111 @@ def test_filenotfounderror_raised(capsys):
     # Verify the failure is printed to stderr
     captured = capsys.readouterr()
     assert 'FileNotFoundError' in captured.err
+
+
+class SlitScaleStep(Step):
+    """Stand-in for the MOS slit calibration steps, scaling each slit by its number"""
+
+    spec = """
+        save_interpolated_flat = boolean(default=False) # as the flat field step
+    """
+
+    def process(self, input_model):
+        result = input_model.copy()
+        corrections = datamodels.MultiSlitModel()
+        for slit in result.slits:
+            slit.data *= float(slit.name)
+            slit.meta.wcsinfo.spectral_order = 1
+            corrections.slits.append(datamodels.SlitModel(np.full((1, 1), float(slit.name))))
+        # Only the last slit needs this step
+        if any(slit.name == '8' for slit in result.slits):
+            result.meta.cal_step.photom = 'COMPLETE'
+        else:
+            result.meta.cal_step.photom = 'SKIPPED'
+        self.correction_pars = {'scale': corrections}
+        return result
+
+
+def make_mos_slits(nslits):
+    model = datamodels.MultiSlitModel()
+    model.meta.exposure.type = 'NRS_MSASPEC'
+    model.meta.filename = 'mos_slits.fits'
+    for i in range(nslits):
+        slit = datamodels.SlitModel(np.full((5, 20), 1.5, dtype=np.float32))
+        slit.name = str(i + 2)
+        slit.source_id = 100 + i
+        model.slits.append(slit)
+    return model
+
+
+@pytest.mark.parametrize('num_cores', [1, 2, 3])
+def test_calibrate_msa_slits(num_cores):
+    """Test MOS slits calibrated in batches match the serial calibration"""
+    pipeline = Spec2Pipeline()
+    for step_name in MSA_SLIT_STEPS:
+        setattr(pipeline, step_name, SlitScaleStep())
+
+    result = pipeline._calibrate_msa_slits(make_mos_slits(7), num_cores)
+
+    assert result.meta.exposure.type == 'NRS_MSASPEC'
+    assert result.meta.cal_step.photom == 'COMPLETE'
+    for step_name in MSA_SLIT_STEPS:
+        corrections = getattr(pipeline, step_name).correction_pars['scale']
+        assert [slit.data[0, 0] for slit in corrections.slits] == [i + 2 for i in range(7)]
+    assert [slit.name for slit in result.slits] == [str(i + 2) for i in range(7)]
+    for i, slit in enumerate(result.slits):
+        assert slit.source_id == 100 + i
+        assert slit.meta.wcsinfo.spectral_order == 1
+        assert_array_equal(slit.data, 1.5 * float(i + 2) ** len(MSA_SLIT_STEPS))
+
+
+@pytest.fixture(scope='module')
+def nirspec_mos_slits():
+    """NIRSpec MOS slits with their WCS, ready for the slit calibration steps"""
+    hdul = create_nirspec_mos_file()
+    hdul[0].header['MSAMETFL'] = get_file_path('msa_configuration.fits')
+    hdul[0].header['MSAMETID'] = 16
+    model = datamodels.ImageModel(hdul)
+    model.data[:, :] = 1.
+    model = AssignWcsStep.call(model)
+    model = Extract2dStep.call(model)
+    return SourceTypeStep.call(model)
+
+
+def test_calibrate_msa_slits_nirspec(nirspec_mos_slits):
+    """Test NIRSpec MOS slits with gwcs WCSs calibrated in parallel match the serial calibration"""
+    assert len(nirspec_mos_slits.slits) == 2
+    serial_pipeline = Spec2Pipeline()
+    serial = serial_pipeline._calibrate_msa_slits(nirspec_mos_slits.copy(), 1)
+    parallel_pipeline = Spec2Pipeline()
+    parallel = parallel_pipeline._calibrate_msa_slits(nirspec_mos_slits.copy(), 2)
+
+    for step_name in MSA_SLIT_STEPS:
+        assert (getattr(parallel.meta.cal_step, step_name)
+                == getattr(serial.meta.cal_step, step_name))
+    assert len(parallel_pipeline.pathloss.correction_pars.slits) == 2
+
+    assert len(parallel.slits) == len(serial.slits)
+    for slit, serial_slit in zip(parallel.slits, serial.slits):
+        assert slit.name == serial_slit.name
+        for attr in ['data', 'err', 'dq', 'wavelength', 'barshadow', 'pathloss_point']:
+            assert_allclose(getattr(slit, attr), getattr(serial_slit, attr), equal_nan=True)
+
+        # The WCS of the slits calibrated in the worker processes still works
+        x, y = wcstools.grid_from_bounding_box(serial_slit.meta.wcs.bounding_box)
+        for coord, serial_coord in zip(slit.meta.wcs(x, y), serial_slit.meta.wcs(x, y)):
+            assert_allclose(coord, serial_coord, equal_nan=True)
+
+
+def test_calibrate_msa_slits_save_interpolated_flat(nirspec_mos_slits, tmp_path):
+    """Test the interpolated flat of all the MOS slits is saved with several cores"""
+    pipeline = Spec2Pipeline()
+    pipeline.output_dir = str(tmp_path)
+    pipeline.flat_field.output_dir = str(tmp_path)
+    pipeline.flat_field.save_interpolated_flat = True
+    result = pipeline._calibrate_msa_slits(nirspec_mos_slits.copy(), 2)
+
+    flat_files = list(tmp_path.glob('*interpolatedflat*'))
+    assert len(flat_files) == 1
+    with datamodels.open(flat_files[0]) as flat:
+        assert [slit.name for slit in flat.slits] == [slit.name for slit in result.slits]
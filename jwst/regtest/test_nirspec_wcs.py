@@ -1,3 +1,5 @@
+import time
+
 import pytest
 from numpy.testing import assert_allclose
 from gwcs.wcstools import grid_from_bounding_box
@@ -79,6 +81,48 @@ def test_nirspec_ifu_wcs(input_file, rtdata):
             assert_wcs_grid_allclose(wcs, wcs_truth)
 
 
+@pytest.mark.bigdata
+def test_nirspec_ifu_wcs_list(rtdata):
+    """Test building all NIRSpec IFU slice WCSs at once against one at a time"""
+    input_file = 'jw00011001001_01120_00001_nrs1_rate.fits'
+    rtdata.get_data(f"nirspec/ifu/{input_file}")
+    im = AssignWcsStep.call(input_file)
+
+    wcs_list = nirspec.nrs_ifu_wcs(im)
+    wcs_slices = [nirspec.nrs_wcs_set_input(im, slice_) for slice_ in range(30)]
+
+    for wcs, wcs_slice in zip(wcs_list, wcs_slices):
+        assert_wcs_grid_allclose(wcs, wcs_slice)
+
+
+@pytest.mark.bigdata
+def test_nirspec_ifu_wcs_list_benchmark(rtdata, record_property):
+    """Benchmark building all NIRSpec IFU slice WCSs at once against one at a time
+
+    nrs_ifu_wcs builds the slice WCSs with nrs_wcs_set_input_list. Both
+    times are the best of a few repeats and are reported as properties of
+    the test report. The times are not compared,
+    since wall-clock timings on shared test machines are too noisy to fail on.
+    """
+    input_file = 'jw00011001001_01120_00001_nrs1_rate.fits'
+    rtdata.get_data(f"nirspec/ifu/{input_file}")
+    im = AssignWcsStep.call(input_file)
+
+    def best_time(function, repeat=3):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    time_slices = best_time(lambda: [nirspec.nrs_wcs_set_input(im, slice_) for slice_ in range(30)])
+    time_list = best_time(lambda: nirspec.nrs_ifu_wcs(im))
+
+    record_property('nrs_wcs_set_input_seconds', time_slices)
+    record_property('nrs_ifu_wcs_seconds', time_list)
+
+
 def assert_wcs_grid_allclose(wcs, wcs_truth):
     """Assertion helper verifying the RA/DEC/(lam) are the same for 2 WCSs"""
     __tracebackhide__ = True
@@ -17,7 +17,6 @@ Polygon filling algorithm.
 # http://www.cs.rit.edu/~icss571/filling/how_to.html
 # http://www.cs.uic.edu/~jbell/CourseNotes/ComputerGraphics/PolygonFilling.html
 #
-from collections import OrderedDict
 import numpy as np
 
 __all__ = ['Region', 'Edge', 'Polygon']
@@ -131,8 +130,6 @@ class Polygon(Region):
         self._bbox = self._get_bounding_box()
         self._scan_line_range = \
             list(range(self._bbox[1], self._bbox[3] + self._bbox[1] + 1))
-        # constructs a Global Edge Table (GET) in bbox coordinates
-        self._GET = self._construct_ordered_GET()
 
     def _get_bounding_box(self):
         x = self._vertices[:, 0].min()
@@ -141,36 +138,6 @@ class Polygon(Region):
         h = self._vertices[:, 1].max() - y
         return x, y, w, h
 
-    def _construct_ordered_GET(self):
-        """
-        Construct a Global Edge Table (GET)
-
-        The GET is an OrderedDict. Keys are scan  line numbers,
-        ordered from bbox.ymin to bbox.ymax, where bbox is the
-        bounding box of the polygon.
-        Values are lists of edges for which edge.ymin==scan_line_number.
-
-        Returns
-        -------
-        GET: OrderedDict
-            {scan_line: [edge1, edge2]}
-        """
-        # edges is a list of Edge objects which define a polygon
-        # with these vertices
-        edges = self.get_edges()
-        GET = OrderedDict.fromkeys(self._scan_line_range)
-        ymin = np.asarray([e._ymin for e in edges])
-        for i in self._scan_line_range:
-            ymin_ind = (ymin == i).nonzero()[0]
-            # a hack for incomplete filling .any() fails if 0 is in ymin_ind
-            # if ymin_ind.any():
-            yminindlen, = ymin_ind.shape
-            if yminindlen:
-                GET[i] = [edges[ymin_ind[0]]]
-                for j in ymin_ind[1:]:
-                    GET[i].append(edges[j])
-        return GET
-
     def get_edges(self):
         """
         Create a list of Edge objects from vertices
@@ -215,10 +182,6 @@ class Polygon(Region):
         # 1. This algorithm does not mark pixels in the top row and left
         #    most column. Pad the initial pixel description on top and left
         #    with 1 px to prevent this.
-        # 2. Currently it uses intersection of the scan line with edges.
-        #    If this is too slow it should use the 1/m increment
-        #    (replace 3 above) (or the increment should be removed from
-        #    the GET entry).
 
         # see comments in the __init__ function for the reason of introducing
         # polygon shifts (self._shiftx & self._shifty). Here we need to shift
@@ -226,63 +189,56 @@ class Polygon(Region):
 
         (ny, nx) = data.shape
 
-        y = np.min(list(self._GET.keys()))
-
-        AET = []
+        if self._bbox[2] <= 0:
+            return data
+
+        # The intersections of the scan lines with all the edges of the
+        # Active Edge Table (AET) are computed at once: the AET of a scan line
+        # holds the non-horizontal edges with ymin <= y < ymax, except for
+        # the last scan line, which is not used to update the AET and
+        # therefore holds the edges ending on it.
+        start = self._vertices[:-1]
+        stop = self._vertices[1:]
+        ymin = np.minimum(start[:, 1], stop[:, 1])
+        ymax = np.maximum(start[:, 1], stop[:, 1])
         scline = self._scan_line_range[-1]
-
-        while y <= scline:
-
-            if y < scline:
-                AET = self.update_AET(y, AET)
-
-            if self._bbox[2] <= 0:
-                y += 1
-                continue
-
-            scan_line = Edge('scan_line', start=[self._bbox[0], y],
-                             stop=[self._bbox[0] + self._bbox[2], y])
-            x = [
-                int(np.ceil(e.compute_AET_entry(scan_line)[1]))
-                for e in AET if e is not None
-            ]
-            xnew = np.sort(x)
-            ysh = y + self._shifty
-
+        edges = np.flatnonzero(start[:, 1] != stop[:, 1])
+
+        nlines = np.maximum(ymax[edges] - ymin[edges], 0)
+        edge_idx = np.repeat(edges, nlines)
+        y = (ymin[edge_idx] + np.arange(edge_idx.size)
+             - np.repeat(np.cumsum(nlines) - nlines, nlines))
+        # the last scan line keeps the edges ending on it:
+        last = edges[ymax[edges] == scline]
+        edge_idx = np.concatenate([edge_idx, last])
+        y = np.concatenate([y, np.full(last.size, scline, dtype=y.dtype)])
+
+        # intersection of the edges with the scan lines, computed as
+        # in Edge.intersection:
+        u = stop[edge_idx] - start[edge_idx]
+        w = start[edge_idx] - np.stack([np.full_like(y, self._bbox[0]), y], axis=1)
+        cross_vw = self._bbox[2] * w[:, 1] - 0 * w[:, 0]
+        cross_uv = u[:, 0] * 0 - u[:, 1] * self._bbox[2]
+        x = np.ceil((cross_vw / cross_uv) * u[:, 0] + start[edge_idx, 0]).astype(int)
+
+        # pair the sorted intersections of each scan line:
+        order = np.lexsort((x, y))
+        x = x[order]
+        y = y[order]
+        first = np.flatnonzero(np.r_[True, y[1:] != y[:-1]])
+        rank = np.arange(y.size) - np.repeat(first, np.diff(np.r_[first, y.size]))
+        pairs = np.flatnonzero((rank % 2 == 0) & (np.r_[y[1:] == y[:-1], False]))
+
+        for k in pairs:
+            ysh = y[k] + self._shifty
             if ysh < 0 or ysh >= ny:
-                y += 1
                 continue
-
-            for i, j in zip(xnew[::2], xnew[1::2]):
-                xstart = max(0, i + self._shiftx)
-                xend = min(j + self._shiftx, nx - 1)
-                data[ysh][xstart:xend + 1] = self._rid
-
-            y += 1
+            xstart = max(0, x[k] + self._shiftx)
+            xend = min(x[k + 1] + self._shiftx, nx - 1)
+            data[ysh][xstart:xend + 1] = self._rid
 
         return data
 
-    def update_AET(self, y, AET):
-        """
-        Update the Active Edge Table (AET)
-
-        Add edges from GET to AET for which ymin of the edge is
-        equal to the y of the scan line.
-        Remove edges from AET for which ymax of the edge is
-        equal to y of the scan line.
-
-        """
-        edge_cont = self._GET[y]
-        if edge_cont is not None:
-            for edge in edge_cont:
-                if edge._start[1] != edge._stop[1] and edge._ymin == y:
-                    AET.append(edge)
-        for edge in AET[::-1]:
-            if edge is not None:
-                if edge._ymax == y:
-                    AET.remove(edge)
-        return AET
-
     def __contains__(self, px):
         """even-odd algorithm or smth else better should be used"""
         # minx = self._vertices[:,0].min()
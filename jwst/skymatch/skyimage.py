@@ -15,7 +15,10 @@ import tempfile
 
 # THIRD-PARTY
 import numpy as np
+from astropy.io import fits
+from astropy.nddata.bitmask import bitfield_to_boolean_mask
 from spherical_geometry.polygon import SphericalPolygon
+from stdatamodels.jwst import datamodels
 
 # LOCAL
 from . skystatistics import SkyStats
@@ -23,7 +26,15 @@ from . import region
 
 
 __all__ = ['SkyImage', 'SkyGroup', 'DataAccessor', 'NDArrayInMemoryAccessor',
-           'NDArrayMappedAccessor']
+           'NDArrayMappedAccessor', 'ModelLibraryMappedAccessor',
+           'ModelLibraryMaskAccessor']
+
+# Number of image rows processed at once when computing masks from
+# memory-mapped arrays
+_MASK_BLOCK_ROWS = 256
+
+# FITS extensions of the data model arrays used by the library accessors
+_FITS_EXTENSIONS = {'data': 'SCI', 'dq': 'DQ'}
 
 
 class DataAccessor(abc.ABC):
@@ -106,6 +117,127 @@ class NDArrayMappedAccessor(DataAccessor):
         return self._data_shape
 
 
+class ModelLibraryMappedAccessor(DataAccessor):
+    """ Accessor for an array of a model stored on disk by an "on_disk"
+    `~jwst.datamodels.ModelLibrary`.
+
+    The array is memory-mapped from the file of the library member each
+    time it is accessed instead of being copied to a temporary file.
+    Setting the data saves the modified model in the library, which must
+    not be open at that time.
+
+    """
+    def __init__(self, library, index, attribute='data'):
+        super().__init__()
+        self._library = library
+        self._index = index
+        self._attribute = attribute
+        self._data_shape = self.get_data().shape
+
+    def get_data(self):
+        raw, bscale, bzero = _map_model_array(
+            self._library.on_disk_filename(self._index),
+            self._attribute
+        )
+        data = _scale_raw_data(raw, bscale, bzero)
+        if data is raw:
+            # the file of the library member must not be modified:
+            data = raw.view()
+            data.flags.writeable = False
+        return data
+
+    def set_data(self, data):
+        data = np.asanyarray(data)
+        with self._library:
+            model = self._library.borrow(self._index)
+            setattr(model, self._attribute, data)
+            self._library.shelve(model, self._index)
+        self._data_shape = data.shape
+
+    def get_data_shape(self):
+        return self._data_shape
+
+
+class ModelLibraryMaskAccessor(DataAccessor):
+    """ Accessor for the mask of the "good" pixels of a model stored on disk
+    by an "on_disk" `~jwst.datamodels.ModelLibrary`.
+
+    Pixels are "good" when their data are finite and, if ``dqbits`` is
+    not `None`, when their DQ flags pass the ``dqbits`` bit mask (see
+    `~astropy.nddata.bitmask.bitfield_to_boolean_mask`). The mask is
+    computed in blocks of rows of the memory-mapped ``data`` and ``dq``
+    arrays each time it is accessed. A mask set with ``set_data`` is kept
+    in memory.
+
+    """
+    def __init__(self, library, index, dqbits=None):
+        super().__init__()
+        self._library = library
+        self._index = index
+        self._dqbits = dqbits
+        self._mask = None
+        filename = library.on_disk_filename(index)
+        self._data_shape = _map_model_array(filename, 'data')[0].shape
+
+    def get_data(self):
+        if self._mask is not None:
+            return self._mask
+
+        filename = self._library.on_disk_filename(self._index)
+        data = _map_model_array(filename, 'data')
+        if self._dqbits is not None:
+            dq = _map_model_array(filename, 'dq')
+
+        mask = np.empty(self._data_shape, dtype=bool)
+        for start in range(0, self._data_shape[0], _MASK_BLOCK_ROWS):
+            rows = slice(start, start + _MASK_BLOCK_ROWS)
+            block = np.isfinite(_scale_raw_data(data[0][rows], *data[1:]))
+            if self._dqbits is not None:
+                block &= bitfield_to_boolean_mask(
+                    _scale_raw_data(dq[0][rows], *dq[1:]),
+                    self._dqbits,
+                    good_mask_value=True
+                )
+            mask[rows] = block
+        return mask
+
+    def set_data(self, data):
+        self._mask = np.asanyarray(data, dtype=bool)
+        self._data_shape = self._mask.shape
+
+    def get_data_shape(self):
+        return self._data_shape
+
+
+def _map_model_array(filename, attribute):
+    """ Memory-map an array of the model saved in a file.
+
+    Returns the raw (possibly scaled) array and its ``BSCALE`` and ``BZERO``
+    scaling factors. Scaled integer arrays, such as the unsigned DQ arrays
+    of FITS files, cannot be mapped by `~stdatamodels.jwst.datamodels.open`.
+
+    """
+    if str(filename).endswith('.asdf'):
+        with datamodels.open(filename, memmap=True) as model:
+            return np.asarray(getattr(model, attribute)), 1, 0
+
+    with fits.open(filename, memmap=True, do_not_scale_image_data=True) as hdulist:
+        hdu = hdulist[_FITS_EXTENSIONS[attribute]]
+        return hdu.data, hdu.header.get('BSCALE', 1), hdu.header.get('BZERO', 0)
+
+
+def _scale_raw_data(raw, bscale, bzero):
+    """ Apply the FITS scaling factors to a (block of a) raw array. """
+    if bscale == 1 and bzero == 0:
+        return raw
+    sign_bit = 1 << (8 * raw.dtype.itemsize - 1)
+    if raw.dtype.kind == 'i' and bscale == 1 and bzero == sign_bit:
+        # unsigned integers are stored as signed integers offset by BZERO:
+        unsigned = np.dtype(f'u{raw.dtype.itemsize}')
+        return raw.astype(raw.dtype.newbyteorder('=')).view(unsigned) ^ unsigned.type(sign_bit)
+    return bscale * raw.astype(np.float64) + bzero
+
+
 class SkyImage:
     """
     Container that holds information about properties of a *single*
@@ -571,8 +703,6 @@ None, optional
             polyarea = self.poly_area
 
         else:
-            fill_mask = np.zeros(self.image_shape, dtype=bool)
-
             if isinstance(overlap, SkyImage):
                 intersection = self.intersection(overlap)
                 polyarea = np.fabs(intersection.area())
@@ -614,6 +744,7 @@ None, optional
             if polyarea == 0.0:
                 return None, 0, 0.0
 
+            fill_mask = np.zeros(self.image_shape, dtype=bool)
             for ra, dec in radec:
                 if len(ra) < 4:
                     continue
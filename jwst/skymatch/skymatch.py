@@ -6,10 +6,12 @@ A module that provides functions for matching sky in overlapping images.
 """
 import logging
 from datetime import datetime
+from functools import partial
 import numpy as np
 
 # LOCAL
-from . skyimage import SkyImage, SkyGroup
+from ..lib.pipe_utils import fork_map, fork_num_cores
+from . skyimage import SkyImage, SkyGroup, NDArrayMappedAccessor
 
 
 __all__ = ['match']
@@ -25,7 +27,8 @@ log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
 
 
-def match(images, skymethod='global+match', match_down=True, subtract=False):
+def match(images, skymethod='global+match', match_down=True, subtract=False,
+          num_cores=1):
     """
     A function to compute and/or "equalize" sky background in input images.
 
@@ -94,6 +97,11 @@ drizzlepac/astrodrizzle.html>`_
     subtract : bool (Default = False)
         Subtract computed sky value from image data.
 
+    num_cores : int, optional
+        Number of processes used to compute the sky values in the overlaps
+        of the image pairs for the `'match'` and `'global+match'` methods.
+        The default value of 1 does not use multiprocessing.
+
 
     Raises
     ------
@@ -305,7 +313,8 @@ drizzlepac/astrodrizzle.html>`_.
                  "overlapping regions.")
 
         # find "optimum" sky changes:
-        sky_deltas = _find_optimum_sky_deltas(images, apply_sky=not subtract)
+        sky_deltas = _find_optimum_sky_deltas(images, apply_sky=not subtract,
+                                              num_cores=num_cores)
         sky_good = np.isfinite(sky_deltas)
 
         if np.any(sky_good):
@@ -476,37 +485,104 @@ def _apply_sky(images, sky_deltas, do_global, do_skysub, show_old):
 #     return A, W
 
 # bug workaround version:
-def _overlap_matrix(images, apply_sky=True):
-    # TODO: to improve performance, the nested loops could be parallelized
-    # since _calc_sky() here can be called independently from previous steps.
+def _overlap_matrix(images, apply_sky=True, num_cores=1):
     ns = len(images)
     A = np.zeros((ns, ns), dtype=float)
     W = np.zeros((ns, ns), dtype=float)
 
-    for i in range(ns):
-        for j in range(i + 1, ns):
-            s1, w1, area1 = images[i].calc_sky(
-                overlap=images[j], delta=apply_sky
-            )
+    # only pairs of images whose bounding caps intersect can overlap,
+    # the sky of the other pairs would not be used anyway:
+    pairs = _overlap_candidates(images)
+    log.debug("Computing sky in the overlaps of {:d} out of {:d} pairs of "
+              "images.".format(len(pairs), ns * (ns - 1) // 2))
+
+    num_cores = fork_num_cores(min(num_cores, len(pairs)), 'image overlaps')
+    if num_cores > 1 and not all(_is_in_memory(img) for img in images):
+        # forked processes would share the file positions of temporary files
+        log.info("Images are stored in temporary files. Computing overlaps "
+                 "serially.")
+        num_cores = 1
+
+    if num_cores <= 1:
+        results = _calc_overlap_skies(images, pairs, apply_sky)
+    else:
+        log.info("Computing sky in {:d} image overlaps using {:d} processes"
+                 .format(len(pairs), num_cores))
+        # interleave the pairs so that each process gets pairs
+        # involving all of the images
+        batches = [pairs[k::num_cores] for k in range(num_cores)]
+
+        # the worker processes inherit the images
+        worker = partial(_calc_overlap_skies, images, apply_sky=apply_sky)
+        results = [r for batch in fork_map(worker, batches, num_cores)
+                   for r in batch]
+
+    for (i, j), (s1, w1, area1, s2, w2, area2) in results:
+        if area1 == 0.0 or area2 == 0.0 or s1 is None or s2 is None:
+            continue
+
+        A[j, i] = s1
+        W[j, i] = w1
+        A[i, j] = s2
+        W[i, j] = w2
 
-            s2, w2, area2 = images[j].calc_sky(
-                overlap=images[i], delta=apply_sky
-            )
+    return A, W
 
-            if area1 == 0.0 or area2 == 0.0 or s1 is None or s2 is None:
-                continue
 
-            A[j, i] = s1
-            W[j, i] = w1
-            A[i, j] = s2
-            W[i, j] = w2
+def _calc_overlap_skies(images, pairs, apply_sky):
+    """ Compute the sky of both images of each pair in their overlap. """
+    results = []
+    for i, j in pairs:
+        s1, w1, area1 = images[i].calc_sky(overlap=images[j], delta=apply_sky)
+        s2, w2, area2 = images[j].calc_sky(overlap=images[i], delta=apply_sky)
+        results.append(((i, j), (s1, w1, area1, s2, w2, area2)))
+    return results
 
-    return A, W
+
+def _is_in_memory(img):
+    members = [img] if isinstance(img, SkyImage) else list(img)
+    return not any(isinstance(accessor, NDArrayMappedAccessor)
+                   for im in members for accessor in (im._image, im._mask))
 
 
-def _find_optimum_sky_deltas(images, apply_sky=True):
+def _overlap_candidates(images, tol=1.0e-9):
+    """
+    Return the pairs ``(i, j)``, ``i < j``, of images that may overlap.
+
+    Each image (or group) is bounded by the smallest spherical cap centered
+    on the mean of the vertices of its bounding polygon. Images whose caps
+    do not intersect cannot overlap.
+
+    """
+    ns = len(images)
+    centers = np.zeros((ns, 3), dtype=float)
+    radii = np.full(ns, np.nan)
+
+    for k, img in enumerate(images):
+        points = [p for p in img.polygon.points if len(p)]
+        if not points:
+            continue  # empty polygon: does not overlap anything
+        points = np.vstack(points)
+        center = np.sum(points, axis=0)
+        norm = np.linalg.norm(center)
+        if norm < 1.0e-6:
+            radii[k] = np.pi
+            continue
+        centers[k] = center / norm
+        radii[k] = np.arccos(np.clip(np.dot(points, centers[k]), -1.0, 1.0)).max()
+        if radii[k] >= 0.5 * np.pi:
+            # caps larger than a hemisphere do not bound the polygon edges
+            radii[k] = np.pi
+
+    separation = np.arccos(np.clip(np.dot(centers, centers.T), -1.0, 1.0))
+    candidates = separation <= radii[:, np.newaxis] + radii[np.newaxis, :] + tol
+    i, j = np.nonzero(np.triu(candidates, k=1))
+    return list(zip(i.tolist(), j.tolist()))
+
+
+def _find_optimum_sky_deltas(images, apply_sky=True, num_cores=1):
     ns = len(images)
-    A, W = _overlap_matrix(images, apply_sky=apply_sky)
+    A, W = _overlap_matrix(images, apply_sky=apply_sky, num_cores=num_cores)
 
     def is_valid(i, j):
         return W[i, j] > 0 and W[j, i] > 0
@@ -20,12 +20,18 @@ from astropy.nddata.bitmask import (
 from stdatamodels.jwst.datamodels.dqflags import pixel
 
 from jwst.datamodels import ModelLibrary
+from jwst.lib.pipe_utils import compute_num_cores
 
 from ..stpipe import Step
 
 # LOCAL:
 from .skymatch import match
-from .skyimage import SkyImage, SkyGroup
+from .skyimage import (
+    SkyImage,
+    SkyGroup,
+    ModelLibraryMappedAccessor,
+    ModelLibraryMaskAccessor,
+)
 from .skystatistics import SkyStats
 
 
@@ -59,6 +65,9 @@ class SkyMatchStep(Step):
         usigma = float(min=0.0, default=4.0) # Upper clipping limit, in sigma
         binwidth = float(min=0.0, default=0.1) # Bin width for 'mode' and 'midpt' `skystat`, in sigma
 
+        # Multiprocessing:
+        maximum_cores = string(default='1') # cores for multiprocessing the image overlaps. Can be an integer, 'half', 'quarter', or 'all'
+
         # Memory management:
         in_memory = boolean(default=True) # If False, preserve memory using temporary files
     """  # noqa: E501
@@ -96,7 +105,7 @@ class SkyMatchStep(Step):
                 for index in group_inds:
                     model = library.borrow(index)
                     try:
-                        sky_images.append(self._imodel2skyim(model, index))
+                        sky_images.append(self._imodel2skyim(model, index, library))
                     finally:
                         library.shelve(model, index, modify=False)
                 if len(sky_images) == 1:
@@ -106,7 +115,8 @@ class SkyMatchStep(Step):
 
         # match/compute sky values:
         match(images, skymethod=self.skymethod, match_down=self.match_down,
-              subtract=self.subtract)
+              subtract=self.subtract,
+              num_cores=compute_num_cores(self.maximum_cores))
 
         # set sky background value in each image's meta:
         with library:
@@ -127,11 +137,18 @@ class SkyMatchStep(Step):
 
         return library
 
-    def _imodel2skyim(self, image_model, index):
+    def _imodel2skyim(self, image_model, index, library=None):
 
-        if self._dqbits is None:
+        if library is not None and library.on_disk_filename(index) is not None:
+            # memory-map the data and compute the mask from the library's
+            # file instead of keeping them in memory:
+            image = ModelLibraryMappedAccessor(library, index)
+            dqmask = ModelLibraryMaskAccessor(library, index, self._dqbits)
+        elif self._dqbits is None:
+            image = image_model.data
             dqmask = np.isfinite(image_model.data).astype(dtype=np.uint8)
         else:
+            image = image_model.data
             dqmask = bitfield_to_boolean_mask(
                 image_model.dq,
                 self._dqbits,
@@ -171,7 +188,7 @@ class SkyMatchStep(Step):
         wcs = deepcopy(image_model.meta.wcs)
 
         sky_im = SkyImage(
-            image=image_model.data,
+            image=image,
             wcs_fwd=wcs.__call__,
             wcs_inv=wcs.invert,
             pix_area=1.0,  # TODO: pixel area
@@ -547,3 +547,283 @@ def test_skymatch_2x(tmp_cwd, nircam_rate, tmp_path, skymethod, subtract):
             else:
                 assert abs(np.mean(im2.data[dq_mask]) - lev) < 0.01
             result2.shelve(im2)
+
+
+def _tan_wcs(ra, dec, roll=0.0, pscale=0.1, crpix=(48.0, 48.0)):
+    """ A simple imaging gwcs: pixel scale in arcsec, roll in degrees """
+    from astropy import coordinates as coord, units as u
+    from astropy.modeling import models
+    from gwcs import coordinate_frames as cf
+
+    transform = (
+        (models.Shift(-crpix[0]) & models.Shift(-crpix[1]))
+        | models.Rotation2D(roll)
+        | (models.Scale(pscale / 3600.0) & models.Scale(pscale / 3600.0))
+        | models.Pix2Sky_TAN()
+        | models.RotateNative2Celestial(ra, dec, 180.0)
+    )
+    detector = cf.Frame2D(name='detector', axes_order=(0, 1), unit=(u.pix, u.pix))
+    sky = cf.CelestialFrame(reference_frame=coord.ICRS(), name='world', unit=(u.deg, u.deg))
+    return WCS([(detector, transform), (sky, None)])
+
+
+@pytest.fixture
+def sky_images():
+    """ A mosaic of overlapping and disjoint sky images and groups """
+    from jwst.skymatch.skyimage import SkyImage, SkyGroup
+    from jwst.skymatch.skystatistics import SkyStats
+
+    rng = np.random.default_rng(46)
+    skystat = SkyStats(skystat='mean', nclip=0)
+    images = []
+    for k in range(12):
+        # 3 columns of overlapping images, a few disjoint ones
+        ra = 22.0 + 0.002 * (k % 3) + (0.5 if k >= 9 else 0.0)
+        dec = 12.0 + 0.002 * (k // 3)
+        wcs = _tan_wcs(ra, dec, roll=7.0 * k)
+        data = rng.normal(loc=k, scale=0.1, size=(96, 96))
+        mask = np.ones(data.shape, dtype=bool)
+        mask[:5, :5] = False
+        images.append(SkyImage(image=data, wcs_fwd=wcs.__call__, wcs_inv=wcs.invert,
+                               mask=mask, id=k, skystat=skystat,
+                               reduce_memory_usage=False))
+    return images[:8] + [SkyGroup(images[8:10], id='a')] + images[10:]
+
+
+def test_overlap_candidates(sky_images):
+    """ Test that all overlapping image pairs are candidates """
+    from jwst.skymatch.skymatch import _overlap_candidates
+
+    ns = len(sky_images)
+    candidates = _overlap_candidates(sky_images)
+    overlapping = [
+        (i, j) for i in range(ns) for j in range(i + 1, ns)
+        if sky_images[i].calc_sky(overlap=sky_images[j])[2] > 0
+    ]
+    assert 0 < len(overlapping) < ns * (ns - 1) // 2
+    assert set(overlapping) <= set(candidates)
+    assert len(candidates) < ns * (ns - 1) // 2
+
+
+@pytest.mark.parametrize('num_cores', [1, 3])
+def test_overlap_matrix(sky_images, num_cores):
+    """ Test the overlap matrix against all the pairs of images """
+    from jwst.skymatch.skymatch import _overlap_matrix
+
+    ns = len(sky_images)
+    A0 = np.zeros((ns, ns))
+    W0 = np.zeros((ns, ns))
+    for i in range(ns):
+        for j in range(i + 1, ns):
+            s1, w1, area1 = sky_images[i].calc_sky(overlap=sky_images[j])
+            s2, w2, area2 = sky_images[j].calc_sky(overlap=sky_images[i])
+            if area1 == 0.0 or area2 == 0.0 or s1 is None or s2 is None:
+                continue
+            A0[j, i], W0[j, i], A0[i, j], W0[i, j] = s1, w1, s2, w2
+
+    A, W = _overlap_matrix(sky_images, num_cores=num_cores)
+
+    assert np.count_nonzero(W0) > 0
+    np.testing.assert_array_equal(A, A0)
+    np.testing.assert_array_equal(W, W0)
+
+
+def test_region_polygon_scan():
+    """ Test the pixels filled by the polygon scan """
+    from jwst.skymatch.region import Polygon
+
+    mask = Polygon(True, [(2, 3), (10, 3), (10, 8), (2, 8), (2, 3)]).scan(
+        np.zeros((12, 14), dtype=bool))
+    expected = np.zeros((12, 14), dtype=bool)
+    expected[3:9, 2:11] = True
+    np.testing.assert_array_equal(mask, expected)
+
+    # polygons larger than the image
+    mask = Polygon(True, [(-5, -5), (20, -5), (20, 20), (-5, 20), (-5, -5)]).scan(
+        np.zeros((12, 14), dtype=bool))
+    assert np.all(mask)
+
+    # pixels are set to the region ID
+    mask = Polygon(2, [(0, 0), (8, 0), (0, 8), (0, 0)]).scan(np.zeros((10, 10), dtype=int))
+    y, x = np.indices(mask.shape)
+    np.testing.assert_array_equal(mask, np.where((x + y <= 8) & (y < 9), 2, 0))
+
+
+def _scan_edge_tables(polygon, data):
+    """ Fill a polygon with the original Global/Active Edge Table scan """
+    from jwst.skymatch.region import Edge
+
+    # Global Edge Table: the edges starting on each scan line
+    edges = polygon.get_edges()
+    get = {y: [e for e in edges if e.ymin == y] for y in polygon._scan_line_range}
+
+    ny, nx = data.shape
+    bbox = polygon._bbox
+    scline = polygon._scan_line_range[-1]
+    aet = []
+    for y in polygon._scan_line_range:
+        if y < scline:
+            # Active Edge Table: add the edges starting on the scan line and
+            # remove the edges ending on it
+            aet.extend(e for e in get[y] if e.start[1] != e.stop[1])
+            aet = [e for e in aet if e.ymax != y]
+
+        if bbox[2] <= 0:
+            continue
+
+        scan_line = Edge('scan_line', start=[bbox[0], y], stop=[bbox[0] + bbox[2], y])
+        x = np.sort([int(np.ceil(e.compute_AET_entry(scan_line)[1])) for e in aet])
+        ysh = y + polygon._shifty
+        if ysh < 0 or ysh >= ny:
+            continue
+        for i, j in zip(x[::2], x[1::2]):
+            xstart = max(0, i + polygon._shiftx)
+            xend = min(j + polygon._shiftx, nx - 1)
+            data[ysh][xstart:xend + 1] = polygon._rid
+    return data
+
+
+def _concave_polygon(rng, npoints):
+    """ Star shaped polygon around a random center, closed """
+    angles = np.sort(rng.uniform(0, 2 * np.pi, npoints))
+    radii = rng.uniform(2, 25, npoints)
+    center = rng.uniform(-10, 50, 2)
+    vertices = list(zip(center[0] + radii * np.cos(angles),
+                        center[1] + radii * np.sin(angles)))
+    return vertices + vertices[:1]
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_region_polygon_scan_edge_tables(seed):
+    """ Test the polygon scan fills the same pixels as the edge table scan """
+    from jwst.skymatch.region import Polygon
+
+    rng = np.random.default_rng(seed)
+    polygons = [
+        # random (possibly self-intersecting) polygons
+        [tuple(v) for v in rng.uniform(-15, 55, (rng.integers(3, 9), 2))],
+        # concave polygons
+        _concave_polygon(rng, 12),
+        _concave_polygon(rng, 30),
+        # concave polygon with horizontal and vertical edges
+        [(3, 2), (30, 2), (30, 30), (20, 30), (20, 10), (12, 10), (12, 30), (3, 30)],
+    ]
+    for vertices in polygons:
+        if vertices[0] != vertices[-1]:
+            vertices = vertices + vertices[:1]
+        polygon = Polygon(3, vertices)
+        expected = _scan_edge_tables(polygon, np.zeros((40, 45), dtype=int))
+        np.testing.assert_array_equal(polygon.scan(np.zeros((40, 45), dtype=int)), expected)
+
+
+@pytest.fixture
+def on_disk_asn(tmp_path):
+    """ An association of overlapping images saved to disk """
+    rng = np.random.default_rng(48)
+    filenames = []
+    for k in range(3):
+        im = ImageModel((96, 96))
+        im.data[:] = rng.normal(1.0 + k, 0.05, im.data.shape)
+        im.data[5, 7:9] = np.nan
+        im.dq[10:12, :] = DO_NOT_USE
+        im.dq[20, :] = SATURATED
+        # high bit of the unsigned DQ arrays:
+        im.dq[30, :] = dqflags.pixel['REFERENCE_PIXEL']
+        im.meta.wcs = _tan_wcs(22.0 + 0.002 * k, 12.0)
+        im.meta.observation.program_number = '0001'
+        im.meta.observation.observation_number = str(k + 1)
+        im.meta.observation.visit_number = '1'
+        im.meta.observation.visit_group = '1'
+        im.meta.observation.sequence_id = '01'
+        im.meta.observation.activity_id = '1'
+        im.meta.observation.exposure_number = '1'
+        im.meta.filename = f'im{k}_cal.fits'
+        im.save(tmp_path / im.meta.filename)
+        filenames.append(im.meta.filename)
+
+    asn = asn_from_list(filenames, product_name='on_disk')
+    asn_path = tmp_path / 'on_disk_asn.json'
+    with open(asn_path, 'w') as f:
+        f.write(asn.dump(format='json')[1])
+    return asn_path
+
+
+def test_model_library_accessors(on_disk_asn, monkeypatch):
+    """ Test the data and masks memory-mapped from an on_disk library """
+    from astropy.nddata.bitmask import bitfield_to_boolean_mask
+    from stdatamodels.jwst.datamodels import open as dm_open
+    from jwst.datamodels import ModelLibrary
+    from jwst.skymatch import skyimage
+
+    # mask blocks not aligned with the flagged rows
+    monkeypatch.setattr(skyimage, '_MASK_BLOCK_ROWS', 7)
+    library = ModelLibrary(on_disk_asn, on_disk=True)
+    dqbits = ~(DO_NOT_USE + SATURATED)
+
+    for index in range(len(library)):
+        with dm_open(library.on_disk_filename(index)) as model:
+            image = skyimage.ModelLibraryMappedAccessor(library, index)
+            data = image.get_data()
+            assert image.get_data_shape() == model.data.shape
+            assert not data.flags.writeable
+            np.testing.assert_array_equal(data, model.data)
+            np.testing.assert_array_equal(
+                skyimage.ModelLibraryMappedAccessor(library, index, 'dq').get_data(),
+                model.dq
+            )
+
+            mask = skyimage.ModelLibraryMaskAccessor(library, index, dqbits)
+            expected = bitfield_to_boolean_mask(
+                model.dq, dqbits, good_mask_value=True
+            ) & np.isfinite(model.data)
+            assert mask.get_data().dtype == bool
+            np.testing.assert_array_equal(mask.get_data(), expected)
+            np.testing.assert_array_equal(
+                skyimage.ModelLibraryMaskAccessor(library, index).get_data(),
+                np.isfinite(model.data)
+            )
+
+        # setting the data saves the model in the library
+        image.set_data(model.data - 1.0)
+        assert library.on_disk_filename(index) != str(on_disk_asn.parent / model.meta.filename)
+        np.testing.assert_array_equal(image.get_data(), model.data - 1.0)
+        with library:
+            model = library.borrow(index)
+            np.testing.assert_array_equal(model.data, image.get_data())
+            library.shelve(model, index, modify=False)
+
+
+@pytest.mark.parametrize('suffix', ['fits', 'asdf'])
+def test_map_model_array(tmp_path, suffix):
+    """ Test the arrays memory-mapped from FITS and ASDF files """
+    from jwst.skymatch.skyimage import _map_model_array, _scale_raw_data
+
+    im = ImageModel((16, 16))
+    im.data[:] = np.arange(256).reshape(16, 16)
+    im.dq[:] = dqflags.pixel['REFERENCE_PIXEL'] + DO_NOT_USE
+    im.save(tmp_path / f'im_cal.{suffix}')
+
+    for attribute in ['data', 'dq']:
+        data = _scale_raw_data(*_map_model_array(tmp_path / f'im_cal.{suffix}', attribute))
+        assert data.dtype.newbyteorder('=') == getattr(im, attribute).dtype
+        np.testing.assert_array_equal(data, getattr(im, attribute))
+
+
+@pytest.mark.parametrize('subtract', [False, True])
+def test_skymatch_on_disk(on_disk_asn, subtract):
+    """ Test skymatch gives the same results with memory-mapped images """
+    results = []
+    for in_memory in [True, False]:
+        step = SkyMatchStep(skymethod='match', subtract=subtract,
+                            in_memory=in_memory, skystat='mean', nclip=0)
+        result = step.run(str(on_disk_asn))
+        with result:
+            models = [result.borrow(i) for i in range(len(result))]
+            results.append([(m.meta.background.level, m.data.copy()) for m in models])
+            for i, model in enumerate(models):
+                result.shelve(model, i, modify=False)
+
+    for (level, data), (level_on_disk, data_on_disk) in zip(*results):
+        assert level is not None
+        assert level == level_on_disk
+        np.testing.assert_array_equal(data, data_on_disk)
@@ -13,6 +13,7 @@ import numpy as np
 from photutils.background import Background2D, MedianBackground
 from photutils.utils.exceptions import NoDetectionsWarning
 from photutils.segmentation import detect_sources, deblend_sources
+from scipy.ndimage import map_coordinates, spline_filter
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
@@ -48,6 +49,12 @@ class JWSTBackground:
 
     background_rms : 2D `~numpy.ndimage`
         The estimated 2D background RMS image.
+
+    background_mesh : 2D `~numpy.ndimage`
+        The low-resolution background image, with one value per box.
+
+    background_rms_mesh : 2D `~numpy.ndimage`
+        The low-resolution background RMS image, with one value per box.
     """
 
     def __init__(self, data, box_size=100, coverage_mask=None):
@@ -107,6 +114,87 @@ class JWSTBackground:
         """
         return self._background2d.background_rms
 
+    @lazyproperty
+    def background_mesh(self):
+        """
+        The low-resolution 2D background image.
+        """
+        return self._background2d.background_mesh
+
+    @lazyproperty
+    def background_rms_mesh(self):
+        """
+        The low-resolution 2D background RMS image.
+        """
+        return self._background2d.background_rms_mesh
+
+    def background_cutout(self, slices):
+        """
+        The background of a cutout of the image.
+
+        Only the cutout is interpolated from the background mesh, so
+        the memory needed scales with the size of the cutout.
+
+        Parameters
+        ----------
+        slices : tuple of 2 slices
+            The ``(y, x)`` slices of the cutout.
+
+        Returns
+        -------
+        background : 2D `~numpy.ndarray`
+            The background of the cutout, equal to
+            ``background[slices]``.
+        """
+        return self._interpolate_cutout(self.background_mesh, slices)
+
+    def background_rms_cutout(self, slices):
+        """
+        The background RMS of a cutout of the image.
+
+        Parameters
+        ----------
+        slices : tuple of 2 slices
+            The ``(y, x)`` slices of the cutout.
+
+        Returns
+        -------
+        background_rms : 2D `~numpy.ndarray`
+            The background RMS of the cutout, equal to
+            ``background_rms[slices]``.
+        """
+        return self._interpolate_cutout(self.background_rms_mesh, slices)
+
+    def _interpolate_cutout(self, mesh, slices):
+        """
+        Interpolate a mesh on the pixels of a cutout, as the
+        `~photutils.background.BkgZoomInterpolator` of `Background2D`
+        does for the whole image.
+        """
+        bkg = self._background2d
+        interpolator = bkg.interpolator
+        shape = tuple(s.stop - s.start for s in slices)
+        if np.ptp(mesh) == 0:
+            cutout = np.full(shape, np.min(mesh), dtype=self.data.dtype)
+        else:
+            # the spline coefficients of the whole mesh, evaluated at the
+            # cutout pixels with the coordinates used by zoom in grid mode
+            coeffs = spline_filter(mesh, interpolator.order, output=np.float64,
+                                   mode=interpolator.mode)
+            yy, xx = np.mgrid[slices]
+            coords = ((yy + 0.5) / bkg.box_size[0] - 0.5,
+                      (xx + 0.5) / bkg.box_size[1] - 0.5)
+            cutout = map_coordinates(coeffs, coords, output=mesh.dtype,
+                                     order=interpolator.order,
+                                     mode=interpolator.mode,
+                                     cval=interpolator.cval, prefilter=False)
+            if interpolator.clip:
+                np.clip(cutout, np.min(mesh), np.max(mesh), out=cutout)
+
+        if self.coverage_mask is not None:
+            cutout[self.coverage_mask[slices]] = bkg.fill_value
+        return cutout
+
 
 def make_kernel(kernel_fwhm):
     """
@@ -215,16 +303,50 @@ class JWSTSourceFinder:
                           'sources.')
                 return None
 
+        segment_img = self.detect(convolved_data, mask=mask)
+        if segment_img is None:
+            log.warning('No sources were found. Source catalog will not '
+                        'be created.')
+            return None
+
+        log.info(f'Detected {segment_img.nlabels} sources')
+        return segment_img
+
+    def detect(self, convolved_data, mask=None, threshold=None):
+        """
+        Detect and deblend the sources, without logging the results.
+
+        Parameters
+        ----------
+        convolved_data : 2D `numpy.ndarray`
+            The 2D convolved array from which to detect sources.
+
+        mask : array_like, bool, optional
+            A boolean mask with the same shape as ``convolved_data``,
+            where a `True` value indicates the corresponding element
+            of ``convolved_data`` is masked.
+
+        threshold : float or 2D `numpy.ndarray`, optional
+            The detection threshold to use instead of ``threshold``,
+            e.g. the part of a threshold image matching a cutout of the
+            convolved data.
+
+        Returns
+        -------
+        segment_image : `~photutils.segmentation.SegmentationImage` or `None`
+            The segmentation image, or `None` if no sources are found.
+        """
+        if threshold is None:
+            threshold = self.threshold
+
         with warnings.catch_warnings():
             # suppress NoDetectionsWarning from photutils
             warnings.filterwarnings('ignore', category=NoDetectionsWarning)
 
-            segment_img = detect_sources(convolved_data, self.threshold,
+            segment_img = detect_sources(convolved_data, threshold,
                                          self.npixels, mask=mask,
                                          connectivity=self.connectivity)
             if segment_img is None:
-                log.warning('No sources were found. Source catalog will not '
-                            'be created.')
                 return None
 
             # source deblending requires scikit-image
@@ -237,5 +359,4 @@ class JWSTSourceFinder:
                                               connectivity=self.connectivity,
                                               relabel=True)
 
-        log.info(f'Detected {segment_img.nlabels} sources')
         return segment_img
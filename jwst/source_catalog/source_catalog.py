@@ -3,6 +3,7 @@ Module to calculate the source catalog.
 """
 
 import logging
+import math
 import warnings
 
 from astropy.convolution import Gaussian2DKernel
@@ -17,8 +18,7 @@ from scipy import ndimage
 from scipy.spatial import KDTree
 
 from photutils.segmentation import SourceCatalog
-from photutils.aperture import (CircularAperture, CircularAnnulus,
-                                aperture_photometry)
+from photutils.geometry import circular_overlap_grid
 
 from stdatamodels.jwst.datamodels import ImageModel
 
@@ -29,6 +29,75 @@ from ._wcs_helpers import pixel_scale_angle_at_skycoord
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
 
+# the number of sources whose annulus values are sigma clipped together
+_APERTURE_BLOCK_SIZE = 4096
+
+
+def _circular_bbox(xpos, ypos, radius):
+    """
+    The (xmin, xmax, ymin, ymax) pixel bounding box of a circle.
+
+    This is the same minimal bounding box that photutils uses for
+    circular apertures, with exclusive upper limits.
+    """
+    return (math.floor(xpos - radius + 0.5), math.ceil(xpos + radius + 0.5),
+            math.floor(ypos - radius + 0.5), math.ceil(ypos + radius + 0.5))
+
+
+def _circular_weights(xpos, ypos, radius, cutout_bbox, inner_radius=None):
+    """
+    Compute the pixel weights of a circular aperture or annulus within
+    a data cutout.
+
+    Parameters
+    ----------
+    xpos, ypos : float
+        The aperture center position.
+
+    radius : float
+        The aperture radius (the outer radius for an annulus).
+
+    cutout_bbox : tuple of int
+        The (xmin, xmax, ymin, ymax) bounding box of the cutout in
+        the data, with exclusive upper limits.  It must enclose the
+        aperture bounding box where the aperture overlaps the data.
+
+    inner_radius : float or `None`, optional
+        The inner radius of an annulus.  If `None`, then the exact
+        overlap weights of a circular aperture are returned.
+        Otherwise, the annulus weights are computed with the
+        ``'center'`` method.
+
+    Returns
+    -------
+    result : tuple or `None`
+        A tuple of the slices of the aperture overlap in the cutout and
+        the corresponding pixel weights.  `None` is returned if the
+        aperture does not overlap the cutout.
+    """
+    xmin, xmax, ymin, ymax = _circular_bbox(xpos, ypos, radius)
+    x0, x1, y0, y1 = cutout_bbox
+    if xmin >= x1 or ymin >= y1 or xmax <= x0 or ymax <= y0:
+        return None
+
+    edges = (xmin - 0.5 - xpos, xmax - 0.5 - xpos,
+             ymin - 0.5 - ypos, ymax - 0.5 - ypos)
+    nx, ny = xmax - xmin, ymax - ymin
+    if inner_radius is None:
+        # the 'exact' method
+        weights = circular_overlap_grid(*edges, nx, ny, radius, 1, 1)
+    else:
+        # the 'center' method
+        weights = circular_overlap_grid(*edges, nx, ny, radius, 0, 1)
+        weights -= circular_overlap_grid(*edges, nx, ny, inner_radius, 0, 1)
+
+    slc_cutout = (slice(max(ymin, y0) - y0, min(ymax, y1) - y0),
+                  slice(max(xmin, x0) - x0, min(xmax, x1) - x0))
+    slc_weights = (slice(max(ymin, y0) - ymin, min(ymax, y1) - ymin),
+                   slice(max(xmin, x0) - xmin, min(xmax, x1) - xmin))
+
+    return slc_cutout, weights[slc_weights]
+
 
 class JWSTSourceCatalog:
     """
@@ -462,46 +531,119 @@ class JWSTSourceCatalog:
         return list(desc.keys())
 
     @lazyproperty
-    def _aper_local_background(self):
-        """
-        Estimate the local background and error using a circular annulus
-        aperture.
-
-        The local background is the sigma-clipped median value in the
-        annulus.  The background error is the standard error of the
-        median, sqrt(pi / 2N) * std.
-        """
-        bkg_aper = CircularAnnulus(
-            self._xypos_finite,
-            self.aperture_params['bkg_aperture_inner_radius'],
-            self.aperture_params['bkg_aperture_outer_radius'])
-        bkg_aper_masks = bkg_aper.to_mask(method='center')
+    def _aperture_photometry(self):
+        """
+        The batched circular aperture photometry and annulus local
+        background.
+
+        Each source is measured in a single pass: one cutout of the
+        data and error arrays that encloses both the largest aperture
+        and the background annulus is extracted and then reused for
+        every aperture radius and for the annulus.  The pixel weights
+        are identical to those of the photutils ``'exact'`` (aperture)
+        and ``'center'`` (annulus) mask methods.  The annulus values
+        are sigma clipped in blocks of sources at a time instead of
+        one source at a time.
+
+        The returned aperture sums and errors are lists (one element
+        per aperture radius) of arrays, without the local background
+        subtracted.
+        """
+        radii = self.aperture_params['aperture_radii']
+        bkg_rin = self.aperture_params['bkg_aperture_inner_radius']
+        bkg_rout = self.aperture_params['bkg_aperture_outer_radius']
+        data = self.model.data.value
+        error = self.model.err.value
+        ny, nx = data.shape
+        nsources = len(self._xypos_finite)
+        max_radius = max(*radii, bkg_rout)
+
+        aperture_sums = np.full((len(radii), nsources), np.nan)
+        aperture_sum_errs = np.full((len(radii), nsources), np.nan)
+        bkg_median = np.full(nsources, np.nan)
+        bkg_std = np.full(nsources, np.nan)
+        nvalues = np.zeros(nsources, dtype=int)
         sigclip = SigmaClip(sigma=3.)
 
+        # an upper limit on the number of annulus pixels per source
+        bkg_size = (int(np.ceil(2 * bkg_rout)) + 2) ** 2
+
         with warnings.catch_warnings():
             warnings.simplefilter('ignore', category=RuntimeWarning)
             warnings.simplefilter('ignore', category=AstropyUserWarning)
 
-            nvalues = []
-            bkg_median = []
-            bkg_std = []
-            for mask in bkg_aper_masks:
-                bkg_data = mask.get_values(self.model.data.value)
-                values = sigclip(bkg_data, masked=False)
-                nvalues.append(values.size)
-                bkg_median.append(np.median(values))
-                bkg_std.append(np.std(values))
-
-            nvalues = np.array(nvalues)
-            bkg_median = np.array(bkg_median)
+            for start in range(0, nsources, _APERTURE_BLOCK_SIZE):
+                xypos = self._xypos_finite[start:start
+                                           + _APERTURE_BLOCK_SIZE]
+                bkg_values = np.full((len(xypos), bkg_size), np.nan)
+                bkg_maxsize = 0
+
+                for idx, (xpos, ypos) in enumerate(xypos.tolist()):
+                    # the cutout enclosing all apertures and the annulus
+                    bbox = _circular_bbox(xpos, ypos, max_radius)
+                    x0, x1 = max(bbox[0], 0), min(bbox[1], nx)
+                    y0, y1 = max(bbox[2], 0), min(bbox[3], ny)
+                    if x0 >= x1 or y0 >= y1:
+                        continue  # no overlap with the data
+                    data_cutout = data[y0:y1, x0:x1]
+                    error_cutout = error[y0:y1, x0:x1]
+
+                    for i, radius in enumerate(radii):
+                        weights = _circular_weights(xpos, ypos, radius,
+                                                    (x0, x1, y0, y1))
+                        if weights is None:
+                            continue
+                        slc, weights = weights
+                        pixel_mask = weights > 0
+                        values = (data_cutout[slc] * weights)[pixel_mask]
+                        variance = ((error_cutout[slc] ** 2 * weights)
+                                    [pixel_mask])
+                        aperture_sums[i, start + idx] = values.sum()
+                        aperture_sum_errs[i, start + idx] = np.sqrt(
+                            variance.sum())
+
+                    weights = _circular_weights(xpos, ypos, bkg_rout,
+                                                (x0, x1, y0, y1),
+                                                inner_radius=bkg_rin)
+                    if weights is None:
+                        continue
+                    slc, weights = weights
+                    values = (data_cutout[slc] * weights)[weights > 0]
+                    bkg_values[idx, :values.size] = values
+                    bkg_maxsize = max(bkg_maxsize, values.size)
+
+                # sigma clip the annulus values of all sources in the
+                # block at once; clipped and padded values become NaN
+                bkg_values = sigclip(bkg_values[:, :bkg_maxsize], axis=1,
+                                     masked=False)
+                block = slice(start, start + len(xypos))
+                nvalues[block] = np.count_nonzero(np.isfinite(bkg_values),
+                                                  axis=1)
+                bkg_median[block] = np.nanmedian(bkg_values, axis=1)
+                bkg_std[block] = np.nanstd(bkg_values, axis=1)
+
             # standard error of the median
-            bkg_median_err = (np.sqrt(np.pi / (2. * nvalues))
-                              * np.array(bkg_std))
+            bkg_median_err = np.sqrt(np.pi / (2. * nvalues)) * bkg_std
 
-        bkg_median <<= self.model.data.unit
-        bkg_median_err <<= self.model.data.unit
+        unit = self.model.data.unit
+        aperture_sums = [flux << unit for flux in aperture_sums]
+        aperture_sum_errs = [flux_err << unit
+                             for flux_err in aperture_sum_errs]
+
+        return (aperture_sums, aperture_sum_errs, bkg_median << unit,
+                bkg_median_err << unit)
+
+    @lazyproperty
+    def _aper_local_background(self):
+        """
+        Estimate the local background and error using a circular annulus
+        aperture.
 
-        return bkg_median, bkg_median_err
+        The local background is the sigma-clipped median value in the
+        annulus.  The background error is the standard error of the
+        median, sqrt(pi / 2N) * std.
+        """
+        return self._aperture_photometry[2:]
 
     @lazyproperty
     def aper_bkg_flux(self):
@@ -523,20 +665,12 @@ class JWSTSourceCatalog:
 
         The values are set as dynamic attributes.
         """
-        apertures = [CircularAperture(self._xypos_finite, radius) for radius in
-                     self.aperture_params['aperture_radii']]
-        aper_phot = aperture_photometry(self.model.data, apertures,
-                                        error=self.model.err)
-
-        for i, aperture in enumerate(apertures):
-            flux_col = f'aperture_sum_{i}'
-            flux_err_col = f'aperture_sum_err_{i}'
+        aperture_sums, aperture_sum_errs = self._aperture_photometry[:2]
 
+        for i, radius in enumerate(self.aperture_params['aperture_radii']):
             # subtract the local background measured in the annulus
-            aper_phot[flux_col] -= (self.aper_bkg_flux * aperture.area)
-
-            flux = aper_phot[flux_col]
-            flux_err = aper_phot[flux_err_col]
+            flux = aperture_sums[i] - (self.aper_bkg_flux * (np.pi * radius**2))
+            flux_err = aperture_sum_errs[i]
             abmag, abmag_err = self.convert_flux_to_abmag(flux, flux_err)
             vegamag = abmag - self.abvega_offset
             vegamag_err = abmag_err
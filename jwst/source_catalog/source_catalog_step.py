@@ -12,6 +12,8 @@ from stdatamodels.jwst import datamodels
 from .detection import convolve_data, JWSTBackground, JWSTSourceFinder
 from .reference_data import ReferenceData
 from .source_catalog import JWSTSourceCatalog
+from .tiled_catalog import JWSTTiledSourceCatalog
+from ..lib.pipe_utils import compute_num_cores
 from ..stpipe import Step
 
 __all__ = ["SourceCatalogStep"]
@@ -40,8 +42,11 @@ class SourceCatalogStep(Step):
         aperture_ee3 = integer(default=70)    # aperture encircled energy 3
         ci1_star_threshold = float(default=2.0)  # CI 1 star threshold
         ci2_star_threshold = float(default=1.8)  # CI 2 star threshold
+        tile_size = integer(min=1, default=None)  # tile size in pixels to detect and measure sources in parallel, None to process the whole image at once
+        tile_overlap = integer(min=0, default=256)  # overlap of the tiles in pixels
+        maximum_cores = string(default='1')  # cores for multiprocessing the tiles. Can be an integer, 'half', 'quarter', or 'all'
         suffix = string(default='cat')        # Default suffix for output files
-    """
+    """  # noqa: E501
 
     reference_file_types = ['apcorr', 'abvegaoffset']
 
@@ -79,27 +84,42 @@ class SourceCatalogStep(Step):
             coverage_mask = np.isnan(model.err) | (model.wht == 0)
             bkg = JWSTBackground(model.data, box_size=self.bkg_boxsize,
                                  coverage_mask=coverage_mask)
-            model.data -= bkg.background
-
-            threshold = self.snr_threshold * bkg.background_rms
-            finder = JWSTSourceFinder(threshold, self.npixels,
-                                      deblend=self.deblend)
-
-            convolved_data = convolve_data(model.data, self.kernel_fwhm,
-                                           mask=coverage_mask)
-            segment_img = finder(convolved_data, mask=coverage_mask)
-            if segment_img is None:
-                return None
-
             ci_star_thresholds = (self.ci1_star_threshold,
                                   self.ci2_star_threshold)
-            catobj = JWSTSourceCatalog(model, segment_img, convolved_data,
-                                       self.kernel_fwhm, aperture_params,
-                                       abvega_offset, ci_star_thresholds)
-            catalog = catobj.catalog
 
-            # add back background to data so input model is unchanged
-            model.data += bkg.background
+            if self.tile_size is None:
+                model.data -= bkg.background
+
+                threshold = self.snr_threshold * bkg.background_rms
+                finder = JWSTSourceFinder(threshold, self.npixels,
+                                          deblend=self.deblend)
+                convolved_data = convolve_data(model.data, self.kernel_fwhm,
+                                               mask=coverage_mask)
+                segment_img = finder(convolved_data, mask=coverage_mask)
+                if segment_img is None:
+                    return None
+
+                catobj = JWSTSourceCatalog(model, segment_img, convolved_data,
+                                           self.kernel_fwhm, aperture_params,
+                                           abvega_offset, ci_star_thresholds)
+                catalog = catobj.catalog
+
+                # add back background to data so input model is unchanged
+                model.data += bkg.background
+            else:
+                # the background and threshold are computed for each tile
+                finder = JWSTSourceFinder(None, self.npixels,
+                                          deblend=self.deblend)
+                tiled = JWSTTiledSourceCatalog(
+                    model, bkg, self.snr_threshold, coverage_mask, finder,
+                    self.kernel_fwhm, aperture_params, abvega_offset,
+                    ci_star_thresholds, self.tile_size, self.tile_overlap,
+                    num_cores=compute_num_cores(self.maximum_cores),
+                    make_segment_img=self.save_results)
+                catalog = tiled.catalog
+                if catalog is None:
+                    return None
+                segment_img = tiled.segment_img
 
             if self.save_results:
                 cat_filepath = self.make_output_path(ext='.ecsv')
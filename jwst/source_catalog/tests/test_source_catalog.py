@@ -1,11 +1,19 @@
+import warnings
+
 import pytest
 import numpy as np
-from numpy.testing import assert_allclose
+from astropy.stats import SigmaClip
+from numpy.testing import assert_allclose, assert_equal
+from photutils.aperture import (CircularAnnulus, CircularAperture,
+                                aperture_photometry)
 from photutils.datasets import make_gwcs
 
 from stdatamodels.jwst.datamodels import ImageModel
 
+from ..detection import convolve_data, JWSTBackground, JWSTSourceFinder
+from ..source_catalog import JWSTSourceCatalog
 from ..source_catalog_step import SourceCatalogStep
+from ..tiled_catalog import JWSTTiledSourceCatalog, make_tiles
 
 
 @pytest.fixture
@@ -106,11 +114,13 @@ def nircam_model_without_apcorr():
     return model
 
 
+@pytest.mark.parametrize('tile_size', (None, 60))
 @pytest.mark.parametrize('npixels, nsources', ((5, 2), (1000, 1), (5000, 0)))
-def test_source_catalog(nircam_model, npixels, nsources):
+def test_source_catalog(nircam_model, npixels, nsources, tile_size):
 
     step = SourceCatalogStep(snr_threshold=0.5, npixels=npixels,
                              bkg_boxsize=50, kernel_fwhm=2.0,
+                             tile_size=tile_size, tile_overlap=50,
                              save_results=False)
     cat = step.run(nircam_model)
     if cat is None:
@@ -150,3 +160,150 @@ def test_input_model_reset(nircam_model):
     assert_allclose(original_err, nircam_model.err, 5.e-7)
     assert (nircam_model.meta.bunit_data == 'MJy/sr')
     assert (nircam_model.meta.bunit_err == 'MJy/sr')
+
+
+@pytest.fixture
+def star_field_model():
+    rng = np.random.default_rng(seed=49)
+    shape = (240, 260)
+    yy, xx = np.mgrid[:shape[0], :shape[1]]
+    data = rng.normal(0, 0.1, size=shape)
+    for x, y, flux, sigma in zip(rng.uniform(5, shape[1] - 5, 25),
+                                 rng.uniform(5, shape[0] - 5, 25),
+                                 rng.uniform(5, 50, 25),
+                                 rng.uniform(1, 3, 25)):
+        data += flux * np.exp(-((xx - x)**2 + (yy - y)**2) / (2 * sigma**2))
+
+    wht = np.ones(shape)
+    wht[0:10, :] = 0.
+    err = np.full(shape, 0.1)
+    model = ImageModel(data, wht=wht, err=err)
+    model.meta.bunit_data = 'MJy/sr'
+    model.meta.bunit_err = 'MJy/sr'
+    model.meta.photometry.pixelarea_steradians = 1.0e-13
+    model.meta.wcs = make_gwcs(shape)
+    model.meta.wcsinfo = {'crpix1': 50, 'crpix2': 50}
+    return model
+
+
+def test_aperture_photometry(star_field_model):
+    """ Test the batched aperture photometry against photutils """
+    model = star_field_model
+    model.data[100:103, 50:200] = np.nan
+    aperture_params = {'aperture_ee': (30, 50, 70),
+                       'aperture_radii': np.array((1.5, 2.5, 3.5)),
+                       'aperture_corrections': np.array((2.0, 1.5, 1.2)),
+                       'bkg_aperture_inner_radius': 5.0,
+                       'bkg_aperture_outer_radius': 10.0}
+    convolved_data = convolve_data(model.data, 2.0)
+    finder = JWSTSourceFinder(np.full(model.data.shape, 0.3), 10)
+    segment_img = finder(convolved_data)
+    catalog = JWSTSourceCatalog(model, segment_img, convolved_data, 2.0,
+                                aperture_params, 0.0, (2.0, 1.8))
+    catalog.convert_to_jy()
+    catalog.set_segment_properties()
+    # include sources that partially overlap or do not overlap the data
+    catalog.xypos[:3] = ((-4.2, 80.0), (259.7, 241.5), (np.nan, 3.0))
+    aperture_sums, aperture_sum_errs, bkg_median, bkg_median_err = (
+        catalog._aperture_photometry)
+
+    xypos = catalog._xypos_finite
+    apertures = [CircularAperture(xypos, radius)
+                 for radius in aperture_params['aperture_radii']]
+    expected = aperture_photometry(model.data, apertures, error=model.err)
+    for i in range(len(apertures)):
+        assert_equal(aperture_sums[i], expected[f'aperture_sum_{i}'])
+        assert_equal(aperture_sum_errs[i], expected[f'aperture_sum_err_{i}'])
+    assert np.isnan(aperture_sums[0][2])
+
+    masks = CircularAnnulus(xypos, 5.0, 10.0).to_mask(method='center')
+    sigclip = SigmaClip(sigma=3.)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        values = [sigclip(mask.get_values(model.data.value), masked=False)
+                  for mask in masks]
+        nvalues = np.array([len(vals) for vals in values])
+        expected_median = np.array([np.median(vals) for vals in values])
+        expected_err = (np.sqrt(np.pi / (2. * nvalues))
+                        * np.array([np.std(vals) for vals in values]))
+    assert_allclose(bkg_median.value, expected_median)
+    assert_allclose(bkg_median_err.value, expected_err)
+    assert np.isnan(bkg_median[2])
+
+
+@pytest.mark.parametrize('box_size', (50, (40, 70)))
+def test_background_cutout(star_field_model, box_size):
+    """ Test the background of cutouts against the background of the image """
+    model = star_field_model
+    # the image shape (240, 260) is not a multiple of the box size
+    coverage_mask = model.wht == 0
+    bkg = JWSTBackground(model.data, box_size=box_size,
+                         coverage_mask=coverage_mask)
+    for slices in ((slice(0, 240), slice(0, 260)),
+                   (slice(0, 37), slice(5, 90)),
+                   (slice(101, 240), slice(183, 260)),
+                   (slice(77, 78), slice(130, 131))):
+        assert_allclose(bkg.background_cutout(slices),
+                        bkg.background[slices], rtol=1e-10, atol=1e-12)
+        assert_allclose(bkg.background_rms_cutout(slices),
+                        bkg.background_rms[slices], rtol=1e-10, atol=1e-12)
+
+
+def test_make_tiles():
+    tiles = make_tiles((250, 100), 100, 20)
+    assert len(tiles) == 3
+    assert tiles[0] == ((slice(0, 100), slice(0, 100)),
+                        (slice(0, 120), slice(0, 100)))
+    assert tiles[2] == ((slice(200, 250), slice(0, 100)),
+                        (slice(180, 250), slice(0, 100)))
+
+
+@pytest.mark.parametrize('num_cores', (1, 2))
+def test_tiled_source_catalog(star_field_model, num_cores):
+    """ Test the tiled catalog against the catalog of the whole image """
+    model = star_field_model
+    aperture_params = {'aperture_ee': (30, 50, 70),
+                       'aperture_radii': np.array((1.0, 2.0, 3.0)),
+                       'aperture_corrections': np.array((2.0, 1.5, 1.2)),
+                       'bkg_aperture_inner_radius': 5.0,
+                       'bkg_aperture_outer_radius': 10.0}
+    coverage_mask = model.wht == 0
+    bkg = JWSTBackground(model.data, box_size=50, coverage_mask=coverage_mask)
+
+    data = model.data.copy()
+    model.data -= bkg.background
+    finder = JWSTSourceFinder(3.0 * bkg.background_rms, 10, deblend=True)
+    convolved_data = convolve_data(model.data, 2.0, mask=coverage_mask)
+    segment_img = finder(convolved_data, mask=coverage_mask)
+    expected = JWSTSourceCatalog(model, segment_img, convolved_data, 2.0,
+                                 aperture_params, 0.0, (2.0, 1.8)).catalog
+    model.data = data
+
+    tiled = JWSTTiledSourceCatalog(model, bkg, 3.0, coverage_mask,
+                                   JWSTSourceFinder(None, 10, deblend=True),
+                                   2.0, aperture_params, 0.0, (2.0, 1.8),
+                                   tile_size=90, tile_overlap=40,
+                                   num_cores=num_cores)
+    catalog = tiled.catalog
+    assert_equal(model.data, data)
+    assert isinstance(tiled.segment_img.data, np.memmap)
+    assert len(tiled.tiles) == 9
+    assert len(catalog) == len(expected) > 10
+    assert catalog.colnames == expected.colnames
+    assert_allclose(np.sort(tiled.segment_img.labels), catalog['label'])
+    assert np.array_equal(tiled.segment_img.data > 0, segment_img.data > 0)
+
+    # same sources, in a different order and with different labels
+    expected = expected[np.lexsort((expected['ycentroid'], expected['xcentroid']))]
+    catalog = catalog[np.lexsort((catalog['ycentroid'], catalog['xcentroid']))]
+    labels = dict(zip(expected['label'], catalog['label']))
+    assert [labels[label] for label in expected['nn_label']] == list(catalog['nn_label'])
+    for colname in expected.colnames:
+        if (colname in ('label', 'nn_label') or colname.startswith('sky_')
+                or 'orientation' in colname):
+            continue
+        assert_allclose(catalog[colname], expected[colname], rtol=1e-6, atol=1e-7)
+    # the orientation of the nearly round sources depends on their position
+    # in the tiles
+    assert_allclose(catalog['orientation'], expected['orientation'], atol=1e-2)
+    assert_allclose(catalog['sky_centroid'].ra.deg, expected['sky_centroid'].ra.deg)
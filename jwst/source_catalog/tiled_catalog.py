@@ -0,0 +1,360 @@
+"""
+Module to calculate the source catalog of a large image in overlapping
+tiles.
+"""
+
+from copy import deepcopy
+import logging
+import math
+import tempfile
+
+from astropy.modeling.models import Shift
+from astropy.table import vstack
+import astropy.units as u
+from astropy.utils import lazyproperty
+import numpy as np
+from photutils.segmentation import SegmentationImage
+from scipy.spatial import KDTree
+
+from stdatamodels.jwst.datamodels import ImageModel
+
+from ..lib.pipe_utils import fork_map, fork_num_cores
+from .detection import convolve_data
+from .source_catalog import JWSTSourceCatalog
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+
+class JWSTTiledSourceCatalog:
+    """
+    Class to detect and measure the sources of a large image in
+    overlapping tiles.
+
+    The image is divided into square tiles of ``tile_size`` pixels.
+    The sources of each tile are detected (and deblended) and measured
+    in the tile extended by ``tile_overlap`` pixels on each side, and
+    only the sources whose peak pixel lies in the tile itself are kept,
+    so that the sources in the overlaps are not duplicated. Sources
+    that are far enough from the edges of the extended tiles have the
+    same properties as when the whole image is processed at once, which
+    requires ``tile_overlap`` to be larger than the largest sources plus
+    the outer radius of the background annulus of the apertures.
+
+    The tiles are processed in parallel with ``num_cores`` processes.
+    The background and the detection threshold of each extended tile
+    are interpolated from the background meshes, and the segmentation
+    image of the whole image is assembled in a temporary file, so the
+    memory needed, beyond the input image and the background meshes,
+    scales with the tile size.
+
+    Parameters
+    ----------
+    model : `ImageModel`
+        The input `ImageModel`.  The background is subtracted from
+        the data of each tile, and the model is not modified.
+
+    bkg : `~jwst.source_catalog.detection.JWSTBackground`
+        The background of the image.
+
+    snr_threshold : float
+        The detection threshold, in units of the background RMS.
+
+    coverage_mask : 2D `~numpy.ndarray` (bool)
+        A boolean mask where `True` values indicate pixels without
+        coverage (no data).
+
+    finder : `~jwst.source_catalog.detection.JWSTSourceFinder`
+        The source finder used in each tile, with the threshold of the
+        tile.
+
+    kernel_fwhm : float
+        The full-width at half-maximum (FWHM) of the 2D Gaussian kernel
+        used to convolve the data.
+
+    aperture_params : `dict`
+        A dictionary containing the aperture parameters (radii, aperture
+        corrections, and background annulus inner and outer radii).
+
+    abvega_offset : float
+        Offset to convert from AB to Vega magnitudes.  The value
+        represents m_AB - m_Vega.
+
+    ci_star_thresholds : array-like of 2 floats
+        The concentration index thresholds for determining whether
+        a source is a star.
+
+    tile_size : int
+        The size of the (square) tiles in pixels.
+
+    tile_overlap : int
+        The number of pixels by which the tiles are extended on each
+        side to detect and measure their sources.
+
+    num_cores : int, optional
+        The number of processes used to process the tiles.
+
+    make_segment_img : bool, optional
+        Whether to assemble the segmentation image of the whole image.
+    """
+
+    def __init__(self, model, bkg, snr_threshold, coverage_mask, finder,
+                 kernel_fwhm, aperture_params, abvega_offset,
+                 ci_star_thresholds, tile_size, tile_overlap, num_cores=1,
+                 make_segment_img=True):
+
+        if not isinstance(model, ImageModel):
+            raise ValueError('The input model must be a ImageModel.')
+        if tile_size < 1 or tile_overlap < 0:
+            raise ValueError('tile_size must be positive and tile_overlap '
+                             'must not be negative.')
+        self.model = model
+        self.bkg = bkg
+        self.snr_threshold = snr_threshold
+        self.coverage_mask = coverage_mask
+        self.finder = finder
+        self.kernel_fwhm = kernel_fwhm
+        self.aperture_params = aperture_params
+        self.abvega_offset = abvega_offset
+        self.ci_star_thresholds = ci_star_thresholds
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.num_cores = num_cores
+        self.make_segment_img = make_segment_img
+
+        self.tiles = make_tiles(model.data.shape, tile_size, tile_overlap)
+
+    @property
+    def catalog(self):
+        """
+        The final source catalog, or `None` if no sources are found.
+        """
+        return self._catalog_and_segment_img[0]
+
+    @property
+    def segment_img(self):
+        """
+        The `~photutils.segmentation.SegmentationImage` of the whole
+        image, memory-mapped from a temporary file, or `None` if no
+        sources are found or if ``make_segment_img`` is `False`.
+        """
+        return self._catalog_and_segment_img[1]
+
+    @lazyproperty
+    def _catalog_and_segment_img(self):
+        ntiles = len(self.tiles)
+        num_cores = fork_num_cores(min(self.num_cores, ntiles), 'source catalog tiles')
+
+        log.info(f'Detecting and measuring sources in {ntiles} tiles of '
+                 f'{self.tile_size} pixels using {num_cores} processes')
+
+        # The background meshes are estimated on the whole image before
+        # the worker processes are started
+        self.bkg.background_mesh
+        self.bkg.background_rms_mesh
+
+        segm = None
+        if self.make_segment_img:
+            # the file is removed once the array is no longer used
+            with tempfile.TemporaryFile(prefix='jwst_segm_') as segm_file:
+                segm = np.memmap(segm_file, dtype=np.uint32, mode='w+',
+                                 shape=self.model.data.shape)
+
+        # The worker processes inherit the tiled catalog, and return the
+        # catalogs of the tiles and the segmentation images of the sources
+        # they keep.
+        if num_cores > 1:
+            tile_catalogs = fork_map(self._tile_catalog, range(ntiles), num_cores)
+        else:
+            tile_catalogs = map(self._tile_catalog, range(ntiles))
+        catalogs = self._merge_tiles(tile_catalogs, segm)
+
+        if not catalogs:
+            log.warning('No sources were found. Source catalog will not '
+                        'be created.')
+            return None, None
+
+        catalog = vstack(catalogs, metadata_conflicts='silent')
+        catalog.meta.update(catalogs[0].meta)
+        _set_nearest_neighbors(catalog)
+        catalog = JWSTSourceCatalog.format_columns(catalog)
+
+        log.info(f'Detected {len(catalog)} sources')
+        return catalog, None if segm is None else SegmentationImage(segm)
+
+    def _merge_tiles(self, results, segm):
+        """
+        Relabel the sources of the tiles consecutively and add them to
+        the segmentation image.
+        """
+        catalogs = []
+        nlabels = 0
+        ntruncated = 0
+        for (_, ext), result in zip(self.tiles, results):
+            if result is None:
+                continue
+            tile_cat, tile_segm, tile_ntruncated = result
+            ntruncated += tile_ntruncated
+
+            labels = np.arange(nlabels + 1, nlabels + len(tile_cat) + 1)
+            if segm is not None:
+                lookup = np.zeros(tile_segm.max() + 1, dtype=np.uint32)
+                lookup[tile_cat['label']] = labels
+                kept = tile_segm > 0
+                segm[ext][kept] = lookup[tile_segm[kept]]
+            tile_cat['label'] = labels
+            nlabels += len(tile_cat)
+            catalogs.append(tile_cat)
+
+        if ntruncated:
+            log.warning(f'{ntruncated} sources extend beyond the overlap of '
+                        'the tiles and may be truncated. Consider increasing '
+                        'tile_overlap.')
+        return catalogs
+
+    def _tile_catalog(self, tile_index):
+        """
+        Detect and measure the sources of a tile.
+
+        Returns the catalog of the sources whose peak is in the tile, in
+        the pixel coordinates of the whole image, the segmentation image
+        of the extended tile restricted to these sources (or `None`) and
+        the number of these sources that touch the edges of the extended
+        tile, or `None` if the tile has no sources.
+        """
+        core, ext = self.tiles[tile_index]
+        coverage_mask = self.coverage_mask[ext]
+        if coverage_mask[_relative_slices(core, ext)].all():
+            return None
+
+        y0, x0 = ext[0].start, ext[1].start
+        data = self.model.data[ext].copy()
+        data -= self.bkg.background_cutout(ext)
+        model = ImageModel(data=data, err=self.model.err[ext].copy())
+        model.meta.bunit_data = self.model.meta.bunit_data
+        model.meta.bunit_err = self.model.meta.bunit_err
+        model.meta.photometry.pixelarea_steradians = \
+            self.model.meta.photometry.pixelarea_steradians
+        model.meta.wcs = _shift_wcs(self.model.meta.wcs, x0, y0)
+        model.meta.wcsinfo.crpix1 = self.model.meta.wcsinfo.crpix1 - x0
+        model.meta.wcsinfo.crpix2 = self.model.meta.wcsinfo.crpix2 - y0
+
+        convolved_data = convolve_data(model.data, self.kernel_fwhm,
+                                       mask=coverage_mask)
+        threshold = self.snr_threshold * self.bkg.background_rms_cutout(ext)
+        segment_img = self.finder.detect(convolved_data, mask=coverage_mask,
+                                         threshold=threshold)
+        if segment_img is None:
+            return None
+
+        catobj = JWSTSourceCatalog(model, segment_img, convolved_data,
+                                   self.kernel_fwhm, self.aperture_params,
+                                   self.abvega_offset, self.ci_star_thresholds)
+        catalog = catobj.catalog
+
+        # keep the sources whose peak is in the tile
+        xpeak = np.asarray(catobj._xpeak) + x0
+        ypeak = np.asarray(catobj._ypeak) + y0
+        kept = ((ypeak >= core[0].start) & (ypeak < core[0].stop)
+                & (xpeak >= core[1].start) & (xpeak < core[1].stop))
+        if not kept.any():
+            return None
+        catalog = catalog[kept]
+        catalog['xcentroid'] += x0
+        catalog['ycentroid'] += y0
+
+        # sources touching the edges of the extended tile (but not the
+        # edges of the image) are truncated
+        shape = self.model.data.shape
+        ntruncated = 0
+        for slc in np.array(segment_img.slices, dtype=object)[kept]:
+            ntruncated += ((slc[0].start == 0 and y0 > 0)
+                           or (slc[1].start == 0 and x0 > 0)
+                           or (slc[0].stop == model.data.shape[0] and ext[0].stop < shape[0])
+                           or (slc[1].stop == model.data.shape[1] and ext[1].stop < shape[1]))
+
+        tile_segm = None
+        if self.make_segment_img:
+            tile_segm = segment_img.data.copy()
+            tile_segm[~np.isin(tile_segm, catalog['label'])] = 0
+
+        return catalog, tile_segm, ntruncated
+
+
+def make_tiles(shape, tile_size, tile_overlap):
+    """
+    Divide an image into square tiles.
+
+    Parameters
+    ----------
+    shape : tuple of 2 int
+        The shape of the image.
+
+    tile_size : int
+        The size of the tiles in pixels. The tiles on the right and top
+        edges of the image may be smaller.
+
+    tile_overlap : int
+        The number of pixels by which the tiles are extended on each
+        side (within the image).
+
+    Returns
+    -------
+    tiles : list of tuples
+        The ``(core, extended)`` tuples of ``(y, x)`` slices of each tile
+        and of the extended tile, in row-major order.
+    """
+    ny, nx = shape
+    tiles = []
+    for j in range(math.ceil(ny / tile_size)):
+        for i in range(math.ceil(nx / tile_size)):
+            core = (slice(j * tile_size, min((j + 1) * tile_size, ny)),
+                    slice(i * tile_size, min((i + 1) * tile_size, nx)))
+            ext = tuple(slice(max(s.start - tile_overlap, 0),
+                              min(s.stop + tile_overlap, n))
+                        for s, n in zip(core, shape))
+            tiles.append((core, ext))
+    return tiles
+
+
+def _relative_slices(core, ext):
+    """The slices of a tile relative to the extended tile."""
+    return tuple(slice(c.start - e.start, c.stop - e.start)
+                 for c, e in zip(core, ext))
+
+
+def _shift_wcs(wcs, x0, y0):
+    """The WCS of a cutout whose first pixel is ``(x0, y0)``."""
+    wcs = deepcopy(wcs)
+    bbox = wcs.bounding_box
+    wcs.insert_transform(wcs.input_frame, Shift(x0) & Shift(y0), after=True)
+    if bbox is not None:
+        (xmin, xmax), (ymin, ymax) = bbox
+        wcs.bounding_box = ((xmin - x0, xmax - x0), (ymin - y0, ymax - y0))
+    return wcs
+
+
+def _set_nearest_neighbors(catalog):
+    """
+    Set the nearest neighbor label and distance of the merged catalog,
+    as `~jwst.source_catalog.source_catalog.JWSTSourceCatalog` does.
+    """
+    if len(catalog) == 1:
+        catalog['nn_label'][:] = -1
+        catalog['nn_dist'][:] = np.nan * u.pixel
+        return
+
+    xypos = np.transpose((np.asarray(catalog['xcentroid']),
+                          np.asarray(catalog['ycentroid'])))
+    nonfinite = ~np.isfinite(xypos).all(axis=1)
+    xypos[~np.isfinite(xypos)] = -1000.
+
+    tree = KDTree(xypos)
+    qdist, qidx = tree.query(xypos, k=[2])
+    nn_label = np.asarray(catalog['label'])[np.transpose(qidx)[0]]
+    nn_dist = np.transpose(qdist)[0]
+    nn_label[nonfinite] = -1
+    nn_dist[nonfinite] = np.nan
+
+    catalog['nn_label'][:] = nn_label
+    catalog['nn_dist'][:] = nn_dist * u.pixel
@@ -0,0 +1,244 @@
+"""
+Local store of absolute astrometric reference catalogs.
+
+A store is a directory with one sub-directory per catalog name
+(for example ``GAIADR3``). The sources of each catalog are partitioned
+into FITS shards by declination zones of constant height, each zone being
+divided into right ascension cells of approximately the same size, so that
+a cone search only reads the few shards overlapping the cone. The tiling
+of the shards is described by the ``index.json`` file of each catalog.
+
+"""
+from functools import lru_cache
+import glob
+import json
+import logging
+import math
+import os
+
+from astropy.table import Table, vstack
+import numpy as np
+
+log = logging.getLogger(__name__)
+log.setLevel(logging.DEBUG)
+
+
+_INDEX_FILENAME = 'index.json'
+
+# number of shards kept in memory by _read_shard
+_SHARD_CACHE_SIZE = 256
+
+
+__all__ = ["write_refcat_store", "query_refcat_store"]
+
+
+def write_refcat_store(catalog, store_dir, catalog_name, zone_height=1.0,
+                       epoch=None, overwrite=False):
+    """
+    Partition a reference catalog into the shards of a local store.
+
+    Parameters
+    ----------
+    catalog : `~astropy.table.Table`
+        The reference catalog. It must have the ``ra``, ``dec``, ``mag``
+        and ``objID`` columns, with the coordinates in degrees. Optional
+        ``GAIAsourceID``, ``epoch``, ``pmra`` and ``pmdec`` columns (the proper
+        motions in mas/yr, ``pmra`` including the cos(dec) factor) are kept.
+    store_dir : str
+        The directory of the store.
+    catalog_name : str
+        The name of the catalog, as used by the ``abs_refcat`` parameter
+        of the tweakreg step (for example 'GAIADR3').
+    zone_height : float, optional
+        The height of the declination zones (and the size of the right
+        ascension cells) of the shards, in degrees.
+    epoch : float, optional
+        The epoch of the catalog coordinates, in decimal years. Required to
+        apply the proper motions when the store is queried.
+    overwrite : bool, optional
+        Replace an existing catalog of the same name.
+
+    Returns
+    -------
+    catalog_dir : str
+        The directory of the catalog in the store.
+    """
+    catalog_dir = os.path.join(store_dir, catalog_name.upper())
+    if os.path.exists(os.path.join(catalog_dir, _INDEX_FILENAME)) and not overwrite:
+        raise OSError(f"Reference catalog {catalog_dir} already exists.")
+    os.makedirs(catalog_dir, exist_ok=True)
+
+    # remove the shards of the previous catalog
+    for filename in glob.glob(os.path.join(catalog_dir, '[0-9]*_[0-9]*.fits')):
+        os.remove(filename)
+
+    ra = np.mod(np.asarray(catalog['ra'], dtype=float), 360.0)
+    dec = np.asarray(catalog['dec'], dtype=float)
+    zones, cells = _shard_cells(ra, dec, zone_height)
+
+    # one shard for each populated cell, sources sorted by shard
+    order = np.lexsort((cells, zones))
+    keys = np.stack((zones[order], cells[order]), axis=1)
+    starts = np.flatnonzero(np.any(np.diff(keys, axis=0), axis=1)) + 1
+    for indices in np.split(order, starts):
+        if len(indices):
+            shard = catalog[indices]
+            shard.write(_shard_filename(catalog_dir, zones[indices[0]], cells[indices[0]]),
+                        overwrite=True)
+
+    with open(os.path.join(catalog_dir, _INDEX_FILENAME), 'w') as f:
+        json.dump({'catalog': catalog_name.upper(), 'zone_height': zone_height,
+                   'epoch': epoch, 'nsources': len(catalog)}, f)
+
+    log.info(f"Wrote {len(catalog)} sources of {catalog_name} in "
+             f"{len(starts) + 1 if len(order) else 0} shards to {catalog_dir}")
+    return catalog_dir
+
+
+def query_refcat_store(store_dir, catalog_name, ra, dec, radius, epoch=None):
+    """
+    Return the sources of a stored reference catalog within a cone.
+
+    Parameters
+    ----------
+    store_dir : str
+        The directory of the store.
+    catalog_name : str
+        The name of the catalog (for example 'GAIADR3').
+    ra, dec : float
+        The center of the cone in degrees.
+    radius : float
+        The radius of the cone in degrees.
+    epoch : float, optional
+        The epoch, in decimal years, to which the positions are moved
+        using the proper motions, if the catalog has them.
+
+    Returns
+    -------
+    ref_table : `~astropy.table.Table`
+        The sources in the same format as the catalogs retrieved from the
+        astrometric catalog web service: ``RA``, ``DEC``, ``mag``, ``objID``,
+        ``epoch`` and ``GaiaID`` columns, sorted from the faintest to the
+        brightest source.
+    """
+    catalog_dir = os.path.join(store_dir, catalog_name.upper())
+    index_filename = os.path.join(catalog_dir, _INDEX_FILENAME)
+    if not os.path.isfile(index_filename):
+        raise OSError(f"No reference catalog {catalog_name.upper()} in the store {store_dir}.")
+    with open(index_filename) as f:
+        index = json.load(f)
+
+    shards = []
+    for zone, cell in _cone_cells(ra, dec, radius, index['zone_height']):
+        filename = _shard_filename(catalog_dir, zone, cell)
+        if os.path.isfile(filename):
+            shards.append(_read_shard(filename, os.stat(filename).st_mtime_ns))
+
+    colnames = ['RA', 'DEC', 'mag', 'objID', 'epoch', 'GaiaID']
+    if not shards:
+        log.info(f"No sources of {catalog_name.upper()} found in the store.")
+        return Table(names=colnames, dtype=(float, float, float, 'i8', float, 'U25'))
+    sources = vstack(shards, metadata_conflicts='silent')
+
+    src_ra = np.asarray(sources['ra'], dtype=float)
+    src_dec = np.asarray(sources['dec'], dtype=float)
+    if (epoch is not None and index['epoch'] is not None
+            and 'pmra' in sources.colnames and 'pmdec' in sources.colnames):
+        dt = (epoch - index['epoch']) / 3.6e6  # mas to degrees
+        pmra = np.nan_to_num(np.asarray(sources['pmra'], dtype=float))
+        pmdec = np.nan_to_num(np.asarray(sources['pmdec'], dtype=float))
+        src_ra = src_ra + dt * pmra / np.cos(np.deg2rad(src_dec))
+        src_dec = src_dec + dt * pmdec
+
+    in_cone = _angular_separation(ra, dec, src_ra, src_dec) <= radius
+    sources = sources[in_cone]
+
+    ref_table = Table()
+    ref_table['RA'] = np.mod(src_ra[in_cone], 360.0)
+    ref_table['DEC'] = src_dec[in_cone]
+    ref_table['mag'] = sources['mag']
+    ref_table['objID'] = sources['objID']
+    if 'epoch' in sources.colnames:
+        ref_table['epoch'] = sources['epoch']
+    else:
+        ref_table['epoch'] = np.full(len(sources), np.nan if index['epoch'] is None
+                                     else index['epoch'])
+    if 'GAIAsourceID' in sources.colnames:
+        ref_table['GaiaID'] = np.asarray(sources['GAIAsourceID']).astype('U25')
+    else:
+        ref_table['GaiaID'] = np.full(len(sources), '-1', dtype='U25')
+
+    ref_table.meta['catalog'] = catalog_name.upper()
+    ref_table.meta['gaia_only'] = False
+
+    # sort table by magnitude, fainter to brightest
+    ref_table.sort('mag', reverse=True)
+
+    log.info(f"Found {len(ref_table)} sources of {catalog_name.upper()} "
+             f"in {len(shards)} shards of the store.")
+    return ref_table
+
+
+def _shard_filename(catalog_dir, zone, cell):
+    return os.path.join(catalog_dir, f'{zone:04d}_{cell:05d}.fits')
+
+
+@lru_cache(maxsize=_SHARD_CACHE_SIZE)
+def _read_shard(filename, mtime):
+    """Read a shard; the modification time invalidates the cached shards."""
+    return Table.read(filename)
+
+
+def _zone_ncells(zones, zone_height):
+    """Number of right ascension cells of the declination zones."""
+    # cells of the zone are (about) as wide as the zone is high at its center
+    center = np.deg2rad((np.asarray(zones) + 0.5) * zone_height - 90.0)
+    return np.maximum((360.0 / zone_height * np.cos(center)).astype(int), 1)
+
+
+def _shard_cells(ra, dec, zone_height):
+    """Return the declination zones and right ascension cells of positions."""
+    nzones = math.ceil(180.0 / zone_height)
+    zones = np.clip(np.floor((dec + 90.0) / zone_height).astype(int), 0, nzones - 1)
+    ncells = _zone_ncells(zones, zone_height)
+    cells = np.minimum((ra / 360.0 * ncells).astype(int), ncells - 1)
+    return zones, cells
+
+
+def _cone_cells(ra, dec, radius, zone_height):
+    """Return the (zone, cell) of all the shards overlapping a cone."""
+    nzones = math.ceil(180.0 / zone_height)
+    zone_min = max(int(math.floor((dec - radius + 90.0) / zone_height)), 0)
+    zone_max = min(int(math.floor((dec + radius + 90.0) / zone_height)), nzones - 1)
+
+    # half width in right ascension of the cone, all of it if it covers a pole
+    if abs(dec) + radius >= 90.0:
+        half_width = 180.0
+    else:
+        half_width = math.degrees(math.asin(min(math.sin(math.radians(radius))
+                                                / math.cos(math.radians(dec)), 1.0)))
+
+    cells = []
+    for zone in range(zone_min, zone_max + 1):
+        ncells = int(_zone_ncells(zone, zone_height))
+        if half_width >= 180.0:
+            cells.extend((zone, cell) for cell in range(ncells))
+            continue
+        first = int(math.floor((ra - half_width) / 360.0 * ncells))
+        last = int(math.floor((ra + half_width) / 360.0 * ncells))
+        zone_cells = {cell % ncells for cell in range(first, last + 1)}
+        cells.extend((zone, cell) for cell in sorted(zone_cells))
+    return cells
+
+
+def _angular_separation(ra1, dec1, ra2, dec2):
+    """Angular separation in degrees (Vincenty formula)."""
+    lon1, lat1, lon2, lat2 = (np.deg2rad(v) for v in (ra1, dec1, ra2, dec2))
+    sdlon = np.sin(lon2 - lon1)
+    cdlon = np.cos(lon2 - lon1)
+    slat1, clat1 = np.sin(lat1), np.cos(lat1)
+    slat2, clat2 = np.sin(lat2), np.cos(lat2)
+    num1 = clat2 * sdlon
+    num2 = clat1 * slat2 - slat1 * clat2 * cdlon
+    denominator = slat1 * slat2 + clat1 * clat2 * cdlon
+    return np.rad2deg(np.arctan2(np.hypot(num1, num2), denominator))
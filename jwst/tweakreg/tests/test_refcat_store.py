@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+from astropy.table import Table
+
+from jwst.tweakreg.refcat_store import query_refcat_store, write_refcat_store
+from jwst.tweakreg.refcat_store import _angular_separation, _read_shard
+
+
+@pytest.fixture(scope='module')
+def sky_catalog():
+    """ Random sources on the whole sky """
+    rng = np.random.default_rng(45)
+    nsources = 5000
+    ra = rng.uniform(0, 360, nsources)
+    dec = np.rad2deg(np.arcsin(rng.uniform(-1, 1, nsources)))
+    return Table({
+        'ra': ra,
+        'dec': dec,
+        'mag': rng.uniform(10, 20, nsources),
+        'objID': np.arange(nsources),
+        'GAIAsourceID': [str(i + 1000) for i in range(nsources)],
+    })
+
+
+@pytest.fixture(scope='module')
+def sky_store(tmp_path_factory, sky_catalog):
+    """ Store of the sky catalog """
+    store_dir = tmp_path_factory.mktemp('refcat')
+    write_refcat_store(sky_catalog, store_dir, 'gaiadr3', zone_height=10.0)
+    return store_dir
+
+
+@pytest.mark.parametrize('ra, dec, radius', [
+    (150.0, 2.0, 3.0),
+    (0.5, -30.0, 4.0),
+    (359.0, 45.0, 2.5),
+    (80.0, 88.0, 3.0),
+    (200.0, -89.5, 3.0),
+])
+def test_query_refcat_store(sky_store, sky_catalog, ra, dec, radius):
+    """ Test the sources in a cone against a brute force search """
+    result = query_refcat_store(sky_store, 'GAIADR3', ra, dec, radius)
+
+    in_cone = _angular_separation(ra, dec, sky_catalog['ra'], sky_catalog['dec']) <= radius
+    assert np.count_nonzero(in_cone) > 0
+    assert sorted(result['objID']) == sorted(sky_catalog['objID'][in_cone])
+    assert result.colnames == ['RA', 'DEC', 'mag', 'objID', 'epoch', 'GaiaID']
+    assert result.meta['catalog'] == 'GAIADR3'
+
+    # same format as the catalogs from the web service
+    assert np.all(np.diff(result['mag']) <= 0)
+    expected = dict(zip(sky_catalog['objID'], sky_catalog['GAIAsourceID']))
+    assert all(gaia_id == expected[obj_id] for obj_id, gaia_id in zip(result['objID'], result['GaiaID']))
+
+
+def test_query_refcat_store_proper_motion(tmp_path):
+    """ Test the positions are moved to the requested epoch """
+    catalog = Table({
+        'ra': [10.0, 10.01],
+        'dec': [60.0, 60.01],
+        'mag': [15.0, 16.0],
+        'objID': [1, 2],
+        'pmra': [3600.0, np.nan],
+        'pmdec': [-360.0, np.nan],
+    })
+    write_refcat_store(catalog, tmp_path, 'GAIADR3', epoch=2016.0)
+
+    result = query_refcat_store(tmp_path, 'GAIADR3', 10.0, 60.0, 0.1, epoch=2026.0)
+    result.sort('objID')
+    np.testing.assert_allclose(result['RA'], [10.0 + 0.01 / np.cos(np.deg2rad(60.0)), 10.01])
+    np.testing.assert_allclose(result['DEC'], [59.999, 60.01])
+    np.testing.assert_array_equal(result['epoch'], [2016.0, 2016.0])
+
+    # without an epoch the catalog positions are returned
+    result = query_refcat_store(tmp_path, 'GAIADR3', 10.0, 60.0, 0.1)
+    result.sort('objID')
+    np.testing.assert_array_equal(result['RA'], catalog['ra'])
+
+
+def test_refcat_store_cache(tmp_path, sky_catalog):
+    """ Test the shards are only read once, unless they are rewritten """
+    near = _angular_separation(30.0, 10.0, sky_catalog['ra'], sky_catalog['dec']) < 20.0
+    catalog = sky_catalog[near]
+    write_refcat_store(catalog, tmp_path, 'GAIADR3', zone_height=10.0)
+    _read_shard.cache_clear()
+    first = query_refcat_store(tmp_path, 'GAIADR3', 30.0, 10.0, 8.0)
+    misses = _read_shard.cache_info().misses
+    second = query_refcat_store(tmp_path, 'GAIADR3', 30.0, 10.0, 8.0)
+    assert len(first) > 1
+    assert _read_shard.cache_info().misses == misses
+    assert first.colnames == second.colnames
+    for name in first.colnames:
+        np.testing.assert_array_equal(first[name], second[name])
+
+    with pytest.raises(OSError):
+        write_refcat_store(catalog[:10], tmp_path, 'GAIADR3')
+    write_refcat_store(catalog[::2], tmp_path, 'GAIADR3', zone_height=10.0, overwrite=True)
+    third = query_refcat_store(tmp_path, 'GAIADR3', 30.0, 10.0, 8.0)
+    assert set(third['objID']) < set(first['objID'])
+
+
+def test_refcat_store_missing_catalog(tmp_path, sky_store, sky_catalog):
+    with pytest.raises(OSError, match='No reference catalog GAIADR2'):
+        query_refcat_store(sky_store, 'GAIADR2', 30.0, 10.0, 1.5)
+
+    # no sources in the cone
+    write_refcat_store(sky_catalog[:1], tmp_path, 'GAIADR1')
+    ra, dec = sky_catalog['ra'][0], sky_catalog['dec'][0]
+    result = query_refcat_store(tmp_path, 'GAIADR1', ra + 180.0, -dec, 1.0)
+    assert len(result) == 0
+    assert result.colnames == ['RA', 'DEC', 'mag', 'objID', 'epoch', 'GaiaID']
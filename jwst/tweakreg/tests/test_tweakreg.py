@@ -11,9 +11,10 @@ from astropy.table import Table
 from gwcs.wcstools import grid_from_bounding_box
 from stdatamodels.jwst.datamodels import ImageModel
 
-from jwst.datamodels import ModelContainer
+from jwst.datamodels import ModelContainer, ModelLibrary
 from jwst.tweakreg import tweakreg_step
 from jwst.tweakreg import tweakreg_catalog
+from jwst.tweakreg.refcat_store import write_refcat_store
 from stcal.tweakreg.utils import _wcsinfo_from_wcs_transform
 from stcal.tweakreg import tweakreg as twk
 
@@ -214,6 +215,97 @@ def test_tweakreg_step(example_input, with_shift):
         assert abs_delta < 1E-12
 
 
+@pytest.mark.parametrize("in_memory", [True, False])
+def test_find_sources_parallel(example_input, in_memory, tmp_cwd):
+    """
+    Test the source catalogs found using several processes
+    are the same as the ones found serially
+    """
+    example_input[1].data[:-9] = example_input[1].data[9:]
+    example_input[1].data[-9:] = BKG_LEVEL
+    example_input[0].meta.group_id = 'a'
+    example_input[1].meta.group_id = 'b'
+
+    if in_memory:
+        images = ModelLibrary(example_input)
+    else:
+        # an on_disk library needs an association
+        for model in example_input:
+            model.save(model.meta.filename)
+        asn = {
+            'asn_id': 'o001',
+            'products': [{
+                'name': 'product_a',
+                'members': [{'expname': model.meta.filename, 'exptype': 'science'}
+                            for model in example_input],
+            }],
+        }
+        images = ModelLibrary(asn, on_disk=True)
+
+    step = tweakreg_step.TweakRegStep()
+    catalogs = step._find_all_sources(images, 2)
+
+    assert len(catalogs) == 2
+    with images:
+        for index, model in enumerate(images):
+            expected = step._find_sources(model)
+            assert len(catalogs[index]) > 0
+            assert catalogs[index].colnames == expected.colnames
+            assert catalogs[index].meta.keys() == expected.meta.keys()
+            for name in expected.colnames:
+                assert catalogs[index][name].unit == expected[name].unit
+                np.testing.assert_array_equal(catalogs[index][name], expected[name])
+            images.shelve(model, index, modify=False)
+
+    # the aligned wcs do not depend on the number of processes
+    results = [tweakreg_step.TweakRegStep(maximum_cores=cores)(example_input.copy())
+               for cores in ('1', '2')]
+    values = []
+    for result in results:
+        with result:
+            model = result.borrow(1)
+            assert model.meta.cal_step.tweakreg == 'COMPLETE'
+            values.append(model.meta.wcs(0, 0))
+            result.shelve(model, 1, modify=False)
+    np.testing.assert_array_equal(values[0], values[1])
+
+
+def test_abs_refcat_store(example_input, tmp_path):
+    """
+    Test the alignment to a reference catalog from a local store
+    """
+    # the reference sources are the sources of the first image, shifted
+    # by half a pixel to make a correction of the wcs
+    y, x = np.nonzero(example_input[0].data == 0.8)
+    ra, dec = example_input[0].meta.wcs(x + 0.5, y)
+    catalog = Table({
+        'ra': ra,
+        'dec': dec,
+        'mag': np.linspace(15, 20, len(ra)),
+        'objID': np.arange(len(ra)),
+    })
+    write_refcat_store(catalog, tmp_path, REFCAT)
+
+    example_input[0].meta.group_id = 'a'
+    example_input[1].meta.group_id = 'b'
+    step = tweakreg_step.TweakRegStep(abs_refcat=REFCAT, abs_refcat_dir=str(tmp_path),
+                                      save_abs_catalog=True, output_dir=str(tmp_path))
+    result = step(example_input)
+
+    with result:
+        for index, model in enumerate(result):
+            assert model.meta.cal_step.tweakreg == 'COMPLETE'
+            assert model.meta.wcs.name == f"FIT-LVL3-{REFCAT}"
+            if index == 0:
+                # the reference sources now match the sources of the image
+                x_ref = np.mean(model.meta.wcs.invert(ra, dec)[0] - x)
+            result.shelve(model, index, modify=False)
+    assert abs(x_ref) < 0.05
+
+    saved = Table.read(tmp_path / f"fit_{REFCAT.lower()}_ref.ecsv")
+    assert sorted(saved['objID']) == list(catalog['objID'])
+
+
 @pytest.mark.parametrize("alignment_type", ['', 'abs_'])
 def test_src_confusion_pars(example_input, alignment_type):
     # assign images to different groups (so they are aligned to each other)
@@ -4,21 +4,27 @@ JWST pipeline step for image alignment.
 :Authors: Mihai Cara
 
 """
+from functools import partial
 from os import path
+import tempfile
 
 from astropy.table import Table
 from astropy.time import Time
 from tweakwcs.correctors import JWSTWCSCorrector
 
 import stcal.tweakreg.tweakreg as twk
+from stcal.alignment import wcs_from_footprints
+from stcal.tweakreg.astrometric_utils import compute_radius
 
 from jwst.stpipe import record_step_status
 from jwst.assign_wcs.util import update_fits_wcsinfo, update_s_region_imaging
 from jwst.datamodels import ModelLibrary
+from jwst.lib.pipe_utils import compute_num_cores, fork_map, fork_num_cores
 
 # LOCAL
 from ..stpipe import Step
 from .tweakreg_catalog import make_tweakreg_catalog
+from .refcat_store import query_refcat_store
 
 
 def _oxford_or_str_join(str_list):
@@ -99,6 +105,7 @@ class TweakRegStep(Step):
         # Absolute catalog options
         abs_refcat = string(default='')  # Catalog file name or one of: {_SINGLE_GROUP_REFCAT_STR}, or None, or ''
         save_abs_catalog = boolean(default=False)  # Write out used absolute astrometric reference catalog as a separate product
+        abs_refcat_dir = string(default=None)  # Local store of the reference catalogs used instead of the web service
 
         # Absolute catalog align wcs options
         abs_minobj = integer(default=15) # Minimum number of objects acceptable for matching when performing absolute astrometry
@@ -120,7 +127,10 @@ class TweakRegStep(Step):
         sip_max_inv_pix_error = float(default=0.01)  # max err for SIP fit, inverse.
         sip_inv_degree = integer(max=6, default=None)  # degree for inverse SIP fit, None to use best fit.
         sip_npoints = integer(default=12)  #  number of points for SIP
-        
+
+        # multiprocessing options
+        maximum_cores = string(default='1')  # cores for source finding: an integer, 'half', 'quarter' or 'all'
+
         # stpipe general options
         output_use_model = boolean(default=True)  # When saving use `DataModel.meta.filename`
         in_memory = boolean(default=True)  # If False, preserve memory using temporary files at expense of runtime
@@ -190,15 +200,20 @@ class TweakRegStep(Step):
         # pre-allocate collectors (same length and order as images)
         correctors = [None] * len(images)
 
+        # find the sources of all images in parallel (if requested), only
+        # the alignment below needs all the catalogs at once
+        num_cores = fork_num_cores(
+            compute_num_cores(self.maximum_cores, max_tasks=len(images)), 'source finding')
+        if num_cores > 1:
+            found_catalogs = self._find_all_sources(
+                images, num_cores, catdict if use_custom_catalogs else None)
+        else:
+            found_catalogs = None
+
         # Build the catalog and corrector for each input images
         with images:
             for (model_index, image_model) in enumerate(images):
-                # now that the model is open, check its metadata for a custom catalog
-                # only if it's not listed in the catdict
-                if use_custom_catalogs and image_model.meta.filename not in catdict:
-                    if (image_model.meta.tweakreg_catalog is not None and image_model.meta.tweakreg_catalog.strip()):
-                        catdict[image_model.meta.filename] = image_model.meta.tweakreg_catalog
-                if use_custom_catalogs and catdict.get(image_model.meta.filename, None) is not None:
+                if use_custom_catalogs and _custom_catalog_name(image_model, catdict) is not None:
                     image_model.meta.tweakreg_catalog = catdict[image_model.meta.filename]
                     # use user-supplied catalog:
                     self.log.info("Using user-provided input catalog "
@@ -208,8 +223,11 @@ class TweakRegStep(Step):
                     )
                     save_catalog = False
                 else:
-                    # source finding
-                    catalog = self._find_sources(image_model)
+                    # source finding (unless already done in parallel)
+                    if found_catalogs is not None:
+                        catalog = found_catalogs[model_index]
+                    else:
+                        catalog = self._find_sources(image_model)
 
                     # only save if catalog was computed from _find_sources and
                     # the user requested save_catalogs
@@ -283,11 +301,15 @@ class TweakRegStep(Step):
         # absolute alignment to the reference catalog
         # can (and does) occur after alignment between groups
         if align_to_abs_refcat:
-            with images:
+            with images, tempfile.TemporaryDirectory() as refcat_dir:
                 ref_image = images.borrow(0)
                 try:
+                    abs_refcat = self.abs_refcat
+                    if (self.abs_refcat_dir is not None and
+                            abs_refcat.strip().upper() in SINGLE_GROUP_REFCAT):
+                        abs_refcat = self._query_refcat_store(correctors, ref_image, refcat_dir)
                     correctors = \
-                        twk.absolute_align(correctors, self.abs_refcat,
+                        twk.absolute_align(correctors, abs_refcat,
                                         ref_wcs=ref_image.meta.wcs,
                                         ref_wcsinfo=ref_image.meta.wcsinfo.instance,
                                         epoch=Time(ref_image.meta.observation.date).decimalyear,
@@ -445,6 +467,104 @@ class TweakRegStep(Step):
             starfinder_kwargs=starfinder_kwargs,
         )
 
+    def _query_refcat_store(self, correctors, ref_image, refcat_dir):
+        """Retrieve the absolute reference catalog from the local store.
+
+        The catalog covers the combined footprint of the aligned images,
+        like the catalogs retrieved from the astrometric catalog web service,
+        and is written to a file that is passed to the absolute alignment
+        instead of the catalog name.
+
+        Parameters
+        ----------
+        correctors : list
+            The WCS correctors of all the images.
+        ref_image : ImageModel
+            The image defining the reference WCS of the combined footprint.
+        refcat_dir : str
+            Directory for the (temporary) catalog file, unless the catalog
+            is saved (``save_abs_catalog``).
+
+        Returns
+        -------
+        filename : str
+            The name of the reference catalog file.
+        """
+        catalog_name = self.abs_refcat.strip().upper()
+        combined_wcs = wcs_from_footprints(
+            [corrector.wcs for corrector in correctors],
+            ref_wcs=ref_image.meta.wcs,
+            ref_wcsinfo=ref_image.meta.wcsinfo.instance,
+        )
+        radius, fiducial = compute_radius(combined_wcs)
+        ref_cat = query_refcat_store(
+            self.abs_refcat_dir, catalog_name, fiducial[0], fiducial[1], radius,
+            epoch=Time(ref_image.meta.observation.date).decimalyear,
+        )
+
+        root = f"fit_{catalog_name.lower()}_ref.ecsv"
+        if self.save_abs_catalog:
+            filename = root if self.output_dir is None else path.join(self.output_dir, root)
+        else:
+            filename = path.join(refcat_dir, root)
+        ref_cat.write(filename, format='ascii.ecsv', overwrite=True)
+        return filename
+
+    def _find_all_sources(self, images, num_cores, catdict=None):
+        """Find the sources of all the images using multiple processes.
+
+        Parameters
+        ----------
+        images : ModelLibrary
+            The images to find the sources in. The library must not be open.
+        num_cores : int
+            Number of processes to use.
+        catdict : dict or None
+            Custom catalog filenames of the images (see ``_parse_catfile``),
+            or None if custom catalogs are not used.
+
+        Returns
+        -------
+        catalogs : list
+            The source catalogs (`~astropy.table.Table`) in the order of
+            the images; None for the images with a custom catalog.
+        """
+        self.log.info(f'Finding sources in {len(images)} images using {num_cores} processes')
+
+        # The worker processes inherit the step and the library, borrow the
+        # images themselves and return the catalogs.
+        worker = partial(_find_sources_worker, self, images, catdict)
+        return list(fork_map(worker, range(len(images)), num_cores))
+
+
+def _find_sources_worker(step, images, catdict, model_index):
+    """Worker process function: find the sources of one image.
+
+    Returns the catalog, with its units and metadata, or None if the image
+    has a custom catalog.
+    """
+    with images:
+        image_model = images.borrow(model_index)
+        try:
+            if catdict is not None and _custom_catalog_name(image_model, catdict) is not None:
+                return None
+            return step._find_sources(image_model)
+        finally:
+            images.shelve(image_model, model_index, modify=False)
+
+
+def _custom_catalog_name(image_model, catdict):
+    """
+    Return the custom catalog filename of an image model, or None.
+
+    Now that the model is open, check its metadata for a custom catalog
+    only if it's not listed in the catdict (which is then updated).
+    """
+    if image_model.meta.filename not in catdict:
+        if (image_model.meta.tweakreg_catalog is not None and image_model.meta.tweakreg_catalog.strip()):
+            catdict[image_model.meta.filename] = image_model.meta.tweakreg_catalog
+    return catdict.get(image_model.meta.filename, None)
+
 
 def _parse_catfile(catfile):
     """
@@ -1,38 +1,35 @@
 import numpy as np
 import warnings
 
-from scipy.interpolate import interp1d
-
+from ..assign_wcs.util import is_elementwise
 from ..lib.winclip import get_clipped_pixels
 from .sens1d import create_1d_sens
 
+# Maximum number of dispersed positions computed in one transform call
+_MAX_POINTS = 2 ** 20
+
 
-def dispersed_pixel(x0, y0, width, height, lams, flxs, order, wmin, wmax,
-                    sens_waves, sens_resp, seg_wcs, grism_wcs, ID, naxis,
-                    oversample_factor=2, extrapolate_sed=False, xoffset=0,
-                    yoffset=0):
+def disperse_pixels(x0, y0, width, height, flxs, order, wmin, wmax,
+                    sens_waves, sens_resp, seg_wcs, grism_wcs, naxis,
+                    oversample_factor=2, xoffset=0, yoffset=0):
     """
-    This function take a list of pixels and disperses them using the information contained
-    in the grism image WCS object and returns a list of dispersed pixels and fluxes.
+    Disperse a list of pixels of the direct image with a single flux value each.
+
+    The pixels are dispersed using the information contained in the grism
+    image WCS object, evaluating the WCS transforms for many pixels at once.
 
     Parameters
     ----------
     x0 : float array
-        Array of x-coordinates of the centers of the pixels. One value for each
-        direct image, so if only 1 direct image is in use, this is a single value.
+        Array of x-coordinates of the centers of the pixels.
     y0 : float array
-        Array of y-coordinates of the centers of the pixels. One value for each
-        direct image, so if only 1 direct image is in use, this is a single value.
+        Array of y-coordinates of the centers of the pixels.
     width : float
         Width of the pixels to be dispersed.
     height : float
         Height of the pixels to be dispersed.
-    lams : float array
-        Array of wavelengths corresponding to the fluxes (flxs) for each pixel.
-        One wavelength per direct image, so can be a single value.
     flxs : float array
-        Array of fluxes (flam) for the pixels contained in x0, y0. If a single
-        direct image is in use, this will be a single value.
+        Array of fluxes (flam) of the pixels, used at all wavelengths.
     order : int
         The spectral order to disperse.
     wmin : float
@@ -47,16 +44,11 @@ def dispersed_pixel(x0, y0, width, height, lams, flxs, order, wmin, wmax,
         The WCS object of the segmentation map.
     grism_wcs : WCS object
         The WCS object of the grism image.
-    ID : int
-        The ID of the object to which the pixel belongs.
     naxis : tuple
         Dimensions (shape) of grism image into which pixels are dispersed.
     oversample_factor : int
-        The amount of oversampling required above that of the input spectra or natural dispersion,
-        whichever is smaller. Default=2.
-    extrapolate_sed : bool
-        Whether to allow for the SED of the object to be extrapolated when it does not fully cover the
-        needed wavelength range. Default if False.
+        The amount of oversampling required above that of the natural dispersion.
+        Default=2.
     xoffset : int
         Pixel offset to apply when computing the dispersion (accounts for offset from source cutout to
         full frame)
@@ -76,85 +68,91 @@ def dispersed_pixel(x0, y0, width, height, lams, flxs, order, wmin, wmax,
         1D array of the wavelengths of each dispersed pixel
     counts : array
         1D array of counts for each dispersed pixel
-    ID : int
-        The source ID. Returned for bookkeeping convenience.
+    pixel : array
+        1D array of the index of the input pixel of each dispersed pixel.
+        The dispersed pixels are sorted by input pixel.
     """
-
-    # Setup the transforms we need from the input WCS objects
     sky_to_imgxy = grism_wcs.get_transform('world', 'detector')
     imgxy_to_grismxy = grism_wcs.get_transform('detector', 'grism_detector')
 
-    # Setup function for retrieving flux values at each dispersed wavelength
-    if len(lams) > 1:
-        # If we have direct image flux values from more than one filter (lambda),
-        # we have the option to extrapolate the fluxes outside the
-        # wavelength range of the direct images
-        if extrapolate_sed is False:
-            flux = interp1d(lams, flxs, fill_value=0., bounds_error=False)
-        else:
-            flux = interp1d(lams, flxs, fill_value="extrapolate", bounds_error=False)
+    def grism_positions(x, y, wavelength, order):
+        x_sky, y_sky = seg_wcs(x, y)
+        x_xy, y_xy, _, _ = sky_to_imgxy(x_sky, y_sky, wavelength, order)
+        return imgxy_to_grismxy(x_xy + xoffset, y_xy + yoffset, wavelength, order)
+
+    def wavelength_step(x, y):
+        x_sky, y_sky = seg_wcs(x, y)
+        x_xy, y_xy, _, _ = sky_to_imgxy(x_sky, y_sky, 1, order)
+        xwmin, ywmin = imgxy_to_grismxy(x_xy + xoffset, y_xy + yoffset, wmin, order)
+        xwmax, ywmax = imgxy_to_grismxy(x_xy + xoffset, y_xy + yoffset, wmax, order)
+        return np.abs((wmax - wmin) / ((ywmax - ywmin) - (xwmax - xwmin)))
+
+    x0 = np.asarray(x0, dtype=float)
+    y0 = np.asarray(y0, dtype=float)
+    npix = len(x0)
+
+    # The NIRCam dispersion without inverse wavelength models interpolates
+    # the wavelengths of all the points of a call together, so the pixels
+    # are dispersed one at a time
+    elementwise = is_elementwise(imgxy_to_grismxy)
+
+    # Compute the delta-wave per pixel and the wavelengths of each pixel
+    if elementwise:
+        dlam = wavelength_step(x0, y0) / oversample_factor
     else:
-        # If we only have flux from one lambda, just use that
-        # single flux value at all wavelengths
-        def flux(x):
-            return flxs[0]
-
-    # Get x/y positions in the grism image corresponding to wmin and wmax:
-    # Start with RA/Dec of the input pixel position in segmentation map,
-    # then convert to x/y in the direct image frame corresponding
-    # to the grism image,
-    # then finally convert to x/y in the grism image frame
-    x0_sky, y0_sky = seg_wcs(x0, y0)
-    x0_xy, y0_xy, _, _ = sky_to_imgxy(x0_sky, y0_sky, 1, order)
-    xwmin, ywmin = imgxy_to_grismxy(x0_xy + xoffset, y0_xy + yoffset, wmin, order)
-    xwmax, ywmax = imgxy_to_grismxy(x0_xy + xoffset, y0_xy + yoffset, wmax, order)
-    dxw = xwmax - xwmin
-    dyw = ywmax - ywmin
-
-    # Compute the delta-wave per pixel
-    dw = np.abs((wmax - wmin) / (dyw - dxw))
-
-    # Use a natural wavelength scale or the wavelength scale of the input SED/spectrum,
-    # whichever is smaller, divided by oversampling requested
-    if len(lams) > 1:
-        input_dlam = np.median(lams[1:] - lams[:-1])
-        if input_dlam < dw:
-            dlam = input_dlam / oversample_factor
+        dlam = np.array([wavelength_step(x, y) for x, y in zip(x0, y0)]) / oversample_factor
+    lambdas = [np.arange(wmin, wmax + dl, dl) if np.isfinite(dl) and dl > 0 else np.empty(0)
+               for dl in dlam]
+    n_lam = np.array([len(lam) for lam in lambdas], dtype=int)
+
+    # Group the pixels in chunks of at most _MAX_POINTS dispersed positions
+    if elementwise:
+        chunk = np.cumsum(n_lam) // _MAX_POINTS
+        starts = np.flatnonzero(np.diff(chunk, prepend=-1))
     else:
-        # this value gets used when we only have 1 direct image wavelength
-        dlam = dw / oversample_factor
-
-    # Create list of wavelengths on which to compute dispersed pixels
-    lambdas = np.arange(wmin, wmax + dlam, dlam)
-    n_lam = len(lambdas)
-
-    # Compute lists of x/y positions in the grism image for
-    # the set of desired wavelengths:
-    # As above, first get RA/Dec of segmentation map pixel positions,
-    # then convert to x/y in image frame of grism image,
-    # then convert to x/y in grism frame.
-    x0_sky, y0_sky = seg_wcs([x0] * n_lam, [y0] * n_lam)
-    x0_xy, y0_xy, _, _ = sky_to_imgxy(x0_sky, y0_sky, lambdas, [order] * n_lam)
-    x0s, y0s = imgxy_to_grismxy(x0_xy + xoffset, y0_xy + yoffset, lambdas, [order] * n_lam)
-
-    # If none of the dispersed pixel indexes are within the image frame,
-    # return a null result without wasting time doing other computations
-    if x0s.min() >= naxis[0] or x0s.max() < 0 or y0s.min() >= naxis[1] or y0s.max() < 0:
-        return None
-
-    # Compute arrays of dispersed pixel locations and areas
+        starts = np.arange(npix)
+    stops = np.append(starts[1:], npix)
+
+    results = []
     padding = 1
-    xs, ys, areas, index = get_clipped_pixels(
-        x0s, y0s,
-        padding,
-        naxis[0], naxis[1],
-        width, height
-    )
-    lams = np.take(lambdas, index)
-
-    # If results give no dispersed pixels, return null result
-    if xs.size <= 1:
-        return None
+    for start, stop in zip(starts, stops):
+        nlam = n_lam[start:stop]
+        if nlam.sum() == 0:
+            continue
+        lam = np.concatenate(lambdas[start:stop])
+        pix = np.repeat(np.arange(start, stop), nlam)
+        x0s, y0s = grism_positions(x0[pix], y0[pix], lam, np.full(len(lam), order))
+
+        # Skip the pixels with none of the dispersed positions within the image frame
+        first = np.flatnonzero(nlam)
+        offsets = np.cumsum(nlam)[first] - nlam[first]
+        outside = ((np.minimum.reduceat(x0s, offsets) >= naxis[0]) |
+                   (np.maximum.reduceat(x0s, offsets) < 0) |
+                   (np.minimum.reduceat(y0s, offsets) >= naxis[1]) |
+                   (np.maximum.reduceat(y0s, offsets) < 0))
+        inside = ~np.repeat(outside, nlam[first])
+        lam, pix = lam[inside], pix[inside]
+
+        # Compute arrays of dispersed pixel locations and areas
+        xs, ys, areas, index = get_clipped_pixels(
+            x0s[inside], y0s[inside],
+            padding,
+            naxis[0], naxis[1],
+            width, height
+        )
+        pixel = pix[index]
+
+        # Skip the pixels that give less than two dispersed pixels
+        valid = np.bincount(pixel - start, minlength=stop - start)[pixel - start] > 1
+        results.append((xs[valid], ys[valid], areas[valid], lam[index][valid], pixel[valid]))
+
+    if results:
+        xs, ys, areas, lams, pixel = map(np.concatenate, zip(*results))
+    else:
+        xs = np.empty(0, dtype=np.int32)
+        ys = np.empty(0, dtype=np.int32)
+        areas, lams = np.empty(0), np.empty(0)
+        pixel = np.empty(0, dtype=int)
 
     # compute 1D sensitivity array corresponding to list of wavelengths
     sens, no_cal = create_1d_sens(lams, sens_waves, sens_resp)
@@ -165,7 +163,7 @@ def dispersed_pixel(x0, y0, width, height, lams, flxs, order, wmin, wmax,
     # countrate (DN/s).
     with warnings.catch_warnings():
         warnings.filterwarnings("ignore", category=RuntimeWarning, message="divide by zero")
-        counts = flux(lams) * areas / (sens * oversample_factor)
+        counts = np.asarray(flxs)[pixel] * areas / (sens * oversample_factor)
     counts[no_cal] = 0.  # set to zero where no flux cal info available
 
-    return xs, ys, areas, lams, counts, ID
+    return xs, ys, areas, lams, counts, pixel
@@ -1,12 +1,13 @@
+import os
+import shutil
+import tempfile
 import time
 import multiprocessing
 import numpy as np
 
-from scipy import sparse
-
 from stdatamodels.jwst import datamodels
 
-from .disperse import dispersed_pixel
+from .disperse import disperse_pixels
 
 import logging
 
@@ -16,6 +17,89 @@ from astropy.stats import SigmaClip
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
 
+# The segmentation map and grism WCS objects of the worker processes,
+# set once by the pool initializer
+_worker_wcs = None
+
+
+def _init_worker(seg_wcs, grism_wcs):
+    global _worker_wcs
+    _worker_wcs = (seg_wcs, grism_wcs)
+
+
+def _disperse_worker(pars):
+    seg_wcs, grism_wcs = _worker_wcs
+    return disperse_pixels(seg_wcs=seg_wcs, grism_wcs=grism_wcs, **pars)
+
+
+class DispersionCache:
+    """Dispersed pixels of all the sources of an observation in concatenated arrays.
+
+    For every dispersed pixel (``point``) the cache holds its counts ``f``,
+    wavelength ``w`` and the ``index`` of the sum it belongs to: the counts
+    of a direct image pixel that fall on the same grism image pixel are summed
+    together. For every sum, ``loc`` is the flat index of its grism image pixel.
+    The points and sums of source ``c`` are the slices between
+    ``point_offsets[c]``, ``point_offsets[c + 1]`` and
+    ``sum_offsets[c]``, ``sum_offsets[c + 1]``.
+
+    Parameters
+    ----------
+    cache_dir : str or None
+        If given, the arrays are written to files in a new temporary directory
+        within ``cache_dir`` and memory-mapped, instead of being kept in memory.
+    """
+
+    dtypes = {'f': np.float64, 'w': np.float64, 'index': np.int64, 'loc': np.int64}
+
+    def __init__(self, cache_dir=None):
+        self.point_offsets = [0]
+        self.sum_offsets = [0]
+        self.directory = None
+        if cache_dir is None:
+            self._buffers = {name: [] for name in self.dtypes}
+        else:
+            self.directory = tempfile.mkdtemp(prefix='wfss_contam_cache_', dir=cache_dir)
+            self._buffers = {name: open(os.path.join(self.directory, f'{name}.dat'), 'wb')
+                             for name in self.dtypes}
+
+    def append(self, f, w, index, loc):
+        """Add the points and sums of the next source"""
+        arrays = {'f': f, 'w': w, 'index': index + self.sum_offsets[-1], 'loc': loc}
+        for name, array in arrays.items():
+            array = np.asarray(array, dtype=self.dtypes[name])
+            if self.directory is None:
+                self._buffers[name].append(array)
+            else:
+                array.tofile(self._buffers[name])
+        self.point_offsets.append(self.point_offsets[-1] + len(f))
+        self.sum_offsets.append(self.sum_offsets[-1] + len(loc))
+
+    def finalize(self):
+        """Concatenate (or memory-map) the arrays once all the sources are added"""
+        self.point_offsets = np.array(self.point_offsets)
+        self.sum_offsets = np.array(self.sum_offsets)
+        sizes = {'f': self.point_offsets[-1], 'w': self.point_offsets[-1],
+                 'index': self.point_offsets[-1], 'loc': self.sum_offsets[-1]}
+        for name, dtype in self.dtypes.items():
+            if self.directory is None:
+                array = np.concatenate(self._buffers[name] or [np.empty(0)]).astype(dtype, copy=False)
+            else:
+                self._buffers[name].close()
+                if sizes[name] > 0:
+                    array = np.memmap(self._buffers[name].name, dtype=dtype, mode='r',
+                                      shape=(sizes[name],))
+                else:
+                    array = np.empty(0, dtype=dtype)
+            setattr(self, name, array)
+        del self._buffers
+
+    def delete(self):
+        """Remove the memory-mapped files, if any"""
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
 
 def background_subtract(data, box_size=None, filter_size=(3,3), sigma=3.0, exclude_percentile=30.0):
     """
@@ -58,11 +142,13 @@ def background_subtract(data, box_size=None, filter_size=(3,3), sigma=3.0, exclu
 
 
 class Observation:
-    """This class defines an actual observation. It is tied to a single grism image."""
+    """This class defines an actual observation. It is tied to a single grism image.
+
+    Used as a context manager, the observation is closed on exit.
+    """
 
     def __init__(self, direct_images, segmap_model, grism_wcs, filter, ID=0,
-                 sed_file=None, extrapolate_sed=False,
-                 boundaries=[], offsets=[0, 0], renormalize=True, max_cpu=1):
+                 sed_file=None, boundaries=[], offsets=[0, 0], renormalize=True, max_cpu=1):
 
         """
         Initialize all data and metadata for a given observation. Creates lists of
@@ -83,8 +169,6 @@ class Observation:
         sed_file : str
             Name of Spectral Energy Distribution (SED) file containing datasets matching
             the ID in the segmentation file and each consisting of a [[lambda],[flux]] array.
-        extrapolate_sed : bool
-            Flag indicating whether to extrapolate wavelength range of SED
         boundaries : tuple
             Start/Stop coordinates of the FOV within the larger seed image.
         renormalize : bool
@@ -103,8 +187,11 @@ class Observation:
         self.filter = filter
         self.sed_file = sed_file   # should always be NONE for baseline pipeline (use flat SED)
         self.cache = False
+        self.dispersion_cache = None
+        self._building_cache = None
         self.renormalize = renormalize
         self.max_cpu = max_cpu
+        self._pool = None
         self.xoffset = offsets[0]
         self.yoffset = offsets[1]
 
@@ -120,41 +207,37 @@ class Observation:
         self.dims = (self.yend - self.ystart + 1, self.xend - self.xstart + 1)
         log.debug(f"Using simulated image size of {self.dims[1]} {self.dims[0]}")
 
-        # Allow for SED extrapolation
-        self.extrapolate_sed = extrapolate_sed
-        if self.extrapolate_sed:
-            log.warning("SED Extrapolation turned on.")
-
         # Create pixel lists for sources labeled in segmentation map
         self.create_pixel_list()
 
     def create_pixel_list(self):
         # Create a list of pixels to be dispersed, grouped per object ID.
 
+        # The pixels of all the sources are indexed in a single pass over the
+        # segmentation map: pixel_index holds the flat indexes of the pixels
+        # in the segmentation map, sorted by source ID, and the pixels of
+        # source c are pixel_index[pixel_offsets[c]:pixel_offsets[c + 1]],
+        # in the same order as np.nonzero(seg == ID).
+        seg = np.ravel(self.seg)
         if self.ID == 0:
             # When ID=0, all sources in the segmentation map are processed.
-            # This creates a huge list of all x,y pixel indices that have non-zero values
-            # in the seg map, sorted by those indices belonging to a particular source ID.
-            self.xs = []
-            self.ys = []
-            all_IDs = np.array(list(set(np.ravel(self.seg))))
-            all_IDs = all_IDs[all_IDs > 0]
-            self.IDs = all_IDs
-            log.info(f"Loading {len(all_IDs)} sources from segmentation map")
-            for ID in all_IDs:
-                ys, xs = np.nonzero(self.seg == ID)
-                if len(xs) > 0 and len(ys) > 0:
-                    self.xs.append(xs)
-                    self.ys.append(ys)
-
+            pixels = np.flatnonzero(seg > 0)
         else:
             # Process only the given source ID
             log.info(f"Loading source {self.ID} from segmentation map")
-            ys, xs = np.nonzero(self.seg == self.ID)
-            if len(xs) > 0 and len(ys) > 0:
-                self.xs = [xs]
-                self.ys = [ys]
-                self.IDs = [self.ID]
+            pixels = np.flatnonzero(seg == self.ID)
+        labels = seg[pixels]
+        order = np.argsort(labels, kind='stable')
+        self.pixel_index = pixels[order]
+        self.IDs, starts = np.unique(labels[order], return_index=True)
+        self.pixel_offsets = np.append(starts, len(self.pixel_index))
+        if self.ID == 0:
+            log.info(f"Loading {len(self.IDs)} sources from segmentation map")
+
+        # Pixel coordinates of all the pixels and per-source views of them
+        ys, xs = np.unravel_index(self.pixel_index, self.seg.shape)
+        self.xs = self._split_sources(xs)
+        self.ys = self._split_sources(ys)
 
         # Populate lists of direct image flux values for the sources.
         self.fluxes = {}
@@ -171,30 +254,33 @@ class Observation:
                     # Set pivlam, in units of microns, based on filter name.
                     pivlam = float(self.filter[1:4]) / 100.
 
-                    # Use pixel fluxes from the direct image.
-                    self.fluxes[pivlam] = []
-                    for i in range(len(self.IDs)):
-                        # This loads lists of pixel flux values for each source
-                        # from the direct image
-                        self.fluxes[pivlam].append(dimage[self.ys[i], self.xs[i]])
+                    # Use pixel fluxes from the direct image: this loads lists of
+                    # pixel flux values for each source from the direct image
+                    fluxes = np.ravel(dimage)[self.pixel_index]
+                    self.fluxes[pivlam] = self._split_sources(fluxes)
 
                 else:
                     # Use an SED file. Need to normalize the object stamps.
-                    for ID in self.IDs:
-                        vg = self.seg == ID
-                        dnew = dimage
-                        if self.renormalize:
-                            sum_seg = np.sum(dimage[vg])  # But normalize by the whole flux
+                    fluxes = np.ravel(dimage)[self.pixel_index]
+                    if self.renormalize:
+                        for i in range(len(self.IDs)):
+                            source = slice(self.pixel_offsets[i], self.pixel_offsets[i + 1])
+                            sum_seg = np.sum(fluxes[source])  # But normalize by the whole flux
                             if sum_seg != 0:
-                                dimage[vg] /= sum_seg
-                        else:
-                            log.debug("not renormalizing sources to unity")
+                                fluxes[source] /= sum_seg
+                    else:
+                        log.debug("not renormalizing sources to unity")
 
-                    self.fluxes["sed"] = []
-                    for i in range(len(self.IDs)):
-                        self.fluxes["sed"].append(dnew[self.ys[i], self.xs[i]])
+                    self.fluxes["sed"] = self._split_sources(fluxes)
 
-    def disperse_all(self, order, wmin, wmax, sens_waves, sens_resp, cache=False):
+    def _split_sources(self, values):
+        """Split values of all the pixels from pixel_index into a list of views per source"""
+        if len(self.IDs) == 0:
+            return []
+        return np.split(values, self.pixel_offsets[1:-1])
+
+    def disperse_all(self, order, wmin, wmax, sens_waves, sens_resp, cache=False,
+                     cache_dir=None):
         """
         Compute dispersed pixel values for all sources identified in
         the segmentation map.
@@ -211,29 +297,48 @@ class Observation:
             Wavelength array from photom reference file
         sens_resp : float array
             Response (flux calibration) array from photom reference file
+        cache : bool
+            Keep the dispersed pixels of all the sources in a `DispersionCache`,
+            to re-simulate the image with `disperse_all_from_cache`
+        cache_dir : str or None
+            Directory in which the cache is memory-mapped. If None, the cache
+            is kept in memory.
         """
         if cache:
             log.debug("Object caching ON")
             self.cache = True
-            self.cached_object = {}
+        if self.cache:
+            if self.dispersion_cache is not None:
+                self.dispersion_cache.delete()
+            self.dispersion_cache = DispersionCache(cache_dir)
+            self._building_cache = self.dispersion_cache
 
         # Initialize the simulated dispersed image
         self.simulated_image = np.zeros(self.dims, float)
 
-        # Loop over all source ID's from segmentation map
-        for i in range(len(self.IDs)):
-            if self.cache:
-                self.cached_object[i] = {}
-                self.cached_object[i]['x'] = []
-                self.cached_object[i]['y'] = []
-                self.cached_object[i]['f'] = []
-                self.cached_object[i]['w'] = []
-                self.cached_object[i]['minx'] = []
-                self.cached_object[i]['maxx'] = []
-                self.cached_object[i]['miny'] = []
-                self.cached_object[i]['maxy'] = []
-
-            self.disperse_chunk(i, order, wmin, wmax, sens_waves, sens_resp)
+        if self.max_cpu > 1:
+            # Disperse whole sources in the worker processes; the results
+            # are added to the image in the same order as in serial mode
+            self.order = order
+            self.wmin = wmin
+            self.wmax = wmax
+            self.sens_waves = sens_waves
+            self.sens_resp = sens_resp
+            pars = [self._disperse_pars(i, slice(None)) for i in range(len(self.IDs))]
+            chunksize = max(1, len(pars) // (4 * self.max_cpu))
+            time1 = time.time()
+            results = self._get_pool().imap(_disperse_worker, pars, chunksize=chunksize)
+            for i, result in enumerate(results):
+                log.info(f"Dispersing source {int(self.IDs[i])}, order {order}")
+                self._add_dispersed(*result)
+            log.debug(f"Elapsed time {time.time() - time1} sec")
+        else:
+            for i in range(len(self.IDs)):
+                self.disperse_chunk(i, order, wmin, wmax, sens_waves, sens_resp)
+
+        if self._building_cache is not None:
+            self._building_cache.finalize()
+            self._building_cache = None
 
     def disperse_chunk(self, c, order, wmin, wmax, sens_waves, sens_resp):
         """
@@ -263,104 +368,131 @@ class Observation:
         self.sens_waves = sens_waves
         self.sens_resp = sens_resp
         log.info(f"Dispersing source {sid}, order {self.order}")
-        pars = []  # initialize params for this object
-
-        # Loop over all pixels in list for object "c"
         log.debug(f"source contains {len(self.xs[c])} pixels")
-        for i in range(len(self.xs[c])):
-
-            # Here "i" and "ID" are just indexes into the pixel list for the object
-            # being processed, as opposed to the ID number of the object itself
-            ID = i
-
-            # xc, yc are the coordinates of the central pixel of the group
-            # of pixels surrounding the direct image pixel index
-            width = 1.0
-            height = 1.0
-            xc = self.xs[c][i] + 0.5 * width
-            yc = self.ys[c][i] + 0.5 * height
-
-            # "lams" is the array of wavelengths previously stored in flux list
-            # and correspond to the central wavelengths of the filters used in
-            # the input direct image(s). For the simple case of 1 combined direct image,
-            # this contains a single value (e.g. 4.44 for F444W).
-
-            # "fluxes" is the array of pixel values from the direct image(s).
-            # For the simple case of 1 combined direct image, this contains a
-            # a single value (just like "lams").
-            fluxes, lams = map(np.array, zip(*[
-                (self.fluxes[lm][c][i], lm) for lm in sorted(self.fluxes.keys())
-                if self.fluxes[lm][c][i] != 0
-            ]))
-
-            pars_i = (xc, yc, width, height, lams, fluxes, self.order,
-                      self.wmin, self.wmax, self.sens_waves, self.sens_resp,
-                      self.seg_wcs, self.grism_wcs, ID, self.dims[::-1], 2,
-                      self.extrapolate_sed, self.xoffset, self.yoffset)
-
-            pars.append(pars_i)
-            # now have full pars list for all pixels for this object
 
         time1 = time.time()
         if self.max_cpu > 1:
-            ctx = multiprocessing.get_context("forkserver")
-            mypool = ctx.Pool(self.max_cpu)  # Create the pool
-            all_res = mypool.imap_unordered(dispersed_pixel, pars)  # Fill the pool
-            mypool.close()  # Drain the pool
+            # Split the pixels of the source between the worker processes
+            batches = np.array_split(np.arange(len(self.xs[c])), self.max_cpu)
+            batches = [slice(batch[0], batch[-1] + 1) for batch in batches if len(batch) > 0]
+            pars = [self._disperse_pars(c, batch) for batch in batches]
+            results = list(self._get_pool().imap(_disperse_worker, pars))
+            for batch, (*_, pixel) in zip(batches, results):
+                pixel += batch.start
+            result = [np.concatenate(arrays) for arrays in zip(*results)]
         else:
-            all_res = []
-            for i in range(len(pars)):
-                all_res.append(dispersed_pixel(*pars[i]))
-
-        # Initialize blank image for this source
-        this_object = np.zeros(self.dims, float)
+            result = disperse_pixels(seg_wcs=self.seg_wcs, grism_wcs=self.grism_wcs,
+                                     **self._disperse_pars(c, slice(None)))
 
-        nres = 0
-        for pp in all_res:
-            if pp is None:
-                continue
-
-            nres += 1
-            x, y, _, w, f, *_ = pp
-
-            # skip results that don't have pixels in the field
-            if len(x) < 1:
-                continue
-
-            minx = int(min(x))
-            maxx = int(max(x))
-            miny = int(min(y))
-            maxy = int(max(y))
-            a = sparse.coo_matrix((f, (y - miny, x - minx)),
-                                  shape=(maxy - miny + 1, maxx - minx + 1)).toarray()
-
-            # Accumulate results into simulated images
-            self.simulated_image[miny:maxy + 1, minx:maxx + 1] += a
-            this_object[miny:maxy + 1, minx:maxx + 1] += a
-
-            if self.cache:
-                self.cached_object[c]['x'].append(x)
-                self.cached_object[c]['y'].append(y)
-                self.cached_object[c]['f'].append(f)
-                self.cached_object[c]['w'].append(w)
-                self.cached_object[c]['minx'].append(minx)
-                self.cached_object[c]['maxx'].append(maxx)
-                self.cached_object[c]['miny'].append(miny)
-                self.cached_object[c]['maxy'].append(maxy)
+        this_object = self._add_dispersed(*result)
 
         time2 = time.time()
         log.debug(f"Elapsed time {time2-time1} sec")
 
         return this_object
 
+    def _disperse_pars(self, c, pixels):
+        """Arguments of `disperse_pixels` for the given pixels of a source, without the WCSs"""
+
+        # xc, yc are the coordinates of the centers of the direct image pixels
+        width = 1.0
+        height = 1.0
+        xc = self.xs[c][pixels] + 0.5 * width
+        yc = self.ys[c][pixels] + 0.5 * height
+
+        # The direct image pixel values of the source. All the direct images
+        # are loaded under the same key, so there is a single flux per pixel
+        # that is used at all wavelengths. Pixels without flux are skipped.
+        (fluxes,) = self.fluxes.values()
+        fluxes = fluxes[c][pixels]
+        good = fluxes != 0
+
+        return dict(x0=xc[good], y0=yc[good], width=width, height=height,
+                    flxs=fluxes[good], order=self.order, wmin=self.wmin, wmax=self.wmax,
+                    sens_waves=self.sens_waves, sens_resp=self.sens_resp,
+                    naxis=self.dims[::-1], xoffset=self.xoffset, yoffset=self.yoffset)
+
+    def _add_dispersed(self, x, y, _, w, f, pixel):
+        """Add the dispersed pixels of a source to the simulated image"""
+
+        # Sum the counts of each direct image pixel that fall on the same
+        # dispersed pixel first, then add the direct image pixels one after
+        # the other
+        npix = self.simulated_image.size
+        index = y.astype(np.int64) * self.dims[1] + x
+        keys, inverse = np.unique(pixel * npix + index, return_inverse=True)
+        counts = np.bincount(inverse, weights=f, minlength=len(keys))
+        loc = keys % npix
+
+        # Only disperse_all fills the cache, one source after the other
+        if self._building_cache is not None:
+            self._building_cache.append(f, w, inverse, loc)
+
+        return self._add_sums(loc, counts)
+
+    def _add_sums(self, loc, counts):
+        """Add the sums of the counts of a source to the simulated image"""
+        this_object = np.zeros(self.dims, float)
+        np.add.at(self.simulated_image.reshape(-1), loc, counts)
+        np.add.at(this_object.reshape(-1), loc, counts)
+        return this_object
+
+    def _get_pool(self):
+        """Start the worker processes, which are kept until `close` is called"""
+        if self._pool is None:
+            ctx = multiprocessing.get_context("forkserver")
+            self._pool = ctx.Pool(self.max_cpu, initializer=_init_worker,
+                                  initargs=(self.seg_wcs, self.grism_wcs))
+        return self._pool
+
+    def close(self):
+        """Stop the worker processes and remove the memory-mapped cache, if any"""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        if self.dispersion_cache is not None:
+            self.dispersion_cache.delete()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def disperse_all_from_cache(self, trans=None):
+        """
+        Re-simulate the dispersed image of all the sources from the cache.
+
+        Parameters
+        ----------
+        trans : callable or None
+            Transmission function of wavelength, applied to the cached counts
+
+        Returns
+        -------
+        this_object : np.ndarray
+            Simulated image of the last source
+        """
         if not self.cache:
             return
 
-        self.simulated_image = np.zeros(self.dims, float)
+        time1 = time.time()
+        cache = self.dispersion_cache
+        counts = self._cached_counts(slice(None), trans)
+        sums = np.bincount(cache.index, weights=counts, minlength=len(cache.loc))
+        npix = self.simulated_image.size
+        self.simulated_image = np.bincount(cache.loc, weights=sums,
+                                           minlength=npix).reshape(self.dims)
+
+        # Image of the last source
+        this_object = np.zeros(self.dims, float)
+        if len(self.IDs) > 0:
+            last = slice(cache.sum_offsets[-2], cache.sum_offsets[-1])
+            np.add.at(this_object.reshape(-1), cache.loc[last], sums[last])
 
-        for i in range(len(self.IDs)):
-            this_object = self.disperse_chunk_from_cache(i, trans=trans)
+        time2 = time.time()
+        log.debug(f"Elapsed time {time2-time1} sec")
 
         return this_object
 
@@ -372,34 +504,24 @@ class Observation:
 
         time1 = time.time()
 
-        # Initialize blank image for this object
-        this_object = np.zeros(self.dims, float)
-
-        if trans is not None:
-            log.debug("Applying a transmission function...")
+        cache = self.dispersion_cache
+        points = slice(cache.point_offsets[c], cache.point_offsets[c + 1])
+        first, last = cache.sum_offsets[c], cache.sum_offsets[c + 1]
+        counts = self._cached_counts(points, trans)
+        sums = np.bincount(cache.index[points] - first, weights=counts, minlength=last - first)
 
-        for i in range(len(self.cached_object[c]['x'])):
-            x = self.cached_object[c]['x'][i]
-            y = self.cached_object[c]['y'][i]
-            f = self.cached_object[c]['f'][i] * 1.
-            w = self.cached_object[c]['w'][i]
-
-            if trans is not None:
-                f *= trans(w)
-
-            minx = self.cached_object[c]['minx'][i]
-            maxx = self.cached_object[c]['maxx'][i]
-            miny = self.cached_object[c]['miny'][i]
-            maxy = self.cached_object[c]['maxy'][i]
-
-            a = sparse.coo_matrix((f, (y - miny, x - minx)),
-                                  shape=(maxy - miny + 1, maxx - minx + 1)).toarray()
-
-            # Accumulate the results into the simulated images
-            self.simulated_image[miny:maxy + 1, minx:maxx + 1] += a
-            this_object[miny:maxy + 1, minx:maxx + 1] += a
+        # Accumulate the results into the simulated images
+        this_object = self._add_sums(cache.loc[first:last], sums)
 
         time2 = time.time()
         log.debug(f"Elapsed time {time2-time1} sec")
 
         return this_object
+
+    def _cached_counts(self, points, trans):
+        """Cached counts of the given points, times the transmission function"""
+        counts = self.dispersion_cache.f[points] * 1.
+        if trans is not None:
+            log.debug("Applying a transmission function...")
+            counts *= trans(self.dispersion_cache.w[points])
+        return counts
@@ -9,8 +9,10 @@ from astropy.stats import sigma_clipped_stats
 from photutils.datasets import make_100gaussians_image
 from photutils.segmentation import SourceFinder
 
-from jwst.wfss_contam.observations import background_subtract
-from jwst.wfss_contam.disperse import dispersed_pixel
+from jwst.wfss_contam.observations import background_subtract, Observation
+from jwst.lib.winclip import get_clipped_pixels
+from jwst.wfss_contam.disperse import disperse_pixels
+from jwst.wfss_contam.sens1d import create_1d_sens
 from jwst.wfss_contam.tests import data
 from jwst.datamodels import SegmentationMapModel, ImageModel
 
@@ -70,6 +72,30 @@ def test_background_subtract(direct_image_with_gradient):
     assert np.isclose(mean, 0.0, atol=0.2*stddev)
 
 
+def test_create_pixel_list(direct_image_with_gradient, segmentation_map, grism_wcs):
+    obs = Observation([DIR_IMAGE], segmentation_map, grism_wcs, 'F200W',
+                      boundaries=[0, 499, 0, 299])
+    seg = segmentation_map.data
+    dimage = background_subtract(direct_image_with_gradient.data)
+
+    np.testing.assert_array_equal(obs.IDs, np.unique(seg[seg > 0]))
+    assert obs.pixel_offsets[-1] == np.count_nonzero(seg)
+    for i, sid in enumerate(obs.IDs):
+        ys, xs = np.nonzero(seg == sid)
+        np.testing.assert_array_equal(obs.xs[i], xs)
+        np.testing.assert_array_equal(obs.ys[i], ys)
+        np.testing.assert_array_equal(obs.fluxes[2.0][i], dimage[ys, xs])
+
+    # a single source
+    sid = obs.IDs[3]
+    obs = Observation([DIR_IMAGE], segmentation_map, grism_wcs, 'F200W', ID=sid,
+                      boundaries=[0, 499, 0, 299])
+    ys, xs = np.nonzero(seg == sid)
+    np.testing.assert_array_equal(obs.IDs, [sid])
+    np.testing.assert_array_equal(obs.xs[0], xs)
+    np.testing.assert_array_equal(obs.ys[0], ys)
+
+
 def test_disperse_oversample_same_result(grism_wcs, segmentation_map):
     '''
     Coverage for bug where wavelength oversampling led to double-counted fluxes
@@ -84,9 +110,7 @@ def test_disperse_oversample_same_result(grism_wcs, segmentation_map):
     order = 1
     width = 1.0
     height = 1.0
-    lams = [2.0]
     flxs = [1.0]
-    ID = 0
     naxis = (300, 500)
     sens_waves = np.linspace(1.708, 2.28, 100)
     wmin, wmax = np.min(sens_waves), np.max(sens_waves)
@@ -97,16 +121,173 @@ def test_disperse_oversample_same_result(grism_wcs, segmentation_map):
     yoffset = 1000
 
 
-    xs, ys, areas, lams_out, counts_1, ID = dispersed_pixel(
-                    x0, y0, width, height, lams, flxs, order, wmin, wmax,
-                    sens_waves, sens_resp, seg_wcs, grism_wcs, ID, naxis,
-                    oversample_factor=1, extrapolate_sed=False, xoffset=xoffset,
-                    yoffset=yoffset)
-    
-    xs, ys, areas, lams_out, counts_3, ID = dispersed_pixel(
-                x0, y0, width, height, lams, flxs, order, wmin, wmax,
-                sens_waves, sens_resp, seg_wcs, grism_wcs, ID, naxis,
-                oversample_factor=3, extrapolate_sed=False, xoffset=xoffset,
-                yoffset=yoffset)
+    xs, ys, areas, lams_out, counts_1, pixel = disperse_pixels(
+                    [x0], [y0], width, height, flxs, order, wmin, wmax,
+                    sens_waves, sens_resp, seg_wcs, grism_wcs, naxis,
+                    oversample_factor=1, xoffset=xoffset, yoffset=yoffset)
+
+    xs, ys, areas, lams_out, counts_3, pixel = disperse_pixels(
+                [x0], [y0], width, height, flxs, order, wmin, wmax,
+                sens_waves, sens_resp, seg_wcs, grism_wcs, naxis,
+                oversample_factor=3, xoffset=xoffset, yoffset=yoffset)
+
+    assert np.isclose(np.sum(counts_1), np.sum(counts_3), rtol=1/sens_waves.size)
+
+
+def test_disperse_pixels(grism_wcs, segmentation_map):
+    """Test dispersing several pixels at once against dispersing each pixel"""
+    x0 = np.array([300.5, 310.5, 290.5, 100.5])
+    y0 = np.array([300.5, 290.5, 305.5, 100.5])
+    flxs = np.array([1.0, 2.0, 0.5, 1.0])
+    order = 1
+    naxis = (300, 500)
+    sens_waves = np.linspace(1.708, 2.28, 100)
+    wmin, wmax = 1.75, 2.25
+    sens_resp = np.ones(100)
+    sens_resp[:10] = 0
+    seg_wcs = segmentation_map.meta.wcs
+
+    xs, ys, areas, lams, counts, pixel = disperse_pixels(
+        x0, y0, 1.0, 1.0, flxs, order, wmin, wmax, sens_waves, sens_resp,
+        seg_wcs, grism_wcs, naxis, xoffset=2200, yoffset=1000)
+
+    # the last pixel falls outside of the grism image
+    assert set(pixel) == {0, 1, 2}
+    for i in range(len(x0)):
+        result = _disperse_pixel(
+            x0[i], y0[i], 1.0, 1.0, flxs[i], order, wmin, wmax,
+            sens_waves, sens_resp, seg_wcs, grism_wcs, naxis,
+            xoffset=2200, yoffset=1000)
+        if result is None:
+            assert i not in pixel
+            continue
+        this_pixel = pixel == i
+        np.testing.assert_array_equal(xs[this_pixel], result[0])
+        np.testing.assert_array_equal(ys[this_pixel], result[1])
+        np.testing.assert_allclose(areas[this_pixel], result[2], rtol=1e-10)
+        np.testing.assert_allclose(lams[this_pixel], result[3], rtol=1e-12)
+        np.testing.assert_allclose(counts[this_pixel], result[4], rtol=1e-10)
+
+
+def _disperse_pixel(x0, y0, width, height, flux, order, wmin, wmax,
+                    sens_waves, sens_resp, seg_wcs, grism_wcs, naxis,
+                    oversample_factor=2, xoffset=0, yoffset=0):
+    """Disperse a single pixel, evaluating the WCS for this pixel only"""
+    sky_to_imgxy = grism_wcs.get_transform('world', 'detector')
+    imgxy_to_grismxy = grism_wcs.get_transform('detector', 'grism_detector')
+
+    # Compute the delta-wave per pixel from the positions of wmin and wmax
+    x0_sky, y0_sky = seg_wcs(x0, y0)
+    x0_xy, y0_xy, _, _ = sky_to_imgxy(x0_sky, y0_sky, 1, order)
+    xwmin, ywmin = imgxy_to_grismxy(x0_xy + xoffset, y0_xy + yoffset, wmin, order)
+    xwmax, ywmax = imgxy_to_grismxy(x0_xy + xoffset, y0_xy + yoffset, wmax, order)
+    dw = np.abs((wmax - wmin) / ((ywmax - ywmin) - (xwmax - xwmin)))
+    dlam = dw / oversample_factor
+
+    lambdas = np.arange(wmin, wmax + dlam, dlam)
+    n_lam = len(lambdas)
+    x0_sky, y0_sky = seg_wcs([x0] * n_lam, [y0] * n_lam)
+    x0_xy, y0_xy, _, _ = sky_to_imgxy(x0_sky, y0_sky, lambdas, [order] * n_lam)
+    x0s, y0s = imgxy_to_grismxy(x0_xy + xoffset, y0_xy + yoffset, lambdas, [order] * n_lam)
+    if x0s.min() >= naxis[0] or x0s.max() < 0 or y0s.min() >= naxis[1] or y0s.max() < 0:
+        return None
+
+    xs, ys, areas, index = get_clipped_pixels(x0s, y0s, 1, naxis[0], naxis[1], width, height)
+    lams = np.take(lambdas, index)
+    if xs.size <= 1:
+        return None
+
+    sens, no_cal = create_1d_sens(lams, sens_waves, sens_resp)
+    with np.errstate(divide='ignore'):
+        counts = flux * areas / (sens * oversample_factor)
+    counts[no_cal] = 0.
+    return xs, ys, areas, lams, counts
+
+
+def test_disperse_all_parallel(direct_image_with_gradient, segmentation_map, grism_wcs):
+    """Test the simulated image does not depend on the number of processes"""
+    sens_waves = np.linspace(1.708, 2.28, 100)
+    sens_resp = np.ones(100)
+
+    images = []
+    for max_cpu in (1, 2):
+        obs = Observation([DIR_IMAGE], segmentation_map, grism_wcs, 'F200W',
+                          boundaries=[0, 499, 0, 299], offsets=[2200, 1000],
+                          max_cpu=max_cpu)
+        obs.disperse_all(1, 1.75, 2.25, sens_waves, sens_resp)
+        images.append(obs.simulated_image)
+        obs.close()
+
+    assert np.sum(images[0]) > 0
+    np.testing.assert_array_equal(images[0], images[1])
+
+
+def test_disperse_all_clipped_trace(direct_image_with_gradient, segmentation_map, grism_wcs):
+    """Test the sources with a trace that crosses the edge of the image contribute to it"""
+    sens_waves = np.linspace(1.708, 2.28, 100)
+    sens_resp = np.ones(100)
+    order, wmin, wmax = 1, 1.75, 2.25
+    obs = Observation([DIR_IMAGE], segmentation_map, grism_wcs, 'F200W',
+                      boundaries=[0, 499, 0, 299], offsets=[2200, 1000])
+
+    # the trace of the first pixel of each source
+    sky_to_imgxy = grism_wcs.get_transform('world', 'detector')
+    imgxy_to_grismxy = grism_wcs.get_transform('detector', 'grism_detector')
+    lambdas = np.linspace(wmin, wmax, 200)
+    orders = np.full(len(lambdas), order)
+    ny, nx = obs.dims
+    clipped = []
+    for i in range(len(obs.IDs)):
+        x_sky, y_sky = obs.seg_wcs(np.full(len(lambdas), obs.xs[i][0] + 0.5),
+                                   np.full(len(lambdas), obs.ys[i][0] + 0.5))
+        x_xy, y_xy, _, _ = sky_to_imgxy(x_sky, y_sky, lambdas, orders)
+        xs, ys = imgxy_to_grismxy(x_xy + obs.xoffset, y_xy + obs.yoffset, lambdas, orders)
+        inside = (xs >= 0) & (xs < nx) & (ys >= 0) & (ys < ny)
+        if np.any(inside) and not np.all(inside):
+            clipped.append(i)
+    assert len(clipped) > 0
+
+    obs.disperse_all(order, wmin, wmax, sens_waves, sens_resp)
+    simulated_image = obs.simulated_image.copy()
+
+    # the image is the sum of the images of all the sources, and the
+    # sources with a clipped trace contribute to it
+    obs.simulated_image = np.zeros(obs.dims)
+    for i in range(len(obs.IDs)):
+        this_object = obs.disperse_chunk(i, order, wmin, wmax, sens_waves, sens_resp)
+        if i in clipped:
+            assert np.any(this_object != 0)
+    np.testing.assert_allclose(simulated_image, obs.simulated_image)
+
+
+@pytest.mark.parametrize('memmap', [False, True])
+def test_disperse_all_from_cache(direct_image_with_gradient, segmentation_map, grism_wcs,
+                                 tmp_path, memmap):
+    sens_waves = np.linspace(1.708, 2.28, 100)
+    sens_resp = np.ones(100)
+    cache_dir = str(tmp_path) if memmap else None
+
+    obs = Observation([DIR_IMAGE], segmentation_map, grism_wcs, 'F200W',
+                      boundaries=[0, 499, 0, 299], offsets=[2200, 1000])
+    obs.disperse_all(1, 1.75, 2.25, sens_waves, sens_resp, cache=True, cache_dir=cache_dir)
+    simulated_image = obs.simulated_image.copy()
+    cache = obs.dispersion_cache
+    assert len(cache.point_offsets) == len(obs.IDs) + 1
+    assert isinstance(cache.f, np.memmap) == memmap
+
+    # replaying the cache gives the same image
+    obs.disperse_all_from_cache()
+    np.testing.assert_array_equal(obs.simulated_image, simulated_image)
+
+    obs.disperse_all_from_cache(trans=lambda w: np.full(len(w), 0.5))
+    np.testing.assert_array_equal(obs.simulated_image, 0.5 * simulated_image)
+
+    # the images of the sources add up to the same image
+    obs.simulated_image = np.zeros(obs.dims)
+    for i in range(len(obs.IDs)):
+        this_object = obs.disperse_chunk_from_cache(i)
+    assert np.sum(this_object) > 0
+    np.testing.assert_allclose(obs.simulated_image, simulated_image)
 
-    assert np.isclose(np.sum(counts_1), np.sum(counts_3), rtol=1/sens_waves.size)
\ No newline at end of file
+    obs.close()
+    assert os.listdir(tmp_path) == []
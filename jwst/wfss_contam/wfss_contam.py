@@ -113,57 +113,60 @@ def contam_corr(input_model, waverange, photom, max_cores):
 
     # Initialize the simulated image object
     simul_all = None
-    obs = Observation(image_names, seg_model, grism_wcs, filter_name,
-                      boundaries=[0, 2047, 0, 2047], offsets=[xoffset, yoffset], max_cpu=ncpus)
-
-    # Create simulated grism image for each order and sum them up
-    for order in spec_orders:
-
-        log.info(f"Creating full simulated grism image for order {order}")
-        obs.disperse_all(order, wmin[order], wmax[order], sens_waves[order],
-                         sens_response[order])
-
-        # Accumulate result for this order into the combined image
-        if simul_all is None:
-            simul_all = obs.simulated_image
-        else:
-            simul_all += obs.simulated_image
-
-    # Save the full-frame simulated grism image
-    simul_model = datamodels.ImageModel(data=simul_all)
-    simul_model.update(input_model, only="PRIMARY")
-
-    # Loop over all slits/sources to subtract contaminating spectra
-    log.info("Creating contamination image for each individual source")
-    contam_model = datamodels.MultiSlitModel()
-    contam_model.update(input_model)
-    slits = []
-    for slit in output_model.slits:
-
-        # Create simulated spectrum for this source only
-        sid = slit.source_id
-        order = slit.meta.wcsinfo.spectral_order
-        chunk = np.where(obs.IDs == sid)[0][0]  # find chunk for this source
-
-        obs.simulated_image = np.zeros(obs.dims)
-        obs.disperse_chunk(chunk, order, wmin[order], wmax[order],
-                           sens_waves[order], sens_response[order])
-        this_source = obs.simulated_image
-
-        # Contamination estimate is full simulated image minus this source
-        contam = simul_all - this_source
-
-        # Create a cutout of the contam image that matches the extent
-        # of the source slit
-        x1 = slit.xstart - 1
-        y1 = slit.ystart - 1
-        cutout = contam[y1:y1 + slit.ysize, x1:x1 + slit.xsize]
-        new_slit = datamodels.SlitModel(data=cutout)
-        copy_slit_info(slit, new_slit)
-        slits.append(new_slit)
-
-        # Subtract the cutout from the source slit
-        slit.data -= cutout
+    # The worker processes of the observation are shared by all the orders
+    # and sources, and stopped when leaving the context
+    with Observation(image_names, seg_model, grism_wcs, filter_name,
+                     boundaries=[0, 2047, 0, 2047], offsets=[xoffset, yoffset],
+                     max_cpu=ncpus) as obs:
+
+        # Create simulated grism image for each order and sum them up
+        for order in spec_orders:
+
+            log.info(f"Creating full simulated grism image for order {order}")
+            obs.disperse_all(order, wmin[order], wmax[order], sens_waves[order],
+                             sens_response[order])
+
+            # Accumulate result for this order into the combined image
+            if simul_all is None:
+                simul_all = obs.simulated_image
+            else:
+                simul_all += obs.simulated_image
+
+        # Save the full-frame simulated grism image
+        simul_model = datamodels.ImageModel(data=simul_all)
+        simul_model.update(input_model, only="PRIMARY")
+
+        # Loop over all slits/sources to subtract contaminating spectra
+        log.info("Creating contamination image for each individual source")
+        contam_model = datamodels.MultiSlitModel()
+        contam_model.update(input_model)
+        slits = []
+        for slit in output_model.slits:
+
+            # Create simulated spectrum for this source only
+            sid = slit.source_id
+            order = slit.meta.wcsinfo.spectral_order
+            chunk = np.where(obs.IDs == sid)[0][0]  # find chunk for this source
+
+            obs.simulated_image = np.zeros(obs.dims)
+            obs.disperse_chunk(chunk, order, wmin[order], wmax[order],
+                               sens_waves[order], sens_response[order])
+            this_source = obs.simulated_image
+
+            # Contamination estimate is full simulated image minus this source
+            contam = simul_all - this_source
+
+            # Create a cutout of the contam image that matches the extent
+            # of the source slit
+            x1 = slit.xstart - 1
+            y1 = slit.ystart - 1
+            cutout = contam[y1:y1 + slit.ysize, x1:x1 + slit.xsize]
+            new_slit = datamodels.SlitModel(data=cutout)
+            copy_slit_info(slit, new_slit)
+            slits.append(new_slit)
+
+            # Subtract the cutout from the source slit
+            slit.data -= cutout
 
     # Save the contamination estimates for all slits
     contam_model.slits.extend(slits)
@@ -1,5 +1,11 @@
+import os
+import sys
+import tempfile
+
 import numpy
 from setuptools import setup, Extension
+from setuptools.command.build_ext import build_ext
+from setuptools.errors import CompileError, LinkError
 
 # Setup C module include directories
 include_dirs = [numpy.get_include()]
@@ -7,7 +13,47 @@ include_dirs = [numpy.get_include()]
 # Setup C module macros
 define_macros = [("NUMPY", "1")]
 
+# Extensions built with OpenMP if the compiler supports it; otherwise they are
+# built single threaded
+openmp_extensions = [
+    "jwst.cube_build.cube_match_sky_pointcloud",
+    "jwst.cube_build.cube_match_sky_driz",
+]
+
+
+class BuildExtOpenMP(build_ext):
+    """Build the extensions, with OpenMP if the build compiler supports it"""
+
+    def build_extensions(self):
+        openmp_args = self.get_openmp_args()
+        for ext in self.extensions:
+            if ext.name in openmp_extensions:
+                ext.extra_compile_args += openmp_args
+                ext.extra_link_args += openmp_args
+        super().build_extensions()
+
+    def get_openmp_args(self):
+        """Return the OpenMP compiler flags, or none if the compiler lacks OpenMP"""
+        if sys.platform == "win32":
+            return []
+        flags = ["-fopenmp"]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            source = os.path.join(tmpdir, "test_openmp.c")
+            with open(source, "w") as f:
+                f.write("#include <omp.h>\n"
+                        "int main(void) { return omp_get_max_threads() > 0 ? 0 : 1; }\n")
+            try:
+                objects = self.compiler.compile([source], output_dir=tmpdir,
+                                                extra_postargs=flags)
+                self.compiler.link_executable(objects, os.path.join(tmpdir, "test_openmp"),
+                                              extra_postargs=flags)
+            except (CompileError, LinkError):
+                return []
+        return flags
+
+
 setup(
+    cmdclass={"build_ext": BuildExtOpenMP},
     # importing these extension modules is tested in `.github/workflows/build.yml`; 
     # when adding new modules here, make sure to add them to the `test_command` entry there
     ext_modules=[